@@ -1,3 +1,77 @@
 from django.contrib import admin
+from .models import Cloture, MouvementPoints, Paiement, ResumeClient, Table, Tournee
+
+
+@admin.register(Table)
+class TableAdmin(admin.ModelAdmin):
+    list_display = ('numero', 'restaurant', 'capacite', 'zone', 'is_active')
+    list_filter = ('restaurant', 'zone', 'is_active')
+
+
+@admin.register(Tournee)
+class TourneeAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'restaurant', 'livreur', 'statut', 'distance_km', 'date_depart', 'date_retour')
+    list_filter = ('restaurant', 'statut')
+
+
+@admin.register(Paiement)
+class PaiementAdmin(admin.ModelAdmin):
+    list_display = ('commande', 'mode', 'montant', 'encaisse_par', 'date_paiement')
+    list_filter = ('mode', 'commande__restaurant')
+    search_fields = ('commande__reference', 'reference')
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(Cloture)
+class ClotureAdmin(admin.ModelAdmin):
+    """
+    Clôtures en lecture seule : elles se créent par « manage.py cloturer_journee »
+    """
+    list_display = ('date', 'restaurant', 'nombre_commandes', 'chiffre_affaires', 'total_encaisse', 'impayes', 'ecart', 'cloture_par')
+    list_filter = ('restaurant',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ResumeClient)
+class ResumeClientAdmin(admin.ModelAdmin):
+    """
+    Résumés en lecture seule : tenus à jour au service des commandes
+    """
+    list_display = ('client', 'telephone', 'nombre_commandes', 'valeur_totale', 'derniere_visite', 'solde_points')
+    search_fields = ('client__username', 'telephone')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(MouvementPoints)
+class MouvementPointsAdmin(admin.ModelAdmin):
+    list_display = ('client', 'motif', 'points', 'commande', 'utilisateur', 'date')
+    list_filter = ('motif',)
+    search_fields = ('client__username',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
 
-# Register your models here.
@@ -0,0 +1,49 @@
+"""
+API JSON des caisses hors ligne (protocole dans commandes_app/synchro.py).
+
+GET renvoie le delta du catalogue et du stock depuis ?depuis=<version> et
+dépose le cookie CSRF ; POST envoie un lot de commandes (JSON, éventuellement
+compressé : Content-Encoding: gzip, jeton dans l'en-tête X-CSRFToken) et
+reçoit leurs résultats suivis du delta. Les réponses sont compressées en
+gzip si la tablette l'accepte.
+"""
+from django.db import IntegrityError
+from django.http import JsonResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.csrf import ensure_csrf_cookie
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import require_http_methods
+
+from users.permissions import staff_requis
+from .synchro import LotInvalide, appliquer_lot, delta, lire_lot, lire_version
+
+VERSION = 'v1'
+
+
+@staff_requis
+@require_http_methods(['GET', 'HEAD', 'POST'])
+@gzip_page
+@cache_control(private=True, no_store=True)
+@ensure_csrf_cookie
+def synchro(request):
+    """
+    Synchronisation d'une caisse : lot de commandes et delta du catalogue
+    """
+    try:
+        if request.method == 'POST':
+            lot = lire_lot(request.body, request.headers.get('Content-Encoding', ''))
+            depuis = lot['depuis']
+        else:
+            lot, depuis = None, lire_version(request.GET.get('depuis'))
+    except LotInvalide as erreur:
+        return JsonResponse({'erreur': str(erreur)}, status=400)
+
+    reponse = {}
+    if lot is not None:
+        try:
+            reponse['resultats'] = appliquer_lot(lot['commandes'])
+        except IntegrityError:
+            # Même lot envoyé en parallèle : le renvoi verra les commandes appliquées
+            return JsonResponse({'erreur': 'Lot en cours de traitement, renvoyez-le.'}, status=409)
+    reponse.update(delta(depuis))
+    return JsonResponse(reponse)
@@ -3,3 +3,10 @@ from django.apps import AppConfig
 
 class CommandesAppConfig(AppConfig):
     name = 'commandes_app'
+
+    def ready(self):
+        # Index des tables, tournées de livraison et fidélité ; ces modules
+        # ne sont importés qu'au premier événement qui les concerne
+        from . import signaux  # noqa: F401
+        # Compteur des suppressions lu par les sondes des API
+        from . import fraicheur  # noqa: F401
@@ -0,0 +1,464 @@
+"""
+Génération de données de charge réalistes.
+
+Catégories, produits, utilisateurs de tous les rôles, tables de la salle,
+commandes avec leurs lignes et mouvements de stock sont créés en lots à
+partir d'une graine : deux générations avec la même graine et les mêmes
+volumes produisent les mêmes données. Utilisé par la commande seed_load et comme jeu de données
+des tests de performance.
+
+Les petites tables passent par bulk_create. Les commandes, leurs lignes et
+les mouvements sont insérés par executemany de tuples déjà adaptés à la
+base, le lot suivant étant tiré dans un thread pendant l'insertion du
+courant : compiler le SQL objet par objet coûte plus que l'insertion.
+
+Les clés primaires sont attribuées à la suite des existantes, ce qui évite
+de relire les identifiants après chaque lot. Les dates (auto_now_add) sont
+celles générées et non la date d'insertion. Aucun signal n'étant émis, la
+valorisation du stock, les alertes et le cache du catalogue sont mis à
+jour directement.
+
+Les données sont rattachées au restaurant courant (users.restaurants),
+dont le code entre dans le préfixe des références et des identifiants.
+"""
+import itertools
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from produits_app.catalogue import invalider_catalogue
+from produits_app.models import Categorie, Produit
+from stock_app.alertes import reconstruire_alertes
+from stock_app.models import MouvementStock
+from stock_app.valorisation import ajuster_valeurs
+from users.restaurants import restaurant_courant
+from .fidelite import reconstruire as reconstruire_fidelite
+from .livraison import repertoire
+from .models import Commande, LigneCommande, Table
+from .tables import invalider_salle
+
+User = get_user_model()
+
+TAILLE_LOT = 5000
+MOT_DE_PASSE = 'charge'
+
+# Catégorie -> (unité, prix minimum, prix maximum, bases de noms)
+CATEGORIES = {
+    'Entrées': ('UNITE', 1000, 3500, ['Salade', 'Pastels', 'Nems', 'Accras', 'Soupe', 'Fataya']),
+    'Plats': ('UNITE', 2500, 8000, ['Thieboudienne', 'Yassa', 'Mafé', 'Domoda', 'Soupou kandja', 'Thiou']),
+    'Grillades': ('UNITE', 3000, 12000, ['Dibi', 'Brochettes', 'Poulet braisé', 'Poisson braisé', 'Côtelettes']),
+    'Accompagnements': ('UNITE', 500, 2000, ['Riz', 'Attiéké', 'Frites', 'Alloco', 'Couscous', 'Pain']),
+    'Desserts': ('UNITE', 800, 3000, ['Thiakry', 'Salade de fruits', 'Glace', 'Beignets', 'Tarte']),
+    'Boissons fraîches': ('BOUTEILLE', 500, 2500, ['Bissap', 'Bouye', 'Gingembre', 'Eau minérale', 'Soda']),
+    'Boissons chaudes': ('UNITE', 300, 1500, ['Café Touba', 'Thé', 'Ataya', 'Chocolat', 'Kinkéliba']),
+    'Petit-déjeuner': ('UNITE', 500, 2500, ['Omelette', 'Sandwich', 'Tartine', 'Bouillie', 'Ndambé']),
+    'Menus': ('UNITE', 4000, 15000, ['Menu midi', 'Menu soir', 'Menu enfant', 'Menu famille']),
+    'Ingrédients': ('KG', 300, 6000, ['Oignons', 'Riz brisé', 'Huile', 'Poisson', 'Poulet', 'Tomate']),
+}
+VARIANTES = [
+    'maison', 'du chef', 'spécial', 'royal', 'léger', 'épicé', 'au citron', 'à la sauce',
+    'aux légumes', 'du jour', 'traditionnel', 'grande portion', 'petite portion', 'de saison',
+]
+PRENOMS = ['Awa', 'Moussa', 'Fatou', 'Ibrahima', 'Aminata', 'Cheikh', 'Mariama', 'Ousmane', 'Khady', 'Modou']
+NOMS = ['Diop', 'Ndiaye', 'Fall', 'Sow', 'Ba', 'Diallo', 'Faye', 'Gueye', 'Sarr', 'Mbaye']
+
+# Part de chaque rôle parmi les utilisateurs générés
+ROLES = (('ADMIN', 0.02), ('MANAGER', 0.06), ('STAFF', 0.22), ('CLIENT', 0.70))
+# Heures d'ouverture et affluence relative
+AFFLUENCE = {
+    8: 3, 9: 3, 10: 2, 11: 4, 12: 10, 13: 12, 14: 6, 15: 2,
+    16: 2, 17: 3, 18: 5, 19: 9, 20: 11, 21: 7, 22: 3,
+}
+HEURES = list(AFFLUENCE)
+CUMULS_AFFLUENCE = list(itertools.accumulate(AFFLUENCE.values()))
+TYPES_COMMANDE = (('SUR_PLACE', 0.6), ('EMPORTER', 0.25), ('LIVRAISON', 0.15))
+STATUTS_PASSES = (('SERVIE', 0.88), ('ANNULEE', 0.07), ('PRETE', 0.05))
+STATUTS_DU_JOUR = (('EN_ATTENTE', 0.25), ('EN_PREPARATION', 0.25), ('PRETE', 0.2), ('SERVIE', 0.25), ('ANNULEE', 0.05))
+QUANTITES = (1, 2, 3, 4)
+CUMULS_QUANTITES = (60, 85, 95, 100)
+MOUVEMENTS = (('ENTREE', 0.55), ('SORTIE', 0.25), ('PERTE', 0.08), ('AJUSTEMENT', 0.07), ('RETOUR', 0.05))
+
+# Colonnes des insertions directes, dans l'ordre des tuples générés
+CHAMPS_COMMANDE = (
+    'id', 'restaurant', 'reference', 'client', 'nom_client', 'type_commande', 'table', 'adresse_livraison', 'latitude',
+    'longitude', 'statut', 'montant_total', 'date_commande', 'date_mise_a_jour',
+)
+CHAMPS_LIGNE = ('id', 'commande', 'produit', 'quantite', 'prix_unitaire', 'remise', 'prix_total')
+CHAMPS_MOUVEMENT = ('restaurant', 'produit', 'type_mouvement', 'quantite', 'motif', 'date_mouvement', 'utilisateur')
+
+
+def _tirage(rng, repartition):
+    valeurs, poids = zip(*repartition)
+    return rng.choices(valeurs, weights=poids)[0]
+
+
+@contextmanager
+def _dates_imposees(*modeles):
+    """
+    Désactive auto_now/auto_now_add le temps de la génération pour garder
+    les dates historiques
+    """
+    champs = [
+        (champ, champ.auto_now, champ.auto_now_add)
+        for modele in modeles
+        for champ in modele._meta.concrete_fields
+        if getattr(champ, 'auto_now', False) or getattr(champ, 'auto_now_add', False)
+    ]
+    for champ, _, _ in champs:
+        champ.auto_now = champ.auto_now_add = False
+    try:
+        yield
+    finally:
+        for champ, auto_now, auto_now_add in champs:
+            champ.auto_now, champ.auto_now_add = auto_now, auto_now_add
+
+
+def _en_avance(lots):
+    """
+    Itère sur `lots` en préparant l'élément suivant dans un thread pendant
+    que l'appelant traite le courant. Le générateur ne doit pas accéder à
+    la base : la connexion Django est propre à chaque thread.
+    """
+    file = queue.Queue(maxsize=1)
+    fin = object()
+
+    def produire():
+        try:
+            for lot in lots:
+                file.put(lot)
+        except BaseException as erreur:
+            file.put(erreur)
+        else:
+            file.put(fin)
+
+    thread = threading.Thread(target=produire, daemon=True)
+    thread.start()
+    while True:
+        lot = file.get()
+        if lot is fin:
+            break
+        if isinstance(lot, BaseException):
+            raise lot
+        yield lot
+    thread.join()
+
+
+def _prochain_id(modele):
+    # Tous restaurants confondus : les clés primaires sont communes
+    return (modele._base_manager.aggregate(maximum=Max('pk'))['maximum'] or 0) + 1
+
+
+class GenerateurCharge:
+    """
+    Génère un jeu de données ; les volumes sont des nombres de lignes
+    """
+
+    def __init__(self, graine=42, categories=len(CATEGORIES), produits=2000, utilisateurs=50, tables=30,
+                 commandes=100_000, lignes_max=5, mouvements=10_000, jours=90,
+                 taille_lot=TAILLE_LOT, rapport=None):
+        self.graine = graine
+        self.rng = random.Random(graine)
+        self.volumes = {
+            'categories': categories,
+            'produits': produits,
+            'utilisateurs': utilisateurs,
+            'tables': tables,
+            'commandes': commandes,
+            'mouvements': mouvements,
+        }
+        self.lignes_max = max(lignes_max, 1)
+        self.jours = max(jours, 1)
+        self.taille_lot = taille_lot
+        self.rapport = rapport or (lambda message: None)
+        self.maintenant = timezone.now().replace(microsecond=0)
+        restaurant = restaurant_courant()
+        self.restaurant_id = restaurant.pk if restaurant is not None else None
+        self.prefixe = f'CHG{graine}-' if restaurant is None else f'CHG{graine}-{restaurant.code.upper()}-'
+        self.totaux = {}
+        self.ops = connection.ops
+        self.adapter_date = self.ops.adapt_datetimefield_value
+        self.decimaux = {}
+
+        # Dates des insertions directes : naïves dans le fuseau de la
+        # connexion, comme les écrit l'adaptateur du backend
+        fuseau = connection.timezone
+        aujourd_hui = timezone.localdate(self.maintenant)
+        self.minuits = [
+            timezone.make_naive(timezone.make_aware(
+                datetime.combine(aujourd_hui - timedelta(days=jour), datetime.min.time())
+            ), fuseau)
+            for jour in range(self.jours)
+        ]
+        self.maintenant_bd = timezone.make_naive(self.maintenant, fuseau)
+
+    def generer(self):
+        """
+        Crée toutes les données et retourne {modèle: lignes créées}
+        """
+        with _dates_imposees(Categorie, Produit, User):
+            with transaction.atomic():
+                categories = self._categories()
+                produits = self._produits(categories)
+                utilisateurs = self._utilisateurs()
+                tables = self._tables()
+            self._commandes(produits, utilisateurs, tables)
+            with transaction.atomic():
+                self._mouvements(produits, utilisateurs)
+
+        # Ce que les signaux post_save auraient maintenu
+        reconstruire_alertes()
+        invalider_catalogue()
+        invalider_salle()
+        reconstruire_fidelite()
+        return self.totaux
+
+    def _inserer(self, modele, objets):
+        modele.objects.bulk_create(objets)
+        self.totaux[modele._meta.model_name] = self.totaux.get(modele._meta.model_name, 0) + len(objets)
+
+    def _executer(self, modele, champs, lignes):
+        """
+        Insertion directe de tuples déjà adaptés à la base (executemany),
+        pour les tables volumineuses : bulk_create passe l'essentiel de son
+        temps à compiler le SQL objet par objet
+        """
+        if not lignes:
+            return 0
+        debut = time.perf_counter()
+        nom_colonne = connection.ops.quote_name
+        colonnes = ', '.join(nom_colonne(modele._meta.get_field(champ).column) for champ in champs)
+        sql = 'INSERT INTO %s (%s) VALUES (%s)' % (
+            nom_colonne(modele._meta.db_table), colonnes, ', '.join(['%s'] * len(champs)),
+        )
+        with connection.cursor() as curseur:
+            curseur.executemany(sql, lignes)
+        self.totaux[modele._meta.model_name] = self.totaux.get(modele._meta.model_name, 0) + len(lignes)
+        return time.perf_counter() - debut
+
+    def _decimal(self, modele, champ, valeur):
+        """
+        Montant entier adapté à la base, mémorisé : les montants générés
+        se répètent beaucoup
+        """
+        cle = (modele, champ, valeur)
+        adapte = self.decimaux.get(cle)
+        if adapte is None:
+            champ = modele._meta.get_field(champ)
+            adapte = self.ops.adapt_decimalfield_value(Decimal(valeur), champ.max_digits, champ.decimal_places)
+            self.decimaux[cle] = adapte
+        return adapte
+
+    def _dates(self, nombre):
+        """
+        [(jour, date)] aléatoires sur la période (jour 0 : aujourd'hui),
+        pondérées par l'affluence horaire
+        """
+        rng = self.rng
+        jours = [rng.randrange(self.jours) for _ in range(nombre)]
+        heures = rng.choices(HEURES, cum_weights=CUMULS_AFFLUENCE, k=nombre)
+        return [
+            (jour, min(self.minuits[jour] + timedelta(seconds=heure * 3600 + rng.randrange(3600)),
+                       self.maintenant_bd))
+            for jour, heure in zip(jours, heures)
+        ]
+
+    def _categories(self):
+        """
+        Retourne [(pk, caractéristiques de la catégorie de base)]
+        """
+        bases = list(CATEGORIES)
+        noms = [
+            (base if i < len(bases) else f'{base} {i // len(bases) + 1}', base)
+            for i, base in ((i, bases[i % len(bases)]) for i in range(self.volumes['categories']))
+        ]
+        du_restaurant = Categorie.objects.tous().filter(
+            restaurant_id=self.restaurant_id, nom__in=[nom for nom, _ in noms],
+        )
+        existantes = set(du_restaurant.values_list('nom', flat=True))
+        self._inserer(Categorie, [
+            Categorie(restaurant_id=self.restaurant_id, nom=nom, description=f'Catégorie {nom.lower()}',
+                      date_created=self.maintenant, date_updated=self.maintenant)
+            for nom, _ in noms if nom not in existantes
+        ])
+        ids = dict(du_restaurant.values_list('nom', 'pk'))
+        return [(ids[nom], CATEGORIES[base]) for nom, base in noms]
+
+    def _produits(self, categories):
+        """
+        Retourne [(pk, prix de vente entier)] par popularité décroissante
+        """
+        prochain = _prochain_id(Produit)
+        produits, objets, valeurs = [], [], {}
+        for i in range(self.volumes['produits']):
+            categorie_id, (unite, prix_min, prix_max, bases) = categories[i % len(categories)]
+            nom = f'{self.rng.choice(bases)} {self.rng.choice(VARIANTES)}'
+            prix = self.rng.randrange(prix_min, prix_max + 1, 50)
+            seuil = self.rng.randint(5, 30)
+            # Une petite part du catalogue sous le seuil ou en rupture
+            stock = self.rng.choice([0, self.rng.randint(1, seuil)]) if self.rng.random() < 0.08 \
+                else self.rng.randint(seuil + 1, 500)
+            date = self.maintenant - timedelta(days=self.rng.randrange(self.jours + 365))
+            objets.append(Produit(
+                pk=prochain + i, restaurant_id=self.restaurant_id, nom=nom, description=f'{nom} ({unite.lower()})', categorie_id=categorie_id,
+                prix_vente=Decimal(prix), stock_actuel=stock, seuil_alerte=seuil, unite=unite,
+                is_active=self.rng.random() > 0.03, date_created=date, date_updated=date,
+            ))
+            produits.append((prochain + i, prix))
+            valeurs[categorie_id] = valeurs.get(categorie_id, 0) + stock * prix
+            if len(objets) >= self.taille_lot:
+                self._inserer(Produit, objets)
+                objets = []
+        self._inserer(Produit, objets)
+        # Ce que le signal post_save aurait ajouté à la valorisation
+        ajuster_valeurs({categorie_id: Decimal(valeur) for categorie_id, valeur in valeurs.items()})
+        self.rng.shuffle(produits)
+        self.rapport(f"{self.volumes['produits']} produits")
+        return produits
+
+    def _utilisateurs(self):
+        """
+        Retourne {rôle: [pk]}
+        """
+        prochain = _prochain_id(User)
+        # Un seul hachage pour tous les comptes générés
+        mot_de_passe = make_password(MOT_DE_PASSE)
+        par_role, objets = {role: [] for role, _ in ROLES}, []
+        for i in range(self.volumes['utilisateurs']):
+            # Au moins un utilisateur par rôle, puis selon la répartition
+            role = ROLES[i][0] if i < len(ROLES) else _tirage(self.rng, ROLES)
+            prenom, nom = self.rng.choice(PRENOMS), self.rng.choice(NOMS)
+            date = self.maintenant - timedelta(days=self.rng.randrange(self.jours + 365))
+            objets.append(User(
+                pk=prochain + i, restaurant_id=self.restaurant_id,
+                username=f'{self.prefixe.lower()}{role.lower()}{i}', password=mot_de_passe,
+                first_name=prenom, last_name=nom, email=f'{prenom.lower()}.{nom.lower()}{i}@exemple.sn',
+                role=role, telephone=f'+2217{self.rng.randrange(10**7, 10**8)}', is_staff=role == 'ADMIN',
+                date_joined=date, date_created=date, date_updated=date,
+            ))
+            par_role[role].append(prochain + i)
+        self._inserer(User, objets)
+        return par_role
+
+    def _tables(self):
+        """
+        Retourne les pk des tables numérotées de 1 à N, créées au besoin
+        """
+        numeros = range(1, self.volumes['tables'] + 1)
+        du_restaurant = Table.objects.tous().filter(restaurant_id=self.restaurant_id, numero__in=numeros)
+        existantes = set(du_restaurant.values_list('numero', flat=True))
+        self._inserer(Table, [
+            Table(restaurant_id=self.restaurant_id, numero=numero, capacite=self.rng.choice([2, 2, 4, 4, 4, 6, 8]),
+                  zone='Terrasse' if numero % 3 == 0 else 'Salle')
+            for numero in numeros if numero not in existantes
+        ])
+        return list(du_restaurant.order_by('numero').values_list('pk', flat=True))
+
+    def _commandes(self, produits, utilisateurs, tables):
+        # Le lot suivant est tiré pendant l'insertion du précédent
+        premiers_ids = _prochain_id(Commande), _prochain_id(LigneCommande)
+        lots = self._lots_commandes(produits, utilisateurs, tables, *premiers_ids)
+        for numero, commandes, lignes in _en_avance(lots):
+            with transaction.atomic():
+                duree = self._executer(Commande, CHAMPS_COMMANDE, commandes)
+                duree += self._executer(LigneCommande, CHAMPS_LIGNE, lignes)
+            self.rapport(f'{numero} commandes, {len(commandes) + len(lignes)} lignes insérées en {duree:.2f} s')
+
+    def _lots_commandes(self, produits, utilisateurs, tables, id_commande, id_ligne):
+        """
+        Produit (commandes générées, tuples des commandes, tuples des lignes)
+        par lot, sans accès à la base
+        """
+        # Popularité de type Zipf : quelques produits font l'essentiel des ventes
+        cumuls = list(itertools.accumulate(1 / (rang + 1) ** 0.8 for rang in range(len(produits))))
+        # Montants adaptés une fois par produit et par quantité
+        tarifs = {
+            pk: [self._decimal(LigneCommande, 'prix_total', prix * quantite) for quantite in range(5)]
+            for pk, prix in produits
+        }
+        nombres_lignes = range(1, self.lignes_max + 1)
+        poids_lignes = [self.lignes_max + 1 - nombre for nombre in nombres_lignes]
+        clients = utilisateurs['CLIENT']
+        # Livraisons réparties sur les quartiers du répertoire, déjà localisées
+        quartiers = repertoire().quartiers
+        rng = self.rng
+
+        restantes = self.volumes['commandes']
+        numero = 0
+        while restantes > 0:
+            taille = min(restantes, self.taille_lot)
+            nombres = rng.choices(nombres_lignes, weights=poids_lignes, k=taille)
+            tirages = rng.choices(produits, cum_weights=cumuls, k=sum(nombres))
+            quantites = rng.choices(QUANTITES, cum_weights=CUMULS_QUANTITES, k=len(tirages))
+            types = rng.choices(*zip(*TYPES_COMMANDE), k=taille)
+            statuts = rng.choices(*zip(*STATUTS_PASSES), k=taille)
+            dates = self._dates(taille)
+
+            commandes, lignes, position = [], [], 0
+            for i, nombre in enumerate(nombres):
+                montant = 0
+                for (produit_id, prix), quantite in zip(tirages[position:position + nombre],
+                                                        quantites[position:position + nombre]):
+                    montant += prix * quantite
+                    lignes.append((id_ligne, id_commande, produit_id, quantite, tarifs[produit_id][1],
+                                   tarifs[produit_id][0], tarifs[produit_id][quantite]))
+                    id_ligne += 1
+                position += nombre
+
+                jour, date = dates[i]
+                statut = _tirage(rng, STATUTS_DU_JOUR) if jour == 0 else statuts[i]
+                date_bd = self.adapter_date(date)
+                if types[i] == 'LIVRAISON':
+                    quartier, latitude, longitude = rng.choice(quartiers)
+                    adresse = f'Rue {rng.randrange(1, 120)}, {quartier}'
+                else:
+                    adresse, latitude, longitude = '', None, None
+                commandes.append((
+                    id_commande, self.restaurant_id, f'{self.prefixe}{numero:08d}',
+                    rng.choice(clients) if clients and rng.random() < 0.3 else None,
+                    f'{rng.choice(PRENOMS)} {rng.choice(NOMS)}', types[i],
+                    rng.choice(tables) if tables and types[i] == 'SUR_PLACE' else None,
+                    adresse, latitude, longitude, statut,
+                    self._decimal(Commande, 'montant_total', montant), date_bd, date_bd,
+                ))
+                id_commande += 1
+                numero += 1
+
+            restantes -= taille
+            yield numero, commandes, lignes
+
+    def _mouvements(self, produits, utilisateurs):
+        for lignes in _en_avance(self._lots_mouvements(produits, utilisateurs)):
+            self._executer(MouvementStock, CHAMPS_MOUVEMENT, lignes)
+
+    def _lots_mouvements(self, produits, utilisateurs):
+        equipe = utilisateurs['STAFF'] + utilisateurs['MANAGER'] or [None]
+        rng = self.rng
+        restants = self.volumes['mouvements']
+        while restants > 0:
+            taille = min(restants, self.taille_lot)
+            lignes = []
+            for type_mouvement, (_, date) in zip(rng.choices(*zip(*MOUVEMENTS), k=taille), self._dates(taille)):
+                lignes.append((
+                    self.restaurant_id, rng.choice(produits)[0], type_mouvement,
+                    rng.randint(1, 100 if type_mouvement == 'ENTREE' else 20),
+                    'Mouvement généré', self.adapter_date(date), rng.choice(equipe),
+                ))
+            restants -= taille
+            yield lignes
+
+
+def generer(graine=42, **volumes):
+    """
+    Raccourci : GenerateurCharge(graine, **volumes).generer()
+    """
+    return GenerateurCharge(graine, **volumes).generer()
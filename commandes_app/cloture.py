@@ -0,0 +1,310 @@
+"""
+Encaissements et clôture de caisse journalière.
+
+La clôture lit en un seul passage deux flux triés par commande : les
+commandes de la journée et les paiements qui les concernent ou qui ont été
+reçus ce jour-là (fusion de deux curseurs, sans charger la journée en
+mémoire). Elle rapproche ce qui est dû de ce qui est encaissé puis fige le
+résultat dans une ligne Cloture, que les statistiques lisent ensuite à la
+place d'un nouveau calcul.
+
+Chaque restaurant clôture sa caisse ; les clôtures servent aussi de cumuls
+journaliers pour les statistiques consolidées du réseau.
+
+Une journée clôturée est figée : ses commandes ne sont plus annulées,
+supprimées ni modifiées et la caisse du jour n'encaisse plus. Les commandes
+encore ni prêtes ni servies à la clôture (rien de facturé) sont reportées
+au premier jour suivant non clôturé, dont la clôture les comptera.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from users.models import Restaurant
+from users.restaurants import restaurant_courant_id
+from .cycle import STATUTS_OUVERTS
+from .models import Cloture, Commande, Paiement
+
+# Statuts comptés dans le chiffre d'affaires (comme les statistiques)
+STATUTS_FACTURES = ('PRETE', 'SERVIE')
+# Commandes non facturées à la clôture, reportées au jour suivant
+STATUTS_REPORTES = tuple(statut for statut in STATUTS_OUVERTS if statut not in STATUTS_FACTURES)
+TAILLE_LOT = 2000
+CHAMPS_MODE = {'ESPECES': 'especes', 'CARTE': 'carte', 'MOBILE': 'mobile'}
+
+
+class ClotureImpossible(Exception):
+    pass
+
+
+class PaiementRefuse(Exception):
+    pass
+
+
+def bornes_du_jour(date):
+    debut = timezone.make_aware(datetime.combine(date, time.min))
+    return debut, debut + timedelta(days=1)
+
+
+def commandes_figees(commandes):
+    """
+    pk de celles des commandes [(pk, restaurant_id, date_commande)] dont la
+    journée est clôturée
+    """
+    jours = {pk: (restaurant_id, timezone.localdate(date)) for pk, restaurant_id, date in commandes}
+    if not jours:
+        return set()
+    closes = set(Cloture.objects.tous().filter(
+        date__in={jour for _, jour in jours.values()},
+    ).values_list('restaurant_id', 'date'))
+    return {pk for pk, jour in jours.items() if jour in closes}
+
+
+def journee_close(commande):
+    """
+    Vrai si la journée de la commande est clôturée
+    """
+    return bool(commandes_figees([(commande.pk, commande.restaurant_id, commande.date_commande)]))
+
+
+def caisse_close(restaurant_id, date=None):
+    """
+    Vrai si la caisse du restaurant est clôturée pour la journée (aujourd'hui
+    par défaut)
+    """
+    return Cloture.objects.tous().filter(restaurant_id=restaurant_id, date=date or timezone.localdate()).exists()
+
+
+def premier_jour_ouvert(date):
+    """
+    Première journée non clôturée du restaurant courant à partir de `date`
+    """
+    closes = set(Cloture.objects.tous().filter(
+        restaurant_id=restaurant_courant_id(), date__gte=date,
+    ).values_list('date', flat=True))
+    while date in closes:
+        date += timedelta(days=1)
+    return date
+
+
+def reste_a_payer(commande):
+    paye = commande.paiements.aggregate(total=Sum('montant'))['total'] or Decimal('0')
+    return max(commande.montant_total - paye, Decimal('0'))
+
+
+def encaisser(commande, mode, montant, utilisateur=None, reference=''):
+    """
+    Enregistre un paiement, éventuellement partiel ; plusieurs paiements de
+    modes différents peuvent régler une même commande
+    """
+    if mode not in CHAMPS_MODE:
+        raise PaiementRefuse('Mode de paiement invalide.')
+    with transaction.atomic():
+        commande = Commande.objects.select_for_update().get(pk=commande.pk)
+        if commande.statut == 'ANNULEE':
+            raise PaiementRefuse('La commande est annulée.')
+        if caisse_close(commande.restaurant_id):
+            raise PaiementRefuse('La caisse du jour est clôturée.')
+        reste = reste_a_payer(commande)
+        if montant <= 0:
+            raise PaiementRefuse('Le montant doit être positif.')
+        if montant > reste:
+            raise PaiementRefuse(f'Montant supérieur au reste à payer ({reste} FCFA).')
+        return Paiement.objects.create(
+            commande=commande, mode=mode, montant=montant, encaisse_par=utilisateur, reference=reference,
+        )
+
+
+def cloturer(date, utilisateur=None):
+    """
+    Reporte les commandes non facturées, rapproche commandes et paiements de
+    la journée et enregistre la clôture
+    """
+    if date > timezone.localdate():
+        raise ClotureImpossible('Impossible de clôturer une journée future.')
+    with transaction.atomic():
+        return _cloturer(date, utilisateur)
+
+
+def _cloturer(date, utilisateur):
+    debut, fin = bornes_du_jour(date)
+    du_jour = Q(date_commande__gte=debut, date_commande__lt=fin)
+    if caisse_close(restaurant_courant_id(), date):
+        raise ClotureImpossible(f'La journée du {date:%d/%m/%Y} est déjà clôturée.')
+
+    # Rien de facturé : la commande passe au premier jour suivant non clôturé
+    reportees = Commande.objects.filter(du_jour, statut__in=STATUTS_REPORTES).update(
+        date_commande=bornes_du_jour(premier_jour_ouvert(date + timedelta(days=1)))[0],
+        date_mise_a_jour=timezone.now(),
+    )
+
+    commandes = (
+        Commande.objects.filter(du_jour).order_by('pk')
+        .values_list('pk', 'statut', 'montant_total').iterator(chunk_size=TAILLE_LOT)
+    )
+    paiements = (
+        Paiement.objects.filter(
+            Q(date_paiement__gte=debut, date_paiement__lt=fin)
+            | Q(commande__date_commande__gte=debut, commande__date_commande__lt=fin)
+        ).order_by('commande_id', 'pk')
+        .values_list('commande_id', 'mode', 'montant', 'date_paiement').iterator(chunk_size=TAILLE_LOT)
+    )
+
+    zero = Decimal('0.00')
+    totaux = dict.fromkeys(
+        ('chiffre_affaires', 'especes', 'carte', 'mobile', 'encaissements_autres_jours', 'impayes', 'trop_percu'),
+        zero,
+    )
+    nombres = dict.fromkeys(
+        ('nombre_commandes', 'nombre_facturees', 'nombre_annulees', 'nombre_ouvertes', 'nombre_impayees'), 0,
+    )
+    # Non terminées : reportées, plus les commandes prêtes non servies
+    nombres['nombre_ouvertes'] = reportees
+
+    def compter_encaissement(mode, montant, date_paiement):
+        # La caisse du jour ne contient que les paiements reçus ce jour-là
+        if debut <= date_paiement < fin:
+            totaux[CHAMPS_MODE[mode]] += montant
+            return True
+        return False
+
+    paiement = next(paiements, None)
+    for pk, statut, montant_total in commandes:
+        # Paiements de commandes d'autres jours, reçus aujourd'hui
+        while paiement is not None and paiement[0] < pk:
+            if compter_encaissement(*paiement[1:]):
+                totaux['encaissements_autres_jours'] += paiement[2]
+            paiement = next(paiements, None)
+        paye = zero
+        while paiement is not None and paiement[0] == pk:
+            compter_encaissement(*paiement[1:])
+            paye += paiement[2]
+            paiement = next(paiements, None)
+
+        nombres['nombre_commandes'] += 1
+        if statut == 'ANNULEE':
+            nombres['nombre_annulees'] += 1
+            totaux['trop_percu'] += paye
+            continue
+        if statut in STATUTS_OUVERTS:
+            nombres['nombre_ouvertes'] += 1
+        if statut not in STATUTS_FACTURES:
+            continue
+        nombres['nombre_facturees'] += 1
+        totaux['chiffre_affaires'] += montant_total
+        if paye < montant_total:
+            nombres['nombre_impayees'] += 1
+            totaux['impayes'] += montant_total - paye
+        else:
+            totaux['trop_percu'] += paye - montant_total
+    while paiement is not None:
+        if compter_encaissement(*paiement[1:]):
+            totaux['encaissements_autres_jours'] += paiement[2]
+        paiement = next(paiements, None)
+
+    total_encaisse = totaux['especes'] + totaux['carte'] + totaux['mobile']
+    try:
+        with transaction.atomic():
+            cloture = Cloture.objects.create(
+                date=date, cloture_par=utilisateur, total_encaisse=total_encaisse,
+                ecart=total_encaisse - totaux['chiffre_affaires'], **totaux, **nombres,
+            )
+    except IntegrityError:
+        raise ClotureImpossible(f'La journée du {date:%d/%m/%Y} est déjà clôturée.')
+    cloture.reportees = reportees
+    return cloture
+
+
+def ventes_par_jour(debut, fin):
+    """
+    {date: {'chiffre_affaires', 'nombre_commandes', 'nombre_facturees'}} du
+    `debut` au `fin` inclus : lignes figées des journées clôturées, une
+    seule requête groupée pour les autres
+    """
+    ventes = {
+        cloture['date']: cloture
+        for cloture in Cloture.objects.filter(date__gte=debut, date__lte=fin).values(
+            'date', 'chiffre_affaires', 'nombre_commandes', 'nombre_facturees',
+        )
+    }
+    restantes = [debut + timedelta(days=i) for i in range((fin - debut).days + 1)]
+    restantes = [date for date in restantes if date not in ventes]
+    if restantes:
+        calculees = (
+            Commande.objects.filter(date_commande__date__gte=restantes[0], date_commande__date__lte=restantes[-1])
+            .exclude(date_commande__date__in=list(ventes))
+            .annotate(jour=TruncDate('date_commande'))
+            .values('jour')
+            .annotate(
+                chiffre_affaires=Sum('montant_total', filter=Q(statut__in=STATUTS_FACTURES)),
+                nombre_commandes=Count('id'),
+                nombre_facturees=Count('id', filter=Q(statut__in=STATUTS_FACTURES)),
+            )
+            .order_by()
+        )
+        for ligne in calculees:
+            ventes[ligne['jour']] = {
+                'date': ligne['jour'],
+                'chiffre_affaires': ligne['chiffre_affaires'] or Decimal('0'),
+                'nombre_commandes': ligne['nombre_commandes'],
+                'nombre_facturees': ligne['nombre_facturees'],
+            }
+    return ventes
+
+
+def ventes_par_restaurant(debut, fin):
+    """
+    {restaurant_id: {'chiffre_affaires', 'nombre_commandes', 'nombre_facturees'}}
+    cumulés du `debut` au `fin` inclus sur tout le réseau : clôtures de
+    chaque restaurant, plus une requête groupée limitée aux journées qu'un
+    restaurant au moins n'a pas encore clôturées
+    """
+    ventes = {}
+
+    def cumuler(restaurant_id, chiffre_affaires, nombre_commandes, nombre_facturees):
+        cumul = ventes.setdefault(restaurant_id, {
+            'chiffre_affaires': Decimal('0'), 'nombre_commandes': 0, 'nombre_facturees': 0,
+        })
+        cumul['chiffre_affaires'] += chiffre_affaires or 0
+        cumul['nombre_commandes'] += nombre_commandes
+        cumul['nombre_facturees'] += nombre_facturees
+
+    closes = set()
+    for restaurant_id, date, *totaux in Cloture.objects.tous().filter(date__gte=debut, date__lte=fin).values_list(
+        'restaurant_id', 'date', 'chiffre_affaires', 'nombre_commandes', 'nombre_facturees',
+    ):
+        closes.add((restaurant_id, date))
+        cumuler(restaurant_id, *totaux)
+
+    restaurants = list(Restaurant.objects.filter(is_active=True).values_list('pk', flat=True))
+    jours = [debut + timedelta(days=i) for i in range((fin - debut).days + 1)]
+    ouverts = [
+        jour for jour in jours
+        if any((restaurant_id, jour) not in closes for restaurant_id in restaurants or [None])
+    ]
+    if ouverts:
+        commandes = Commande.objects.tous().filter(
+            date_commande__gte=bornes_du_jour(ouverts[0])[0], date_commande__lt=bornes_du_jour(ouverts[-1])[1],
+        )
+        if restaurants:
+            # Index restaurant / date, parcouru restaurant par restaurant
+            commandes = commandes.filter(restaurant__in=restaurants)
+        calculees = (
+            commandes
+            .annotate(jour=TruncDate('date_commande'))
+            .values_list('restaurant_id', 'jour')
+            .annotate(
+                chiffre_affaires=Sum('montant_total', filter=Q(statut__in=STATUTS_FACTURES)),
+                nombre_commandes=Count('id'),
+                nombre_facturees=Count('id', filter=Q(statut__in=STATUTS_FACTURES)),
+            )
+            .order_by()
+        )
+        for restaurant_id, jour, *totaux in calculees:
+            if (restaurant_id, jour) not in closes:
+                cumuler(restaurant_id, *totaux)
+    return ventes
@@ -0,0 +1,132 @@
+"""
+Cycle de vie des commandes.
+
+Les statuts n'avancent que selon TRANSITIONS. Une transition, qu'elle porte
+sur une commande ou sur une sélection, est une seule requête
+UPDATE ... WHERE statut IN (statuts d'origine autorisés) : une commande
+modifiée entre-temps n'est pas déplacée. Les effets de bord s'appliquent
+une fois pour l'ensemble des commandes effectivement déplacées :
+restitution groupée du stock à l'annulation, puis signal
+transition_effectuee (agrégats, index des tables ouvertes…), émis dans la
+transaction. Une commande d'une journée clôturée n'est plus annulée ni
+modifiée (commandes_app/cloture.py).
+"""
+from django.db import transaction
+from django.db.models import Sum
+from django.dispatch import Signal
+from django.utils import timezone
+
+from stock_app.consommation import restituer
+from .models import Commande, LigneCommande
+
+# Statut d'origine -> statuts cibles autorisés
+TRANSITIONS = {
+    'EN_ATTENTE': ('EN_PREPARATION', 'ANNULEE'),
+    'EN_PREPARATION': ('PRETE', 'ANNULEE'),
+    'PRETE': ('SERVIE', 'ANNULEE'),
+    'SERVIE': (),
+    'ANNULEE': (),
+}
+STATUTS_OUVERTS = ('EN_ATTENTE', 'EN_PREPARATION', 'PRETE')
+
+# Arguments : commandes (liste des pk déplacés), statut (cible)
+transition_effectuee = Signal()
+
+
+class TransitionInterdite(Exception):
+    pass
+
+
+class CommandeFermee(Exception):
+    pass
+
+
+def origines(statut):
+    """
+    Statuts à partir desquels `statut` est atteignable
+    """
+    return [origine for origine, cibles in TRANSITIONS.items() if statut in cibles]
+
+
+def transitions_possibles(commande):
+    """
+    [(code, libellé)] des statuts atteignables depuis celui de la commande
+    """
+    libelles = dict(Commande.STATUT_CHOICES)
+    return [(cible, libelles[cible]) for cible in TRANSITIONS.get(commande.statut, ())]
+
+
+def verrouiller_ouverte(pk):
+    """
+    Verrouille la commande jusqu'à la fin de la transaction en cours ; lève
+    CommandeFermee si elle n'est plus ouverte (servie ou annulée : son stock
+    et ses agrégats sont soldés) ou si sa journée est clôturée
+    """
+    from .cloture import commandes_figees
+
+    lue = list(Commande.objects.select_for_update().filter(pk=pk, statut__in=STATUTS_OUVERTS).values_list(
+        'pk', 'restaurant_id', 'date_commande',
+    ))
+    if not lue:
+        raise CommandeFermee('Commande servie ou annulée : ses lignes ne peuvent plus être modifiées.')
+    if commandes_figees(lue):
+        raise CommandeFermee('Journée clôturée : les lignes de la commande ne peuvent plus être modifiées.')
+
+
+def transition_groupee(pks, statut):
+    """
+    Fait passer au statut donné celles des commandes `pks` qui le peuvent
+    et retourne la liste de leurs pk ; les autres restent inchangées
+    """
+    sources = origines(statut)
+    if not sources:
+        raise TransitionInterdite(f'Aucune commande ne peut passer au statut {statut}.')
+
+    with transaction.atomic():
+        eligibles = Commande.objects.filter(pk__in=set(pks), statut__in=sources)
+        if statut == 'ANNULEE':
+            from .cloture import commandes_figees
+
+            # Chiffre d'affaires d'une journée clôturée figé
+            lues = list(eligibles.select_for_update().values_list('pk', 'restaurant_id', 'date_commande'))
+            figees = commandes_figees(lues)
+            deplacees = [pk for pk, _, _ in lues if pk not in figees]
+        else:
+            deplacees = list(eligibles.select_for_update().values_list('pk', flat=True))
+        if not deplacees:
+            return []
+        # date_mise_a_jour explicite : auto_now ne s'applique pas à update()
+        Commande.objects.filter(pk__in=deplacees, statut__in=sources).update(
+            statut=statut, date_mise_a_jour=timezone.now(),
+        )
+
+        if statut == 'ANNULEE':
+            # Stock consommé à l'ajout des lignes, rendu en une seule variation
+            lignes = LigneCommande.objects.filter(commande_id__in=deplacees).values('produit_id').annotate(
+                quantite=Sum('quantite')
+            ).order_by()
+            restituer([(ligne['produit_id'], ligne['quantite']) for ligne in lignes])
+
+        transition_effectuee.send(sender=Commande, commandes=deplacees, statut=statut)
+    return deplacees
+
+
+def changer_statut(commande, statut):
+    """
+    Transition d'une seule commande ; lève TransitionInterdite si elle
+    n'est pas autorisée depuis son statut actuel
+    """
+    if statut not in TRANSITIONS.get(commande.statut, ()):
+        raise TransitionInterdite(
+            f'Transition interdite : {commande.get_statut_display()} → '
+            f'{dict(Commande.STATUT_CHOICES).get(statut, statut)}.'
+        )
+    if statut == 'ANNULEE':
+        from .cloture import journee_close
+
+        if journee_close(commande):
+            raise TransitionInterdite("Journée clôturée : la commande ne peut plus être annulée.")
+    if not transition_groupee([commande.pk], statut):
+        # Statut modifié par ailleurs depuis la lecture de la commande
+        raise TransitionInterdite('La commande a changé de statut entre-temps, rechargez la page.')
+    commande.statut = statut
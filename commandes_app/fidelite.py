@@ -0,0 +1,204 @@
+"""
+Historique et fidélité des clients.
+
+ResumeClient porte, par client, les agrégats de ses commandes servies
+(nombre, montant cumulé, première et dernière visite, quantités par
+produit) et le solde de ses points de fidélité. Ils sont mis à jour de
+façon incrémentale au passage des commandes au statut SERVIE (signal
+transition_effectuee, commandes_app/signaux.py), dans la transaction de la transition : à la caisse,
+retrouver un client lit une seule ligne, par clé primaire ou par l'index du
+téléphone, sans parcourir ses commandes.
+
+Les points sont tenus dans un registre (MouvementPoints) dont le solde est
+reporté sur le résumé. reconstruire() recalcule l'ensemble à partir des
+commandes (import en masse, initialisation d'une base existante).
+"""
+import re
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, Max, Min, Q, Sum
+
+from produits_app.models import Produit
+from users.models import User
+from .models import Commande, LigneCommande, MouvementPoints, ResumeClient
+
+# Un point par tranche de FCFA_PAR_POINT FCFA servis
+FCFA_PAR_POINT = 500
+FAVORIS = 3
+INDICATIF = '221'
+TAILLE_LOT = 2000
+
+
+class PointsInsuffisants(Exception):
+    pass
+
+
+def normaliser_telephone(telephone):
+    """
+    Chiffres du numéro, avec l'indicatif du Sénégal pour les numéros locaux
+    """
+    chiffres = re.sub(r'\D', '', telephone or '')
+    if chiffres.startswith('00'):
+        chiffres = chiffres[2:]
+    if len(chiffres) == 9:
+        chiffres = INDICATIF + chiffres
+    return chiffres
+
+
+def points_gagnes(montant):
+    return int(montant // FCFA_PAR_POINT)
+
+
+def _resumes(clients):
+    """
+    {client_id: ResumeClient} verrouillés, créés au besoin
+    """
+    resumes = ResumeClient.objects.select_for_update().in_bulk(list(clients))
+    manquants = set(clients) - set(resumes)
+    if manquants:
+        ResumeClient.objects.bulk_create([
+            ResumeClient(client_id=pk, telephone=normaliser_telephone(telephone))
+            for pk, telephone in User.objects.filter(pk__in=manquants).values_list('pk', 'telephone')
+        ], ignore_conflicts=True)
+        resumes.update(ResumeClient.objects.select_for_update().in_bulk(list(manquants)))
+    return resumes
+
+
+def enregistrer_servies(pks):
+    """
+    Ajoute les commandes servies `pks` aux résumés de leurs clients et
+    crédite les points correspondants
+    """
+    commandes = list(
+        Commande.objects.filter(pk__in=pks, client__isnull=False)
+        .values_list('pk', 'client_id', 'montant_total', 'date_commande')
+    )
+    if not commandes:
+        return
+    resumes = _resumes({client for _, client, _, _ in commandes})
+
+    gains = []
+    for pk, client, montant, date in commandes:
+        resume = resumes[client]
+        resume.nombre_commandes += 1
+        resume.valeur_totale += montant
+        resume.premiere_visite = min(resume.premiere_visite or date, date)
+        resume.derniere_visite = max(resume.derniere_visite or date, date)
+        points = points_gagnes(montant)
+        if points:
+            resume.solde_points += points
+            gains.append(MouvementPoints(client_id=client, commande_id=pk, motif='GAIN', points=points))
+
+    lignes = (
+        LigneCommande.objects.filter(commande_id__in=[pk for pk, _, _, _ in commandes])
+        .values_list('commande__client_id', 'produit_id').annotate(quantite=Sum('quantite')).order_by()
+    )
+    for client, produit, quantite in lignes:
+        quantites = resumes[client].quantites_produits
+        quantites[str(produit)] = quantites.get(str(produit), 0) + quantite
+
+    MouvementPoints.objects.bulk_create(gains)
+    ResumeClient.objects.bulk_update(resumes.values(), [
+        'nombre_commandes', 'valeur_totale', 'premiere_visite', 'derniere_visite', 'quantites_produits',
+        'solde_points',
+    ])
+
+
+def ajuster_points(client, points, motif='AJUSTEMENT', utilisateur=None, commande=None):
+    """
+    Écrit un mouvement de points (négatif pour une utilisation) ; le solde
+    ne peut pas devenir négatif
+    """
+    with transaction.atomic():
+        resume = _resumes([client.pk])[client.pk]
+        if resume.solde_points + points < 0:
+            raise PointsInsuffisants(f'Solde insuffisant : {resume.solde_points} points.')
+        mouvement = MouvementPoints.objects.create(
+            client=client, commande=commande, motif=motif, points=points, utilisateur=utilisateur,
+        )
+        resume.solde_points += points
+        resume.save(update_fields=['solde_points'])
+    return mouvement
+
+
+def rechercher(terme):
+    """
+    Résumé du client désigné par son téléphone ou son identifiant de
+    connexion (lecture indexée), ou None
+    """
+    terme = (terme or '').strip()
+    resumes = ResumeClient.objects.select_related('client')
+    telephone = normaliser_telephone(terme)
+    if len(telephone) >= 7 and not re.search(r'[^\d\s.+()-]', terme):
+        return resumes.filter(telephone=telephone).first()
+    return resumes.filter(client__username=terme).first() if terme else None
+
+
+def favoris(resume, nombre=FAVORIS):
+    """
+    [(Produit, quantité servie)] des produits préférés du client
+    """
+    meilleurs = Counter({int(pk): quantite for pk, quantite in resume.quantites_produits.items()}).most_common(nombre)
+    produits = Produit.objects.in_bulk([pk for pk, _ in meilleurs])
+    return [(produits[pk], quantite) for pk, quantite in meilleurs if pk in produits]
+
+
+def reconstruire():
+    """
+    Recalcule tous les résumés à partir des commandes servies et du
+    registre, après avoir crédité les gains de points manquants. Retourne
+    le nombre de résumés.
+    """
+    servies = Commande.objects.filter(statut='SERVIE', client__isnull=False)
+    with transaction.atomic():
+        credites = MouvementPoints.objects.filter(motif='GAIN', commande__isnull=False).values('commande_id')
+        gains = (
+            MouvementPoints(client_id=client, commande_id=pk, motif='GAIN', points=points_gagnes(montant))
+            for pk, client, montant in servies.exclude(pk__in=credites)
+            .values_list('pk', 'client_id', 'montant_total').iterator(chunk_size=TAILLE_LOT)
+        )
+        MouvementPoints.objects.bulk_create([gain for gain in gains if gain.points], batch_size=TAILLE_LOT)
+
+        resumes = {
+            pk: ResumeClient(client_id=pk, telephone=normaliser_telephone(telephone))
+            for pk, telephone in User.objects.filter(
+                Q(role='CLIENT')
+                | Q(pk__in=servies.values('client_id'))
+                | Q(pk__in=MouvementPoints.objects.values('client_id'))
+            ).values_list('pk', 'telephone')
+        }
+        agregats = servies.values('client_id').annotate(
+            nombre=Count('id'), valeur=Sum('montant_total'),
+            premiere=Min('date_commande'), derniere=Max('date_commande'),
+        ).order_by()
+        for agregat in agregats:
+            resume = resumes[agregat['client_id']]
+            resume.nombre_commandes = agregat['nombre']
+            resume.valeur_totale = agregat['valeur']
+            resume.premiere_visite = agregat['premiere']
+            resume.derniere_visite = agregat['derniere']
+        quantites = (
+            LigneCommande.objects.filter(commande__in=servies)
+            .values_list('commande__client_id', 'produit_id').annotate(quantite=Sum('quantite')).order_by()
+        )
+        for client, produit, quantite in quantites:
+            resumes[client].quantites_produits[str(produit)] = quantite
+        for client, solde in MouvementPoints.objects.values_list('client_id').annotate(solde=Sum('points')).order_by():
+            resumes[client].solde_points = solde
+
+        ResumeClient.objects.all().delete()
+        ResumeClient.objects.bulk_create(resumes.values(), batch_size=TAILLE_LOT)
+    return len(resumes)
+
+
+def telephone_modifie(instance, created):
+    """
+    Compte créé ou téléphone modifié (commandes_app/signaux.py)
+    """
+    telephone = normaliser_telephone(instance.telephone)
+    if created:
+        if instance.role == 'CLIENT':
+            ResumeClient.objects.create(client=instance, telephone=telephone)
+    else:
+        ResumeClient.objects.filter(client=instance).exclude(telephone=telephone).update(telephone=telephone)
@@ -1,6 +1,8 @@
 from django import forms
-from .models import Commande, LigneCommande
-from produits_app.models import Produit
+from .models import Commande, LigneCommande, Paiement, Table
+from produits_app.catalogue import catalogue
+from .livraison import localiser
+from produits_app.recettes import portions_disponibles
 
 class CommandeForm(forms.ModelForm):
     """
@@ -8,25 +10,86 @@ class CommandeForm(forms.ModelForm):
     """
     class Meta:
         model = Commande
-        fields = ['nom_client', 'type_commande', 'notes']
+        fields = ['nom_client', 'type_commande', 'table', 'adresse_livraison', 'notes']
         widgets = {
             'nom_client': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Nom du client'}),
             'type_commande': forms.Select(attrs={'class': 'form-control'}),
+            'table': forms.Select(attrs={'class': 'form-control'}),
+            'adresse_livraison': forms.Textarea(attrs={'class': 'form-control', 'rows': 2,
+                                                       'placeholder': 'Rue, quartier'}),
             'notes': forms.Textarea(attrs={'class': 'form-control', 'rows': 3}),
         }
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['table'].queryset = Table.objects.filter(is_active=True)
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        # Seules les commandes sur place occupent une table
+        if cleaned_data.get('type_commande') != 'SUR_PLACE':
+            cleaned_data['table'] = None
+        if cleaned_data.get('type_commande') != 'LIVRAISON':
+            cleaned_data['adresse_livraison'] = ''
+        return cleaned_data
+    
+    def save(self, commit=True):
+        commande = super().save(commit=False)
+        # Position de livraison d'après le répertoire des quartiers
+        localiser(commande)
+        if commit:
+            commande.save()
+        return commande
 
 class LigneCommandeForm(forms.ModelForm):
     """
     Formulaire pour les lignes de commande
     """
+    produit = forms.TypedChoiceField(
+        coerce=int,
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    
     class Meta:
         model = LigneCommande
-        fields = ['produit', 'quantite']
+        fields = ['quantite']
         widgets = {
-            'produit': forms.Select(attrs={'class': 'form-control'}),
             'quantite': forms.NumberInput(attrs={'class': 'form-control', 'min': 1}),
         }
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.fields['produit'].queryset = Produit.objects.filter(is_active=True, stock_actuel__gt=0)
+        # Produits actifs lus dans le cache du catalogue, disponibilité
+        # d'après le stock des ingrédients de la recette
+        self.catalogue = catalogue()
+        self.portions = portions_disponibles(list(self.catalogue.par_id))
+        self.fields['produit'].choices = [('', '---------')] + [
+            (produit.pk, str(produit))
+            for produit in self.catalogue.produits
+            if self.portions.get(produit.pk, 0) > 0
+        ]
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        produit_id = cleaned_data.get('produit')
+        quantite = cleaned_data.get('quantite')
+        if produit_id:
+            self.instance.produit_id = produit_id
+            if quantite:
+                disponibles = self.portions.get(produit_id, 0)
+                if quantite > disponibles:
+                    self.add_error('quantite', f'Stock insuffisant : {disponibles} portion(s) disponible(s).')
+        return cleaned_data
+
+class PaiementForm(forms.ModelForm):
+    """
+    Formulaire d'encaissement
+    """
+    class Meta:
+        model = Paiement
+        fields = ['mode', 'montant', 'reference']
+        widgets = {
+            'mode': forms.Select(attrs={'class': 'form-control'}),
+            'montant': forms.NumberInput(attrs={'class': 'form-control', 'min': '0.01', 'step': '0.01'}),
+            'reference': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Référence (carte, mobile money)'}),
+        }
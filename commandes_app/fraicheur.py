@@ -0,0 +1,43 @@
+"""
+Fraîcheur des commandes, pour les sondes des API (stats_app/api.py).
+
+Toute écriture sur une commande ou ses lignes avance sa date de mise à
+jour (auto_now, ou date_mise_a_jour explicite dans les update()) : la
+dernière modification se lit sur l'index (restaurant, date_mise_a_jour),
+une recherche par restaurant quel que soit le nombre de commandes. Les
+suppressions, qui ne laissent pas de date, incrémentent un numéro de
+version partagé via le cache Django.
+"""
+from django.db.models import Max
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from users.models import Restaurant
+from users.restaurants import incrementer_apres_validation, restaurant_courant_id, version
+from .models import Commande, LigneCommande
+
+CLE_SUPPRESSIONS = 'commandes:suppressions'
+
+
+def derniere_modification():
+    """
+    (date de la dernière modification, compteur de suppressions) pour le
+    restaurant courant, ou tout le réseau
+    """
+    restaurant_id = restaurant_courant_id()
+    if restaurant_id is not None:
+        restaurants = [restaurant_id]
+    else:
+        # Une recherche d'index par restaurant plutôt qu'un parcours de la table
+        restaurants = [None, *Restaurant.objects.order_by().values_list('pk', flat=True)]
+    dates = [
+        Commande.objects.tous().filter(restaurant_id=pk).aggregate(derniere=Max('date_mise_a_jour'))['derniere']
+        for pk in restaurants
+    ]
+    return max(filter(None, dates), default=None), version(CLE_SUPPRESSIONS)
+
+
+@receiver(post_delete, sender=Commande)
+@receiver(post_delete, sender=LigneCommande)
+def commande_supprimee(sender, **kwargs):
+    incrementer_apres_validation(CLE_SUPPRESSIONS)
@@ -0,0 +1,298 @@
+"""
+Livraisons : géocodage hors ligne et tournées des livreurs.
+
+Les adresses sont localisées à partir d'un répertoire local des quartiers
+(donnees/quartiers_dakar.csv), sans service externe : la mention de
+quartier la plus longue trouvée dans l'adresse donne la position. Les
+livraisons en attente sont regroupées en tournées d'au plus CAPACITE
+commandes : matrice des distances calculée une fois pour toutes (NumPy,
+vectorisée), tournées construites au plus proche voisin à partir de la
+livraison restante la plus éloignée, puis ordre de passage amélioré par
+2-opt.
+
+NumPy n'est importé qu'au moment de la planification.
+"""
+import csv
+import unicodedata
+from functools import lru_cache
+from pathlib import Path
+
+from django.db import transaction
+from django.utils import timezone
+
+from .cycle import STATUTS_OUVERTS, transition_groupee
+from users.restaurants import annuaire
+
+from .models import Commande, Tournee
+
+REPERTOIRE = Path(__file__).resolve().parent / 'donnees' / 'quartiers_dakar.csv'
+# Point de départ et de retour des tournées (latitude, longitude)
+# quand la position du restaurant (Restaurant.latitude, longitude) n'est pas renseignée
+RESTAURANT = (14.6928, -17.4467)
+# Commandes par tournée
+CAPACITE = 6
+RAYON_TERRE_KM = 6371.0
+# Gain minimal (km) d'une inversion 2-opt, contre les boucles d'arrondi
+GAIN_MINIMAL = 1e-9
+
+
+class LivraisonImpossible(Exception):
+    pass
+
+
+def normaliser(texte):
+    """
+    Mots d'une adresse, sans accents ni ponctuation, en minuscules
+    """
+    texte = unicodedata.normalize('NFKD', texte or '').encode('ascii', 'ignore').decode().lower()
+    return ''.join(caractere if caractere.isalnum() else ' ' for caractere in texte).split()
+
+
+class Repertoire:
+    """
+    Quartiers connus : formes normalisées (nom et variantes) ->
+    (nom, latitude, longitude)
+    """
+
+    def __init__(self, quartiers):
+        self.quartiers = []
+        self.formes = {}
+        self.mots_max = 1
+        for nom, latitude, longitude, variantes in quartiers:
+            lieu = (nom, float(latitude), float(longitude))
+            self.quartiers.append(lieu)
+            for forme in [nom, *filter(None, variantes.split('|'))]:
+                mots = tuple(normaliser(forme))
+                self.formes[mots] = lieu
+                self.mots_max = max(self.mots_max, len(mots))
+
+    @classmethod
+    def charger(cls, chemin):
+        with open(chemin, encoding='utf-8', newline='') as fichier:
+            return cls(
+                (ligne['nom'], ligne['latitude'], ligne['longitude'], ligne['variantes'] or '')
+                for ligne in csv.DictReader(fichier)
+            )
+
+    def localiser(self, adresse):
+        """
+        (nom, latitude, longitude) du quartier cité dans l'adresse, ou None ;
+        la mention la plus longue l'emporte (« Liberté 6 » sur « Liberté »)
+        """
+        mots = normaliser(adresse)
+        for taille in range(min(self.mots_max, len(mots)), 0, -1):
+            for debut in range(len(mots) - taille + 1):
+                lieu = self.formes.get(tuple(mots[debut:debut + taille]))
+                if lieu:
+                    return lieu
+        return None
+
+
+@lru_cache(maxsize=1)
+def repertoire():
+    return Repertoire.charger(REPERTOIRE)
+
+
+def localiser(commande):
+    """
+    Renseigne la position de livraison de la commande (sans l'enregistrer)
+    d'après son adresse, à défaut celle du client. Retourne le quartier
+    reconnu ou None.
+    """
+    adresse = commande.adresse_livraison
+    if not adresse and commande.client_id:
+        adresse = commande.client.adresse
+    lieu = repertoire().localiser(adresse) if commande.type_commande == 'LIVRAISON' else None
+    commande.latitude, commande.longitude = lieu[1:] if lieu else (None, None)
+    return lieu
+
+
+def matrice_distances(points):
+    """
+    Distances orthodromiques (km) entre tous les points [(latitude,
+    longitude)], en une seule opération vectorisée
+    """
+    import numpy as np
+
+    radians = np.radians(np.asarray(points, dtype=np.float64).reshape(-1, 2))
+    latitudes, longitudes = radians[:, :1], radians[:, 1:]
+    demi_corde = (
+        np.sin((latitudes - latitudes.T) / 2) ** 2
+        + np.cos(latitudes) * np.cos(latitudes.T) * np.sin((longitudes - longitudes.T) / 2) ** 2
+    )
+    return 2 * RAYON_TERRE_KM * np.arcsin(np.sqrt(np.clip(demi_corde, 0, 1)))
+
+
+def longueur(arrets, distances):
+    """
+    Longueur de l'aller-retour depuis le point 0 en passant par `arrets`
+    """
+    parcours = [0, *arrets, 0]
+    return sum(distances[a][b] for a, b in zip(parcours, parcours[1:]))
+
+
+def deux_opt(arrets, distances):
+    """
+    Inverse des segments de l'aller-retour tant qu'une inversion le
+    raccourcit (distances symétriques)
+    """
+    parcours = [0, *arrets, 0]
+    ameliore = True
+    while ameliore:
+        ameliore = False
+        for i in range(1, len(parcours) - 2):
+            for j in range(i + 1, len(parcours) - 1):
+                a, b, c, d = parcours[i - 1], parcours[i], parcours[j], parcours[j + 1]
+                if distances[a][c] + distances[b][d] < distances[a][b] + distances[c][d] - GAIN_MINIMAL:
+                    parcours[i:j + 1] = parcours[j:i - 1:-1]
+                    ameliore = True
+    return parcours[1:-1]
+
+
+def regrouper(points, capacite=CAPACITE, depart=RESTAURANT, ameliorer=True):
+    """
+    Répartit les points de livraison en tournées d'au plus `capacite`
+    arrêts. Retourne [(indices des points dans l'ordre de passage,
+    distance de l'aller-retour en km)].
+    """
+    import numpy as np
+
+    if not points:
+        return []
+    distances = matrice_distances([depart, *points])
+    libres = np.ones(len(distances), dtype=bool)
+    libres[0] = False
+    restants = len(points)
+
+    tournees = []
+    while restants:
+        # Chaque tournée part du point libre le plus éloigné du restaurant,
+        # puis enchaîne au plus proche voisin : les quartiers éloignés ne
+        # sont pas laissés en fin de répartition dans des tournées éparses
+        position = int(np.where(libres, distances[0], -np.inf).argmax())
+        arrets = []
+        while True:
+            libres[position] = False
+            arrets.append(position)
+            restants -= 1
+            if not restants or len(arrets) == capacite:
+                break
+            position = int(np.where(libres, distances[position], np.inf).argmin())
+        tournees.append(arrets)
+
+    distances = distances.tolist()
+    resultat = []
+    for arrets in tournees:
+        if ameliorer:
+            arrets = deux_opt(arrets, distances)
+        resultat.append(([indice - 1 for indice in arrets], longueur(arrets, distances)))
+    return resultat
+
+
+def depart(restaurant_id):
+    """
+    Point de départ des tournées du restaurant `restaurant_id`
+    """
+    restaurant = annuaire().par_id.get(restaurant_id)
+    if restaurant is None or restaurant.latitude is None or restaurant.longitude is None:
+        return RESTAURANT
+    return (restaurant.latitude, restaurant.longitude)
+
+
+def livraisons_en_attente():
+    return Commande.objects.filter(type_commande='LIVRAISON', statut__in=STATUTS_OUVERTS, tournee__isnull=True)
+
+
+def planifier(capacite=CAPACITE):
+    """
+    Localise les livraisons en attente qui ne le sont pas encore, puis
+    regroupe les livraisons localisées en nouvelles tournées, restaurant
+    par restaurant. Retourne les tournées créées.
+    """
+    with transaction.atomic():
+        a_localiser = list(
+            livraisons_en_attente().filter(latitude__isnull=True).select_related('client')
+        )
+        for commande in a_localiser:
+            localiser(commande)
+        Commande.objects.bulk_update(
+            [commande for commande in a_localiser if commande.latitude is not None], ['latitude', 'longitude'],
+        )
+
+        par_restaurant = {}
+        for pk, restaurant_id, latitude, longitude in (
+            livraisons_en_attente().filter(latitude__isnull=False, longitude__isnull=False)
+            .select_for_update().order_by('pk').values_list('pk', 'restaurant_id', 'latitude', 'longitude')
+        ):
+            par_restaurant.setdefault(restaurant_id, []).append((pk, latitude, longitude))
+
+        tournees = []
+        for restaurant_id, attente in par_restaurant.items():
+            groupes = regrouper(
+                [(latitude, longitude) for _, latitude, longitude in attente], capacite, depart(restaurant_id),
+            )
+            # bulk_create : restaurant renseigné ici, sans passer par pre_save
+            creees = Tournee.objects.bulk_create([
+                Tournee(restaurant_id=restaurant_id, distance_km=round(distance, 2)) for _, distance in groupes
+            ])
+            Commande.objects.bulk_update([
+                Commande(pk=attente[indice][0], tournee_id=tournee.pk, rang_tournee=rang)
+                for tournee, (indices, _) in zip(creees, groupes)
+                for rang, indice in enumerate(indices, start=1)
+            ], ['tournee', 'rang_tournee'], batch_size=500)
+            tournees.extend(creees)
+    return tournees
+
+
+def _verrouiller(tournee, *statuts):
+    tournee = Tournee.objects.select_for_update().get(pk=tournee.pk)
+    if tournee.statut not in statuts:
+        raise LivraisonImpossible(f'Tournée {tournee.get_statut_display().lower()}.')
+    return tournee
+
+
+def demarrer(tournee, livreur):
+    """
+    Départ du livreur : toutes les commandes de la tournée doivent être prêtes
+    """
+    with transaction.atomic():
+        tournee = _verrouiller(tournee, 'PLANIFIEE')
+        non_pretes = tournee.commandes.exclude(statut='PRETE').count()
+        if non_pretes:
+            raise LivraisonImpossible(f'{non_pretes} commande(s) de la tournée ne sont pas encore prêtes.')
+        tournee.livreur = livreur
+        tournee.statut = 'EN_COURS'
+        tournee.date_depart = timezone.now()
+        tournee.save(update_fields=['livreur', 'statut', 'date_depart'])
+    return tournee
+
+
+def terminer(tournee):
+    """
+    Retour du livreur : les commandes livrées passent au statut SERVIE.
+    Retourne leurs pk.
+    """
+    with transaction.atomic():
+        tournee = _verrouiller(tournee, 'EN_COURS')
+        livrees = transition_groupee(list(tournee.commandes.values_list('pk', flat=True)), 'SERVIE')
+        tournee.statut = 'TERMINEE'
+        tournee.date_retour = timezone.now()
+        tournee.save(update_fields=['statut', 'date_retour'])
+    return livrees
+
+
+def dissoudre(tournee):
+    """
+    Supprime une tournée pas encore partie ; ses commandes redeviennent en attente
+    """
+    with transaction.atomic():
+        tournee = _verrouiller(tournee, 'PLANIFIEE')
+        tournee.commandes.update(tournee=None, rang_tournee=None)
+        tournee.delete()
+
+
+def retirer_annulees(commandes):
+    """
+    Une commande annulée ne part plus en livraison (commandes_app/signaux.py)
+    """
+    Commande.objects.filter(pk__in=commandes, tournee__isnull=False).update(tournee=None, rang_tournee=None)
@@ -0,0 +1,54 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from commandes_app import livraison
+
+
+class Command(BaseCommand):
+    help = "Mesure le regroupement des livraisons en attente en tournées (géocodage et planification)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--livraisons', type=int, default=500, help='Livraisons en attente (défaut : 500)')
+        parser.add_argument('--capacite', type=int, default=livraison.CAPACITE, help='Commandes par tournée')
+        parser.add_argument('--repetitions', type=int, default=5, help='Nombre de mesures (défaut : 5)')
+        parser.add_argument('--graine', type=int, default=42, help='Graine des adresses générées')
+        parser.add_argument('--budget-ms', type=float, default=1000,
+                            help='Durée médiane maximale du regroupement (défaut : 1000 ms)')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['graine'])
+        quartiers = livraison.repertoire().quartiers
+        adresses = [
+            f'{rng.randrange(1, 200)} Rue {rng.randrange(1, 120)}, {rng.choice(quartiers)[0]}'
+            for _ in range(options['livraisons'])
+        ]
+        # Écart de quelques centaines de mètres autour du centre du quartier
+        ecarts = [(rng.uniform(-0.004, 0.004), rng.uniform(-0.004, 0.004)) for _ in adresses]
+
+        def regrouper(ameliorer=True):
+            points = []
+            for adresse, (ecart_latitude, ecart_longitude) in zip(adresses, ecarts):
+                _, latitude, longitude = livraison.repertoire().localiser(adresse)
+                points.append((latitude + ecart_latitude, longitude + ecart_longitude))
+            return livraison.regrouper(points, options['capacite'], ameliorer=ameliorer)
+
+        # Premier passage hors mesure : import de NumPy
+        plus_proche_voisin = sum(distance for _, distance in regrouper(ameliorer=False))
+        durees = []
+        for _ in range(max(options['repetitions'], 1)):
+            debut = time.perf_counter()
+            tournees = regrouper()
+            durees.append(time.perf_counter() - debut)
+
+        distance = sum(distance for _, distance in tournees)
+        mediane = statistics.median(durees) * 1000
+        self.stdout.write(f"{options['livraisons']} livraisons -> {len(tournees)} tournées, {distance:.1f} km "
+                          f"({plus_proche_voisin:.1f} km au plus proche voisin seul)")
+        self.stdout.write(f'Durée : médiane {mediane:.1f} ms, max {max(durees) * 1000:.1f} ms '
+                          f"(budget {options['budget_ms']:.0f} ms)")
+        if mediane > options['budget_ms']:
+            raise CommandError('Budget dépassé.')
+        self.stdout.write(self.style.SUCCESS('Regroupement dans le budget.'))
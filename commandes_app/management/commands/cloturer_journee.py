@@ -0,0 +1,71 @@
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from commandes_app.cloture import ClotureImpossible, cloturer
+from users.models import Restaurant
+from users.restaurants import activer
+
+
+class Command(BaseCommand):
+    help = "Clôture la caisse d'une journée : rapprochement commandes / paiements (rapport Z)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', type=date.fromisoformat,
+                            help="Journée à clôturer, AAAA-MM-JJ (défaut : aujourd'hui)")
+        parser.add_argument('--veille', action='store_true', help='Clôturer la veille (tâche planifiée après minuit)')
+        parser.add_argument('--restaurant', help='Code du restaurant (défaut : tous les restaurants actifs)')
+
+    def handle(self, *args, **options):
+        journee = options['date'] or timezone.localdate()
+        if options['veille']:
+            journee -= timedelta(days=1)
+
+        restaurants = Restaurant.objects.filter(is_active=True)
+        if options['restaurant']:
+            restaurants = restaurants.filter(code=options['restaurant'])
+            if not restaurants:
+                raise CommandError(f"Restaurant inconnu : {options['restaurant']}.")
+        # Installation sans restaurant : une seule caisse
+        restaurants = list(restaurants) or [None]
+        echecs = []
+        for restaurant in restaurants:
+            with activer(restaurant):
+                if restaurant is not None:
+                    self.stdout.write(self.style.MIGRATE_HEADING(str(restaurant)))
+                try:
+                    self.cloturer(journee)
+                except CommandError as erreur:
+                    if len(restaurants) == 1:
+                        raise
+                    # Les autres restaurants sont clôturés quand même
+                    self.stderr.write(str(erreur))
+                    echecs.append(str(restaurant))
+        if echecs:
+            raise CommandError(f"Clôture impossible pour : {', '.join(echecs)}.")
+
+    def cloturer(self, journee):
+        debut = time.perf_counter()
+        try:
+            cloture = cloturer(journee)
+        except ClotureImpossible as erreur:
+            raise CommandError(str(erreur))
+        duree = time.perf_counter() - debut
+
+        self.stdout.write(
+            f'Commandes : {cloture.nombre_commandes} ({cloture.nombre_facturees} facturées, '
+            f'{cloture.nombre_annulees} annulées, {cloture.nombre_ouvertes} non terminées '
+            f'dont {cloture.reportees} reportée(s) au jour suivant)'
+        )
+        self.stdout.write(f"Chiffre d'affaires : {cloture.chiffre_affaires} FCFA")
+        self.stdout.write(
+            f'Encaissé : {cloture.total_encaisse} FCFA (espèces {cloture.especes}, carte {cloture.carte}, '
+            f'mobile {cloture.mobile} ; dont autres jours {cloture.encaissements_autres_jours})'
+        )
+        self.stdout.write(
+            f'Impayés : {cloture.impayes} FCFA sur {cloture.nombre_impayees} commande(s), '
+            f'trop-perçu : {cloture.trop_percu} FCFA, écart : {cloture.ecart} FCFA'
+        )
+        self.stdout.write(self.style.SUCCESS(f'{cloture} enregistrée en {duree:.2f} s.'))
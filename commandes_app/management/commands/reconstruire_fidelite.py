@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from commandes_app.fidelite import reconstruire
+
+
+class Command(BaseCommand):
+    help = "Recalcule les résumés clients et les soldes de points à partir des commandes servies"
+
+    def handle(self, *args, **options):
+        nombre = reconstruire()
+        self.stdout.write(self.style.SUCCESS(f'{nombre} résumé(s) client reconstruit(s).'))
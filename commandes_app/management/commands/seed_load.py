@@ -0,0 +1,69 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from commandes_app import charge
+from commandes_app.models import Commande
+from users.models import Restaurant
+from users.restaurants import activer
+
+
+class Command(BaseCommand):
+    help = "Génère un jeu de données de charge réaliste et reproductible (graine)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--graine', type=int, default=42,
+                            help='Graine du générateur : même graine, mêmes données (défaut : 42)')
+        parser.add_argument('--categories', type=int, default=len(charge.CATEGORIES),
+                            help='Nombre de catégories')
+        parser.add_argument('--produits', type=int, default=2000, help='Nombre de produits')
+        parser.add_argument('--utilisateurs', type=int, default=50, help="Nombre d'utilisateurs")
+        parser.add_argument('--tables', type=int, default=30, help='Nombre de tables de la salle')
+        parser.add_argument('--commandes', type=int, default=100_000, help='Nombre de commandes')
+        parser.add_argument('--lignes-max', type=int, default=5, help='Nombre maximal de lignes par commande')
+        parser.add_argument('--mouvements', type=int, default=10_000, help='Nombre de mouvements de stock')
+        parser.add_argument('--jours', type=int, default=90, help='Période couverte, en jours')
+        parser.add_argument('--restaurant', help='Code du restaurant auquel rattacher les données')
+        parser.add_argument('--lot', type=int, default=charge.TAILLE_LOT,
+                            help=f'Lignes insérées par lot (défaut : {charge.TAILLE_LOT})')
+
+    def handle(self, *args, **options):
+        restaurant = None
+        if options['restaurant']:
+            try:
+                restaurant = Restaurant.objects.get(code=options['restaurant'])
+            except Restaurant.DoesNotExist:
+                raise CommandError(f"Restaurant inconnu : {options['restaurant']}.")
+        with activer(restaurant):
+            self.generer(options)
+
+    def generer(self, options):
+        generateur = charge.GenerateurCharge(
+            graine=options['graine'],
+            categories=options['categories'],
+            produits=options['produits'],
+            utilisateurs=options['utilisateurs'],
+            tables=options['tables'],
+            commandes=options['commandes'],
+            lignes_max=options['lignes_max'],
+            mouvements=options['mouvements'],
+            jours=options['jours'],
+            taille_lot=max(options['lot'], 1),
+            rapport=self.stdout.write if options['verbosity'] > 1 else None,
+        )
+        if Commande.objects.filter(reference__startswith=generateur.prefixe).exists():
+            raise CommandError(
+                f"Des données de la graine {options['graine']} existent déjà "
+                f"(références {generateur.prefixe}…) : changez de graine ou videz la base."
+            )
+
+        debut = time.perf_counter()
+        totaux = generateur.generer()
+        duree = time.perf_counter() - debut
+
+        for modele, nombre in totaux.items():
+            self.stdout.write(f'{modele:<16} {nombre:>10}')
+        total = sum(totaux.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'{total} ligne(s) créée(s) en {duree:.1f} s ({total / duree:.0f} lignes/s).'
+        ))
@@ -0,0 +1,82 @@
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import override_settings
+
+from commandes_app.models import Commande
+from commandes_app.simulation import CaisseHorsLigne
+from commandes_app.synchro import LOT_MAX
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = ("Simule des tablettes restées hors ligne qui synchronisent leurs commandes par lots "
+            "(crée des commandes réelles : à lancer sur des données générées par seed_load)")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--caisses', type=int, default=4, help='Nombre de tablettes (défaut : 4)')
+        parser.add_argument('--commandes', type=int, default=100,
+                            help='Commandes prises hors ligne par tablette (défaut : 100)')
+        parser.add_argument('--lot', type=int, default=50, help=f'Commandes par lot (défaut : 50, au plus {LOT_MAX})')
+        parser.add_argument('--utilisateur', help='Compte employé des tablettes (défaut : le premier employé actif)')
+        parser.add_argument('--graine', type=int, default=42, help='Graine des commandes générées')
+
+    def handle(self, *args, **options):
+        employes = User.objects.filter(is_active=True, role__in=['STAFF', 'MANAGER', 'ADMIN'])
+        if options['utilisateur']:
+            employes = employes.filter(username=options['utilisateur'])
+        employe = employes.order_by('pk').first()
+        if employe is None:
+            raise CommandError('Aucun employé actif : générez des données avec seed_load.')
+        rng = random.Random(options['graine'])
+        lot = min(max(options['lot'], 1), LOT_MAX)
+
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            caisses = []
+            for _ in range(max(options['caisses'], 1)):
+                client = Client(enforce_csrf_checks=True)
+                client.force_login(employe)
+                caisse = CaisseHorsLigne(client)
+                caisse.rafraichir()
+                caisses.append(caisse)
+            produits = list(caisses[0].produits)
+            if not produits:
+                raise CommandError('Aucun produit à la carte : générez des données avec seed_load.')
+
+            # Prise de commandes sans liaison
+            for caisse in caisses:
+                for _ in range(options['commandes']):
+                    caisse.commander(
+                        [(rng.choice(produits), rng.randint(1, 3)) for _ in range(rng.randint(1, 5))],
+                        statut=rng.choice(['EN_ATTENTE', 'SERVIE']),
+                    )
+            avant = Commande.objects.count()
+
+            # Retour de la liaison : un premier envoi dont les réponses se
+            # perdent, puis le renvoi complet
+            envois, renvois, resultats = [], [], {}
+            for caisse in caisses:
+                debut = time.perf_counter()
+                caisse.synchroniser(lot, perdre_reponse=True)
+                envois.append(time.perf_counter() - debut)
+            for caisse in caisses:
+                debut = time.perf_counter()
+                for resultat in caisse.synchroniser(lot):
+                    resultats[resultat['resultat']] = resultats.get(resultat['resultat'], 0) + 1
+                renvois.append(time.perf_counter() - debut)
+
+        envoyees = sum(caisse.octets_envoyes for caisse in caisses)
+        brutes = sum(caisse.octets_json for caisse in caisses)
+        self.stdout.write(f"{len(caisses)} caisse(s), {options['commandes']} commande(s) chacune, lots de {lot}")
+        self.stdout.write(f'Premier envoi : médiane {statistics.median(envois) * 1000:.0f} ms par caisse')
+        self.stdout.write(f'Renvoi : médiane {statistics.median(renvois) * 1000:.0f} ms par caisse, '
+                          + ', '.join(f'{nombre} {resultat}' for resultat, nombre in sorted(resultats.items())))
+        self.stdout.write(f'Envoyé : {envoyees / 1024:.0f} Kio compressés pour {brutes / 1024:.0f} Kio de JSON')
+        creees = Commande.objects.count() - avant
+        if resultats.get('creee'):
+            raise CommandError(f"{resultats['creee']} commande(s) créée(s) au renvoi : le renvoi n'est pas idempotent.")
+        self.stdout.write(self.style.SUCCESS(f'{creees} commande(s) créée(s), aucune en double.'))
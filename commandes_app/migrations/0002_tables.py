@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-19 17:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('commandes_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Table',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('numero', models.PositiveIntegerField(unique=True, verbose_name='Numéro')),
+                ('capacite', models.PositiveSmallIntegerField(default=4, verbose_name='Couverts')),
+                ('zone', models.CharField(blank=True, max_length=50, verbose_name='Zone')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Active')),
+            ],
+            options={
+                'verbose_name': 'Table',
+                'verbose_name_plural': 'Tables',
+                'ordering': ['numero'],
+            },
+        ),
+        migrations.AddField(
+            model_name='commande',
+            name='table',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='commandes', to='commandes_app.table', verbose_name='Table'),
+        ),
+        migrations.AddIndex(
+            model_name='commande',
+            index=models.Index(fields=['statut', 'table'], name='commande_statut_table_idx'),
+        ),
+    ]
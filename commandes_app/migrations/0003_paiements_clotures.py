@@ -0,0 +1,61 @@
+# Generated by Django 4.2.7 on 2026-10-19 17:58
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('commandes_app', '0002_tables'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Paiement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mode', models.CharField(choices=[('ESPECES', 'Espèces'), ('CARTE', 'Carte bancaire'), ('MOBILE', 'Mobile money')], max_length=20, verbose_name='Mode de paiement')),
+                ('montant', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Montant')),
+                ('reference', models.CharField(blank=True, max_length=100, verbose_name='Référence de transaction')),
+                ('date_paiement', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Date du paiement')),
+                ('commande', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='paiements', to='commandes_app.commande', verbose_name='Commande')),
+                ('encaisse_par', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Encaissé par')),
+            ],
+            options={
+                'verbose_name': 'Paiement',
+                'verbose_name_plural': 'Paiements',
+                'ordering': ['date_paiement'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Cloture',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True, verbose_name='Journée')),
+                ('nombre_commandes', models.PositiveIntegerField(default=0, verbose_name='Commandes')),
+                ('nombre_facturees', models.PositiveIntegerField(default=0, verbose_name='Commandes facturées')),
+                ('nombre_annulees', models.PositiveIntegerField(default=0, verbose_name='Commandes annulées')),
+                ('nombre_ouvertes', models.PositiveIntegerField(default=0, verbose_name='Commandes non terminées')),
+                ('nombre_impayees', models.PositiveIntegerField(default=0, verbose_name='Commandes impayées')),
+                ('chiffre_affaires', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name="Chiffre d'affaires")),
+                ('especes', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Espèces')),
+                ('carte', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Carte bancaire')),
+                ('mobile', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Mobile money')),
+                ('total_encaisse', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Total encaissé')),
+                ('encaissements_autres_jours', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name="Encaissements de commandes d'autres jours")),
+                ('impayes', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Reste à encaisser')),
+                ('trop_percu', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Trop-perçu')),
+                ('ecart', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name="Écart encaissé / chiffre d'affaires")),
+                ('date_cloture', models.DateTimeField(auto_now_add=True, verbose_name='Date de clôture')),
+                ('cloture_par', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Clôturée par')),
+            ],
+            options={
+                'verbose_name': 'Clôture de caisse',
+                'verbose_name_plural': 'Clôtures de caisse',
+                'ordering': ['-date'],
+            },
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:03
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('commandes_app', '0003_paiements_clotures'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tournee',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('statut', models.CharField(choices=[('PLANIFIEE', 'Planifiée'), ('EN_COURS', 'En cours'), ('TERMINEE', 'Terminée')], default='PLANIFIEE', max_length=20, verbose_name='Statut')),
+                ('distance_km', models.FloatField(default=0, verbose_name='Distance (km)')),
+                ('date_creation', models.DateTimeField(auto_now_add=True, verbose_name='Date de création')),
+                ('date_depart', models.DateTimeField(blank=True, null=True, verbose_name='Départ')),
+                ('date_retour', models.DateTimeField(blank=True, null=True, verbose_name='Retour')),
+            ],
+            options={
+                'verbose_name': 'Tournée',
+                'verbose_name_plural': 'Tournées',
+                'ordering': ['-date_creation'],
+            },
+        ),
+        migrations.AddField(
+            model_name='commande',
+            name='adresse_livraison',
+            field=models.TextField(blank=True, verbose_name='Adresse de livraison'),
+        ),
+        migrations.AddField(
+            model_name='commande',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True, verbose_name='Latitude'),
+        ),
+        migrations.AddField(
+            model_name='commande',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True, verbose_name='Longitude'),
+        ),
+        migrations.AddField(
+            model_name='commande',
+            name='rang_tournee',
+            field=models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Rang dans la tournée'),
+        ),
+        migrations.AddField(
+            model_name='tournee',
+            name='livreur',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='tournees', to=settings.AUTH_USER_MODEL, verbose_name='Livreur'),
+        ),
+        migrations.AddField(
+            model_name='commande',
+            name='tournee',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='commandes', to='commandes_app.tournee', verbose_name='Tournée'),
+        ),
+        migrations.AddIndex(
+            model_name='commande',
+            index=models.Index(fields=['type_commande', 'statut', 'tournee'], name='commande_livraison_idx'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:07
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('users', '0001_initial'),
+        ('commandes_app', '0004_livraisons'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumeClient',
+            fields=[
+                ('client', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='resume_client', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Client')),
+                ('telephone', models.CharField(blank=True, db_index=True, max_length=20, verbose_name='Téléphone (normalisé)')),
+                ('nombre_commandes', models.PositiveIntegerField(default=0, verbose_name='Commandes servies')),
+                ('valeur_totale', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Montant cumulé')),
+                ('premiere_visite', models.DateTimeField(blank=True, null=True, verbose_name='Première visite')),
+                ('derniere_visite', models.DateTimeField(blank=True, null=True, verbose_name='Dernière visite')),
+                ('quantites_produits', models.JSONField(blank=True, default=dict, verbose_name='Quantités par produit')),
+                ('solde_points', models.IntegerField(default=0, verbose_name='Points de fidélité')),
+            ],
+            options={
+                'verbose_name': 'Résumé client',
+                'verbose_name_plural': 'Résumés clients',
+                'indexes': [models.Index(fields=['-valeur_totale'], name='resume_client_valeur_idx'), models.Index(fields=['derniere_visite'], name='resume_client_visite_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='MouvementPoints',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('motif', models.CharField(choices=[('GAIN', 'Commande servie'), ('UTILISATION', 'Utilisation'), ('AJUSTEMENT', 'Ajustement')], max_length=20, verbose_name='Motif')),
+                ('points', models.IntegerField(verbose_name='Points')),
+                ('date', models.DateTimeField(auto_now_add=True, verbose_name='Date')),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mouvements_points', to=settings.AUTH_USER_MODEL, verbose_name='Client')),
+                ('commande', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='mouvements_points', to='commandes_app.commande', verbose_name='Commande')),
+                ('utilisateur', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Saisi par')),
+            ],
+            options={
+                'verbose_name': 'Mouvement de points',
+                'verbose_name_plural': 'Mouvements de points',
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['client', '-date'], name='points_client_date_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='mouvementpoints',
+            constraint=models.UniqueConstraint(condition=models.Q(('motif', 'GAIN')), fields=('commande',), name='points_gain_unique'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('commandes_app', '0005_fidelite'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lignecommande',
+            name='remise',
+            field=models.DecimalField(decimal_places=2, default=0, help_text='Part de la remise des menus imputée à la ligne', max_digits=10, verbose_name='Remise'),
+        ),
+    ]
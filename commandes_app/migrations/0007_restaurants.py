@@ -0,0 +1,58 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_restaurants'),
+        ('commandes_app', '0006_lignecommande_remise'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='commande',
+            name='commande_statut_table_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='commande',
+            name='commande_livraison_idx',
+        ),
+        migrations.AddField(
+            model_name='cloture',
+            name='restaurant',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='clotures', to='users.restaurant', verbose_name='Restaurant'),
+        ),
+        migrations.AddField(
+            model_name='commande',
+            name='restaurant',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='commandes', to='users.restaurant', verbose_name='Restaurant'),
+        ),
+        migrations.AlterField(
+            model_name='cloture',
+            name='date',
+            field=models.DateField(verbose_name='Journée'),
+        ),
+        migrations.AddIndex(
+            model_name='commande',
+            index=models.Index(fields=['restaurant', '-date_commande'], name='commande_restaurant_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='commande',
+            index=models.Index(fields=['restaurant', 'statut', 'table'], name='commande_statut_table_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='commande',
+            index=models.Index(fields=['restaurant', 'type_commande', 'statut', 'tournee'], name='commande_livraison_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='cloture',
+            constraint=models.UniqueConstraint(fields=('restaurant', 'date'), name='cloture_restaurant_date_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='cloture',
+            constraint=models.UniqueConstraint(condition=models.Q(('restaurant__isnull', True)), fields=('date',), name='cloture_date_reseau_unique'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('commandes_app', '0007_restaurants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='commande',
+            name='cle_synchro',
+            field=models.UUIDField(blank=True, editable=False, help_text='Identifiant attribué par la caisse hors ligne (commandes_app/synchro.py)', null=True, unique=True, verbose_name='Clé de synchronisation'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_restaurant_position'),
+        ('commandes_app', '0008_commande_cle_synchro'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='table',
+            name='restaurant',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='tables', to='users.restaurant', verbose_name='Restaurant'),
+        ),
+        migrations.AddField(
+            model_name='tournee',
+            name='restaurant',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='tournees', to='users.restaurant', verbose_name='Restaurant'),
+        ),
+        migrations.AlterField(
+            model_name='table',
+            name='numero',
+            field=models.PositiveIntegerField(verbose_name='Numéro'),
+        ),
+        migrations.AddIndex(
+            model_name='tournee',
+            index=models.Index(fields=['restaurant', 'statut'], name='tournee_restaurant_statut_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='table',
+            constraint=models.UniqueConstraint(fields=('restaurant', 'numero'), name='table_numero_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='table',
+            constraint=models.UniqueConstraint(condition=models.Q(('restaurant__isnull', True)), fields=('numero',), name='table_numero_reseau_unique'),
+        ),
+    ]
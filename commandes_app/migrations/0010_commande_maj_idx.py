@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-19 19:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('commandes_app', '0009_tables_tournees_restaurant'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='commande',
+            index=models.Index(fields=['restaurant', 'date_mise_a_jour'], name='commande_restaurant_maj_idx'),
+        ),
+    ]
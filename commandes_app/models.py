@@ -2,9 +2,56 @@ from django.db import models
 from django.core.exceptions import ValidationError
 from django.contrib.auth import get_user_model
 from produits_app.models import Produit
+from users.models import Restaurant
+from users.restaurants import ParRestaurantManager
 
 User = get_user_model()
 
+class Table(models.Model):
+    """
+    Table de la salle, pour les commandes sur place
+    """
+    restaurant = models.ForeignKey(
+        Restaurant,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='tables',
+        verbose_name='Restaurant'
+    )
+    numero = models.PositiveIntegerField(
+        verbose_name='Numéro'
+    )
+    capacite = models.PositiveSmallIntegerField(
+        default=4,
+        verbose_name='Couverts'
+    )
+    zone = models.CharField(
+        max_length=50,
+        blank=True,
+        verbose_name='Zone'
+    )
+    is_active = models.BooleanField(
+        default=True,
+        verbose_name='Active'
+    )
+    
+    objects = ParRestaurantManager()
+    
+    class Meta:
+        verbose_name = 'Table'
+        verbose_name_plural = 'Tables'
+        ordering = ['numero']
+        constraints = [
+            models.UniqueConstraint(fields=['restaurant', 'numero'], name='table_numero_unique'),
+            # Installation sans restaurant
+            models.UniqueConstraint(fields=['numero'], condition=models.Q(restaurant__isnull=True),
+                                    name='table_numero_reseau_unique'),
+        ]
+    
+    def __str__(self):
+        return f"Table {self.numero}"
+
 class Commande(models.Model):
     """
     Modèle pour les commandes
@@ -23,6 +70,14 @@ class Commande(models.Model):
         ('LIVRAISON', 'Livraison'),
     )
     
+    restaurant = models.ForeignKey(
+        Restaurant,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='commandes',
+        verbose_name='Restaurant'
+    )
     reference = models.CharField(
         max_length=50,
         unique=True,
@@ -46,6 +101,41 @@ class Commande(models.Model):
         default='SUR_PLACE',
         verbose_name='Type de commande'
     )
+    table = models.ForeignKey(
+        Table,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='commandes',
+        verbose_name='Table'
+    )
+    adresse_livraison = models.TextField(
+        blank=True,
+        verbose_name='Adresse de livraison'
+    )
+    latitude = models.FloatField(
+        null=True,
+        blank=True,
+        verbose_name='Latitude'
+    )
+    longitude = models.FloatField(
+        null=True,
+        blank=True,
+        verbose_name='Longitude'
+    )
+    tournee = models.ForeignKey(
+        'Tournee',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='commandes',
+        verbose_name='Tournée'
+    )
+    rang_tournee = models.PositiveSmallIntegerField(
+        null=True,
+        blank=True,
+        verbose_name='Rang dans la tournée'
+    )
     statut = models.CharField(
         max_length=20,
         choices=STATUT_CHOICES,
@@ -71,15 +161,42 @@ class Commande(models.Model):
         auto_now=True,
         verbose_name='Date de mise à jour'
     )
+    cle_synchro = models.UUIDField(
+        null=True,
+        blank=True,
+        unique=True,
+        editable=False,
+        verbose_name='Clé de synchronisation',
+        help_text="Identifiant attribué par la caisse hors ligne (commandes_app/synchro.py)"
+    )
+    
+    objects = ParRestaurantManager()
     
     class Meta:
         verbose_name = 'Commande'
         verbose_name_plural = 'Commandes'
         ordering = ['-date_commande']
+        indexes = [
+            # Listes et statistiques d'un restaurant
+            models.Index(fields=['restaurant', '-date_commande'], name='commande_restaurant_date_idx'),
+            # Reconstruction de l'index des tables ouvertes
+            models.Index(fields=['restaurant', 'statut', 'table'], name='commande_statut_table_idx'),
+            # Livraisons en attente de tournée
+            models.Index(fields=['restaurant', 'type_commande', 'statut', 'tournee'], name='commande_livraison_idx'),
+            # Sonde de fraîcheur des API (commandes_app/fraicheur.py)
+            models.Index(fields=['restaurant', 'date_mise_a_jour'], name='commande_restaurant_maj_idx'),
+        ]
     
     def __str__(self):
         return f"Commande {self.reference} - {self.get_statut_display()}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Table au chargement : un changement de table met à jour l'index des tables ouvertes
+        instance._table_chargee = instance.__dict__.get('table_id')
+        return instance
+    
     def save(self, *args, **kwargs):
         if not self.reference:
             # Générer une référence unique
@@ -120,12 +237,21 @@ class LigneCommande(models.Model):
         decimal_places=2,
         verbose_name='Prix unitaire'
     )
+    remise = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        default=0,
+        verbose_name='Remise',
+        help_text='Part de la remise des menus imputée à la ligne'
+    )
     prix_total = models.DecimalField(
         max_digits=10,
         decimal_places=2,
         verbose_name='Prix total'
     )
     
+    objects = ParRestaurantManager.par('commande__restaurant')
+    
     class Meta:
         verbose_name = 'Ligne de commande'
         verbose_name_plural = 'Lignes de commande'
@@ -134,8 +260,303 @@ class LigneCommande(models.Model):
         return f"{self.quantite} x {self.produit.nom}"
     
     def save(self, *args, **kwargs):
-        self.prix_total = self.quantite * self.prix_unitaire
+        self.prix_total = self.quantite * self.prix_unitaire - self.remise
         super().save(*args, **kwargs)
         
         # Mettre à jour le montant total de la commande
         self.commande.calculer_montant_total()
+
+class Tournee(models.Model):
+    """
+    Tournée d'un livreur : commandes à livrer, dans l'ordre de passage
+    (Commande.rang_tournee)
+    """
+    STATUT_CHOICES = (
+        ('PLANIFIEE', 'Planifiée'),
+        ('EN_COURS', 'En cours'),
+        ('TERMINEE', 'Terminée'),
+    )
+    
+    restaurant = models.ForeignKey(
+        Restaurant,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='tournees',
+        verbose_name='Restaurant'
+    )
+    livreur = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='tournees',
+        verbose_name='Livreur'
+    )
+    statut = models.CharField(
+        max_length=20,
+        choices=STATUT_CHOICES,
+        default='PLANIFIEE',
+        verbose_name='Statut'
+    )
+    distance_km = models.FloatField(
+        default=0,
+        verbose_name='Distance (km)'
+    )
+    date_creation = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Date de création'
+    )
+    date_depart = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Départ'
+    )
+    date_retour = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Retour'
+    )
+    
+    objects = ParRestaurantManager()
+    
+    class Meta:
+        verbose_name = 'Tournée'
+        verbose_name_plural = 'Tournées'
+        ordering = ['-date_creation']
+        indexes = [
+            # Tableau des livraisons : tournées pas encore terminées
+            models.Index(fields=['restaurant', 'statut'], name='tournee_restaurant_statut_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Tournée n°{self.pk} - {self.get_statut_display()}"
+
+class Paiement(models.Model):
+    """
+    Encaissement (éventuellement partiel) d'une commande
+    """
+    MODE_CHOICES = (
+        ('ESPECES', 'Espèces'),
+        ('CARTE', 'Carte bancaire'),
+        ('MOBILE', 'Mobile money'),
+    )
+    
+    commande = models.ForeignKey(
+        Commande,
+        on_delete=models.PROTECT,
+        related_name='paiements',
+        verbose_name='Commande'
+    )
+    mode = models.CharField(
+        max_length=20,
+        choices=MODE_CHOICES,
+        verbose_name='Mode de paiement'
+    )
+    montant = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        verbose_name='Montant'
+    )
+    reference = models.CharField(
+        max_length=100,
+        blank=True,
+        verbose_name='Référence de transaction'
+    )
+    encaisse_par = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='Encaissé par'
+    )
+    date_paiement = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        verbose_name='Date du paiement'
+    )
+    
+    objects = ParRestaurantManager.par('commande__restaurant')
+    
+    class Meta:
+        verbose_name = 'Paiement'
+        verbose_name_plural = 'Paiements'
+        ordering = ['date_paiement']
+    
+    def __str__(self):
+        return f"{self.montant} FCFA ({self.get_mode_display()}) - {self.commande.reference}"
+
+class Cloture(models.Model):
+    """
+    Clôture de caisse d'une journée (rapport Z) : ligne figée, lue par les
+    statistiques à la place d'un nouveau calcul
+    """
+    restaurant = models.ForeignKey(
+        Restaurant,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='clotures',
+        verbose_name='Restaurant'
+    )
+    date = models.DateField(
+        verbose_name='Journée'
+    )
+    nombre_commandes = models.PositiveIntegerField(default=0, verbose_name='Commandes')
+    nombre_facturees = models.PositiveIntegerField(default=0, verbose_name='Commandes facturées')
+    nombre_annulees = models.PositiveIntegerField(default=0, verbose_name='Commandes annulées')
+    nombre_ouvertes = models.PositiveIntegerField(default=0, verbose_name='Commandes non terminées')
+    nombre_impayees = models.PositiveIntegerField(default=0, verbose_name='Commandes impayées')
+    chiffre_affaires = models.DecimalField(max_digits=14, decimal_places=2, default=0,
+                                           verbose_name="Chiffre d'affaires")
+    especes = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='Espèces')
+    carte = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='Carte bancaire')
+    mobile = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='Mobile money')
+    total_encaisse = models.DecimalField(max_digits=14, decimal_places=2, default=0,
+                                         verbose_name='Total encaissé')
+    encaissements_autres_jours = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0,
+        verbose_name="Encaissements de commandes d'autres jours"
+    )
+    impayes = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='Reste à encaisser')
+    trop_percu = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='Trop-perçu')
+    ecart = models.DecimalField(max_digits=14, decimal_places=2, default=0,
+                                verbose_name="Écart encaissé / chiffre d'affaires")
+    cloture_par = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='Clôturée par'
+    )
+    date_cloture = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Date de clôture'
+    )
+    
+    objects = ParRestaurantManager()
+    
+    class Meta:
+        verbose_name = 'Clôture de caisse'
+        verbose_name_plural = 'Clôtures de caisse'
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(fields=['restaurant', 'date'], name='cloture_restaurant_date_unique'),
+            # Installation sans restaurant
+            models.UniqueConstraint(fields=['date'], condition=models.Q(restaurant__isnull=True),
+                                    name='cloture_date_reseau_unique'),
+        ]
+    
+    def __str__(self):
+        return f"Clôture du {self.date:%d/%m/%Y}"
+    
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValidationError('Une clôture de caisse est définitive.')
+        super().save(*args, **kwargs)
+    
+    def delete(self, *args, **kwargs):
+        raise ValidationError('Une clôture de caisse est définitive.')
+
+class ResumeClient(models.Model):
+    """
+    Agrégats d'un client, tenus à jour au service de ses commandes
+    (commandes_app/fidelite.py)
+    """
+    client = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='resume_client',
+        verbose_name='Client'
+    )
+    telephone = models.CharField(
+        max_length=20,
+        blank=True,
+        db_index=True,
+        verbose_name='Téléphone (normalisé)'
+    )
+    nombre_commandes = models.PositiveIntegerField(default=0, verbose_name='Commandes servies')
+    valeur_totale = models.DecimalField(max_digits=14, decimal_places=2, default=0,
+                                        verbose_name='Montant cumulé')
+    premiere_visite = models.DateTimeField(null=True, blank=True, verbose_name='Première visite')
+    derniere_visite = models.DateTimeField(null=True, blank=True, verbose_name='Dernière visite')
+    # {id du produit: quantité servie}
+    quantites_produits = models.JSONField(default=dict, blank=True, verbose_name='Quantités par produit')
+    solde_points = models.IntegerField(default=0, verbose_name='Points de fidélité')
+    
+    class Meta:
+        verbose_name = 'Résumé client'
+        verbose_name_plural = 'Résumés clients'
+        indexes = [
+            models.Index(fields=['-valeur_totale'], name='resume_client_valeur_idx'),
+            models.Index(fields=['derniere_visite'], name='resume_client_visite_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Résumé de {self.client}"
+    
+    @property
+    def panier_moyen(self):
+        return self.valeur_totale / self.nombre_commandes if self.nombre_commandes else 0
+
+class MouvementPoints(models.Model):
+    """
+    Écriture du registre des points de fidélité
+    """
+    MOTIF_CHOICES = (
+        ('GAIN', 'Commande servie'),
+        ('UTILISATION', 'Utilisation'),
+        ('AJUSTEMENT', 'Ajustement'),
+    )
+    
+    client = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='mouvements_points',
+        verbose_name='Client'
+    )
+    commande = models.ForeignKey(
+        Commande,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='mouvements_points',
+        verbose_name='Commande'
+    )
+    motif = models.CharField(
+        max_length=20,
+        choices=MOTIF_CHOICES,
+        verbose_name='Motif'
+    )
+    points = models.IntegerField(verbose_name='Points')
+    utilisateur = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='Saisi par'
+    )
+    date = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Date'
+    )
+    
+    class Meta:
+        verbose_name = 'Mouvement de points'
+        verbose_name_plural = 'Mouvements de points'
+        ordering = ['-date']
+        indexes = [
+            models.Index(fields=['client', '-date'], name='points_client_date_idx'),
+        ]
+        constraints = [
+            # Une commande ne rapporte ses points qu'une fois
+            models.UniqueConstraint(fields=['commande'], condition=models.Q(motif='GAIN'),
+                                    name='points_gain_unique'),
+        ]
+    
+    def __str__(self):
+        return f"{self.points:+d} points - {self.client}"
@@ -0,0 +1,59 @@
+"""
+Récepteurs des signaux des commandes.
+
+Connectés au démarrage (CommandesAppConfig.ready), ils n'importent les
+modules qu'ils servent (index des tables, livraisons, fidélité) qu'au
+premier événement qui les concerne : les commandes manage.py et les
+travailleurs qui n'en ont pas besoin ne paient pas leur import.
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from users.models import User
+from .cycle import STATUTS_OUVERTS, transition_effectuee
+from .models import Commande, Table
+
+
+@receiver(post_save, sender=Commande)
+@receiver(post_delete, sender=Commande)
+def commande_modifiee(sender, instance, **kwargs):
+    # Commande arrivée à une table ou l'ayant quittée : index des tables
+    if instance.table_id is not None or getattr(instance, '_table_chargee', None) is not None:
+        from .tables import invalider_salle
+
+        invalider_salle(instance.restaurant_id)
+    instance._table_chargee = instance.table_id
+
+
+@receiver(post_delete, sender=Table)
+def table_supprimee(sender, instance, **kwargs):
+    from .tables import invalider_salle
+
+    invalider_salle(instance.restaurant_id)
+
+
+@receiver(transition_effectuee)
+def commandes_transitees(sender, commandes, statut, **kwargs):
+    # Les transitions entre statuts ouverts ne changent pas l'index des tables
+    if statut not in STATUTS_OUVERTS:
+        from .tables import commandes_closes
+
+        commandes_closes(commandes)
+    if statut == 'ANNULEE':
+        from .livraison import retirer_annulees
+
+        retirer_annulees(commandes)
+    elif statut == 'SERVIE':
+        from .fidelite import enregistrer_servies
+
+        enregistrer_servies(commandes)
+
+
+@receiver(post_save, sender=User)
+def utilisateur_enregistre(sender, instance, created, update_fields=None, **kwargs):
+    # Une connexion n'enregistre que last_login
+    if update_fields and 'telephone' not in update_fields:
+        return
+    from .fidelite import telephone_modifie
+
+    telephone_modifie(instance, created)
@@ -0,0 +1,126 @@
+"""
+Caisse hors ligne simulée.
+
+Reproduit le comportement d'une tablette face à l'API de synchronisation
+(commandes_app/synchro.py) : commandes prises sans liaison dans une file
+locale avec leur UUID, envoi par lots compressés avec le jeton CSRF,
+application du delta du catalogue et du stock à la copie locale. Une
+réponse peut être « perdue » pour rejouer un lot, comme après une coupure
+pendant l'envoi. Utilisée par les tests et la commande simuler_caisses,
+avec le client de test de Django.
+"""
+import gzip
+import json
+import uuid
+
+from django.urls import reverse
+from django.utils import timezone
+
+from .synchro import LOT_MAX
+
+
+class ErreurSynchro(Exception):
+    pass
+
+
+class CaisseHorsLigne:
+    """
+    Tablette simulée, sur un client de test déjà connecté
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.url = reverse('commandes_app:api_synchro')
+        self.version = None
+        # Copie locale : produits par id, tables actives
+        self.produits = {}
+        self.tables = []
+        # Commandes en attente d'envoi, puis conflits à arbitrer
+        self.file = []
+        self.conflits = {}
+        self.octets_envoyes = 0
+        self.octets_json = 0
+
+    def commander(self, lignes, **entete):
+        """
+        Prend une commande hors ligne [(produit_id, quantité)] et retourne
+        son identifiant
+        """
+        commande = {
+            'id': str(uuid.uuid4()),
+            'date': timezone.now().isoformat(),
+            'type_commande': 'SUR_PLACE',
+            'lignes': [{'produit': produit_id, 'quantite': quantite} for produit_id, quantite in lignes],
+        }
+        commande.update(entete)
+        self.file.append(commande)
+        return commande['id']
+
+    def forcer(self, cle):
+        """
+        Renvoie une commande en conflit en confirmant qu'elle a été servie
+        """
+        commande = self.conflits.pop(cle)
+        commande['forcer'] = True
+        self.file.append(commande)
+
+    def _lire(self, reponse):
+        contenu = reponse.content
+        if reponse.get('Content-Encoding') == 'gzip':
+            contenu = gzip.decompress(contenu)
+        if reponse.status_code != 200:
+            raise ErreurSynchro(f'{reponse.status_code} : {contenu[:200]!r}')
+        donnees = json.loads(contenu)
+        self._appliquer_delta(donnees)
+        return donnees
+
+    def _appliquer_delta(self, donnees):
+        for produit in donnees['produits']:
+            self.produits[produit['id']] = produit
+        # Produits retirés de la carte ou supprimés
+        actifs = set(donnees['actifs'])
+        for pk in [pk for pk in self.produits if pk not in actifs]:
+            del self.produits[pk]
+        self.tables = donnees['tables']
+        self.version = donnees['version']
+
+    def rafraichir(self):
+        """
+        Delta seul (et cookie CSRF), comme au démarrage de la tablette
+        """
+        return self._lire(self.client.get(
+            self.url, {'depuis': self.version} if self.version else {}, HTTP_ACCEPT_ENCODING='gzip',
+        ))
+
+    def synchroniser(self, taille_lot=LOT_MAX, perdre_reponse=False):
+        """
+        Envoie la file par lots et retourne les résultats ; avec
+        perdre_reponse, les réponses sont ignorées et la file conservée
+        """
+        if 'csrftoken' not in self.client.cookies:
+            self.rafraichir()
+        resultats = []
+        for debut in range(0, len(self.file), max(taille_lot, 1)):
+            lot = {'depuis': self.version, 'commandes': self.file[debut:debut + taille_lot]}
+            corps = json.dumps(lot).encode()
+            compresse = gzip.compress(corps)
+            self.octets_json += len(corps)
+            self.octets_envoyes += len(compresse)
+            reponse = self.client.post(
+                self.url, compresse, content_type='application/json',
+                HTTP_CONTENT_ENCODING='gzip', HTTP_ACCEPT_ENCODING='gzip',
+                HTTP_X_CSRFTOKEN=self.client.cookies['csrftoken'].value,
+            )
+            if perdre_reponse:
+                continue
+            resultats.extend(self._lire(reponse)['resultats'])
+
+        if not perdre_reponse:
+            envoyees = {commande['id']: commande for commande in self.file}
+            for resultat in resultats:
+                if resultat['resultat'] == 'conflit':
+                    self.conflits[resultat['id']] = envoyees[resultat['id']]
+            # Chaque commande envoyée a son résultat : traitée ou à arbitrer
+            repondues = {resultat['id'] for resultat in resultats}
+            self.file = [commande for commande in self.file if commande['id'] not in repondues]
+        return resultats
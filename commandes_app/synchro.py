@@ -0,0 +1,303 @@
+"""
+Synchronisation des caisses hors ligne.
+
+Quand la liaison tombe, une tablette continue de prendre les commandes et
+les garde dans une file locale, chacune avec un identifiant (UUID) qu'elle
+génère. Au retour de la liaison, la file part par lots (JSON, compressé en
+gzip) ; chaque lot est appliqué en une seule transaction :
+
+- identifiant déjà reçu : rien n'est refait, la commande existante est
+  renvoyée (renvoi d'un lot dont la réponse a été perdue) ;
+- en-tête invalide ou produit retiré de la carte : commande refusée ;
+- stock d'un ingrédient insuffisant, compte tenu des commandes précédentes
+  du lot : commande en conflit, non appliquée, sauf si la tablette la
+  renvoie avec `forcer` (plat déjà servi) ;
+- sinon la commande est créée à l'heure de sa prise (au premier jour non
+  clôturé si sa journée est déjà clôturée), tarifée par la grille de
+  cette minute, son stock est consommé et elle est amenée au statut
+  indiqué.
+
+La réponse donne le résultat de chaque commande puis le delta du catalogue
+et du stock depuis la version de la dernière synchronisation de la
+tablette : produits et catégories modifiés depuis, identifiants des
+produits à la carte (pour retirer les autres) et tables actives. La
+version est un instant en microsecondes ; les modifications sont relues
+avec une marge, pour ne pas manquer celles d'une transaction validée après
+la lecture précédente.
+"""
+import json
+import uuid
+import zlib
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from produits_app.catalogue import catalogue
+from produits_app.models import Categorie, Produit
+from produits_app.recettes import consommation
+from .cloture import bornes_du_jour, premier_jour_ouvert
+from .cycle import transition_groupee
+from .forms import CommandeForm
+from .models import Cloture, Commande, Table
+from .tarification import ajouter_panier
+
+# Commandes par lot et lignes par commande
+LOT_MAX = 200
+LIGNES_MAX = 100
+# Taille maximale du lot une fois décompressé
+TAILLE_MAX = 2 * 1024 * 1024
+# Recouvrement des relectures du delta
+MARGE = timedelta(seconds=30)
+# Statuts atteignables par une commande prise hors ligne, dans l'ordre
+ETAPES = ('EN_PREPARATION', 'PRETE', 'SERVIE')
+STATUTS = ('EN_ATTENTE',) + ETAPES
+CHAMPS_PRODUIT = ('pk', 'nom', 'categorie_id', 'prix_vente', 'unite', 'stock_actuel', 'seuil_alerte', 'is_active')
+
+
+class LotInvalide(Exception):
+    pass
+
+
+class CommandeRecue:
+    """
+    Commande d'un lot, validée et prête à être appliquée
+    """
+    __slots__ = ('cle', 'formulaire', 'panier', 'moment', 'statut', 'forcer', 'date_reportee')
+
+    def __init__(self, cle, formulaire, panier, moment, statut, forcer):
+        self.cle = cle
+        self.formulaire = formulaire
+        self.panier = panier
+        self.moment = moment
+        self.statut = statut
+        self.forcer = forcer
+        self.date_reportee = False
+
+
+def version(moment=None):
+    """
+    Version de synchronisation : instant en microsecondes
+    """
+    moment = moment or timezone.now()
+    return int(moment.timestamp() * 1_000_000)
+
+
+def instant(version):
+    return datetime.fromtimestamp(version / 1_000_000, tz=dt_timezone.utc)
+
+
+def lire_lot(corps, encodage=''):
+    """
+    Décode le corps d'un envoi (JSON, éventuellement gzip) :
+    {'depuis': version ou None, 'commandes': [...]}
+    """
+    if encodage.lower() == 'gzip':
+        decompresseur = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            corps = decompresseur.decompress(corps, TAILLE_MAX)
+        except zlib.error:
+            raise LotInvalide('Corps gzip illisible.') from None
+        if decompresseur.unconsumed_tail:
+            raise LotInvalide('Lot trop volumineux.')
+    elif len(corps) > TAILLE_MAX:
+        raise LotInvalide('Lot trop volumineux.')
+    try:
+        lot = json.loads(corps)
+    except ValueError:
+        raise LotInvalide('JSON invalide.') from None
+
+    if not isinstance(lot, dict) or not isinstance(lot.get('commandes', []), list):
+        raise LotInvalide('Le lot doit contenir une liste « commandes ».')
+    if len(lot.get('commandes', [])) > LOT_MAX:
+        raise LotInvalide(f'Au plus {LOT_MAX} commandes par lot.')
+    lot.setdefault('commandes', [])
+    lot['depuis'] = lire_version(lot.get('depuis'))
+    return lot
+
+
+def lire_version(valeur):
+    if valeur in (None, ''):
+        return None
+    try:
+        valeur = int(valeur)
+    except (TypeError, ValueError):
+        raise LotInvalide('Version de synchronisation invalide.') from None
+    if valeur < 0:
+        raise LotInvalide('Version de synchronisation invalide.')
+    return valeur
+
+
+def _lire_commande(donnees, carte, maintenant):
+    """
+    CommandeRecue, ou dictionnaire des erreurs
+    """
+    if not isinstance(donnees, dict):
+        return None, {'commande': ['Objet attendu.']}
+    try:
+        cle = uuid.UUID(str(donnees.get('id')))
+    except ValueError:
+        return None, {'id': ['Identifiant (UUID) manquant ou invalide.']}
+
+    formulaire = CommandeForm(data={
+        champ: donnees.get(champ) or ''
+        for champ in ('nom_client', 'type_commande', 'table', 'adresse_livraison', 'notes')
+    })
+    if not formulaire.is_valid():
+        return cle, {champ: list(messages) for champ, messages in formulaire.errors.items()}
+
+    lignes = donnees.get('lignes')
+    if not isinstance(lignes, list) or not 0 < len(lignes) <= LIGNES_MAX:
+        return cle, {'lignes': [f'De 1 à {LIGNES_MAX} lignes attendues.']}
+    panier = []
+    for ligne in lignes:
+        try:
+            produit_id, quantite = int(ligne['produit']), int(ligne['quantite'])
+        except (KeyError, TypeError, ValueError):
+            return cle, {'lignes': ['Chaque ligne porte un produit et une quantité entière.']}
+        if quantite < 1:
+            return cle, {'lignes': ['La quantité doit être positive.']}
+        if produit_id not in carte.par_id:
+            return cle, {'lignes': [f"Le produit {produit_id} n'est plus à la carte."]}
+        panier.append((produit_id, quantite))
+
+    try:
+        moment = parse_datetime(str(donnees.get('date') or '')) or maintenant
+    except ValueError:
+        return cle, {'date': ['Date invalide.']}
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    statut = donnees.get('statut') or 'EN_ATTENTE'
+    if statut not in STATUTS:
+        return cle, {'statut': [f"Statut attendu parmi {', '.join(STATUTS)}."]}
+    # Horloge de la tablette en avance : l'heure du serveur fait foi
+    return CommandeRecue(cle, formulaire, panier, min(moment, maintenant), statut, bool(donnees.get('forcer'))), None
+
+
+def appliquer_lot(commandes):
+    """
+    Applique les commandes d'un lot en une transaction et retourne leurs
+    résultats, dans l'ordre : {'id', 'resultat'} complété selon le cas
+    (creee, deja_recue, conflit, refusee)
+    """
+    carte = catalogue()
+    maintenant = timezone.now()
+    resultats, recues, cles = [], [], []
+    for donnees in commandes:
+        recue, erreurs = _lire_commande(donnees, carte, maintenant)
+        cle = recue.cle if erreurs is None else recue
+        resultats.append({'id': str(cle) if cle else None})
+        if erreurs is not None:
+            resultats[-1].update(resultat='refusee', erreurs=erreurs)
+        else:
+            recues.append((resultats[-1], recue))
+        if cle:
+            cles.append(cle)
+
+    with transaction.atomic():
+        # Tous restaurants confondus : la clé est unique sur le réseau
+        connues = set(Commande.objects.tous().filter(cle_synchro__in=cles).values_list('cle_synchro', flat=True))
+        # Déjà appliquée : un renvoi n'est pas refusé même si la carte a changé
+        for resultat in resultats:
+            if resultat.get('resultat') == 'refusee' and resultat['id'] and uuid.UUID(resultat['id']) in connues:
+                resultat['resultat'] = 'deja_recue'
+                del resultat['erreurs']
+
+        # Stock des ingrédients concernés, verrouillé jusqu'à la fin du lot
+        besoins = {}
+        for _, recue in recues:
+            if recue.cle not in connues and recue.cle not in besoins:
+                besoins[recue.cle] = consommation(recue.panier)
+        stocks = dict(Produit.objects.select_for_update().filter(
+            pk__in={pk for besoin in besoins.values() for pk in besoin},
+        ).values_list('pk', 'stock_actuel'))
+
+        a_creer = []
+        for resultat, recue in recues:
+            if recue.cle in connues:
+                resultat['resultat'] = 'deja_recue'
+                continue
+            besoin = besoins[recue.cle]
+            manques = [
+                {'produit': pk, 'demande': quantite, 'disponible': stocks.get(pk, 0)}
+                for pk, quantite in besoin.items() if quantite > 0 and quantite > stocks.get(pk, 0)
+            ]
+            if manques and not recue.forcer:
+                resultat.update(resultat='conflit', conflits=manques)
+                continue
+            for pk, quantite in besoin.items():
+                stocks[pk] = stocks.get(pk, 0) - quantite
+            # Un identifiant répété dans le lot n'est appliqué qu'une fois
+            connues.add(recue.cle)
+            resultat['resultat'] = 'creee'
+            a_creer.append((resultat, recue))
+
+        # Journées déjà clôturées : la commande est enregistrée au premier
+        # jour non clôturé (aujourd'hui, sauf si la caisse est déjà close)
+        jours = {timezone.localdate(recue.moment) for _, recue in a_creer}
+        closes = set(Cloture.objects.filter(date__in=jours).values_list('date', flat=True))
+        ouvert = premier_jour_ouvert(timezone.localdate(maintenant))
+        report = maintenant if ouvert == timezone.localdate(maintenant) else bornes_du_jour(ouvert)[0]
+        creees = []
+        for resultat, recue in a_creer:
+            if timezone.localdate(recue.moment) in closes:
+                recue.moment, recue.date_reportee = report, True
+            commande = recue.formulaire.save(commit=False)
+            commande.cle_synchro = recue.cle
+            commande.save()
+            # Grille et menus de l'heure de prise
+            commande.date_commande = recue.moment
+            ajouter_panier(commande, recue.panier, recue.moment)
+            creees.append(commande)
+            if recue.date_reportee:
+                resultat['date_reportee'] = True
+        # auto_now_add ne s'applique pas à bulk_update
+        Commande.objects.bulk_update(creees, ['date_commande'])
+
+        cibles = {commande.pk: recue.statut for commande, (_, recue) in zip(creees, a_creer)}
+        for rang, etape in enumerate(ETAPES, start=1):
+            pks = [pk for pk, statut in cibles.items() if STATUTS.index(statut) >= rang]
+            if pks:
+                transition_groupee(pks, etape)
+
+    etats = {
+        str(cle): (reference, montant_total, statut)
+        for cle, reference, montant_total, statut in Commande.objects.tous().filter(
+            cle_synchro__in=cles,
+        ).values_list('cle_synchro', 'reference', 'montant_total', 'statut')
+    }
+    for resultat in resultats:
+        if resultat['resultat'] in ('creee', 'deja_recue'):
+            resultat['reference'], resultat['montant_total'], resultat['statut'] = etats[resultat['id']]
+    return resultats
+
+
+def delta(depuis=None):
+    """
+    Changements du catalogue et du stock du restaurant courant depuis la
+    version `depuis` (tout le catalogue actif si None), avec la nouvelle
+    version de la tablette
+    """
+    nouvelle = version()
+    produits = Produit.objects.all()
+    categories = Categorie.objects.all()
+    if depuis is None:
+        produits = produits.filter(is_active=True)
+    else:
+        limite = instant(depuis) - MARGE
+        produits = produits.filter(date_updated__gte=limite)
+        categories = categories.filter(date_updated__gte=limite)
+    return {
+        'version': nouvelle,
+        'produits': [
+            dict(zip(('id',) + CHAMPS_PRODUIT[1:], valeurs))
+            for valeurs in produits.order_by().values_list(*CHAMPS_PRODUIT)
+        ],
+        'categories': [{'id': pk, 'nom': nom} for pk, nom in categories.order_by().values_list('pk', 'nom')],
+        'actifs': sorted(catalogue().par_id),
+        'tables': [
+            {'id': pk, 'numero': numero, 'zone': zone}
+            for pk, numero, zone in Table.objects.filter(is_active=True).values_list('pk', 'numero', 'zone')
+        ],
+    }
@@ -0,0 +1,158 @@
+"""
+Tables de la salle : index des additions ouvertes, fusion et séparation.
+
+L'index associe à chaque table les commandes ouvertes (en attente, en
+préparation ou prêtes) qui y sont servies. Comme le catalogue, c'est un
+instantané en mémoire par processus, associé à un numéro de version gardé
+dans le cache Django : toute commande qui arrive à une table, la quitte ou
+est close incrémente la version après validation de la transaction, et
+chaque processus reconstruit l'index (une requête sur l'index
+statut/table) à la lecture suivante. Entre deux changements, « commandes
+ouvertes à la table 12 » est une simple lecture de dictionnaire.
+
+Chaque restaurant a son index et son numéro de version.
+"""
+import threading
+
+from django.db import transaction
+
+from users.restaurants import cle, incrementer_apres_validation, restaurant_courant_id, version
+from .cloture import commandes_figees, journee_close
+from .cycle import STATUTS_OUVERTS, transition_groupee
+from .models import Commande, LigneCommande
+from .tarification import appliquer_menus
+
+CLE_VERSION = 'tables:version'
+
+_verrou = threading.Lock()
+# restaurant_id -> Salle
+_salles = {}
+
+
+class OperationImpossible(Exception):
+    pass
+
+
+class Salle:
+    """
+    Instantané des additions ouvertes : {table_id: (pk des commandes)}
+    """
+    __slots__ = ('version', 'par_table')
+
+    def __init__(self, version, par_table):
+        self.version = version
+        self.par_table = par_table
+
+    def commandes(self, table_id):
+        return self.par_table.get(table_id, ())
+
+
+def _construire(version):
+    par_table = {}
+    ouvertes = Commande.objects.filter(statut__in=STATUTS_OUVERTS, table__isnull=False).order_by('date_commande')
+    for pk, table_id in ouvertes.values_list('pk', 'table_id'):
+        par_table.setdefault(table_id, []).append(pk)
+    return Salle(version, {table_id: tuple(pks) for table_id, pks in par_table.items()})
+
+
+def salle():
+    """
+    Instantané courant du restaurant courant, reconstruit si la version a
+    changé
+    """
+    restaurant_id = restaurant_courant_id()
+    courante = version(cle(CLE_VERSION, restaurant_id))
+    instantane = _salles.get(restaurant_id)
+    if instantane is not None and instantane.version == courante:
+        return instantane
+    with _verrou:
+        instantane = _salles.get(restaurant_id)
+        if instantane is None or instantane.version != courante:
+            instantane = _construire(courante)
+            _salles[restaurant_id] = instantane
+    return instantane
+
+
+def commandes_ouvertes(table_id):
+    """
+    pk des commandes ouvertes à la table, de la plus ancienne à la plus récente
+    """
+    return salle().commandes(table_id)
+
+
+def invalider_salle(restaurant_id=None):
+    """
+    Incrémente la version de l'index du restaurant (courant par défaut)
+    après validation de la transaction en cours
+    """
+    incrementer_apres_validation(cle(CLE_VERSION, restaurant_id))
+
+
+def commandes_closes(commandes):
+    """
+    Commandes passées à un statut clos (commandes_app/signaux.py)
+    """
+    # Restaurants des commandes closes, même sans restaurant actif
+    # (administrateur du réseau, run_worker)
+    restaurants = (
+        Commande.objects.tous().filter(pk__in=commandes, table__isnull=False)
+        .order_by().values_list('restaurant_id', flat=True).distinct()
+    )
+    for restaurant_id in restaurants:
+        invalider_salle(restaurant_id)
+
+
+def fusionner(cible, pks):
+    """
+    Regroupe sur la commande `cible` les lignes des commandes ouvertes
+    `pks`, qui sont ensuite annulées (sans retour en stock : leurs lignes
+    restent servies sur l'addition cible). Retourne les pk fusionnés.
+    """
+    with transaction.atomic():
+        cible = Commande.objects.select_for_update().get(pk=cible.pk)
+        if cible.statut not in STATUTS_OUVERTS or journee_close(cible):
+            raise OperationImpossible(f'La commande {cible.reference} est close.')
+        lues = list(
+            Commande.objects.select_for_update()
+            .filter(pk__in=set(pks), statut__in=STATUTS_OUVERTS)
+            .exclude(pk=cible.pk)
+            .values_list('pk', 'restaurant_id', 'date_commande')
+        )
+        # Les commandes d'une journée clôturée gardent leurs lignes
+        figees = commandes_figees(lues)
+        sources = [pk for pk, _, _ in lues if pk not in figees]
+        if not sources:
+            return []
+        LigneCommande.objects.filter(commande_id__in=sources).update(commande=cible)
+        Commande.objects.filter(pk__in=sources).update(
+            montant_total=0, notes=f'Fusionnée dans {cible.reference}',
+        )
+        transition_groupee(sources, 'ANNULEE')
+        appliquer_menus(cible)
+    return sources
+
+
+def scinder(commande, pks_lignes):
+    """
+    Déplace les lignes `pks_lignes` de la commande vers une nouvelle
+    commande à la même table et retourne cette dernière
+    """
+    with transaction.atomic():
+        commande = Commande.objects.select_for_update().get(pk=commande.pk)
+        if commande.statut not in STATUTS_OUVERTS or journee_close(commande):
+            raise OperationImpossible(f'La commande {commande.reference} est close.')
+        lignes = LigneCommande.objects.filter(commande=commande, pk__in=set(pks_lignes))
+        deplacees = lignes.count()
+        if not deplacees:
+            raise OperationImpossible('Aucune ligne sélectionnée.')
+        if deplacees == commande.lignes_commande.count():
+            raise OperationImpossible("Au moins une ligne doit rester sur l'addition d'origine.")
+
+        nouvelle = Commande.objects.create(
+            client=commande.client, nom_client=commande.nom_client, type_commande=commande.type_commande,
+            table=commande.table, statut=commande.statut, notes=f'Séparée de {commande.reference}',
+        )
+        lignes.update(commande=nouvelle)
+        appliquer_menus(commande)
+        appliquer_menus(nouvelle)
+    return nouvelle
@@ -0,0 +1,65 @@
+"""
+Tarification des commandes.
+
+Les lignes gardent le prix unitaire de la grille de la minute où elles
+sont ajoutées ; les menus sont reconnus sur l'ensemble des lignes d'après
+la grille de l'ouverture de la commande, et leur remise est recalculée à
+chaque changement de lignes. Ajouter un panier entier coûte un nombre de
+requêtes indépendant du nombre de lignes.
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.utils import timezone
+
+from produits_app.tarifs import grille, repartir, resoudre
+from stock_app.consommation import consommer
+from .models import Commande, LigneCommande
+
+
+def appliquer_menus(commande):
+    """
+    Recalcule les remises des menus et le montant de la commande en un
+    passage sur ses lignes
+    """
+    lignes = list(commande.lignes_commande.all())
+    tarification = repartir(
+        [(ligne.produit_id, ligne.quantite, ligne.prix_unitaire) for ligne in lignes],
+        grille(commande.date_commande).menus,
+    )
+    modifiees = []
+    for ligne, tarif in zip(lignes, tarification.lignes):
+        if ligne.remise != tarif.remise or ligne.prix_total != tarif.prix_total:
+            ligne.remise, ligne.prix_total = tarif.remise, tarif.prix_total
+            modifiees.append(ligne)
+    LigneCommande.objects.bulk_update(modifiees, ['remise', 'prix_total'])
+    commande.montant_total = tarification.total
+    # date_mise_a_jour explicite : auto_now ne s'applique pas à update()
+    Commande.objects.filter(pk=commande.pk).update(
+        montant_total=tarification.total, date_mise_a_jour=timezone.now(),
+    )
+    return tarification
+
+
+def ajouter_panier(commande, panier, moment=None):
+    """
+    Ajoute à la commande les lignes d'un panier [(produit_id, quantité)]
+    tarifées en un passage (grille de la minute de `moment`, maintenant par
+    défaut), consomme le stock correspondant et retourne les lignes créées.
+    Lève ProduitIndisponible pour un produit hors carte.
+    """
+    tarification = resoudre(panier, moment)
+    with transaction.atomic():
+        lignes = LigneCommande.objects.bulk_create([
+            LigneCommande(
+                commande=commande, produit_id=ligne.produit_id, quantite=ligne.quantite,
+                prix_unitaire=ligne.prix_unitaire, prix_total=ligne.quantite * ligne.prix_unitaire,
+            )
+            for ligne in tarification.lignes
+        ])
+        quantites = Counter()
+        for produit_id, quantite in panier:
+            quantites[produit_id] += quantite
+        consommer(quantites.items())
+        appliquer_menus(commande)
+    return lignes
@@ -1,3 +1,648 @@
-from django.test import TestCase
+import io
+from datetime import datetime, time, timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from produits_app import tarifs
+from produits_app.models import Categorie, ElementMenu, Produit, Promotion
+from restaurant_management.essais import CachesIsoles
+from stock_app.consommation import consommer
+from stock_app.valorisation import verifier_valorisation
+from users.models import Restaurant, User
+from users.restaurants import activer
+
+from . import charge, fidelite, livraison, synchro, tables
+from .tarification import ajouter_panier, appliquer_menus
+from .cloture import ClotureImpossible, PaiementRefuse, bornes_du_jour, cloturer, encaisser, ventes_par_jour
+from .cycle import TransitionInterdite, changer_statut, transition_effectuee, transition_groupee
+from .models import Cloture, Commande, LigneCommande, MouvementPoints, Paiement, ResumeClient, Table, Tournee
+from .simulation import CaisseHorsLigne
+
+VOLUMES = {'produits': 60, 'utilisateurs': 12, 'commandes': 400, 'mouvements': 100, 'jours': 10, 'taille_lot': 150}
+
+
+class ChargeTests(CachesIsoles, TestCase):
+    """
+    Générateur de données de charge : cohérence et reproductibilité
+    """
+
+    def _empreinte(self):
+        return list(
+            Commande.objects.order_by('reference').values_list(
+                'reference', 'statut', 'type_commande', 'nom_client', 'montant_total'
+            ).annotate(lignes=Count('lignes_commande'))
+        )
+
+    def test_donnees_coherentes(self):
+        totaux = charge.generer(1, **VOLUMES)
+        self.assertEqual(totaux['commande'], 400)
+        self.assertEqual(totaux['lignecommande'], LigneCommande.objects.count())
+
+        incoherentes = [
+            commande.reference
+            for commande in Commande.objects.annotate(somme=Sum('lignes_commande__prix_total'))
+            if commande.somme != commande.montant_total
+        ]
+        self.assertEqual(incoherentes, [])
+        self.assertEqual(verifier_valorisation(corriger=False), [])
+
+    def test_reproductible(self):
+        with transaction.atomic():
+            charge.generer(3, **VOLUMES)
+            premiere = self._empreinte()
+            transaction.set_rollback(True)
+        charge.generer(3, **VOLUMES)
+        self.assertEqual(self._empreinte(), premiere)
+
+    def test_commande_refuse_graine_existante(self):
+        options = {'commandes': 50, 'produits': 20, 'utilisateurs': 5, 'mouvements': 10, 'stdout': io.StringIO()}
+        call_command('seed_load', graine=5, **options)
+        with self.assertRaises(CommandError):
+            call_command('seed_load', graine=5, **options)
+
+
+class CycleCommandeTests(CachesIsoles, TestCase):
+    """
+    Transitions de statut : contrôle, effets de bord et passage groupé
+    """
+
+    def setUp(self):
+        super().setUp()
+        categorie = Categorie.objects.create(nom='Plats')
+        self.produit = Produit.objects.create(
+            nom='Yassa', categorie=categorie, prix_vente=Decimal('2500'), stock_actuel=20,
+        )
+
+    def _commande(self, statut='EN_ATTENTE', quantite=2):
+        commande = Commande.objects.create(nom_client='Awa', statut=statut)
+        LigneCommande.objects.create(
+            commande=commande, produit=self.produit, quantite=quantite, prix_unitaire=Decimal('2500'),
+        )
+        consommer([(self.produit.pk, quantite)])
+        return commande
+
+    def test_transition_interdite(self):
+        commande = self._commande('SERVIE')
+        with self.assertRaises(TransitionInterdite):
+            changer_statut(commande, 'EN_ATTENTE')
+        commande.refresh_from_db()
+        self.assertEqual(commande.statut, 'SERVIE')
+
+    def test_annulation_restitue_le_stock(self):
+        commande = self._commande(quantite=3)
+        self.produit.refresh_from_db()
+        self.assertEqual(self.produit.stock_actuel, 17)
+
+        changer_statut(commande, 'ANNULEE')
+        self.produit.refresh_from_db()
+        self.assertEqual(self.produit.stock_actuel, 20)
+        self.assertEqual(verifier_valorisation(corriger=False), [])
+
+    def test_transition_groupee(self):
+        pretes = [self._commande('PRETE').pk for _ in range(5)]
+        en_attente = self._commande().pk
+        recus = []
+
+        def recepteur(sender, commandes, statut, **kwargs):
+            recus.append((sorted(commandes), statut))
+
+        transition_effectuee.connect(recepteur)
+        self.addCleanup(transition_effectuee.disconnect, recepteur)
+        with CaptureQueriesContext(connection) as requetes:
+            deplacees = transition_groupee(pretes + [en_attente], 'SERVIE')
+
+        self.assertEqual(sorted(deplacees), pretes)
+        self.assertEqual(recus, [(pretes, 'SERVIE')])
+        self.assertEqual(len([q for q in requetes if q['sql'].startswith('UPDATE')]), 1)
+        self.assertEqual(Commande.objects.get(pk=en_attente).statut, 'EN_ATTENTE')
+
+    def test_vue_groupee(self):
+        utilisateur = User.objects.create_user('serveur', password='motdepasse', role='STAFF')
+        self.client.force_login(utilisateur)
+        commandes = [self._commande().pk for _ in range(3)]
+        reponse = self.client.post(reverse('commandes_app:commande_statut_groupe'), {
+            'commandes': commandes, 'statut': 'ANNULEE',
+        })
+        self.assertRedirects(reponse, reverse('commandes_app:commande_list'))
+        self.assertEqual(Commande.objects.filter(statut='ANNULEE').count(), 3)
+        self.produit.refresh_from_db()
+        self.assertEqual(self.produit.stock_actuel, 20)
+
+    def test_lignes_figees_hors_statuts_ouverts(self):
+        utilisateur = User.objects.create_user('serveur', password='motdepasse', role='STAFF')
+        self.client.force_login(utilisateur)
+        commande = Commande.objects.create(nom_client='Awa')
+        reponse = self.client.post(reverse('commandes_app:ajouter_ligne_commande', args=[commande.pk]), {
+            'produit': self.produit.pk, 'quantite': 5,
+        })
+        self.assertRedirects(reponse, reverse('commandes_app:commande_detail', args=[commande.pk]))
+        changer_statut(commande, 'ANNULEE')
+        self.produit.refresh_from_db()
+        self.assertEqual(self.produit.stock_actuel, 20)
+
+        # Ni seconde restitution, ni consommation jamais rendue
+        ligne = commande.lignes_commande.get()
+        self.client.post(reverse('commandes_app:supprimer_ligne_commande', args=[ligne.pk]))
+        self.client.post(reverse('commandes_app:ajouter_ligne_commande', args=[commande.pk]), {
+            'produit': self.produit.pk, 'quantite': 5,
+        })
+        self.assertEqual(list(commande.lignes_commande.all()), [ligne])
+        self.produit.refresh_from_db()
+        self.assertEqual(self.produit.stock_actuel, 20)
+
+
+class TablesTests(CachesIsoles, TestCase):
+    """
+    Index des additions ouvertes par table, fusion et séparation
+    """
+
+    def setUp(self):
+        super().setUp()
+        categorie = Categorie.objects.create(nom='Plats')
+        self.produit = Produit.objects.create(
+            nom='Mafé', categorie=categorie, prix_vente=Decimal('3000'), stock_actuel=50,
+        )
+        self.table = Table.objects.create(numero=12)
+
+    def _commande(self, *quantites, table=None):
+        commande = Commande.objects.create(nom_client='Table', table=table or self.table)
+        for quantite in quantites:
+            LigneCommande.objects.create(
+                commande=commande, produit=self.produit, quantite=quantite, prix_unitaire=Decimal('3000'),
+            )
+        return commande
+
+    def test_index_suit_les_commandes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            premiere, seconde = self._commande(1), self._commande(2)
+        self.assertEqual(tables.commandes_ouvertes(self.table.pk), (premiere.pk, seconde.pk))
+        # Tant que rien ne change, seule la version partagée est relue
+        with self.assertNumQueries(1):
+            tables.commandes_ouvertes(self.table.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            transition_groupee([premiere.pk], 'ANNULEE')
+        self.assertEqual(tables.commandes_ouvertes(self.table.pk), (seconde.pk,))
+
+        autre = Table.objects.create(numero=3)
+        with self.captureOnCommitCallbacks(execute=True):
+            seconde.table = autre
+            seconde.save()
+        self.assertEqual(tables.commandes_ouvertes(self.table.pk), ())
+        self.assertEqual(tables.commandes_ouvertes(autre.pk), (seconde.pk,))
+
+    def test_fusion_et_separation(self):
+        cible, source = self._commande(1), self._commande(2, 3)
+        self.assertEqual(tables.fusionner(cible, [source.pk]), [source.pk])
+        cible.refresh_from_db()
+        source.refresh_from_db()
+        self.assertEqual(cible.montant_total, Decimal('18000'))
+        self.assertEqual((source.statut, source.montant_total), ('ANNULEE', Decimal('0')))
+        # Les lignes déplacées ne reviennent pas en stock
+        self.produit.refresh_from_db()
+        self.assertEqual(self.produit.stock_actuel, 50)
+
+        ligne = cible.lignes_commande.get(quantite=3)
+        nouvelle = tables.scinder(cible, [ligne.pk])
+        cible.refresh_from_db()
+        self.assertEqual((cible.montant_total, nouvelle.montant_total), (Decimal('9000'), Decimal('9000')))
+        self.assertEqual(nouvelle.table, self.table)
+        with self.assertRaises(tables.OperationImpossible):
+            tables.scinder(nouvelle, [ligne.pk])
+
+    def test_cloture_sans_restaurant_actif(self):
+        plateau = Restaurant.objects.create(nom='Plateau', code='plateau')
+        with activer(plateau), self.captureOnCommitCallbacks(execute=True):
+            table = Table.objects.create(numero=4)
+            commande = self._commande(1, table=table)
+        with activer(plateau):
+            self.assertEqual(tables.commandes_ouvertes(table.pk), (commande.pk,))
+
+        # Tâche de run_worker ou administrateur du réseau : aucun restaurant actif
+        with self.captureOnCommitCallbacks(execute=True):
+            transition_groupee([commande.pk], 'ANNULEE')
+        with activer(plateau):
+            self.assertEqual(tables.commandes_ouvertes(table.pk), ())
+
+    def test_vues_reservees_au_personnel(self):
+        cible, source = self._commande(1), self._commande(2, 3)
+        self.client.force_login(User.objects.create_user('client', password='motdepasse'))
+        self.client.post(reverse('commandes_app:table_fusionner', args=[self.table.pk]), {
+            'cible': cible.pk, 'commandes': [source.pk],
+        })
+        self.client.post(reverse('commandes_app:commande_scinder', args=[source.pk]), {
+            'lignes': list(source.lignes_commande.values_list('pk', flat=True)[:1]),
+        })
+        self.client.post(reverse('commandes_app:commande_statut_groupe'), {
+            'commandes': [cible.pk, source.pk], 'statut': 'ANNULEE',
+        })
+        self.assertEqual(Commande.objects.count(), 2)
+        self.assertEqual(Commande.objects.filter(statut='EN_ATTENTE').count(), 2)
+
+
+class ClotureTests(CachesIsoles, TestCase):
+    """
+    Paiements et clôture de caisse journalière
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.jour = timezone.localdate() - timedelta(days=1)
+        self.midi = bornes_du_jour(self.jour)[0] + timedelta(hours=12)
+
+    def _commande(self, montant, statut, date=None):
+        commande = Commande.objects.create(nom_client='Client')
+        Commande.objects.filter(pk=commande.pk).update(
+            montant_total=Decimal(montant), statut=statut, date_commande=date or self.midi,
+        )
+        commande.refresh_from_db()
+        return commande
+
+    def _paiement(self, commande, mode, montant, date=None):
+        paiement = Paiement.objects.create(commande=commande, mode=mode, montant=Decimal(montant))
+        Paiement.objects.filter(pk=paiement.pk).update(date_paiement=date or self.midi)
+
+    def test_rapprochement(self):
+        veille = self._commande('2500', 'SERVIE', date=self.midi - timedelta(days=1))
+        self._paiement(veille, 'MOBILE', '2500')
+        reglee = self._commande('5000', 'SERVIE')
+        self._paiement(reglee, 'ESPECES', '3000')
+        self._paiement(reglee, 'CARTE', '2000')
+        partielle = self._commande('4000', 'SERVIE')
+        self._paiement(partielle, 'MOBILE', '1000')
+        self._paiement(partielle, 'ESPECES', '500', date=timezone.now())
+        annulee = self._commande('1500', 'ANNULEE')
+        self._paiement(annulee, 'ESPECES', '1500')
+        en_attente = self._commande('2000', 'EN_ATTENTE')
+
+        cloture = cloturer(self.jour)
+        # La commande en attente est reportée au lendemain
+        self.assertEqual(
+            (cloture.nombre_commandes, cloture.nombre_facturees, cloture.nombre_annulees,
+             cloture.nombre_ouvertes, cloture.nombre_impayees),
+            (3, 2, 1, 1, 1),
+        )
+        en_attente.refresh_from_db()
+        self.assertEqual(timezone.localdate(en_attente.date_commande), self.jour + timedelta(days=1))
+        self.assertEqual(cloture.chiffre_affaires, Decimal('9000'))
+        self.assertEqual((cloture.especes, cloture.carte, cloture.mobile), (Decimal('4500'), Decimal('2000'), Decimal('3500')))
+        self.assertEqual(cloture.total_encaisse, Decimal('10000'))
+        self.assertEqual(cloture.encaissements_autres_jours, Decimal('2500'))
+        # Le paiement reçu le lendemain règle la commande mais pas la caisse du jour
+        self.assertEqual(cloture.impayes, Decimal('2500'))
+        self.assertEqual(cloture.trop_percu, Decimal('1500'))
+        self.assertEqual(cloture.ecart, Decimal('1000'))
+
+    def test_encaissement_et_cloture_definitive(self):
+        commande = self._commande('3000', 'PRETE')
+        with self.assertRaises(PaiementRefuse):
+            encaisser(commande, 'CARTE', Decimal('3500'))
+        encaisser(commande, 'CARTE', Decimal('3000'))
+        with self.assertRaises(PaiementRefuse):
+            encaisser(commande, 'ESPECES', Decimal('1'))
+
+        cloture = cloturer(self.jour)
+        with self.assertRaises(ClotureImpossible):
+            cloturer(self.jour)
+        with self.assertRaises(ValidationError):
+            cloture.save()
+        with self.assertRaises(ValidationError):
+            cloture.delete()
+        with self.assertRaises(CommandError):
+            call_command('cloturer_journee', date=self.jour, stdout=io.StringIO())
+
+    def test_journee_figee_et_report(self):
+        prete = self._commande('3000', 'PRETE')
+        en_cuisine = self._commande('2000', 'EN_PREPARATION')
+        cloturer(self.jour)
+        # Facturée dans la journée close : plus d'annulation ni de modification
+        with self.assertRaises(TransitionInterdite):
+            changer_statut(prete, 'ANNULEE')
+        self.assertEqual(transition_groupee([prete.pk], 'ANNULEE'), [])
+        changer_statut(prete, 'SERVIE')
+
+        # Reportée, servie le lendemain : comptée par la clôture suivante
+        changer_statut(Commande.objects.get(pk=en_cuisine.pk), 'PRETE')
+        Commande.objects.filter(pk=en_cuisine.pk).update(statut='SERVIE')
+        cloture = cloturer(self.jour + timedelta(days=1))
+        self.assertEqual((cloture.nombre_facturees, cloture.chiffre_affaires), (1, Decimal('2000')))
+        # Caisse du jour close : plus d'encaissement
+        with self.assertRaises(PaiementRefuse):
+            encaisser(en_cuisine, 'ESPECES', Decimal('2000'))
+
+    def test_encaissement_reserve_au_personnel(self):
+        commande = self._commande('3000', 'SERVIE', date=timezone.now())
+        url = reverse('commandes_app:paiement_ajouter', args=[commande.pk])
+        donnees = {'mode': 'ESPECES', 'montant': '3000', 'reference': ''}
+        self.client.force_login(User.objects.create_user('client', password='motdepasse'))
+        self.client.post(url, donnees)
+        self.assertFalse(commande.paiements.exists())
+        self.client.force_login(User.objects.create_user('caisse', password='motdepasse', role='STAFF'))
+        self.client.post(url, donnees)
+        self.assertEqual(commande.paiements.get().montant, Decimal('3000'))
+
+    def test_statistiques_lisent_la_cloture(self):
+        commande = self._commande('6000', 'SERVIE')
+        self._commande('1000', 'PRETE', date=self.midi + timedelta(days=1))
+        cloturer(self.jour)
+        # Une modification après clôture ne change plus la journée figée
+        Commande.objects.filter(pk=commande.pk).update(montant_total=Decimal('9999'))
+
+        with self.assertNumQueries(2):
+            ventes = ventes_par_jour(self.jour, self.jour + timedelta(days=1))
+        self.assertEqual(ventes[self.jour]['chiffre_affaires'], Decimal('6000'))
+        self.assertEqual(ventes[self.jour + timedelta(days=1)]['chiffre_affaires'], Decimal('1000'))
+        self.assertEqual(Cloture.objects.get().nombre_facturees, 1)
+
+
+class LivraisonTests(CachesIsoles, TestCase):
+    """
+    Géocodage hors ligne et tournées de livraison
+    """
+
+    def test_geocodage(self):
+        repertoire = livraison.repertoire()
+        self.assertEqual(repertoire.localiser('Villa 12, Liberte 6 extension')[0], 'Liberté 6')
+        self.assertEqual(repertoire.localiser('rue 10 x 13 Sacré coeur 3')[0], 'Sacré-Cœur')
+        self.assertEqual(repertoire.localiser("Immeuble Fahd, près de la Patte d'Oie")[0], "Patte d'Oie")
+        self.assertIsNone(repertoire.localiser('12 avenue inconnue'))
+
+    def test_regroupement(self):
+        points = [(point[1], point[2]) for point in livraison.repertoire().quartiers] * 3
+        tournees = livraison.regrouper(points, capacite=5)
+        indices = [indice for arrets, _ in tournees for indice in arrets]
+        self.assertEqual(sorted(indices), list(range(len(points))))
+        self.assertTrue(all(len(arrets) <= 5 for arrets, _ in tournees))
+        # 2-opt ne rallonge jamais une tournée construite au plus proche voisin
+        sans_2opt = livraison.regrouper(points, capacite=5, ameliorer=False)
+        self.assertLessEqual(sum(d for _, d in tournees), sum(d for _, d in sans_2opt) + 1e-6)
+
+        sortie = io.StringIO()
+        call_command('benchmark_livraisons', livraisons=500, repetitions=1, stdout=sortie)
+        self.assertIn('500 livraisons', sortie.getvalue())
+
+    def test_planification_et_tournee(self):
+        adresses = ['Rue 3, Ngor', 'Rue 5, Almadies', 'Rue 8, Médina', 'Quelque part']
+        commandes = [
+            Commande.objects.create(nom_client='Client', type_commande='LIVRAISON', adresse_livraison=adresse)
+            for adresse in adresses
+        ]
+        Commande.objects.create(nom_client='Salle', type_commande='SUR_PLACE')
+
+        tournees = livraison.planifier(capacite=2)
+        self.assertEqual(len(tournees), 2)
+        planifiees = Commande.objects.filter(tournee__isnull=False)
+        self.assertEqual(planifiees.count(), 3)
+        # Ngor et Almadies sont voisins : même tournée
+        ngor, almadies = (Commande.objects.get(pk=commande.pk) for commande in commandes[:2])
+        self.assertEqual(ngor.tournee_id, almadies.tournee_id)
+        self.assertIsNone(Commande.objects.get(pk=commandes[3].pk).latitude)
+
+        livreur = User.objects.create_user('livreur', password='x', role='STAFF')
+        tournee = Tournee.objects.get(pk=ngor.tournee_id)
+        with self.assertRaises(livraison.LivraisonImpossible):
+            livraison.demarrer(tournee, livreur)
+        Commande.objects.filter(tournee=tournee).update(statut='PRETE')
+        livraison.demarrer(tournee, livreur)
+        self.assertEqual(sorted(livraison.terminer(tournee)), sorted([ngor.pk, almadies.pk]))
+        self.assertEqual(set(tournee.commandes.values_list('statut', flat=True)), {'SERVIE'})
+
+        # Annulée, une commande quitte sa tournée
+        medina = Commande.objects.get(pk=commandes[2].pk)
+        transition_groupee([medina.pk], 'ANNULEE')
+        medina.refresh_from_db()
+        self.assertIsNone(medina.tournee_id)
+
+
+class FideliteTests(CachesIsoles, TestCase):
+    """
+    Résumés clients incrémentaux et registre des points
+    """
+
+    def setUp(self):
+        super().setUp()
+        categorie = Categorie.objects.create(nom='Boissons')
+        self.bissap = Produit.objects.create(nom='Bissap', categorie=categorie, prix_vente=Decimal('500'), stock_actuel=100)
+        self.cafe = Produit.objects.create(nom='Café Touba', categorie=categorie, prix_vente=Decimal('300'), stock_actuel=100)
+        self.client_fidele = User.objects.create_user('awa', password='x', role='CLIENT', telephone='77 123 45 67')
+
+    def _servir(self, *lignes):
+        commande = Commande.objects.create(nom_client='Awa', client=self.client_fidele)
+        for produit, quantite in lignes:
+            LigneCommande.objects.create(commande=commande, produit=produit, quantite=quantite,
+                                         prix_unitaire=produit.prix_vente)
+        for statut in ('EN_PREPARATION', 'PRETE', 'SERVIE'):
+            transition_groupee([commande.pk], statut)
+        return commande
+
+    def test_resume_incremental_et_recherche(self):
+        self._servir((self.bissap, 3), (self.cafe, 1))
+        self._servir((self.bissap, 2))
+        resume = ResumeClient.objects.get(pk=self.client_fidele.pk)
+        self.assertEqual((resume.nombre_commandes, resume.valeur_totale), (2, Decimal('2800')))
+        # 1800 FCFA -> 3 points, 1000 FCFA -> 2 points
+        self.assertEqual(resume.solde_points, 5)
+        self.assertEqual([produit.nom for produit, _ in fidelite.favoris(resume)], ['Bissap', 'Café Touba'])
+
+        with self.assertNumQueries(1):
+            self.assertEqual(fidelite.rechercher('+221 77 123 45 67').client, self.client_fidele)
+        self.assertEqual(fidelite.rechercher('awa').pk, self.client_fidele.pk)
+        self.assertIsNone(fidelite.rechercher('770000000'))
+
+        with self.assertRaises(fidelite.PointsInsuffisants):
+            fidelite.ajuster_points(self.client_fidele, -6, 'UTILISATION')
+        fidelite.ajuster_points(self.client_fidele, -4, 'UTILISATION')
+
+        # La reconstruction retrouve les agrégats sans créditer deux fois
+        attendu = ResumeClient.objects.values().get(pk=self.client_fidele.pk)
+        fidelite.reconstruire()
+        self.assertEqual(ResumeClient.objects.values().get(pk=self.client_fidele.pk), attendu)
+        self.assertEqual(MouvementPoints.objects.filter(motif='GAIN').count(), 2)
+
+    def test_fiche_client(self):
+        self._servir((self.cafe, 4))
+        employe = User.objects.create_user('caisse', password='x', role='STAFF')
+        self.client.force_login(employe)
+        reponse = self.client.get(reverse('commandes_app:client_list'), {'q': '771234567'})
+        self.assertRedirects(reponse, reverse('commandes_app:client_detail', args=[self.client_fidele.pk]))
+        reponse = self.client.get(reponse['Location'])
+        self.assertContains(reponse, 'Café Touba')
+        self.assertFalse(ResumeClient.objects.filter(pk=employe.pk).exists())
+
+
+
+class TarificationTests(CachesIsoles, TestCase):
+    """
+    Grille de prix par minute, menus et tarification des paniers
+    """
+
+    def setUp(self):
+        super().setUp()
+        with self.captureOnCommitCallbacks(execute=True):
+            plats = Categorie.objects.create(nom='Plats')
+            boissons = Categorie.objects.create(nom='Boissons')
+            self.thieb = Produit.objects.create(nom='Thieboudienne', categorie=plats, prix_vente=Decimal('3000'),
+                                                stock_actuel=100)
+            self.yassa = Produit.objects.create(nom='Yassa', categorie=plats, prix_vente=Decimal('2500'),
+                                                stock_actuel=100)
+            self.bissap = Produit.objects.create(nom='Bissap', categorie=boissons, prix_vente=Decimal('500'),
+                                                 stock_actuel=100)
+            Promotion.objects.create(nom='Happy hour', taux_remise=Decimal('20'), categorie=boissons,
+                                     heure_debut=time(18), heure_fin=time(20))
+            menu = Promotion.objects.create(nom='Menu thieb', type_promotion='MENU', prix_menu=Decimal('3000'))
+            ElementMenu.objects.create(promotion=menu, produit=self.thieb)
+            ElementMenu.objects.create(promotion=menu, produit=self.bissap)
+
+    def _moment(self, heure, minute=0):
+        return timezone.make_aware(datetime(2024, 3, 4, heure, minute))
+
+    def test_grille_et_panier(self):
+        panier = [(self.thieb.pk, 2), (self.bissap.pk, 1), (self.yassa.pk, 1)]
+        midi = tarifs.resoudre(panier, self._moment(12))
+        self.assertEqual([(menu.nom, nombre) for menu, nombre in midi.menus], [('Menu thieb', 1)])
+        self.assertEqual([ligne.remise for ligne in midi.lignes], [Decimal('428.57'), Decimal('71.43'), 0])
+        self.assertEqual(midi.total, Decimal('8500'))
+
+        # Tarif de la plage horaire, fin exclue
+        self.assertEqual(tarifs.grille(self._moment(18, 30)).prix_unitaire(self.bissap.pk), Decimal('400.00'))
+        self.assertEqual(tarifs.grille(self._moment(20)).prix_unitaire(self.bissap.pk), Decimal('500'))
+
+        # Grille de la minute en mémoire : seules les versions partagées du catalogue
+        # et des promotions sont relues, quelle que soit la taille du panier
+        with self.assertNumQueries(2):
+            tarifs.resoudre(panier * 20, self._moment(12, 0))
+        with self.assertRaises(tarifs.ProduitIndisponible):
+            tarifs.resoudre([(0, 1)], self._moment(12))
+
+    def test_promotions_par_restaurant(self):
+        plateau = Restaurant.objects.create(nom='Plateau', code='plateau')
+        almadies = Restaurant.objects.create(nom='Almadies', code='almadies')
+        produits = {}
+        for restaurant in (plateau, almadies):
+            with activer(restaurant), self.captureOnCommitCallbacks(execute=True):
+                produits[restaurant.pk] = Produit.objects.create(
+                    nom='Mafé', categorie=Categorie.objects.create(nom='Plats'), prix_vente=Decimal('2000'),
+                )
+        with activer(almadies):
+            almadies_avant = tarifs.regles()
+
+        # Remise sur toute la carte du Plateau
+        with activer(plateau), self.captureOnCommitCallbacks(execute=True):
+            Promotion.objects.create(nom='Inauguration', taux_remise=Decimal('50'))
+        with activer(plateau):
+            self.assertEqual(tarifs.grille(self._moment(12)).prix_unitaire(produits[plateau.pk].pk), Decimal('1000.00'))
+        with activer(almadies):
+            self.assertIs(tarifs.regles(), almadies_avant)
+            self.assertEqual([regle.nom for regle in tarifs.regles().remises], [])
+            self.assertEqual(tarifs.grille(self._moment(12)).prix_unitaire(produits[almadies.pk].pk), Decimal('2000'))
+            self.assertFalse(Promotion.objects.exists())
+
+    def test_commande(self):
+        commande = Commande.objects.create(nom_client='Fatou')
+        ajouter_panier(commande, [(self.thieb.pk, 1), (self.bissap.pk, 1)])
+        commande.refresh_from_db()
+        self.assertEqual(commande.montant_total, Decimal('3000'))
+
+        # Requêtes indépendantes du nombre de lignes du panier
+        requetes = []
+        for nombre in (1, 30):
+            with CaptureQueriesContext(connection) as capture:
+                ajouter_panier(Commande.objects.create(nom_client='Moussa'), [(self.yassa.pk, 1)] * nombre)
+            requetes.append(len(capture))
+        self.assertEqual(requetes[0], requetes[1])
+        self.assertEqual(Produit.objects.get(pk=self.yassa.pk).stock_actuel, 69)
+
+        # Le menu disparaît avec sa boisson
+        commande.lignes_commande.get(produit=self.bissap).delete()
+        appliquer_menus(commande)
+        self.assertEqual(Commande.objects.get(pk=commande.pk).montant_total, Decimal('3000'))
+        self.assertEqual(commande.lignes_commande.get().remise, 0)
+
+
+class SynchroTests(CachesIsoles, TestCase):
+    """
+    Synchronisation des caisses hors ligne, avec une tablette simulée
+    """
+
+    def setUp(self):
+        super().setUp()
+        with self.captureOnCommitCallbacks(execute=True):
+            categorie = Categorie.objects.create(nom='Plats')
+            self.yassa = Produit.objects.create(
+                nom='Yassa', categorie=categorie, prix_vente=Decimal('2500'), stock_actuel=5,
+            )
+            self.bissap = Produit.objects.create(
+                nom='Bissap', categorie=categorie, prix_vente=Decimal('500'), stock_actuel=100,
+            )
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(User.objects.create_user('tablette', password='motdepasse', role='STAFF'))
+        self.caisse = CaisseHorsLigne(client)
+        self.caisse.rafraichir()
+
+    def _synchroniser(self, **options):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.caisse.synchroniser(**options)
+
+    def test_renvoi_idempotent(self):
+        self.assertEqual(set(self.caisse.produits), {self.yassa.pk, self.bissap.pk})
+        servie = self.caisse.commander([(self.yassa.pk, 1), (self.bissap.pk, 2)], statut='SERVIE')
+        self.caisse.commander([(self.bissap.pk, 3)], type_commande='EMPORTER')
+
+        # Réponse perdue : le lot est appliqué, la tablette le renvoie
+        self._synchroniser(perdre_reponse=True)
+        resultats = self._synchroniser()
+        self.assertEqual([resultat['resultat'] for resultat in resultats], ['deja_recue', 'deja_recue'])
+        self.assertEqual(self.caisse.file, [])
+
+        self.assertEqual(Commande.objects.count(), 2)
+        commande = Commande.objects.get(cle_synchro=servie)
+        self.assertEqual((commande.statut, commande.montant_total), ('SERVIE', Decimal('3500')))
+        self.bissap.refresh_from_db()
+        self.assertEqual(self.bissap.stock_actuel, 95)
+
+    def test_conflit_de_stock(self):
+        self.caisse.commander([(self.yassa.pk, 3)])
+        en_conflit = self.caisse.commander([(self.yassa.pk, 3)])
+
+        resultats = self._synchroniser()
+        self.assertEqual([resultat['resultat'] for resultat in resultats], ['creee', 'conflit'])
+        self.assertEqual(resultats[1]['conflits'], [{'produit': self.yassa.pk, 'demande': 3, 'disponible': 2}])
+        self.assertEqual(Commande.objects.count(), 1)
+
+        # Plat déjà servi : la tablette confirme
+        self.caisse.forcer(en_conflit)
+        self.assertEqual(self._synchroniser()[0]['resultat'], 'creee')
+        self.yassa.refresh_from_db()
+        self.assertEqual(self.yassa.stock_actuel, -1)
+
+    def test_delta_depuis_la_version(self):
+        version = self.caisse.version
+        Produit.objects.update(date_updated=timezone.now() - timedelta(days=1))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bissap.is_active = False
+            self.bissap.save()
+
+        changes = synchro.delta(version)
+        self.assertEqual([produit['id'] for produit in changes['produits']], [self.bissap.pk])
+        self.caisse.rafraichir()
+        self.assertEqual(set(self.caisse.produits), {self.yassa.pk})
+
+        # Produit retiré de la carte entre-temps : commande refusée
+        self.caisse.commander([(self.bissap.pk, 1)])
+        self.assertEqual(self._synchroniser()[0]['resultat'], 'refusee')
+
+    def test_lot_invalide(self):
+        self.caisse.rafraichir()
+        reponse = self.caisse.client.post(
+            self.caisse.url, b'pas du gzip', content_type='application/json', HTTP_CONTENT_ENCODING='gzip',
+            HTTP_X_CSRFTOKEN=self.caisse.client.cookies['csrftoken'].value,
+        )
+        self.assertEqual(reponse.status_code, 400)
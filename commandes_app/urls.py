@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 app_name = 'commandes_app'
 
@@ -14,8 +14,30 @@ urlpatterns = [
     path('commandes/<int:pk>/modifier/', views.commande_update, name='commande_update'),
     path('commandes/<int:pk>/supprimer/', views.commande_delete, name='commande_delete'),
     path('commandes/<int:pk>/statut/', views.commande_update_statut, name='commande_update_statut'),
+    path('commandes/statut/', views.commande_statut_groupe, name='commande_statut_groupe'),
+    
+    path('commandes/<int:pk>/scinder/', views.commande_scinder, name='commande_scinder'),
+    path('commandes/<int:pk>/paiement/', views.paiement_ajouter, name='paiement_ajouter'),
+    
+    # Tables et additions ouvertes
+    path('tables/', views.table_list, name='table_list'),
+    path('tables/<int:pk>/', views.table_detail, name='table_detail'),
+    path('tables/<int:pk>/fusionner/', views.table_fusionner, name='table_fusionner'),
+    
+    # Clients et fidélité
+    path('clients/', views.client_list, name='client_list'),
+    path('clients/<int:pk>/', views.client_detail, name='client_detail'),
+    path('clients/<int:pk>/points/', views.client_points, name='client_points'),
+    
+    # Livraisons
+    path('livraisons/', views.livraison_tableau, name='livraison_tableau'),
+    path('livraisons/planifier/', views.livraison_planifier, name='livraison_planifier'),
+    path('livraisons/tournees/<int:pk>/<str:action>/', views.tournee_action, name='tournee_action'),
     
     # Lignes de commande
     path('commandes/<int:commande_pk>/ajouter-ligne/', views.ajouter_ligne_commande, name='ajouter_ligne_commande'),
     path('lignes-commande/<int:pk>/supprimer/', views.supprimer_ligne_commande, name='supprimer_ligne_commande'),
+    
+    # Synchronisation des caisses hors ligne
+    path(f'api/{api.VERSION}/synchro/', api.synchro, name='api_synchro'),
 ]
@@ -1,13 +1,31 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Q, Sum, Count
+from django.db import transaction
+from django.db.models import Prefetch, ProtectedError, Q, Sum, Count
 from django.core.paginator import Paginator
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse
+from django.urls import reverse
 from django.utils import timezone
-from .models import Commande, LigneCommande
+from django.utils.http import url_has_allowed_host_and_scheme
+from django.views.decorators.http import require_POST
+from .cloture import PaiementRefuse, caisse_close, encaisser, journee_close, reste_a_payer
+from .fidelite import PointsInsuffisants, ajuster_points, favoris, rechercher
+from .cycle import (
+    STATUTS_OUVERTS, CommandeFermee, TransitionInterdite, changer_statut, origines, transition_groupee,
+    transitions_possibles, verrouiller_ouverte,
+)
+from .livraison import LivraisonImpossible, demarrer, dissoudre, livraisons_en_attente, planifier, terminer
+from .models import Commande, LigneCommande, MouvementPoints, ResumeClient, Table, Tournee
+from .tables import OperationImpossible, commandes_ouvertes, fusionner, salle, scinder
+from .tarification import ajouter_panier, appliquer_menus
 from produits_app.models import Produit
-from .forms import CommandeForm, LigneCommandeForm
+from produits_app.tarifs import ProduitIndisponible
+from users.models import User
+from users.permissions import staff_requis
+from users.restaurants import restaurant_courant_id
+from stock_app.consommation import restituer
+from .forms import CommandeForm, LigneCommandeForm, PaiementForm
 
 @login_required
 def commande_list(request):
@@ -38,7 +56,8 @@ def commande_list(request):
         'page_obj': page_obj,
         'commandes': page_obj,
         'statut': statut,
-        'query': query
+        'query': query,
+        'statuts_cibles': [choix for choix in Commande.STATUT_CHOICES if origines(choix[0])],
     })
 
 @login_required
@@ -48,9 +67,15 @@ def commande_detail(request, pk):
     """
     commande = get_object_or_404(Commande, pk=pk)
     lignes_commande = commande.lignes_commande.select_related('produit').all()
+    reste = reste_a_payer(commande)
     return render(request, 'commandes_app/commande_detail.html', {
         'commande': commande,
-        'lignes_commande': lignes_commande
+        'lignes_commande': lignes_commande,
+        'transitions': transitions_possibles(commande),
+        'ouverte': commande.statut in STATUTS_OUVERTS,
+        'paiements': commande.paiements.select_related('encaisse_par'),
+        'reste_a_payer': reste,
+        'paiement_form': PaiementForm(initial={'montant': reste}),
     })
 
 @login_required
@@ -58,6 +83,10 @@ def commande_create(request):
     """
     Création d'une commande
     """
+    if caisse_close(restaurant_courant_id()):
+        messages.error(request, 'La caisse du jour est clôturée : aucune nouvelle commande.')
+        return redirect('commandes_app:commande_list')
+
     if request.method == 'POST':
         form = CommandeForm(request.POST)
         if form.is_valid():
@@ -78,6 +107,9 @@ def commande_update(request, pk):
     Mise à jour d'une commande
     """
     commande = get_object_or_404(Commande, pk=pk)
+    if journee_close(commande):
+        messages.error(request, 'Journée clôturée : la commande ne peut plus être modifiée.')
+        return redirect('commandes_app:commande_detail', pk=commande.pk)
     
     if request.method == 'POST':
         form = CommandeForm(request.POST, instance=commande)
@@ -95,6 +127,7 @@ def commande_update(request, pk):
     })
 
 @login_required
+@require_POST
 def commande_update_statut(request, pk):
     """
     Mise à jour du statut d'une commande
@@ -103,49 +136,117 @@ def commande_update_statut(request, pk):
     nouveau_statut = request.POST.get('statut')
     
     if nouveau_statut in [choice[0] for choice in Commande.STATUT_CHOICES]:
-        commande.statut = nouveau_statut
-        commande.save()
-        messages.success(request, f'Statut de la commande mis à jour: {commande.get_statut_display()}')
+        try:
+            changer_statut(commande, nouveau_statut)
+        except TransitionInterdite as erreur:
+            messages.error(request, str(erreur))
+        else:
+            messages.success(request, f'Statut de la commande mis à jour: {commande.get_statut_display()}')
     else:
         messages.error(request, 'Statut invalide.')
     
     return redirect('commandes_app:commande_detail', pk=pk)
 
+@staff_requis
+@require_POST
+def commande_statut_groupe(request):
+    """
+    Passage d'une sélection de commandes au même statut (clôture de service)
+    """
+    nouveau_statut = request.POST.get('statut')
+    pks = [pk for pk in request.POST.getlist('commandes') if pk.isdigit()]
+    suite = request.POST.get('next')
+    if not suite or not url_has_allowed_host_and_scheme(suite, allowed_hosts={request.get_host()}):
+        suite = reverse('commandes_app:commande_list')
+    
+    if nouveau_statut not in [choice[0] for choice in Commande.STATUT_CHOICES]:
+        messages.error(request, 'Statut invalide.')
+        return redirect(suite)
+    if not pks:
+        messages.error(request, 'Aucune commande sélectionnée.')
+        return redirect(suite)
+    try:
+        deplacees = transition_groupee(pks, nouveau_statut)
+    except TransitionInterdite as erreur:
+        messages.error(request, str(erreur))
+        return redirect(suite)
+    
+    libelle = dict(Commande.STATUT_CHOICES)[nouveau_statut]
+    messages.success(request, f'{len(deplacees)} commande(s) passée(s) au statut {libelle}.')
+    ignorees = len(set(pks)) - len(deplacees)
+    if ignorees:
+        messages.warning(request, f'{ignorees} commande(s) ignorée(s) : transition non autorisée depuis leur statut.')
+    return redirect(suite)
+
 @login_required
 def commande_delete(request, pk):
     """
     Suppression d'une commande
     """
     commande = get_object_or_404(Commande, pk=pk)
+    if journee_close(commande):
+        messages.error(request, 'Journée clôturée : la commande ne peut plus être supprimée.')
+        return redirect('commandes_app:commande_detail', pk=commande.pk)
     
     if request.method == 'POST':
-        commande.delete()
+        try:
+            commande.delete()
+        except ProtectedError:
+            messages.error(request, 'Impossible de supprimer une commande déjà encaissée : annulez-la.')
+            return redirect('commandes_app:commande_detail', pk=commande.pk)
         messages.success(request, 'Commande supprimée avec succès.')
         return redirect('commandes_app:commande_list')
     
     return render(request, 'commandes_app/commande_delete.html', {'commande': commande})
 
+@staff_requis
+@require_POST
+def paiement_ajouter(request, pk):
+    """
+    Encaissement (éventuellement partiel) d'une commande
+    """
+    commande = get_object_or_404(Commande, pk=pk)
+    form = PaiementForm(request.POST)
+    if form.is_valid():
+        try:
+            paiement = encaisser(commande, form.cleaned_data['mode'], form.cleaned_data['montant'],
+                                 utilisateur=request.user, reference=form.cleaned_data['reference'])
+        except PaiementRefuse as erreur:
+            messages.error(request, str(erreur))
+        else:
+            messages.success(request, f'Paiement de {paiement.montant} FCFA enregistré.')
+    else:
+        messages.error(request, 'Paiement invalide.')
+    return redirect('commandes_app:commande_detail', pk=commande.pk)
+
 @login_required
 def ajouter_ligne_commande(request, commande_pk):
     """
     Ajouter une ligne à une commande
     """
     commande = get_object_or_404(Commande, pk=commande_pk)
+    if commande.statut not in STATUTS_OUVERTS:
+        messages.error(request, 'Commande servie ou annulée : ses lignes ne peuvent plus être modifiées.')
+        return redirect('commandes_app:commande_detail', pk=commande.pk)
     
     if request.method == 'POST':
         form = LigneCommandeForm(request.POST)
         if form.is_valid():
+            # Prix de la grille tarifaire de la minute, menus recalculés sur
+            # l'ensemble de la commande et stock des ingrédients décrémenté
             ligne = form.save(commit=False)
-            ligne.commande = commande
-            ligne.prix_unitaire = ligne.produit.prix_vente
-            ligne.save()
-            
-            # Mettre à jour le stock du produit
-            ligne.produit.stock_actuel -= ligne.quantite
-            ligne.produit.save()
-            
-            messages.success(request, 'Produit ajouté à la commande.')
-            return redirect('commandes_app:commande_detail', pk=commande.pk)
+            try:
+                with transaction.atomic():
+                    verrouiller_ouverte(commande.pk)
+                    ajouter_panier(commande, [(ligne.produit_id, ligne.quantite)])
+            except CommandeFermee as erreur:
+                messages.error(request, str(erreur))
+                return redirect('commandes_app:commande_detail', pk=commande.pk)
+            except ProduitIndisponible as erreur:
+                form.add_error('produit', str(erreur))
+            else:
+                messages.success(request, 'Produit ajouté à la commande.')
+                return redirect('commandes_app:commande_detail', pk=commande.pk)
     else:
         form = LigneCommandeForm()
     
@@ -160,20 +261,209 @@ def supprimer_ligne_commande(request, pk):
     """
     Supprimer une ligne de commande
     """
-    ligne = get_object_or_404(LigneCommande, pk=pk)
+    ligne = get_object_or_404(LigneCommande.objects.select_related('commande'), pk=pk)
     commande_pk = ligne.commande.pk
+    if ligne.commande.statut not in STATUTS_OUVERTS:
+        messages.error(request, 'Commande servie ou annulée : ses lignes ne peuvent plus être modifiées.')
+        return redirect('commandes_app:commande_detail', pk=commande_pk)
     
     if request.method == 'POST':
-        # Remettre le produit en stock
-        ligne.produit.stock_actuel += ligne.quantite
-        ligne.produit.save()
-        
-        ligne.delete()
+        try:
+            with transaction.atomic():
+                # Statut relu sous verrou : une annulation a déjà rendu le stock
+                verrouiller_ouverte(commande_pk)
+                # Remettre les ingrédients (ou le produit) en stock
+                restituer([(ligne.produit_id, ligne.quantite)])
+                ligne.delete()
+                appliquer_menus(ligne.commande)
+        except CommandeFermee as erreur:
+            messages.error(request, str(erreur))
+            return redirect('commandes_app:commande_detail', pk=commande_pk)
         messages.success(request, 'Produit retiré de la commande.')
         return redirect('commandes_app:commande_detail', pk=commande_pk)
     
     return render(request, 'commandes_app/ligne_commande_delete.html', {'ligne': ligne})
 
+@login_required
+def table_list(request):
+    """
+    Plan de salle : tables et nombre d'additions ouvertes
+    """
+    instantane = salle()
+    tables = [
+        (table, len(instantane.commandes(table.pk)))
+        for table in Table.objects.filter(is_active=True)
+    ]
+    return render(request, 'commandes_app/table_list.html', {'tables': tables})
+
+@login_required
+def table_detail(request, pk):
+    """
+    Additions ouvertes d'une table, avec fusion et séparation
+    """
+    table = get_object_or_404(Table, pk=pk)
+    pks = commandes_ouvertes(table.pk)
+    commandes = sorted(
+        Commande.objects.filter(pk__in=pks).prefetch_related('lignes_commande__produit'),
+        key=lambda commande: pks.index(commande.pk),
+    )
+    return render(request, 'commandes_app/table_detail.html', {
+        'table': table,
+        'commandes': commandes,
+        'total': sum(commande.montant_total for commande in commandes),
+    })
+
+@staff_requis
+@require_POST
+def table_fusionner(request, pk):
+    """
+    Fusion de plusieurs additions d'une table en une seule
+    """
+    table = get_object_or_404(Table, pk=pk)
+    cible = get_object_or_404(Commande, pk=request.POST.get('cible') or 0, table=table)
+    pks = [pk for pk in request.POST.getlist('commandes') if pk.isdigit()]
+    try:
+        fusionnees = fusionner(cible, Commande.objects.filter(pk__in=pks, table=table).values_list('pk', flat=True))
+    except OperationImpossible as erreur:
+        messages.error(request, str(erreur))
+    else:
+        if fusionnees:
+            messages.success(request, f'{len(fusionnees)} addition(s) fusionnée(s) dans {cible.reference}.')
+        else:
+            messages.error(request, 'Aucune autre addition ouverte sélectionnée.')
+    return redirect('commandes_app:table_detail', pk=table.pk)
+
+@staff_requis
+@require_POST
+def commande_scinder(request, pk):
+    """
+    Séparation d'une addition : les lignes choisies passent sur une nouvelle commande
+    """
+    commande = get_object_or_404(Commande, pk=pk)
+    lignes = [pk for pk in request.POST.getlist('lignes') if pk.isdigit()]
+    try:
+        nouvelle = scinder(commande, lignes)
+    except OperationImpossible as erreur:
+        messages.error(request, str(erreur))
+    else:
+        messages.success(request, f'Addition séparée : nouvelle commande {nouvelle.reference}.')
+    if commande.table_id:
+        return redirect('commandes_app:table_detail', pk=commande.table_id)
+    return redirect('commandes_app:commande_detail', pk=commande.pk)
+
+@staff_requis
+def livraison_tableau(request):
+    """
+    Tableau de répartition des livraisons
+    """
+    attente = list(livraisons_en_attente().order_by('date_commande'))
+    tournees = Tournee.objects.exclude(statut='TERMINEE').select_related('livreur').prefetch_related(
+        Prefetch('commandes', queryset=Commande.objects.order_by('rang_tournee'))
+    ).order_by('date_creation')
+    return render(request, 'commandes_app/livraisons.html', {
+        'localisees': [commande for commande in attente if commande.latitude is not None],
+        'non_localisees': [commande for commande in attente if commande.latitude is None],
+        'tournees': tournees,
+        'livreurs': User.objects.filter(role='STAFF', is_active=True).order_by('first_name', 'username'),
+    })
+
+@staff_requis
+@require_POST
+def livraison_planifier(request):
+    """
+    Regroupement des livraisons en attente en tournées
+    """
+    tournees = planifier()
+    if tournees:
+        messages.success(request, f'{len(tournees)} tournée(s) planifiée(s).')
+    else:
+        messages.info(request, 'Aucune livraison localisée en attente.')
+    return redirect('commandes_app:livraison_tableau')
+
+@staff_requis
+@require_POST
+def tournee_action(request, pk, action):
+    """
+    Départ, retour ou dissolution d'une tournée
+    """
+    tournee = get_object_or_404(Tournee, pk=pk)
+    try:
+        if action == 'depart':
+            livreur = get_object_or_404(User, pk=request.POST.get('livreur') or 0, role='STAFF', is_active=True)
+            demarrer(tournee, livreur)
+            messages.success(request, f'{tournee} confiée à {livreur.get_full_name() or livreur.username}.')
+        elif action == 'retour':
+            livrees = terminer(tournee)
+            messages.success(request, f'{tournee} terminée : {len(livrees)} commande(s) livrée(s).')
+        elif action == 'dissoudre':
+            dissoudre(tournee)
+            messages.success(request, 'Tournée dissoute, ses commandes sont de nouveau en attente.')
+        else:
+            raise Http404(action)
+    except LivraisonImpossible as erreur:
+        messages.error(request, str(erreur))
+    return redirect('commandes_app:livraison_tableau')
+
+@staff_requis
+def client_list(request):
+    """
+    Clients par montant cumulé, recherche par téléphone ou identifiant
+    """
+    query = request.GET.get('q', '').strip()
+    if query:
+        resume = rechercher(query)
+        if resume:
+            return redirect('commandes_app:client_detail', pk=resume.pk)
+        messages.error(request, f'Aucun client pour « {query} ».')
+    
+    paginator = Paginator(ResumeClient.objects.select_related('client').order_by('-valeur_totale'), 20)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    return render(request, 'commandes_app/client_list.html', {
+        'page_obj': page_obj,
+        'resumes': page_obj,
+        'query': query,
+    })
+
+@staff_requis
+def client_detail(request, pk):
+    """
+    Fiche client : agrégats, produits préférés, points et dernières commandes
+    """
+    resume = get_object_or_404(ResumeClient.objects.select_related('client'), pk=pk)
+    return render(request, 'commandes_app/client_detail.html', {
+        'resume': resume,
+        'favoris': favoris(resume),
+        'mouvements': MouvementPoints.objects.filter(client_id=pk).select_related('commande')[:20],
+        'commandes': Commande.objects.filter(client_id=pk).order_by('-date_commande')[:20],
+        'motifs': [choix for choix in MouvementPoints.MOTIF_CHOICES if choix[0] != 'GAIN'],
+    })
+
+@staff_requis
+@require_POST
+def client_points(request, pk):
+    """
+    Utilisation ou ajustement manuel des points d'un client
+    """
+    resume = get_object_or_404(ResumeClient.objects.select_related('client'), pk=pk)
+    motif = request.POST.get('motif')
+    try:
+        points = int(request.POST.get('points', ''))
+    except ValueError:
+        points = 0
+    if motif not in ('UTILISATION', 'AJUSTEMENT') or not points:
+        messages.error(request, 'Mouvement de points invalide.')
+        return redirect('commandes_app:client_detail', pk=pk)
+    # Une utilisation débite toujours le solde
+    if motif == 'UTILISATION':
+        points = -abs(points)
+    try:
+        ajuster_points(resume.client, points, motif, utilisateur=request.user)
+    except PointsInsuffisants as erreur:
+        messages.error(request, str(erreur))
+    else:
+        messages.success(request, f'{points:+d} points enregistrés.')
+    return redirect('commandes_app:client_detail', pk=pk)
+
 @login_required
 def dashboard_commandes(request):
     """
@@ -196,29 +486,7 @@ def dashboard_commandes(request):
     # Dernières commandes
     commandes_recentes = Commande.objects.order_by('-date_commande')[:10]
     
-    # Données pour les graphiques (7 derniers jours)
-    from datetime import timedelta
-    dates = []
-    commandes_par_jour = []
-    
-    for i in range(7):
-        date = today - timedelta(days=i)
-        dates.append(date.strftime('%d/%m'))
-        nb_commandes = Commande.objects.filter(date_commande__date=date).count()
-        commandes_par_jour.append(nb_commandes)
-    
-    dates.reverse()
-    commandes_par_jour.reverse()
-    
-    # Répartition par statut
-    statuts_labels = ['En attente', 'En préparation', 'Prête', 'Servie', 'Annulée']
-    statuts_data = [
-        Commande.objects.filter(statut='EN_ATTENTE').count(),
-        Commande.objects.filter(statut='EN_PREPARATION').count(),
-        Commande.objects.filter(statut='PRETE').count(),
-        Commande.objects.filter(statut='SERVIE').count(),
-        Commande.objects.filter(statut='ANNULEE').count(),
-    ]
+    # Les graphiques sont chargés séparément depuis l'API statistiques
     
     context = {
         'chiffre_affaires_today': chiffre_affaires_today,
@@ -228,10 +496,6 @@ def dashboard_commandes(request):
         'commandes_en_cours': commandes_en_cours,
         'commandes_annulees': commandes_annulees,
         'commandes_recentes': commandes_recentes,
-        'dates_graphique': dates,
-        'commandes_graphique': commandes_par_jour,
-        'statuts_labels': statuts_labels,
-        'statuts_data': statuts_data,
     }
     
     return render(request, 'commandes_app/dashboard.html', context)
@@ -1,3 +1,46 @@
 from django.contrib import admin
+from .models import Categorie, Composant, ElementMenu, Produit, Promotion
 
-# Register your models here.
+
+class ComposantInline(admin.TabularInline):
+    """
+    Recette du produit : ingrédients et quantités par portion
+    """
+    model = Composant
+    fk_name = 'produit'
+    extra = 1
+    autocomplete_fields = ('ingredient',)
+
+
+@admin.register(Categorie)
+class CategorieAdmin(admin.ModelAdmin):
+    list_display = ('nom', 'restaurant', 'date_created')
+    list_filter = ('restaurant',)
+    search_fields = ('nom',)
+
+
+@admin.register(Produit)
+class ProduitAdmin(admin.ModelAdmin):
+    list_display = ('nom', 'categorie', 'prix_vente', 'stock_actuel', 'seuil_alerte', 'is_active')
+    list_filter = ('restaurant', 'categorie', 'is_active')
+    search_fields = ('nom',)
+    inlines = [ComposantInline]
+
+
+class ElementMenuInline(admin.TabularInline):
+    """
+    Composition d'un menu à prix fixe
+    """
+    model = ElementMenu
+    extra = 1
+    autocomplete_fields = ('produit',)
+
+
+@admin.register(Promotion)
+class PromotionAdmin(admin.ModelAdmin):
+    list_display = ('nom', 'type_promotion', 'taux_remise', 'prix_menu', 'jours', 'heure_debut', 'heure_fin',
+                    'is_active')
+    list_filter = ('restaurant', 'type_promotion', 'is_active')
+    search_fields = ('nom',)
+    autocomplete_fields = ('produit', 'categorie')
+    inlines = [ElementMenuInline]
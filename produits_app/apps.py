@@ -3,3 +3,9 @@ from django.apps import AppConfig
 
 class ProduitsAppConfig(AppConfig):
     name = 'produits_app'
+
+    def ready(self):
+        # Caches du catalogue et des recettes, variantes des images
+        from . import catalogue, images, recettes  # noqa: F401
+        # Tarifs : produits_app.tarifs n'est importé qu'à l'usage
+        from . import signaux  # noqa: F401
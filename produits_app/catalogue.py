@@ -0,0 +1,157 @@
+"""
+Cache du catalogue en mémoire.
+
+Un instantané immuable des catégories et des produits actifs (prix, niveau
+de stock, URL de l'image) est gardé par processus et associé à un numéro de
+version partagé via le cache Django. Toute modification du catalogue
+incrémente la version ; chaque processus reconstruit alors son instantané,
+une seule fois, à la première lecture suivante.
+
+Instantané et version sont propres à chaque restaurant (users/restaurants.py).
+"""
+import threading
+
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from users.restaurants import cle, incrementer_apres_validation, restaurant_courant_id, version
+from .models import Categorie, Produit, niveau_stock
+
+CLE_VERSION = 'catalogue:version'
+
+# Champs du produit repris dans l'instantané
+CHAMPS_CATALOGUE = ('nom', 'description', 'categorie_id', 'prix_vente', 'unite', 'image', 'is_active')
+
+_verrou = threading.Lock()
+# restaurant_id -> Catalogue
+_instantanes = {}
+
+
+class CategorieCatalogue:
+    __slots__ = ('pk', 'nom')
+
+    def __init__(self, pk, nom):
+        self.pk = pk
+        self.nom = nom
+
+    def __str__(self):
+        return self.nom
+
+
+class ProduitCatalogue:
+    __slots__ = (
+        'pk', 'nom', 'description', 'categorie', 'prix_vente', 'unite',
+        'niveau_stock', 'image_url', 'variantes_image',
+    )
+
+    def __init__(self, pk, nom, description, categorie, prix_vente, unite, niveau_stock, image_url,
+                 variantes_image):
+        self.pk = pk
+        self.nom = nom
+        self.description = description
+        self.categorie = categorie
+        self.prix_vente = prix_vente
+        self.unite = unite
+        self.niveau_stock = niveau_stock
+        self.image_url = image_url
+        self.variantes_image = variantes_image
+
+    def __str__(self):
+        return f"{self.nom} ({self.categorie.nom})"
+
+    @property
+    def en_rupture(self):
+        return self.niveau_stock == 'RUPTURE'
+
+    @property
+    def stock_faible(self):
+        return self.niveau_stock is not None
+
+
+class Catalogue:
+    """
+    Instantané immuable du catalogue pour une version donnée
+    """
+    __slots__ = ('version', 'categories', 'produits', 'par_id')
+
+    def __init__(self, version, categories, produits):
+        self.version = version
+        self.categories = tuple(categories)
+        self.produits = tuple(produits)
+        self.par_id = {produit.pk: produit for produit in self.produits}
+
+    def produit(self, pk):
+        return self.par_id.get(pk)
+
+
+def _construire(version):
+    categories = {
+        pk: CategorieCatalogue(pk, nom)
+        for pk, nom in Categorie.objects.values_list('pk', 'nom')
+    }
+    produits = []
+    for valeurs in Produit.objects.filter(is_active=True).values_list(
+        'pk', 'nom', 'description', 'categorie_id', 'prix_vente', 'unite',
+        'stock_actuel', 'seuil_alerte', 'image', 'variantes_image',
+    ):
+        (pk, nom, description, categorie_id, prix_vente, unite,
+         stock_actuel, seuil_alerte, image, variantes_image) = valeurs
+        image_url = Produit._meta.get_field('image').storage.url(image) if image else ''
+        produits.append(ProduitCatalogue(
+            pk, nom, description, categories[categorie_id], prix_vente, unite,
+            niveau_stock(stock_actuel, seuil_alerte), image_url, variantes_image or {},
+        ))
+    return Catalogue(version, categories.values(), produits)
+
+
+def catalogue():
+    """
+    Instantané courant du catalogue du restaurant courant, reconstruit si
+    la version a changé
+    """
+    restaurant_id = restaurant_courant_id()
+    courante = version(cle(CLE_VERSION, restaurant_id))
+    instantane = _instantanes.get(restaurant_id)
+    if instantane is not None and instantane.version == courante:
+        return instantane
+    with _verrou:
+        instantane = _instantanes.get(restaurant_id)
+        if instantane is None or instantane.version != courante:
+            instantane = _construire(courante)
+            _instantanes[restaurant_id] = instantane
+    return instantane
+
+
+def invalider_catalogue(restaurant_id=None):
+    """
+    Incrémente la version du catalogue du restaurant (courant par défaut)
+    après validation de la transaction en cours
+    """
+    incrementer_apres_validation(cle(CLE_VERSION, restaurant_id))
+
+
+def _empreinte(produit):
+    champs = produit.__dict__
+    if not all(nom in champs for nom in CHAMPS_CATALOGUE):
+        return None
+    return tuple(str(champs[nom]) for nom in CHAMPS_CATALOGUE)
+
+
+@receiver(post_init, sender=Produit)
+def memoriser_empreinte(sender, instance, **kwargs):
+    instance._empreinte_catalogue = _empreinte(instance)
+
+
+@receiver(post_save, sender=Produit)
+def produit_enregistre(sender, instance, created, **kwargs):
+    empreinte = _empreinte(instance)
+    if created or empreinte is None or empreinte != getattr(instance, '_empreinte_catalogue', None):
+        invalider_catalogue(instance.restaurant_id)
+    instance._empreinte_catalogue = empreinte
+
+
+@receiver(post_delete, sender=Produit)
+@receiver(post_save, sender=Categorie)
+@receiver(post_delete, sender=Categorie)
+def catalogue_modifie(sender, instance, **kwargs):
+    invalider_catalogue(instance.restaurant_id)
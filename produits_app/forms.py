@@ -1,6 +1,13 @@
 from django import forms
+from .catalogue import catalogue
 from .models import Categorie, Produit
 
+def choix_categories():
+    """
+    Choix de catégories lus depuis le cache du catalogue
+    """
+    return [('', 'Toutes les catégories')] + [(c.pk, c.nom) for c in catalogue().categories]
+
 class CategorieForm(forms.ModelForm):
     """
     Formulaire pour les catégories
@@ -71,10 +78,11 @@ class ProduitSearchForm(forms.Form):
             'placeholder': 'Rechercher un produit...'
         })
     )
-    categorie = forms.ModelChoiceField(
-        queryset=Categorie.objects.all(),
+    categorie = forms.TypedChoiceField(
+        choices=choix_categories,
+        coerce=int,
         required=False,
-        empty_label="Toutes les catégories",
+        empty_value=None,
         widget=forms.Select(attrs={'class': 'form-control'})
     )
     prix_min = forms.DecimalField(
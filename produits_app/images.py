@@ -0,0 +1,156 @@
+"""
+Variantes redimensionnées des images de produits.
+
+À chaque nouvelle image, une tâche mise en file (exécutée par manage.py
+run_worker) génère des variantes WebP et JPEG (miniature, carte, détail)
+nommées d'après l'empreinte de leur contenu, puis enregistre leurs noms dans Produit.variantes_image. L'image
+remplacée ou celle d'un produit supprimé est effacée, avec ses variantes,
+dès qu'aucun autre produit ne l'utilise. Les gabarits utilisent ces
+variantes via les balises de produits_app.templatetags.images_produits au
+lieu de l'image d'origine.
+"""
+import hashlib
+import logging
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .catalogue import invalider_catalogue
+from .models import Produit
+
+logger = logging.getLogger(__name__)
+
+# Nom de la variante -> plus grande dimension en pixels
+VARIANTES = {
+    'miniature': 150,
+    'carte': 400,
+    'detail': 1000,
+}
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+DOSSIER_VARIANTES = 'produits/variantes'
+
+
+def generer_variantes(nom_image, stockage=None):
+    """
+    Génère les variantes d'une image stockée et retourne leur description :
+    {variante: {'largeur': l, 'webp': nom, 'jpeg': nom}}
+    """
+    from PIL import Image, ImageOps
+
+    stockage = stockage or Produit._meta.get_field('image').storage
+    with stockage.open(nom_image, 'rb') as fichier:
+        with Image.open(fichier) as source:
+            source = ImageOps.exif_transpose(source)
+            source.load()
+
+    variantes = {}
+    for variante, taille in VARIANTES.items():
+        image = source.copy()
+        image.thumbnail((taille, taille), Image.LANCZOS)
+        description = {'largeur': image.width}
+        for extension, (format_pil, options) in FORMATS.items():
+            convertie = image
+            if format_pil == 'JPEG' and image.mode != 'RGB':
+                # JPEG sans transparence : fond blanc
+                fond = Image.new('RGB', image.size, (255, 255, 255))
+                rgba = image.convert('RGBA')
+                fond.paste(rgba, mask=rgba.getchannel('A'))
+                convertie = fond
+            tampon = BytesIO()
+            convertie.save(tampon, format_pil, **options)
+            contenu = tampon.getvalue()
+            empreinte = hashlib.sha256(contenu).hexdigest()[:20]
+            nom = f'{DOSSIER_VARIANTES}/{empreinte}.{extension}'
+            if not stockage.exists(nom):
+                nom = stockage.save(nom, ContentFile(contenu))
+            description[extension] = nom
+        variantes[variante] = description
+    return variantes
+
+
+def traiter_produit(produit_id):
+    """
+    Génère et enregistre les variantes de l'image courante d'un produit
+    """
+    nom_image, restaurant_id = Produit.objects.filter(pk=produit_id).values_list('image', 'restaurant_id').first() \
+        or (None, None)
+    if not nom_image:
+        return None
+    variantes = generer_variantes(nom_image)
+    # On n'écrase pas les variantes si l'image a changé entre-temps
+    modifies = Produit.objects.filter(pk=produit_id, image=nom_image).update(variantes_image=variantes)
+    if modifies:
+        invalider_catalogue(restaurant_id)
+    return variantes
+
+
+def planifier(produit_id):
+    """
+    Met en file la génération des variantes d'un produit
+    """
+    from taches_app.file import mettre_en_file
+    from .taches import variantes_image
+
+    return mettre_en_file(variantes_image, produit_id, unique=True)
+
+
+@receiver(post_init, sender=Produit)
+def memoriser_image(sender, instance, **kwargs):
+    instance._image_initiale = instance.__dict__.get('image')
+
+
+@receiver(post_save, sender=Produit)
+def image_enregistree(sender, instance, created, raw=False, **kwargs):
+    if raw or 'image' not in instance.__dict__:
+        return
+    nom_image = instance.image.name if instance.image else ''
+    ancien = instance._image_initiale
+    ancien = getattr(ancien, 'name', ancien) or ''
+    instance._image_initiale = nom_image
+    if nom_image != ancien:
+        anciennes_variantes = instance.__dict__.get('variantes_image') or {}
+        if ancien:
+            transaction.on_commit(lambda: supprimer_si_orphelin(ancien, anciennes_variantes))
+        if nom_image:
+            transaction.on_commit(lambda: planifier(instance.pk))
+        elif anciennes_variantes:
+            Produit.objects.filter(pk=instance.pk).update(variantes_image={})
+            instance.variantes_image = {}
+
+
+@receiver(post_delete, sender=Produit)
+def produit_supprime(sender, instance, **kwargs):
+    nom_image = instance.__dict__.get('image')
+    nom_image = getattr(nom_image, 'name', nom_image)
+    if nom_image:
+        variantes = instance.__dict__.get('variantes_image') or {}
+        transaction.on_commit(lambda: supprimer_si_orphelin(nom_image, variantes))
+
+
+def supprimer_si_orphelin(nom_image, variantes, stockage=None):
+    """
+    Supprime une image et ses variantes si plus aucun produit n'utilise
+    cette image (les fichiers identiques sont partagés entre produits)
+    """
+    # Tous restaurants confondus : un fichier dédupliqué peut servir ailleurs
+    if Produit.objects.tous().filter(image=nom_image).exists():
+        return False
+    stockage = stockage or Produit._meta.get_field('image').storage
+    noms = [nom_image] + [
+        nom
+        for description in variantes.values()
+        for extension, nom in description.items()
+        if extension in FORMATS
+    ]
+    for nom in noms:
+        try:
+            stockage.delete(nom)
+        except OSError:
+            logger.warning("Impossible de supprimer le fichier media %s", nom)
+    return True
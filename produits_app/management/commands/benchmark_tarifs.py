@@ -0,0 +1,61 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from produits_app import tarifs
+from produits_app.catalogue import catalogue
+from produits_app.models import Produit
+
+
+class Command(BaseCommand):
+    help = "Mesure la tarification d'un panier (grille en cache, reconstruction, lecture ligne à ligne)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lignes', type=int, default=50, help='Lignes du panier (défaut : 50)')
+        parser.add_argument('--repetitions', type=int, default=200, help='Nombre de mesures (défaut : 200)')
+        parser.add_argument('--graine', type=int, default=42, help='Graine du panier généré')
+        parser.add_argument('--budget-ms', type=float, default=5,
+                            help='Durée médiane maximale avec la grille en cache (défaut : 5 ms)')
+
+    def handle(self, *args, **options):
+        produits = list(catalogue().par_id)
+        if not produits:
+            raise CommandError('Aucun produit actif : générez des données avec seed_load.')
+        rng = random.Random(options['graine'])
+        panier = [(rng.choice(produits), rng.randint(1, 4)) for _ in range(options['lignes'])]
+        repetitions = max(options['repetitions'], 1)
+
+        def mesurer(fonction, repetitions=repetitions):
+            durees = []
+            for _ in range(repetitions):
+                debut = time.perf_counter()
+                resultat = fonction()
+                durees.append(time.perf_counter() - debut)
+            return resultat, statistics.median(durees) * 1000
+
+        def reconstruire():
+            tarifs._grilles.clear()
+            return tarifs.resoudre(panier)
+
+        tarifs.resoudre(panier)
+        with CaptureQueriesContext(connection) as requetes:
+            tarification, en_cache = mesurer(lambda: tarifs.resoudre(panier))
+        _, reconstruction = mesurer(reconstruire)
+        # Référence : une requête par ligne, sur moins de mesures
+        _, ligne_a_ligne = mesurer(lambda: [
+            (pk, quantite, Produit.objects.only('prix_vente').get(pk=pk).prix_vente) for pk, quantite in panier
+        ], repetitions=max(repetitions // 10, 1))
+
+        self.stdout.write(f"Panier de {len(panier)} lignes : {tarification.total} FCFA, "
+                          f"{sum(nombre for _, nombre in tarification.menus)} menu(s) reconnu(s)")
+        self.stdout.write(f'Grille en cache : médiane {en_cache:.3f} ms, '
+                          f'{len(requetes) // repetitions} requête(s) par panier')
+        self.stdout.write(f'Grille reconstruite à chaque panier : médiane {reconstruction:.3f} ms')
+        self.stdout.write(f'Prix lus ligne à ligne : médiane {ligne_a_ligne:.3f} ms, {len(panier)} requêtes')
+        if en_cache > options['budget_ms']:
+            raise CommandError(f"Budget dépassé ({options['budget_ms']:.1f} ms).")
+        self.stdout.write(self.style.SUCCESS('Tarification dans le budget.'))
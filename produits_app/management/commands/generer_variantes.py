@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from produits_app.images import traiter_produit
+from produits_app.models import Produit
+
+
+class Command(BaseCommand):
+    help = "Génère les variantes redimensionnées des images de produits"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--toutes', action='store_true',
+                            help='Régénérer aussi les produits qui ont déjà des variantes')
+
+    def handle(self, *args, **options):
+        produits = Produit.objects.exclude(image='').exclude(image__isnull=True)
+        if not options['toutes']:
+            produits = produits.filter(variantes_image={})
+
+        total = 0
+        for produit_id in produits.values_list('pk', flat=True).iterator():
+            try:
+                traiter_produit(produit_id)
+                total += 1
+            except Exception as erreur:
+                self.stderr.write(f'Produit {produit_id} : {erreur}')
+        self.stdout.write(self.style.SUCCESS(f'Variantes générées pour {total} produit(s).'))
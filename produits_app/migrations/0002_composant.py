@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-19 17:07
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('produits_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Composant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantite', models.PositiveIntegerField(default=1, verbose_name='Quantité par portion')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='utilise_dans', to='produits_app.produit', verbose_name='Ingrédient')),
+                ('produit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='composants', to='produits_app.produit', verbose_name='Produit')),
+            ],
+            options={
+                'verbose_name': 'Composant',
+                'verbose_name_plural': 'Composants',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='composant',
+            constraint=models.UniqueConstraint(fields=('produit', 'ingredient'), name='composant_unique'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 17:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('produits_app', '0002_composant'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='produit',
+            name='variantes_image',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name="Variantes de l'image"),
+        ),
+    ]
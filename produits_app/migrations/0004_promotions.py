@@ -0,0 +1,55 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:14
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('produits_app', '0003_produit_variantes_image'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Promotion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nom', models.CharField(max_length=100, verbose_name='Nom')),
+                ('type_promotion', models.CharField(choices=[('REMISE', 'Remise'), ('MENU', 'Menu')], default='REMISE', max_length=10, verbose_name='Type')),
+                ('taux_remise', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True, verbose_name='Remise (%)')),
+                ('prix_menu', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Prix du menu')),
+                ('jours', models.CharField(default='0123456', help_text='Jours de validité, 0 = lundi … 6 = dimanche', max_length=7, verbose_name='Jours')),
+                ('heure_debut', models.TimeField(blank=True, null=True, verbose_name='Heure de début')),
+                ('heure_fin', models.TimeField(blank=True, help_text='Exclue ; une fin antérieure au début passe minuit', null=True, verbose_name='Heure de fin')),
+                ('date_debut', models.DateField(blank=True, null=True, verbose_name='Date de début')),
+                ('date_fin', models.DateField(blank=True, null=True, verbose_name='Date de fin')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Active')),
+                ('date_created', models.DateTimeField(auto_now_add=True, verbose_name='Date de création')),
+                ('categorie', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='promotions', to='produits_app.categorie', verbose_name='Catégorie')),
+                ('produit', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='promotions', to='produits_app.produit', verbose_name='Produit')),
+            ],
+            options={
+                'verbose_name': 'Promotion',
+                'verbose_name_plural': 'Promotions',
+                'ordering': ['nom'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ElementMenu',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantite', models.PositiveIntegerField(default=1, verbose_name='Quantité')),
+                ('produit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='elements_menu', to='produits_app.produit', verbose_name='Produit')),
+                ('promotion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='elements', to='produits_app.promotion', verbose_name='Menu')),
+            ],
+            options={
+                'verbose_name': 'Élément de menu',
+                'verbose_name_plural': 'Éléments de menu',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='elementmenu',
+            constraint=models.UniqueConstraint(fields=('promotion', 'produit'), name='element_menu_unique'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_restaurants'),
+        ('produits_app', '0004_promotions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='categorie',
+            name='restaurant',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='categories', to='users.restaurant', verbose_name='Restaurant'),
+        ),
+        migrations.AddField(
+            model_name='produit',
+            name='restaurant',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='produits', to='users.restaurant', verbose_name='Restaurant'),
+        ),
+        migrations.AlterField(
+            model_name='categorie',
+            name='nom',
+            field=models.CharField(max_length=100, verbose_name='Nom'),
+        ),
+        migrations.AddIndex(
+            model_name='produit',
+            index=models.Index(fields=['restaurant', 'is_active'], name='produit_restaurant_actif_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='categorie',
+            constraint=models.UniqueConstraint(fields=('restaurant', 'nom'), name='categorie_nom_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='categorie',
+            constraint=models.UniqueConstraint(condition=models.Q(('restaurant__isnull', True)), fields=('nom',), name='categorie_nom_reseau_unique'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('produits_app', '0005_restaurants'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='produit',
+            index=models.Index(fields=['restaurant', 'date_updated'], name='produit_restaurant_maj_idx'),
+        ),
+    ]
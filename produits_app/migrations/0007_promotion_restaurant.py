@@ -0,0 +1,24 @@
+# Generated by Django 4.2.7 on 2026-10-19 19:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_restaurant_position'),
+        ('produits_app', '0006_produit_restaurant_maj_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='promotion',
+            name='restaurant',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='promotions', to='users.restaurant', verbose_name='Restaurant'),
+        ),
+        migrations.AddIndex(
+            model_name='promotion',
+            index=models.Index(fields=['restaurant', 'is_active'], name='promotion_restaurant_actif_idx'),
+        ),
+    ]
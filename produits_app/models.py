@@ -1,14 +1,35 @@
-from django.db import models
+from django.db import models, transaction
 from django.core.exceptions import ValidationError
+from django.db.models.signals import post_init
 from django.urls import reverse
 
+from users.models import Restaurant
+from users.restaurants import ParRestaurantManager, restaurant_courant_id
+
+def niveau_stock(stock_actuel, seuil_alerte):
+    """
+    Niveau d'alerte d'un stock : 'RUPTURE', 'ALERTE' ou None
+    """
+    if stock_actuel <= 0:
+        return 'RUPTURE'
+    if stock_actuel <= seuil_alerte:
+        return 'ALERTE'
+    return None
+
 class Categorie(models.Model):
     """
     Modèle pour les catégories de produits
     """
+    restaurant = models.ForeignKey(
+        Restaurant,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='categories',
+        verbose_name='Restaurant'
+    )
     nom = models.CharField(
         max_length=100, 
-        unique=True,
         verbose_name='Nom'
     )
     description = models.TextField(
@@ -25,16 +46,33 @@ class Categorie(models.Model):
         verbose_name='Date de mise à jour'
     )
     
+    objects = ParRestaurantManager()
+    
     class Meta:
         verbose_name = 'Catégorie'
         verbose_name_plural = 'Catégories'
         ordering = ['nom']
+        constraints = [
+            models.UniqueConstraint(fields=['restaurant', 'nom'], name='categorie_nom_unique'),
+            # Installation sans restaurant
+            models.UniqueConstraint(fields=['nom'], condition=models.Q(restaurant__isnull=True),
+                                    name='categorie_nom_reseau_unique'),
+        ]
     
     def __str__(self):
         return self.nom
     
     def get_absolute_url(self):
         return reverse('produits_app:category_detail', kwargs={'pk': self.pk})
+    
+    def clean(self):
+        """
+        Nom unique dans le restaurant (le restaurant n'est pas saisi dans
+        les formulaires)
+        """
+        restaurant_id = self.restaurant_id or restaurant_courant_id()
+        if Categorie.objects.tous().filter(restaurant_id=restaurant_id, nom=self.nom).exclude(pk=self.pk).exists():
+            raise ValidationError({'nom': 'Une catégorie de ce nom existe déjà.'})
 
 class Produit(models.Model):
     """
@@ -48,6 +86,14 @@ class Produit(models.Model):
         ('BOUTEILLE', 'Bouteille'),
     )
     
+    restaurant = models.ForeignKey(
+        Restaurant,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='produits',
+        verbose_name='Restaurant'
+    )
     nom = models.CharField(
         max_length=200,
         verbose_name='Nom'
@@ -88,6 +134,12 @@ class Produit(models.Model):
         null=True,
         verbose_name='Image'
     )
+    variantes_image = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Variantes de l\'image'
+    )
     is_active = models.BooleanField(
         default=True,
         verbose_name='Actif'
@@ -101,10 +153,18 @@ class Produit(models.Model):
         verbose_name='Date de mise à jour'
     )
     
+    objects = ParRestaurantManager()
+    
     class Meta:
         verbose_name = 'Produit'
         verbose_name_plural = 'Produits'
         ordering = ['-date_created']
+        indexes = [
+            # Instantané du catalogue d'un restaurant
+            models.Index(fields=['restaurant', 'is_active'], name='produit_restaurant_actif_idx'),
+            # Changements depuis la dernière synchronisation d'une caisse
+            models.Index(fields=['restaurant', 'date_updated'], name='produit_restaurant_maj_idx'),
+        ]
     
     def __str__(self):
         return f"{self.nom} ({self.categorie.nom})"
@@ -130,6 +190,22 @@ class Produit(models.Model):
         if errors:
             raise ValidationError(errors)
     
+    def save(self, *args, **kwargs):
+        # Même transaction que les récepteurs post_save (valorisation du stock,
+        # alertes) : une vérification concurrente voit les deux ou aucun
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+    
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
+    
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        # Valeurs relues : les récepteurs post_init (valorisation, alertes,
+        # catalogue) mémorisent de nouveau l'état chargé
+        post_init.send(sender=Produit, instance=self)
+    
     @property
     def stock_faible(self):
         """
@@ -140,6 +216,212 @@ class Produit(models.Model):
     @property
     def en_rupture(self):
         """
-        Vérifie si le produit est en rupture
+        Vérifie si le produit est en rupture (même règle que niveau_stock)
+        """
+        return self.stock_actuel <= 0
+
+class Composant(models.Model):
+    """
+    Ingrédient entrant dans la recette d'un produit (nomenclature)
+    """
+    produit = models.ForeignKey(
+        Produit,
+        on_delete=models.CASCADE,
+        related_name='composants',
+        verbose_name='Produit'
+    )
+    ingredient = models.ForeignKey(
+        Produit,
+        on_delete=models.PROTECT,
+        related_name='utilise_dans',
+        verbose_name='Ingrédient'
+    )
+    quantite = models.PositiveIntegerField(
+        default=1,
+        verbose_name='Quantité par portion'
+    )
+    
+    class Meta:
+        verbose_name = 'Composant'
+        verbose_name_plural = 'Composants'
+        constraints = [
+            models.UniqueConstraint(fields=['produit', 'ingredient'], name='composant_unique'),
+        ]
+    
+    def __str__(self):
+        return f"{self.quantite} x {self.ingredient.nom} pour {self.produit.nom}"
+    
+    def clean(self):
+        """
+        Validation du modèle : pas de recette circulaire
+        """
+        from .recettes import cree_un_cycle
+        
+        if self.quantite == 0:
+            raise ValidationError({'quantite': 'La quantité doit être positive.'})
+        
+        if self.produit_id and self.ingredient_id and cree_un_cycle(self.produit_id, self.ingredient_id):
+            raise ValidationError({'ingredient': 'Cet ingrédient créerait une recette circulaire.'})
+
+class Promotion(models.Model):
+    """
+    Règle tarifaire : remise en pourcentage (sur un produit, une catégorie
+    ou toute la carte) ou menu à prix fixe, éventuellement limitée à
+    certains jours, à une plage horaire et à une période
+    """
+    TYPE_CHOICES = (
+        ('REMISE', 'Remise'),
+        ('MENU', 'Menu'),
+    )
+    
+    restaurant = models.ForeignKey(
+        Restaurant,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='promotions',
+        verbose_name='Restaurant'
+    )
+    nom = models.CharField(
+        max_length=100,
+        verbose_name='Nom'
+    )
+    type_promotion = models.CharField(
+        max_length=10,
+        choices=TYPE_CHOICES,
+        default='REMISE',
+        verbose_name='Type'
+    )
+    taux_remise = models.DecimalField(
+        max_digits=5,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        verbose_name='Remise (%)'
+    )
+    produit = models.ForeignKey(
+        Produit,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='promotions',
+        verbose_name='Produit'
+    )
+    categorie = models.ForeignKey(
+        Categorie,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='promotions',
+        verbose_name='Catégorie'
+    )
+    prix_menu = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        verbose_name='Prix du menu'
+    )
+    jours = models.CharField(
+        max_length=7,
+        default='0123456',
+        verbose_name='Jours',
+        help_text='Jours de validité, 0 = lundi … 6 = dimanche'
+    )
+    heure_debut = models.TimeField(
+        null=True,
+        blank=True,
+        verbose_name='Heure de début'
+    )
+    heure_fin = models.TimeField(
+        null=True,
+        blank=True,
+        verbose_name='Heure de fin',
+        help_text='Exclue ; une fin antérieure au début passe minuit'
+    )
+    date_debut = models.DateField(
+        null=True,
+        blank=True,
+        verbose_name='Date de début'
+    )
+    date_fin = models.DateField(
+        null=True,
+        blank=True,
+        verbose_name='Date de fin'
+    )
+    is_active = models.BooleanField(
+        default=True,
+        verbose_name='Active'
+    )
+    date_created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Date de création'
+    )
+    
+    objects = ParRestaurantManager()
+    
+    class Meta:
+        verbose_name = 'Promotion'
+        verbose_name_plural = 'Promotions'
+        ordering = ['nom']
+        indexes = [
+            # Promotions actives d'un restaurant (produits_app/tarifs.py)
+            models.Index(fields=['restaurant', 'is_active'], name='promotion_restaurant_actif_idx'),
+        ]
+    
+    def __str__(self):
+        return self.nom
+    
+    def clean(self):
+        """
+        Validation du modèle : paramètres cohérents avec le type
         """
-        return self.stock_actuel == 0
+        erreurs = {}
+        if self.type_promotion == 'REMISE':
+            if self.taux_remise is None or not 0 < self.taux_remise <= 100:
+                erreurs['taux_remise'] = 'Le taux de remise doit être compris entre 0 et 100 %.'
+            if self.produit_id and self.categorie_id:
+                erreurs['categorie'] = 'Une remise porte sur un produit ou sur une catégorie, pas les deux.'
+        elif self.prix_menu is None or self.prix_menu <= 0:
+            erreurs['prix_menu'] = 'Le prix du menu doit être positif.'
+        if not self.jours or any(jour not in '0123456' for jour in self.jours):
+            erreurs['jours'] = 'Indiquez les jours par leurs chiffres, de 0 (lundi) à 6 (dimanche).'
+        if (self.heure_debut is None) != (self.heure_fin is None):
+            erreurs['heure_fin'] = 'Indiquez les deux bornes de la plage horaire.'
+        if self.date_debut and self.date_fin and self.date_fin < self.date_debut:
+            erreurs['date_fin'] = 'La date de fin précède la date de début.'
+        if erreurs:
+            raise ValidationError(erreurs)
+
+class ElementMenu(models.Model):
+    """
+    Produit composant un menu à prix fixe
+    """
+    promotion = models.ForeignKey(
+        Promotion,
+        on_delete=models.CASCADE,
+        related_name='elements',
+        verbose_name='Menu'
+    )
+    produit = models.ForeignKey(
+        Produit,
+        on_delete=models.CASCADE,
+        related_name='elements_menu',
+        verbose_name='Produit'
+    )
+    quantite = models.PositiveIntegerField(
+        default=1,
+        verbose_name='Quantité'
+    )
+    
+    objects = ParRestaurantManager.par('promotion__restaurant')
+    
+    class Meta:
+        verbose_name = 'Élément de menu'
+        verbose_name_plural = 'Éléments de menu'
+        constraints = [
+            models.UniqueConstraint(fields=['promotion', 'produit'], name='element_menu_unique'),
+        ]
+    
+    def __str__(self):
+        return f"{self.quantite} x {self.produit.nom} ({self.promotion.nom})"
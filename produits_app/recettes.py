@@ -0,0 +1,142 @@
+"""
+Résolution des recettes (nomenclatures) des produits.
+
+La table des composants est chargée en une seule requête et gardée en
+mémoire par processus, avec un numéro de version partagé via le cache
+Django et incrémenté après validation de toute modification d'un
+composant : chaque processus recharge alors la table à la lecture
+suivante. Les recettes imbriquées sont développées en ingrédients de base
+sans requête supplémentaire, quelle que soit leur profondeur, et les
+développements sont gardés avec la table dont ils proviennent.
+"""
+import threading
+from collections import defaultdict
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from users.restaurants import incrementer_apres_validation, version
+from .models import Composant, Produit
+
+CLE_VERSION = 'recettes:version'
+# Garde-fou contre les recettes circulaires insérées hors validation
+PROFONDEUR_MAX = 20
+
+_verrou = threading.Lock()
+_nomenclature = None
+
+
+class Nomenclature:
+    """
+    Table des composants pour une version donnée : produit_id ->
+    [(ingredient_id, quantite), ...], et développements déjà calculés
+    """
+    __slots__ = ('version', 'composants', 'expansions')
+
+    def __init__(self, version, composants):
+        self.version = version
+        self.composants = composants
+        self.expansions = {}
+
+    def get(self, produit_id, defaut=None):
+        return self.composants.get(produit_id, defaut)
+
+
+@receiver(post_save, sender=Composant)
+@receiver(post_delete, sender=Composant)
+def invalider_nomenclature(sender, **kwargs):
+    incrementer_apres_validation(CLE_VERSION)
+
+
+def _charger_nomenclature():
+    global _nomenclature
+    courante = version(CLE_VERSION)
+    nomenclature = _nomenclature
+    if nomenclature is not None and nomenclature.version == courante:
+        return nomenclature
+    with _verrou:
+        nomenclature = _nomenclature
+        if nomenclature is None or nomenclature.version != courante:
+            composants = defaultdict(list)
+            # Composant n'est pas filtré par restaurant : table du réseau
+            for produit_id, ingredient_id, quantite in Composant.objects.values_list(
+                'produit_id', 'ingredient_id', 'quantite'
+            ):
+                composants[produit_id].append((ingredient_id, quantite))
+            nomenclature = Nomenclature(courante, dict(composants))
+            _nomenclature = nomenclature
+    return nomenclature
+
+
+def expansion(produit_id):
+    """
+    Ingrédients de base consommés par une portion du produit :
+    {ingredient_id: quantite}. Un produit sans recette se consomme
+    lui-même.
+    """
+    nomenclature = _charger_nomenclature()
+    resultat = nomenclature.expansions.get(produit_id)
+    if resultat is not None:
+        return resultat
+
+    resultat = defaultdict(int)
+
+    def developper(pk, facteur, profondeur):
+        if profondeur > PROFONDEUR_MAX:
+            raise ValueError(f'Recette circulaire ou trop profonde pour le produit {produit_id}')
+        composants = nomenclature.get(pk)
+        if not composants:
+            resultat[pk] += facteur
+            return
+        for ingredient_id, quantite in composants:
+            developper(ingredient_id, facteur * quantite, profondeur + 1)
+
+    developper(produit_id, 1, 0)
+    resultat = dict(resultat)
+    nomenclature.expansions[produit_id] = resultat
+    return resultat
+
+
+def consommation(lignes):
+    """
+    Quantités d'ingrédients de base consommées par des lignes
+    [(produit_id, quantite), ...] : {ingredient_id: quantite}
+    """
+    total = defaultdict(int)
+    for produit_id, quantite in lignes:
+        for ingredient_id, par_portion in expansion(produit_id).items():
+            total[ingredient_id] += par_portion * quantite
+    return dict(total)
+
+
+def portions_disponibles(produit_ids):
+    """
+    Nombre maximal de portions vendables pour chaque produit, d'après le
+    stock de ses ingrédients de base (une seule requête) : {produit_id: n}
+    """
+    expansions = {pk: expansion(pk) for pk in produit_ids}
+    ingredients = {pk for recette in expansions.values() for pk in recette}
+    stocks = dict(Produit.objects.filter(pk__in=ingredients).values_list('pk', 'stock_actuel'))
+    return {
+        pk: max(0, min(stocks.get(ingredient_id, 0) // quantite for ingredient_id, quantite in recette.items()))
+        for pk, recette in expansions.items()
+    }
+
+
+def cree_un_cycle(produit_id, ingredient_id):
+    """
+    Vérifie si ajouter ingredient_id à la recette de produit_id créerait
+    une recette circulaire
+    """
+    nomenclature = _charger_nomenclature()
+    a_visiter = [ingredient_id]
+    vus = set()
+    while a_visiter:
+        pk = a_visiter.pop()
+        if pk == produit_id:
+            return True
+        if pk in vus:
+            continue
+        vus.add(pk)
+        a_visiter.extend(ingredient for ingredient, _ in nomenclature.get(pk, ()))
+    return False
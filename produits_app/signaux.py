@@ -0,0 +1,31 @@
+"""
+Récepteurs des signaux des tarifs.
+
+Connectés au démarrage (ProduitsAppConfig.ready) sans importer
+produits_app.tarifs, qui ne l'est qu'au premier calcul de prix ou à la
+première modification d'une promotion.
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import ElementMenu, Promotion
+
+
+@receiver(post_save, sender=Promotion)
+@receiver(post_delete, sender=Promotion)
+def promotion_modifiee(sender, instance, **kwargs):
+    from .tarifs import invalider_tarifs
+
+    invalider_tarifs(instance.restaurant_id)
+
+
+@receiver(post_save, sender=ElementMenu)
+@receiver(post_delete, sender=ElementMenu)
+def element_menu_modifie(sender, instance, **kwargs):
+    from .tarifs import invalider_tarifs
+
+    # Les éléments sont supprimés avant leur menu : celui-ci existe encore
+    restaurant_id = Promotion.objects.tous().filter(pk=instance.promotion_id).values_list(
+        'restaurant_id', flat=True,
+    ).first()
+    invalider_tarifs(restaurant_id)
@@ -0,0 +1,14 @@
+"""
+Tâches différées des produits (exécutées par manage.py run_worker)
+"""
+from taches_app.file import tache
+from .images import traiter_produit
+
+
+@tache(libelle="Variantes d'une image de produit")
+def variantes_image(produit_id):
+    """
+    Génère les variantes de l'image courante du produit
+    """
+    variantes = traiter_produit(produit_id)
+    return {'variantes': sorted(variantes or {})}
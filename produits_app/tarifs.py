@@ -0,0 +1,313 @@
+"""
+Moteur de tarification.
+
+Les promotions actives (remises en pourcentage, menus à prix fixe) sont
+compilées avec les prix de l'instantané du catalogue en une grille valable
+pour une minute locale : prix unitaire remisé de chaque produit actif et
+menus applicables, du plus avantageux au moins avantageux. Les grilles
+sont gardées par processus et associées aux versions du catalogue et des
+promotions ; ces dernières ne sont relues en base qu'après une modification
+(numéro de version partagé via le cache Django, comme pour le catalogue).
+Chaque restaurant a ses promotions et ses grilles, bâties sur son
+catalogue.
+
+resoudre() tarifie un panier entier en un seul passage sur la grille, sans
+requête par ligne : prix unitaires, puis reconnaissance des menus parmi les
+quantités du panier, dont la remise est répartie sur les lignes concernées.
+"""
+import threading
+from collections import defaultdict
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.utils import timezone
+
+from users.restaurants import cle, incrementer_apres_validation, restaurant_courant_id, version
+from .catalogue import catalogue
+from .models import ElementMenu, Promotion
+
+CLE_VERSION = 'tarifs:version'
+CENTIME = Decimal('0.01')
+CENT = Decimal(100)
+# Grilles gardées par processus (minute courante et dates d'ouverture des
+# commandes en cours de tarification)
+GRILLES_MAX = 8
+
+_verrou = threading.Lock()
+# restaurant_id -> Regles
+_regles = {}
+_grilles = {}
+
+
+class ProduitIndisponible(Exception):
+    pass
+
+
+class Regle:
+    """
+    Promotion compilée : critères d'application évalués sans requête
+    """
+    __slots__ = (
+        'pk', 'nom', 'taux', 'produit_id', 'categorie_id', 'prix_menu', 'elements',
+        'jours', 'heure_debut', 'heure_fin', 'date_debut', 'date_fin',
+    )
+
+    def __init__(self, promotion, elements):
+        self.pk = promotion.pk
+        self.nom = promotion.nom
+        self.taux = promotion.taux_remise
+        self.produit_id = promotion.produit_id
+        self.categorie_id = promotion.categorie_id
+        self.prix_menu = promotion.prix_menu
+        self.elements = tuple(elements)
+        self.jours = frozenset(int(jour) for jour in promotion.jours)
+        self.heure_debut = promotion.heure_debut
+        self.heure_fin = promotion.heure_fin
+        self.date_debut = promotion.date_debut
+        self.date_fin = promotion.date_fin
+
+    def applicable(self, moment):
+        jour = moment.date()
+        if self.date_debut and jour < self.date_debut or self.date_fin and jour > self.date_fin:
+            return False
+        if moment.weekday() not in self.jours:
+            return False
+        if self.heure_debut is None or self.heure_fin is None:
+            return True
+        heure = moment.time()
+        if self.heure_debut <= self.heure_fin:
+            return self.heure_debut <= heure < self.heure_fin
+        # Plage passant minuit
+        return heure >= self.heure_debut or heure < self.heure_fin
+
+    def concerne(self, produit):
+        if self.produit_id:
+            return produit.pk == self.produit_id
+        if self.categorie_id:
+            return produit.categorie.pk == self.categorie_id
+        return True
+
+
+class Regles:
+    """
+    Promotions actives pour une version donnée
+    """
+    __slots__ = ('version', 'remises', 'menus')
+
+    def __init__(self, version, remises, menus):
+        self.version = version
+        self.remises = tuple(remises)
+        self.menus = tuple(menus)
+
+
+class Menu:
+    """
+    Menu applicable dans une grille : composants, prix et économie par
+    rapport aux prix unitaires de la grille
+    """
+    __slots__ = ('pk', 'nom', 'elements', 'prix', 'economie')
+
+    def __init__(self, pk, nom, elements, prix, economie):
+        self.pk = pk
+        self.nom = nom
+        self.elements = elements
+        self.prix = prix
+        self.economie = economie
+
+    def __str__(self):
+        return self.nom
+
+
+class Grille:
+    """
+    Prix unitaires et menus applicables pendant une minute
+    """
+    __slots__ = ('cle', 'prix', 'remises', 'menus')
+
+    def __init__(self, cle, prix, remises, menus):
+        self.cle = cle
+        self.prix = prix
+        self.remises = remises
+        self.menus = tuple(menus)
+
+    def prix_unitaire(self, produit_id):
+        try:
+            return self.prix[produit_id]
+        except KeyError:
+            raise ProduitIndisponible(f"Le produit {produit_id} n'est pas à la carte.") from None
+
+
+class LignePrix:
+    __slots__ = ('produit_id', 'quantite', 'prix_unitaire', 'remise', 'prix_total')
+
+    def __init__(self, produit_id, quantite, prix_unitaire, remise=Decimal('0.00')):
+        self.produit_id = produit_id
+        self.quantite = quantite
+        self.prix_unitaire = prix_unitaire
+        self.remise = remise
+        self.prix_total = quantite * prix_unitaire - remise
+
+
+class Tarification:
+    """
+    Panier tarifé : lignes, menus reconnus [(Menu, nombre)] et total
+    """
+    __slots__ = ('lignes', 'menus', 'total')
+
+    def __init__(self, lignes, menus):
+        self.lignes = lignes
+        self.menus = menus
+        self.total = sum((ligne.prix_total for ligne in lignes), Decimal('0.00'))
+
+
+def _lire_regles(version):
+    elements = defaultdict(list)
+    for promotion_id, produit_id, quantite in ElementMenu.objects.filter(
+        promotion__is_active=True,
+    ).values_list('promotion_id', 'produit_id', 'quantite'):
+        elements[promotion_id].append((produit_id, quantite))
+    remises, menus = [], []
+    for promotion in Promotion.objects.filter(is_active=True):
+        if promotion.type_promotion == 'MENU':
+            if promotion.prix_menu and elements[promotion.pk]:
+                menus.append(Regle(promotion, elements[promotion.pk]))
+        elif promotion.taux_remise:
+            remises.append(Regle(promotion, ()))
+    return Regles(version, remises, menus)
+
+
+def regles():
+    """
+    Promotions actives du restaurant courant compilées, relues si leur
+    version a changé
+    """
+    restaurant_id = restaurant_courant_id()
+    courante = version(cle(CLE_VERSION, restaurant_id))
+    instantane = _regles.get(restaurant_id)
+    if instantane is not None and instantane.version == courante:
+        return instantane
+    with _verrou:
+        instantane = _regles.get(restaurant_id)
+        if instantane is None or instantane.version != courante:
+            instantane = _lire_regles(courante)
+            _regles[restaurant_id] = instantane
+    return instantane
+
+
+def _construire(cle, carte, promotions, moment):
+    remises = [regle for regle in promotions.remises if regle.applicable(moment)]
+    prix, appliquees = {}, {}
+    for produit in carte.produits:
+        meilleure = max((regle for regle in remises if regle.concerne(produit)), key=lambda r: r.taux, default=None)
+        if meilleure is None:
+            prix[produit.pk] = produit.prix_vente
+        else:
+            prix[produit.pk] = (produit.prix_vente * (CENT - meilleure.taux) / CENT).quantize(CENTIME, ROUND_HALF_UP)
+            appliquees[produit.pk] = meilleure.nom
+
+    menus = []
+    for regle in promotions.menus:
+        if not regle.applicable(moment) or any(pk not in prix for pk, _ in regle.elements):
+            continue
+        valeur = sum(prix[pk] * quantite for pk, quantite in regle.elements)
+        if valeur > regle.prix_menu:
+            menus.append(Menu(regle.pk, regle.nom, regle.elements, regle.prix_menu, valeur - regle.prix_menu))
+    menus.sort(key=lambda menu: menu.economie, reverse=True)
+    return Grille(cle, prix, appliquees, menus)
+
+
+def grille(moment=None):
+    """
+    Grille de prix de la minute de `moment` (maintenant par défaut),
+    reconstruite si le catalogue ou les promotions ont changé
+    """
+    moment = timezone.localtime(moment).replace(second=0, microsecond=0)
+    carte = catalogue()
+    promotions = regles()
+    cle = (restaurant_courant_id(), carte.version, promotions.version, moment)
+    instantane = _grilles.get(cle)
+    if instantane is not None:
+        return instantane
+    with _verrou:
+        instantane = _grilles.get(cle)
+        if instantane is None:
+            instantane = _construire(cle, carte, promotions, moment)
+            while len(_grilles) >= GRILLES_MAX:
+                del _grilles[next(iter(_grilles))]
+            _grilles[cle] = instantane
+    return instantane
+
+
+def _reconnaitre_menus(quantites, prix, menus):
+    """
+    Applique gloutonnement les menus, du plus avantageux au moins
+    avantageux, aux quantités {produit_id: quantité} ; retourne les menus
+    reconnus [(Menu, nombre)] et la remise {produit_id: montant}
+    """
+    restantes = dict(quantites)
+    reconnus, remises = [], defaultdict(Decimal)
+    for menu in menus:
+        nombre = min(restantes.get(pk, 0) // quantite for pk, quantite in menu.elements)
+        if not nombre:
+            continue
+        # Les prix des lignes peuvent différer de ceux de la grille (lignes
+        # ajoutées à une autre minute)
+        valeur = sum(prix[pk] * quantite for pk, quantite in menu.elements)
+        economie = valeur - menu.prix
+        if economie <= 0:
+            continue
+        # Remise portée par chaque composant au prorata de sa valeur, le
+        # reliquat d'arrondi sur le dernier
+        reste = economie
+        for rang, (pk, quantite) in enumerate(menu.elements):
+            restantes[pk] -= nombre * quantite
+            if rang == len(menu.elements) - 1:
+                part = reste
+            else:
+                part = (economie * prix[pk] * quantite / valeur).quantize(CENTIME, ROUND_HALF_UP)
+                reste -= part
+            remises[pk] += part * nombre
+        reconnus.append((menu, nombre))
+    return reconnus, remises
+
+
+def repartir(lignes, menus):
+    """
+    Remises des menus pour des lignes déjà tarifées
+    [(produit_id, quantité, prix unitaire)] : Tarification dont les lignes
+    suivent l'ordre de `lignes`
+    """
+    quantites, prix = defaultdict(int), {}
+    for produit_id, quantite, prix_unitaire in lignes:
+        quantites[produit_id] += quantite
+        # Un produit présent sur plusieurs lignes garde le prix le plus bas
+        prix[produit_id] = min(prix.get(produit_id, prix_unitaire), prix_unitaire)
+    reconnus, remises = _reconnaitre_menus(quantites, prix, menus)
+
+    resultat = []
+    for produit_id, quantite, prix_unitaire in lignes:
+        # La remise d'un produit est imputée à ses lignes dans l'ordre, dans
+        # la limite de leur montant
+        remise = min(remises.get(produit_id, Decimal('0.00')), quantite * prix_unitaire)
+        if remise:
+            remises[produit_id] -= remise
+        resultat.append(LignePrix(produit_id, quantite, prix_unitaire, remise))
+    return Tarification(resultat, reconnus)
+
+
+def resoudre(panier, moment=None):
+    """
+    Tarifie un panier [(produit_id, quantité)] en un passage sur la grille
+    de la minute de `moment`. Lève ProduitIndisponible pour un produit
+    absent de la carte.
+    """
+    tarifs = grille(moment)
+    lignes = [(produit_id, quantite, tarifs.prix_unitaire(produit_id)) for produit_id, quantite in panier]
+    return repartir(lignes, tarifs.menus)
+
+
+def invalider_tarifs(restaurant_id=None):
+    """
+    Incrémente la version des promotions du restaurant (courant par défaut)
+    après validation de la transaction en cours
+    """
+    incrementer_apres_validation(cle(CLE_VERSION, restaurant_id))
@@ -0,0 +1,78 @@
+from django import template
+from django.db.models.fields.files import FieldFile
+from django.utils.html import format_html
+
+from produits_app.images import VARIANTES
+from produits_app.models import Produit
+
+register = template.Library()
+
+_stockage = Produit._meta.get_field('image').storage
+
+
+def _url_origine(produit):
+    """
+    URL de l'image d'origine pour un Produit ou un enregistrement du
+    cache du catalogue
+    """
+    url = getattr(produit, 'image_url', None)
+    if url is not None:
+        return url
+    image = getattr(produit, 'image', None)
+    if isinstance(image, FieldFile) and image:
+        return image.url
+    return ''
+
+
+def _variantes(produit):
+    return getattr(produit, 'variantes_image', None) or {}
+
+
+@register.simple_tag
+def variante_url(produit, variante='carte', format_image='jpeg'):
+    """
+    URL d'une variante de l'image du produit, ou de l'image d'origine si
+    les variantes ne sont pas encore générées
+    """
+    description = _variantes(produit).get(variante)
+    if description and description.get(format_image):
+        return _stockage.url(description[format_image])
+    return _url_origine(produit)
+
+
+@register.simple_tag
+def srcset(produit, format_image='webp'):
+    """
+    Valeur d'attribut srcset listant toutes les variantes d'un format
+    """
+    variantes = _variantes(produit)
+    return ', '.join(
+        f"{_stockage.url(description[format_image])} {description['largeur']}w"
+        for description in sorted(variantes.values(), key=lambda d: d['largeur'])
+        if description.get(format_image)
+    )
+
+
+@register.simple_tag
+def image_produit(produit, variante='carte', classes='img-fluid rounded', sizes=None, style=''):
+    """
+    Balise <picture> : sources WebP et JPEG responsives, image d'origine
+    en repli
+    """
+    if not _variantes(produit):
+        url = _url_origine(produit)
+        if not url:
+            return ''
+        return format_html(
+            '<img src="{}" alt="{}" class="{}" style="{}" loading="lazy">', url, produit.nom, classes, style
+        )
+    sizes = sizes or f'{VARIANTES[variante]}px'
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}" class="{}" style="{}" loading="lazy" decoding="async">'
+        '</picture>',
+        srcset(produit, 'webp'), sizes,
+        variante_url(produit, variante, 'jpeg'), srcset(produit, 'jpeg'), sizes,
+        produit.nom, classes, style,
+    )
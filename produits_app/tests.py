@@ -1,3 +1,278 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from decimal import Decimal
+from io import BytesIO
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+
+from restaurant_management.essais import CachesIsoles
+from restaurant_management.storage import est_adresse_par_contenu
+from taches_app.file import executer_en_attente
+from users.models import Restaurant
+from users.restaurants import activer, cle
+from . import catalogue, images, recettes
+from .models import Categorie, Composant, Produit
+from .templatetags import images_produits
+
+
+def image_png(couleur=(200, 80, 40), nom='plat.png'):
+    from PIL import Image
+
+    tampon = BytesIO()
+    Image.new('RGB', (1200, 800), couleur).save(tampon, 'PNG')
+    return SimpleUploadedFile(nom, tampon.getvalue(), content_type='image/png')
+
+
+class MediaTemporaire:
+    """
+    Mixin de TestCase : MEDIA_ROOT dans un dossier temporaire
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.racine = tempfile.mkdtemp()
+        reglages = override_settings(MEDIA_ROOT=self.racine)
+        reglages.enable()
+        self.addCleanup(reglages.disable)
+        self.addCleanup(shutil.rmtree, self.racine, ignore_errors=True)
+        self.stockage = Produit._meta.get_field('image').storage
+
+
+class ImagesTests(CachesIsoles, MediaTemporaire, TestCase):
+    """
+    Stockage par contenu : fichiers partagés et suppression des orphelins
+    """
+
+    def _produit(self, restaurant, nom):
+        with activer(restaurant), self.captureOnCommitCallbacks(execute=True):
+            categorie = Categorie.objects.create(nom='Plats')
+            return Produit.objects.create(
+                nom=nom, categorie=categorie, prix_vente=Decimal('3000'), image=image_png(nom=f'{nom}.png'),
+            )
+
+    def test_image_partagee_entre_restaurants(self):
+        plateau = Restaurant.objects.create(nom='Plateau', code='plateau')
+        almadies = Restaurant.objects.create(nom='Almadies', code='almadies')
+        premier = self._produit(plateau, 'Yassa')
+        second = self._produit(almadies, 'Mafé')
+        # Même contenu : un seul fichier
+        self.assertEqual(premier.image.name, second.image.name)
+        nom_image = premier.image.name
+
+        with activer(plateau), self.captureOnCommitCallbacks(execute=True):
+            premier.delete()
+        self.assertTrue(self.stockage.exists(nom_image))
+
+        with activer(almadies), self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(self.stockage.exists(nom_image))
+
+
+    def test_nom_par_contenu(self):
+        premier = self.stockage.save('produits/ChatGPT_Image_12_févr.PNG', image_png())
+        second = self.stockage.save('produits/autre.png', image_png())
+        self.assertEqual(premier, second)
+        self.assertRegex(premier, r'^produits/[0-9a-f]{20}\.png$')
+        self.assertTrue(est_adresse_par_contenu(premier))
+        self.assertEqual(len(self.stockage.listdir('produits')[1]), 1)
+        self.assertNotEqual(self.stockage.save('produits/plat.png', image_png(couleur=(0, 0, 0))), premier)
+
+    def test_image_remplacee_supprimee(self):
+        plateau = Restaurant.objects.create(nom='Plateau', code='plateau')
+        produit = self._produit(plateau, 'Yassa')
+        ancienne = produit.image.name
+        with activer(plateau), self.captureOnCommitCallbacks(execute=True):
+            produit.image = image_png(couleur=(20, 120, 60))
+            produit.save()
+        self.assertFalse(self.stockage.exists(ancienne))
+        self.assertTrue(self.stockage.exists(produit.image.name))
+
+
+class VariantesTests(CachesIsoles, MediaTemporaire, TestCase):
+    """
+    Variantes WebP/JPEG générées en tâche et balises des gabarits
+    """
+
+    def setUp(self):
+        super().setUp()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.produit = Produit.objects.create(
+                nom='Yassa', categorie=Categorie.objects.create(nom='Plats'), prix_vente=Decimal('3000'),
+                image=image_png(),
+            )
+
+    def test_variantes_generees_par_la_tache(self):
+        from PIL import Image
+
+        self.assertEqual(self.produit.variantes_image, {})
+        self.assertEqual(executer_en_attente(), 1)
+        self.produit.refresh_from_db()
+        variantes = self.produit.variantes_image
+        self.assertEqual({v: d['largeur'] for v, d in variantes.items()}, images.VARIANTES)
+        for variante, description in variantes.items():
+            for extension, format_pil in (('webp', 'WEBP'), ('jpeg', 'JPEG')):
+                nom = description[extension]
+                self.assertTrue(nom.startswith(images.DOSSIER_VARIANTES + '/'))
+                with self.stockage.open(nom, 'rb') as fichier, Image.open(fichier) as image:
+                    self.assertEqual((image.format, image.width), (format_pil, images.VARIANTES[variante]))
+
+        # Nouvelle image : nouvelle tâche, anciennes variantes effacées
+        anciennes = [description['webp'] for description in variantes.values()]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.produit.image = image_png(couleur=(20, 120, 60))
+            self.produit.save()
+        self.assertFalse(any(self.stockage.exists(nom) for nom in anciennes))
+        self.assertEqual(executer_en_attente(), 1)
+        self.produit.refresh_from_db()
+        self.assertNotEqual(self.produit.variantes_image['carte']['webp'], anciennes[1])
+
+    def test_balises(self):
+        # Variantes pas encore générées : image d'origine
+        rendu = images_produits.image_produit(self.produit)
+        self.assertIn(f'src="{self.produit.image.url}"', rendu)
+        self.assertNotIn('<picture>', rendu)
+
+        images.traiter_produit(self.produit.pk)
+        produit = catalogue.catalogue().produit(self.produit.pk)
+        carte = produit.variantes_image['carte']
+        self.assertEqual(images_produits.variante_url(produit), self.stockage.url(carte['jpeg']))
+        self.assertEqual(
+            images_produits.srcset(produit).split(', '),
+            [f"{self.stockage.url(produit.variantes_image[v]['webp'])} {largeur}w"
+             for v, largeur in images.VARIANTES.items()],
+        )
+        rendu = images_produits.image_produit(produit, 'miniature')
+        self.assertIn('<source type="image/webp"', rendu)
+        self.assertIn('sizes="150px"', rendu)
+        self.assertIn(f'src="{self.stockage.url(produit.variantes_image["miniature"]["jpeg"])}"', rendu)
+
+
+class RecettesTests(CachesIsoles, TestCase):
+    """
+    Nomenclatures : développement des recettes imbriquées et version partagée
+    """
+
+    def setUp(self):
+        super().setUp()
+        categorie = Categorie.objects.create(nom='Cuisine')
+        self.produits = {
+            nom: Produit.objects.create(nom=nom, categorie=categorie, prix_vente=Decimal('100'), stock_actuel=stock)
+            for nom, stock in (('Riz', 100), ('Poisson', 9), ('Sauce', 0), ('Oignon', 40), ('Thieb', 0))
+        }
+        self._composant('Sauce', 'Oignon', 2)
+        self._composant('Thieb', 'Riz', 3)
+        self._composant('Thieb', 'Poisson', 1)
+        self._composant('Thieb', 'Sauce', 2)
+
+    def _composant(self, produit, ingredient, quantite):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Composant.objects.create(
+                produit=self.produits[produit], ingredient=self.produits[ingredient], quantite=quantite,
+            )
+
+    def _pk(self, *noms):
+        return [self.produits[nom].pk for nom in noms]
+
+    def test_expansion_imbriquee(self):
+        riz, poisson, oignon, thieb = self._pk('Riz', 'Poisson', 'Oignon', 'Thieb')
+        self.assertEqual(recettes.expansion(thieb), {riz: 3, poisson: 1, oignon: 4})
+        # Produit sans recette : consommé lui-même
+        self.assertEqual(recettes.expansion(riz), {riz: 1})
+        self.assertEqual(recettes.consommation([(thieb, 2), (riz, 1)]), {riz: 7, poisson: 2, oignon: 8})
+        # Le poisson limite : 9 portions ; les oignons en permettraient 10
+        self.assertEqual(recettes.portions_disponibles([thieb]), {thieb: 9})
+
+    def test_recette_circulaire_refusee(self):
+        with self.assertRaises(ValidationError):
+            Composant(produit=self.produits['Oignon'], ingredient=self.produits['Thieb'], quantite=1).full_clean()
+
+    def test_modification_visible_des_autres_processus(self):
+        riz, oignon, thieb = self._pk('Riz', 'Oignon', 'Thieb')
+        self.assertEqual(recettes.expansion(thieb)[oignon], 4)
+        # Seule la version partagée est relue
+        with self.assertNumQueries(1):
+            recettes.expansion(thieb)
+
+        # Modification validée : nouvelle version, nomenclature relue
+        composant = Composant.objects.get(produit_id=thieb, ingredient_id=riz)
+        composant.quantite = 5
+        with self.captureOnCommitCallbacks(execute=True):
+            composant.save()
+        self.assertEqual(recettes.expansion(thieb)[riz], 5)
+
+        # Modification faite par un autre processus : seule la version partagée change
+        Composant.objects.filter(pk=composant.pk).update(quantite=6)
+        self.assertEqual(recettes.expansion(thieb)[riz], 5)
+        cache.incr(recettes.CLE_VERSION)
+        self.assertEqual(recettes.expansion(thieb)[riz], 6)
+
+
+class CatalogueTests(CachesIsoles, TestCase):
+    """
+    Instantané du catalogue : réutilisé, reconstruit après modification,
+    propre à chaque restaurant
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.plateau = Restaurant.objects.create(nom='Plateau', code='plateau')
+        self.almadies = Restaurant.objects.create(nom='Almadies', code='almadies')
+        with activer(self.plateau), self.captureOnCommitCallbacks(execute=True):
+            categorie = Categorie.objects.create(nom='Plats')
+            self.yassa = Produit.objects.create(
+                nom='Yassa', categorie=categorie, prix_vente=Decimal('3000'), stock_actuel=20,
+            )
+        with activer(self.almadies), self.captureOnCommitCallbacks(execute=True):
+            Produit.objects.create(
+                nom='Mafé', categorie=Categorie.objects.create(nom='Plats'), prix_vente=Decimal('2500'),
+            )
+
+    def test_instantane_reutilise(self):
+        with activer(self.plateau):
+            premier = catalogue.catalogue()
+            # Seule la version partagée est relue
+            with self.assertNumQueries(1):
+                self.assertIs(catalogue.catalogue(), premier)
+        self.assertEqual(premier.produit(self.yassa.pk).prix_vente, Decimal('3000'))
+
+    def test_reconstruit_apres_modification(self):
+        with activer(self.plateau):
+            premier = catalogue.catalogue()
+            produit = Produit.objects.get(pk=self.yassa.pk)
+
+            # Stock modifié sans changer de niveau : même version
+            with self.captureOnCommitCallbacks(execute=True):
+                produit.stock_actuel = 19
+                produit.save()
+            self.assertIs(catalogue.catalogue(), premier)
+
+            with self.captureOnCommitCallbacks(execute=True):
+                produit.prix_vente = Decimal('3500')
+                produit.save()
+            second = catalogue.catalogue()
+        self.assertIsNot(second, premier)
+        self.assertEqual(second.produit(self.yassa.pk).prix_vente, Decimal('3500'))
+
+        # Version modifiée par un autre processus
+        cache.incr(cle(catalogue.CLE_VERSION, self.plateau.pk))
+        with activer(self.plateau):
+            self.assertIsNot(catalogue.catalogue(), second)
+
+    def test_instantane_par_restaurant(self):
+        with activer(self.plateau):
+            plateau = catalogue.catalogue()
+        with activer(self.almadies):
+            almadies = catalogue.catalogue()
+        self.assertEqual([p.nom for p in plateau.produits], ['Yassa'])
+        self.assertEqual([p.nom for p in almadies.produits], ['Mafé'])
+
+        # Modifier un restaurant ne reconstruit pas l'autre
+        with activer(self.almadies), self.captureOnCommitCallbacks(execute=True):
+            Categorie.objects.create(nom='Boissons')
+        with activer(self.plateau), self.assertNumQueries(1):
+            self.assertIs(catalogue.catalogue(), plateau)
+        with activer(self.almadies):
+            self.assertIsNot(catalogue.catalogue(), almadies)
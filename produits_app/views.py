@@ -1,37 +1,40 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Q, F
 from django.core.paginator import Paginator
+from .catalogue import catalogue
 from .models import Categorie, Produit
 from .forms import CategorieForm, ProduitForm, ProduitSearchForm
+from users.permissions import admin_requis, manager_requis, staff_requis
 
 def home(request):
     """
     Page d'accueil des produits
     """
     form = ProduitSearchForm(request.GET or None)
-    produits = Produit.objects.filter(is_active=True)
+    produits = catalogue().produits
     
-    # Filtrage
+    # Filtrage sur l'instantané du catalogue (produits actifs)
     if form.is_valid():
-        if form.cleaned_data.get('query'):
-            produits = produits.filter(
-                Q(nom__icontains=form.cleaned_data['query']) |
-                Q(description__icontains=form.cleaned_data['query'])
-            )
+        query = form.cleaned_data.get('query')
+        if query:
+            query = query.lower()
+            produits = [
+                p for p in produits
+                if query in p.nom.lower() or query in (p.description or '').lower()
+            ]
         
         if form.cleaned_data.get('categorie'):
-            produits = produits.filter(categorie=form.cleaned_data['categorie'])
+            produits = [p for p in produits if p.categorie.pk == form.cleaned_data['categorie']]
         
         if form.cleaned_data.get('prix_min'):
-            produits = produits.filter(prix_vente__gte=form.cleaned_data['prix_min'])
+            produits = [p for p in produits if p.prix_vente >= form.cleaned_data['prix_min']]
         
         if form.cleaned_data.get('prix_max'):
-            produits = produits.filter(prix_vente__lte=form.cleaned_data['prix_max'])
+            produits = [p for p in produits if p.prix_vente <= form.cleaned_data['prix_max']]
         
         if form.cleaned_data.get('en_stock'):
-            produits = produits.filter(stock_actuel__gt=0)
+            produits = [p for p in produits if not p.en_rupture]
     
     # Pagination
     paginator = Paginator(produits, 12)
@@ -44,27 +47,19 @@ def home(request):
         'produits': page_obj,
     })
 
-@login_required
+@staff_requis
 def categorie_list(request):
     """
     Liste des catégories (réservé aux staff)
     """
-    if not request.user.is_staff_user:
-        messages.error(request, 'Accès non autorisé.')
-        return redirect('dashboard')
-    
     categories = Categorie.objects.all()
     return render(request, 'produits_app/categorie_list.html', {'categories': categories})
 
-@login_required
+@manager_requis
 def categorie_create(request):
     """
     Création d'une catégorie
     """
-    if not request.user.is_manager:
-        messages.error(request, 'Accès non autorisé.')
-        return redirect('dashboard')
-    
     if request.method == 'POST':
         form = CategorieForm(request.POST)
         if form.is_valid():
@@ -79,15 +74,11 @@ def categorie_create(request):
         'title': 'Ajouter une catégorie'
     })
 
-@login_required
+@manager_requis
 def categorie_update(request, pk):
     """
     Mise à jour d'une catégorie
     """
-    if not request.user.is_manager:
-        messages.error(request, 'Accès non autorisé.')
-        return redirect('dashboard')
-    
     categorie = get_object_or_404(Categorie, pk=pk)
     
     if request.method == 'POST':
@@ -105,15 +96,11 @@ def categorie_update(request, pk):
         'categorie': categorie
     })
 
-@login_required
+@admin_requis
 def categorie_delete(request, pk):
     """
     Suppression d'une catégorie
     """
-    if not request.user.is_admin:
-        messages.error(request, 'Accès non autorisé.')
-        return redirect('dashboard')
-    
     categorie = get_object_or_404(Categorie, pk=pk)
     
     if categorie.produits.exists():
@@ -127,15 +114,11 @@ def categorie_delete(request, pk):
     
     return render(request, 'produits_app/categorie_delete.html', {'categorie': categorie})
 
-@login_required
+@manager_requis
 def produit_list(request):
     """
     Liste des produits (réservé au staff)
     """
-    if not request.user.is_manager:
-        messages.error(request, 'Accès non autorisé.')
-        return redirect('dashboard')
-    
     produits = Produit.objects.all()
     return render(request, 'produits_app/produit_list.html', {'produits': produits})
 
@@ -147,15 +130,11 @@ def produit_detail(request, pk):
     produit = get_object_or_404(Produit, pk=pk)
     return render(request, 'produits_app/produit_detail.html', {'produit': produit})
 
-@login_required
+@manager_requis
 def produit_create(request):
     """
     Création d'un produit
     """
-    if not request.user.is_manager:
-        messages.error(request, 'Accès non autorisé.')
-        return redirect('dashboard')
-    
     if request.method == 'POST':
         form = ProduitForm(request.POST, request.FILES)
         if form.is_valid():
@@ -170,15 +149,11 @@ def produit_create(request):
         'title': 'Ajouter un produit'
     })
 
-@login_required
+@manager_requis
 def produit_update(request, pk):
     """
     Mise à jour d'un produit
     """
-    if not request.user.is_manager:
-        messages.error(request, 'Accès non autorisé.')
-        return redirect('dashboard')
-    
     produit = get_object_or_404(Produit, pk=pk)
     
     if request.method == 'POST':
@@ -196,15 +171,11 @@ def produit_update(request, pk):
         'produit': produit
     })
 
-@login_required
+@admin_requis
 def produit_delete(request, pk):
     """
     Suppression d'un produit
     """
-    if not request.user.is_admin:
-        messages.error(request, 'Accès non autorisé.')
-        return redirect('dashboard')
-    
     produit = get_object_or_404(Produit, pk=pk)
     
     if request.method == 'POST':
@@ -0,0 +1,177 @@
+"""
+Regroupement et précompression des fichiers statiques.
+
+Les bibliothèques copiées dans static/vendor sont concaténées en deux
+paquets, css/app.min.css et js/app.min.js, fournis par PaquetsFinder :
+le serveur de développement les sert comme n'importe quel fichier statique
+et collectstatic les copie dans STATIC_ROOT, où StockageStatique leur donne
+un nom haché et écrit leurs versions .gz et .br.
+"""
+import gzip
+import os
+import posixpath
+import re
+import tempfile
+import threading
+from pathlib import Path
+
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.finders import BaseFinder
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.storage import FileSystemStorage
+
+try:
+    import brotli
+except ImportError:  # Brotli optionnel : seules les versions .gz sont produites
+    brotli = None
+
+# Nom du paquet -> fichiers sources, dans l'ordre de chargement
+PAQUETS = {
+    'css/app.min.css': [
+        'vendor/adminlte/adminlte.min.css',
+        'vendor/fontawesome/css/all.min.css',
+        'css/compat.css',
+    ],
+    'js/app.min.js': [
+        'vendor/jquery/jquery.min.js',
+        'vendor/popper/popper.min.js',
+        'vendor/bootstrap/bootstrap.min.js',
+        'vendor/adminlte/adminlte.min.js',
+        'js/widgets.js',
+    ],
+}
+DOSSIER_PAQUETS = Path(tempfile.gettempdir()) / 'restaurant_management_paquets'
+
+EXTENSIONS_COMPRESSIBLES = {'.css', '.js', '.json', '.svg', '.txt', '.html', '.xml', '.map', '.ico'}
+TAILLE_MIN_COMPRESSION = 256
+
+MOTIF_URL = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+MOTIF_CHARSET = re.compile(r'@charset\s+"[^"]*";', re.IGNORECASE)
+MOTIF_COMMENTAIRE = re.compile(r'/\*(?!!).*?\*/', re.DOTALL)
+
+_verrou = threading.Lock()
+
+
+def _reecrire_urls(css, source, paquet):
+    """
+    Rend les url() relatives d'un fichier source relatives au paquet
+    """
+    dossier_source = posixpath.dirname(source)
+    dossier_paquet = posixpath.dirname(paquet) or '.'
+
+    def remplacer(correspondance):
+        url = correspondance.group(2).strip()
+        if url.startswith(('data:', 'http:', 'https:', '//', '/', '#')):
+            return correspondance.group(0)
+        chemin, suffixe = url, ''
+        coupure = re.search(r'[?#]', url)
+        if coupure:
+            chemin, suffixe = url[:coupure.start()], url[coupure.start():]
+        cible = posixpath.normpath(posixpath.join(dossier_source, chemin))
+        return 'url(%s%s)' % (posixpath.relpath(cible, dossier_paquet), suffixe)
+
+    return MOTIF_URL.sub(remplacer, css)
+
+
+def minifier_css(css):
+    """
+    Minification prudente : commentaires (hors licences /*! */) et espaces
+    """
+    css = MOTIF_COMMENTAIRE.sub('', css)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{};,])\s*', r'\1', css)
+    css = re.sub(r':\s+', ':', css)
+    return css.replace(';}', '}').strip()
+
+
+def contenu_paquet(nom, sources):
+    """
+    Contenu concaténé d'un paquet à partir des chemins de ses sources
+    {nom_source: chemin_absolu}
+    """
+    morceaux = []
+    for source, chemin in sources.items():
+        texte = Path(chemin).read_text(encoding='utf-8')
+        if nom.endswith('.css'):
+            if not source.endswith('.min.css'):
+                texte = minifier_css(texte)
+            texte = _reecrire_urls(MOTIF_CHARSET.sub('', texte), source, nom)
+            morceaux.append(texte.strip())
+        else:
+            # Le point-virgule protège d'un fichier terminé par une expression
+            morceaux.append(texte.strip().rstrip(';') + ';')
+    return '\n'.join(morceaux) + '\n'
+
+
+def construire_paquet(nom):
+    """
+    Construit un paquet s'il est absent ou plus ancien que ses sources et
+    retourne son chemin
+    """
+    sources = {}
+    for source in PAQUETS[nom]:
+        chemin = finders.find(source)
+        if not chemin:
+            raise ImproperlyConfigured(f"Fichier statique introuvable pour le paquet {nom} : {source}")
+        sources[source] = chemin
+
+    destination = DOSSIER_PAQUETS / nom
+    with _verrou:
+        if destination.exists():
+            date_paquet = destination.stat().st_mtime
+            if all(os.stat(chemin).st_mtime <= date_paquet for chemin in sources.values()):
+                return str(destination)
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        temporaire = destination.with_name(destination.name + '.tmp')
+        temporaire.write_text(contenu_paquet(nom, sources), encoding='utf-8')
+        os.replace(temporaire, destination)
+    return str(destination)
+
+
+def compresser(chemin):
+    """
+    Écrit les versions .gz (et .br si Brotli est installé) d'un fichier
+    lorsqu'elles sont plus légères que l'original
+    """
+    if os.path.splitext(chemin)[1].lower() not in EXTENSIONS_COMPRESSIBLES:
+        return []
+    with open(chemin, 'rb') as fichier:
+        contenu = fichier.read()
+    if len(contenu) < TAILLE_MIN_COMPRESSION:
+        return []
+
+    versions = [('.gz', gzip.compress(contenu, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        versions.append(('.br', brotli.compress(contenu, quality=11)))
+
+    ecrits = []
+    for extension, compresse in versions:
+        if len(compresse) < len(contenu):
+            with open(chemin + extension, 'wb') as fichier:
+                fichier.write(compresse)
+            ecrits.append(chemin + extension)
+    return ecrits
+
+
+class PaquetsFinder(BaseFinder):
+    """
+    Finder exposant les paquets de PAQUETS, construits à la demande
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stockage = FileSystemStorage(location=DOSSIER_PAQUETS)
+
+    def check(self, **kwargs):
+        return []
+
+    def find(self, path, all=False):
+        if path not in PAQUETS:
+            return [] if all else None
+        chemin = construire_paquet(path)
+        return [chemin] if all else chemin
+
+    def list(self, ignore_patterns):
+        for nom in PAQUETS:
+            construire_paquet(nom)
+            yield nom, self.stockage
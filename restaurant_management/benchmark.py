@@ -0,0 +1,266 @@
+"""
+Banc d'essai HTTP des parcours du restaurant.
+
+Chaque utilisateur virtuel se connecte puis répète le parcours de service :
+création d'une commande, ajout de lignes, passage des statuts jusqu'à
+SERVIE, mouvement de stock, consultation des tableaux de bord et export
+CSV du chiffre d'affaires. Le même parcours s'exécute avec le client de
+test de Django (tests) ou avec ClientWSGI, qui appelle l'application WSGI
+complète (middlewares, CSRF, sessions) depuis plusieurs threads.
+
+Les durées sont regroupées par étape ; le débit d'une étape est son nombre
+de requêtes rapporté à la durée totale de la phase de charge.
+
+    python manage.py benchmark_http --tailles 1000 10000 100000 --threads 8
+"""
+import math
+import random
+import threading
+import time
+from http.cookies import SimpleCookie
+from io import BytesIO
+from urllib.parse import urlencode, urlsplit
+
+from django.db import connection
+from django.urls import resolve, reverse
+
+ETAPES_STATUT = ('EN_PREPARATION', 'PRETE', 'SERVIE')
+TABLEAUX_DE_BORD = ('users:dashboard', 'commandes_app:dashboard', 'stock_app:dashboard', 'stats_app:dashboard')
+CENTILES = (50, 95, 99)
+
+
+class ErreurParcours(Exception):
+    """
+    Réponse inattendue : la suite du parcours en dépend
+    """
+
+
+class Reponse:
+    __slots__ = ('status_code', 'headers', 'content')
+
+    def __init__(self, status_code, headers, content):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    def __getitem__(self, entete):
+        return self.headers[entete.lower()]
+
+
+class ClientWSGI:
+    """
+    Client minimal qui appelle directement une application WSGI : cookies
+    de session et jeton CSRF gérés comme par un navigateur. Une instance
+    par thread.
+    """
+
+    def __init__(self, application, adresse='127.0.0.1', hote='localhost'):
+        self.application = application
+        self.adresse = adresse
+        self.hote = hote
+        self.cookies = {}
+
+    def get(self, chemin, data=None):
+        return self._requete('GET', chemin, urlencode(data or {}, doseq=True), b'')
+
+    def post(self, chemin, data=None):
+        donnees = dict(data or {})
+        if 'csrftoken' in self.cookies:
+            donnees.setdefault('csrfmiddlewaretoken', self.cookies['csrftoken'])
+        return self._requete('POST', chemin, '', urlencode(donnees, doseq=True).encode())
+
+    def _requete(self, methode, chemin, requete, corps):
+        environ = {
+            'REQUEST_METHOD': methode,
+            'PATH_INFO': chemin,
+            'QUERY_STRING': requete,
+            'SERVER_NAME': self.hote,
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'HTTP_HOST': self.hote,
+            'REMOTE_ADDR': self.adresse,
+            'CONTENT_TYPE': 'application/x-www-form-urlencoded',
+            'CONTENT_LENGTH': str(len(corps)),
+            'wsgi.input': BytesIO(corps),
+            'wsgi.errors': BytesIO(),
+            'wsgi.url_scheme': 'http',
+            'wsgi.version': (1, 0),
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        if self.cookies:
+            environ['HTTP_COOKIE'] = '; '.join(f'{nom}={valeur}' for nom, valeur in self.cookies.items())
+
+        reponse = {}
+
+        def start_response(statut, entetes, exc_info=None):
+            reponse['statut'] = int(statut.split(' ', 1)[0])
+            reponse['entetes'] = entetes
+
+        resultat = self.application(environ, start_response)
+        try:
+            contenu = b''.join(resultat)
+        finally:
+            if hasattr(resultat, 'close'):
+                resultat.close()
+
+        entetes = {}
+        for nom, valeur in reponse['entetes']:
+            if nom.lower() == 'set-cookie':
+                for morceau in SimpleCookie(valeur).values():
+                    if morceau['max-age'] == '0':
+                        self.cookies.pop(morceau.key, None)
+                    else:
+                        self.cookies[morceau.key] = morceau.value
+            entetes[nom.lower()] = valeur
+        return Reponse(reponse['statut'], entetes, contenu)
+
+
+class Mesures:
+    """
+    Durées (en secondes) et erreurs par étape, partagées entre threads
+    """
+
+    def __init__(self):
+        self.durees = {}
+        self.erreurs = {}
+        self._verrou = threading.Lock()
+
+    def enregistrer(self, etape, duree, erreur=False):
+        with self._verrou:
+            self.durees.setdefault(etape, []).append(duree)
+            if erreur:
+                self.erreurs[etape] = self.erreurs.get(etape, 0) + 1
+
+    def resume(self, duree_totale):
+        """
+        {étape: indicateurs} et l'ensemble des étapes sous la clé 'total'
+        """
+        resume = {etape: self._indicateurs(durees, self.erreurs.get(etape, 0), duree_totale)
+                  for etape, durees in self.durees.items()}
+        toutes = [duree for durees in self.durees.values() for duree in durees]
+        resume['total'] = self._indicateurs(toutes, sum(self.erreurs.values()), duree_totale)
+        return resume
+
+    @staticmethod
+    def _indicateurs(durees, erreurs, duree_totale):
+        triees = sorted(durees)
+        indicateurs = {
+            'requetes': len(triees),
+            'erreurs': erreurs,
+            'debit': round(len(triees) / duree_totale, 1) if duree_totale else None,
+        }
+        for centile in CENTILES:
+            indicateurs[f'p{centile}_ms'] = round(centile_rang(triees, centile) * 1000, 2) if triees else None
+        indicateurs['max_ms'] = round(triees[-1] * 1000, 2) if triees else None
+        return indicateurs
+
+
+def centile_rang(triees, centile):
+    """
+    Centile par la méthode du rang le plus proche sur une liste triée
+    """
+    return triees[max(math.ceil(centile / 100 * len(triees)) - 1, 0)]
+
+
+class Parcours:
+    """
+    Parcours d'un utilisateur virtuel ; `client` offre get(chemin, data)
+    et post(chemin, data) comme le client de test de Django
+    """
+
+    def __init__(self, client, mesures, produits, graine=0):
+        self.client = client
+        self.mesures = mesures
+        self.produits = produits
+        self.rng = random.Random(graine)
+
+    def _requete(self, etape, methode, chemin, data=None, attendus=(200,)):
+        debut = time.perf_counter()
+        reponse = getattr(self.client, methode)(chemin, data)
+        duree = time.perf_counter() - debut
+        erreur = reponse.status_code not in attendus
+        self.mesures.enregistrer(etape, duree, erreur)
+        if erreur:
+            raise ErreurParcours(f'{etape} : {methode.upper()} {chemin} a répondu {reponse.status_code}')
+        return reponse
+
+    def connexion(self, nom, mot_de_passe):
+        chemin = reverse('users:login')
+        self._requete('page_connexion', 'get', chemin)
+        self._requete('connexion', 'post', chemin, {'username': nom, 'password': mot_de_passe}, attendus=(302,))
+
+    def service(self):
+        """
+        Une commande de sa création à son service
+        """
+        reponse = self._requete('creer_commande', 'post', reverse('commandes_app:commande_create'), {
+            'nom_client': f'Client {self.rng.randrange(10_000)}',
+            'type_commande': self.rng.choice(['SUR_PLACE', 'EMPORTER', 'LIVRAISON']),
+            'notes': '',
+        }, attendus=(302,))
+        commande_pk = resolve(urlsplit(reponse['Location']).path).kwargs['pk']
+
+        for produit_pk in self.rng.sample(self.produits, min(2, len(self.produits))):
+            self._requete('ajouter_ligne', 'post', reverse('commandes_app:ajouter_ligne_commande', args=[commande_pk]),
+                          {'produit': produit_pk, 'quantite': 1}, attendus=(302,))
+        for statut in ETAPES_STATUT:
+            self._requete('changer_statut', 'post', reverse('commandes_app:commande_update_statut', args=[commande_pk]),
+                          {'statut': statut}, attendus=(302,))
+        self._requete('mouvement_stock', 'post', reverse('stock_app:mouvement_create'), {
+            'produit': self.rng.choice(self.produits), 'type_mouvement': 'ENTREE', 'quantite': 2,
+            'motif': 'Réception',
+        }, attendus=(302,))
+
+    def consultation(self):
+        for nom in TABLEAUX_DE_BORD:
+            self._requete(f'tableau_de_bord:{nom.split(":")[0]}', 'get', reverse(nom))
+        self._requete('export_csv', 'get', reverse('stats_app:export_ca'), {'periode': 'mois'}, attendus=(302,))
+
+    def executer(self, nom, mot_de_passe, iterations):
+        """
+        Connexion puis `iterations` parcours ; une étape en échec abandonne
+        l'itération en cours. Retourne le nombre d'itérations abandonnées.
+        """
+        try:
+            self.connexion(nom, mot_de_passe)
+        except ErreurParcours:
+            return iterations
+        echecs = 0
+        for _ in range(iterations):
+            try:
+                self.service()
+                self.consultation()
+            except ErreurParcours:
+                echecs += 1
+        return echecs
+
+
+def charger(application, comptes, produits, iterations, prefixe_adresse='10.0'):
+    """
+    Lance un thread par compte (nom, mot de passe) sur l'application WSGI.
+    Retourne (Mesures, durée totale, itérations abandonnées).
+    """
+    mesures = Mesures()
+    echecs = []
+
+    def utilisateur_virtuel(numero, nom, mot_de_passe):
+        try:
+            # Adresse distincte par utilisateur : RateLimitMiddleware limite
+            # les connexions par adresse
+            client = ClientWSGI(application, adresse=f'{prefixe_adresse}.{numero // 250}.{numero % 250 + 1}')
+            echecs.append(Parcours(client, mesures, produits, graine=numero).executer(nom, mot_de_passe, iterations))
+        finally:
+            connection.close()
+
+    threads = [
+        threading.Thread(target=utilisateur_virtuel, args=(numero, nom, mot_de_passe), name=f'bench-{numero}')
+        for numero, (nom, mot_de_passe) in enumerate(comptes)
+    ]
+    debut = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return mesures, time.perf_counter() - debut, sum(echecs)
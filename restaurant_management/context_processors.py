@@ -0,0 +1,16 @@
+"""
+Processeurs de contexte communs aux gabarits.
+"""
+
+
+def navigation(request):
+    """
+    Section active du menu latéral : 'dashboard', 'users' ou l'espace de
+    noms de l'application (produits_app, commandes_app...)
+    """
+    correspondance = getattr(request, 'resolver_match', None)
+    if correspondance is None:
+        return {'section_active': ''}
+    if correspondance.namespace == 'users' and correspondance.url_name == 'dashboard':
+        return {'section_active': 'dashboard'}
+    return {'section_active': correspondance.namespace}
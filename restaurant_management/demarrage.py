@@ -0,0 +1,132 @@
+"""
+Mesure du temps de démarrage à partir de « python -X importtime ».
+
+Le démarrage mesuré est celui d'un worker : django.setup() (réglages,
+modèles, ready() des applications, ce que paie aussi chaque commande
+manage.py) puis le chargement de ROOT_URLCONF, qui importe toutes les vues.
+Seul le temps cumulé des modules du projet est compté (avec ce qu'ils
+importent), Django lui-même étant incompressible. Les modules du projet
+sont compilés avant la mesure : un worker déployé démarre sur un bytecode
+à jour, et le temps de compilation, qui croît avec la taille des sources,
+ne doit pas entrer dans le budget.
+
+    python -m restaurant_management.demarrage [--budget-ms 60]
+"""
+import argparse
+import compileall
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# Budget du temps d'import cumulé des modules du projet (bytecode à jour),
+# avec une marge pour les machines chargées
+BUDGET_MS = 60
+# Bibliothèques lourdes qui ne doivent être importées qu'à l'usage
+MODULES_DIFFERES = ('numpy', 'PIL')
+
+SCRIPT = (
+    "import os, sys;"
+    "os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'restaurant_management.settings');"
+    "import django; django.setup();"
+    "from django.conf import settings; __import__(settings.ROOT_URLCONF);"
+    "print(','.join(sorted(m for m in sys.modules if '.' not in m)))"
+)
+MOTIF_LIGNE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+class Mesure:
+    __slots__ = ('total_us', 'modules', 'charges')
+
+    def __init__(self, total_us, modules, charges):
+        self.total_us = total_us
+        # (temps cumulé en µs, module) des modules racines du projet
+        self.modules = modules
+        # Modules de premier niveau présents dans sys.modules à la fin
+        self.charges = charges
+
+    @property
+    def total_ms(self):
+        return self.total_us / 1000
+
+
+def paquets_projet():
+    return {
+        chemin.name for chemin in BASE_DIR.iterdir()
+        if (chemin / '__init__.py').exists()
+    }
+
+
+def analyser(sortie, paquets):
+    """
+    Additionne le temps cumulé des modules du projet qui ne sont pas
+    eux-mêmes importés par un autre module du projet
+    """
+    lignes = []
+    for ligne in sortie.splitlines():
+        correspondance = MOTIF_LIGNE.match(ligne)
+        if correspondance:
+            cumul, indentation, module = correspondance.group(2, 3, 4)
+            lignes.append((len(indentation), int(cumul), module))
+
+    # importtime affiche les enfants avant leur parent : en sens inverse,
+    # chaque module suit ses ancêtres
+    pile = []
+    modules = []
+    for profondeur, cumul, module in reversed(lignes):
+        while pile and pile[-1][0] >= profondeur:
+            pile.pop()
+        projet = module.split('.')[0] in paquets
+        if projet and not any(ancetre_projet for _, ancetre_projet in pile):
+            modules.append((cumul, module))
+        pile.append((profondeur, projet))
+    modules.sort(reverse=True)
+    return sum(cumul for cumul, _ in modules), modules
+
+
+def compiler(paquets):
+    """
+    Met à jour le bytecode des paquets du projet
+    """
+    for paquet in paquets:
+        compileall.compile_dir(BASE_DIR / paquet, quiet=2)
+
+
+def mesurer():
+    """
+    Lance un interpréteur neuf et mesure le démarrage du projet, bytecode à jour
+    """
+    paquets = paquets_projet()
+    compiler(paquets)
+    resultat = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', SCRIPT],
+        cwd=BASE_DIR, capture_output=True, text=True, check=True,
+    )
+    total_us, modules = analyser(resultat.stderr, paquets)
+    charges = set(resultat.stdout.strip().split(','))
+    return Mesure(total_us, modules, charges)
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description='Temps de démarrage du projet')
+    parser.add_argument('--budget-ms', type=float, default=BUDGET_MS)
+    parser.add_argument('--modules', type=int, default=15, help='Nombre de modules affichés')
+    options = parser.parse_args(arguments)
+
+    mesure = mesurer()
+    for cumul, module in mesure.modules[:options.modules]:
+        print(f'{cumul / 1000:8.1f} ms  {module}')
+    print(f'Total projet : {mesure.total_ms:.1f} ms (budget {options.budget_ms:.0f} ms)')
+
+    erreurs = [f'{module} importé au démarrage' for module in MODULES_DIFFERES if module in mesure.charges]
+    if mesure.total_ms > options.budget_ms:
+        erreurs.append('budget dépassé')
+    for erreur in erreurs:
+        print(f'ERREUR : {erreur}', file=sys.stderr)
+    return 1 if erreurs else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,42 @@
+"""
+Outils partagés des tests.
+
+Les instantanés gardés en mémoire par processus (catalogue, tarifs,
+recettes, salle, restaurants, utilisateurs) suivent un numéro de version
+tenu dans le cache Django et incrémenté après validation de la
+transaction. Dans un TestCase, rien n'est jamais validé : un instantané
+construit par un test, et la version qui l'accompagne, survivraient aux
+tests suivants, qui liraient alors un catalogue périmé. CachesIsoles fait
+partir chaque test d'un cache et d'instantanés vides.
+"""
+from django.core.cache import cache
+
+
+def vider_caches():
+    """
+    Vide le cache Django et les instantanés en mémoire du processus
+    """
+    from commandes_app import tables
+    from produits_app import catalogue, recettes, tarifs
+    from users import backends, restaurants
+
+    cache.clear()
+    catalogue._instantanes.clear()
+    tarifs._regles.clear()
+    tarifs._grilles.clear()
+    recettes._nomenclature = None
+    tables._salles.clear()
+    backends._utilisateurs.clear()
+    restaurants._annuaire = None
+
+
+class CachesIsoles:
+    """
+    Mixin de TestCase : caches vidés avant et après chaque test (les
+    setUp des classes de test appellent super().setUp())
+    """
+
+    def setUp(self):
+        vider_caches()
+        self.addCleanup(vider_caches)
+        super().setUp()
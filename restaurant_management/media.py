@@ -0,0 +1,106 @@
+"""
+Service des fichiers media avec en-têtes de cache.
+
+Les fichiers nommés d'après leur contenu (voir storage.py) sont servis
+avec un cache permanent « immutable » ; tous les fichiers portent un ETag,
+répondent 304 aux requêtes conditionnelles et acceptent les requêtes
+partielles (Range) sur une seule plage.
+"""
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+from .storage import est_adresse_par_contenu
+
+CACHE_PERMANENT = 'public, max-age=31536000, immutable'
+CACHE_COURT = 'public, max-age=3600'
+MOTIF_PLAGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _etag(chemin, stat):
+    nom = os.path.basename(chemin)
+    if est_adresse_par_contenu(nom):
+        return '"%s"' % os.path.splitext(nom)[0]
+    return '"%x-%x"' % (int(stat.st_mtime), stat.st_size)
+
+
+def _plage(entete, taille):
+    """
+    (debut, fin) inclusifs d'une plage simple, None si absente ou
+    invalide, False si non satisfaisable
+    """
+    correspondance = MOTIF_PLAGE.match(entete.strip())
+    if not correspondance:
+        return None
+    debut, fin = correspondance.groups()
+    if not debut and not fin:
+        return None
+    if not debut:
+        # Suffixe : les N derniers octets
+        longueur = int(fin)
+        if longueur == 0:
+            return False
+        return max(0, taille - longueur), taille - 1
+    debut = int(debut)
+    fin = min(int(fin), taille - 1) if fin else taille - 1
+    if debut >= taille or debut > fin:
+        return False
+    return debut, fin
+
+
+@require_safe
+def servir_media(request, chemin):
+    """
+    Sert un fichier de MEDIA_ROOT
+    """
+    try:
+        chemin_complet = safe_join(settings.MEDIA_ROOT, chemin)
+    except (SuspiciousFileOperation, ValueError):
+        raise Http404('Fichier introuvable')
+    if not os.path.isfile(chemin_complet):
+        raise Http404('Fichier introuvable')
+
+    stat = os.stat(chemin_complet)
+    etag = _etag(chemin_complet, stat)
+    cache_control = CACHE_PERMANENT if est_adresse_par_contenu(chemin_complet) else CACHE_COURT
+
+    def entetes(reponse):
+        reponse['ETag'] = etag
+        reponse['Last-Modified'] = http_date(stat.st_mtime)
+        reponse['Cache-Control'] = cache_control
+        reponse['Accept-Ranges'] = 'bytes'
+        return reponse
+
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match and (if_none_match.strip() == '*' or etag in [e.strip() for e in if_none_match.split(',')]):
+        return entetes(HttpResponseNotModified())
+
+    type_contenu = mimetypes.guess_type(chemin_complet)[0] or 'application/octet-stream'
+    taille = stat.st_size
+
+    entete_plage = request.headers.get('Range')
+    if_range = request.headers.get('If-Range')
+    if entete_plage and (not if_range or if_range.strip() == etag):
+        plage = _plage(entete_plage, taille)
+        if plage is False:
+            reponse = HttpResponse(status=416)
+            reponse['Content-Range'] = f'bytes */{taille}'
+            return entetes(reponse)
+        if plage is not None:
+            debut, fin = plage
+            with open(chemin_complet, 'rb') as fichier:
+                fichier.seek(debut)
+                contenu = fichier.read(fin - debut + 1)
+            reponse = HttpResponse(contenu, status=206, content_type=type_contenu)
+            reponse['Content-Range'] = f'bytes {debut}-{fin}/{taille}'
+            return entetes(reponse)
+
+    reponse = FileResponse(open(chemin_complet, 'rb'), content_type=type_contenu)
+    return entetes(reponse)
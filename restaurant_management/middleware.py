@@ -50,16 +50,54 @@ class TimingMiddleware:
         return response
 
 
-from django.shortcuts import redirect
+from django.conf import settings
+from django.contrib.auth.views import redirect_to_login
+
+from users.permissions import PUBLIC, PolitiquesAcces, a_le_role, memoriser_role, refuser, role_en_session
 
 
 class AuthAccessMiddleware:
-    """Middleware pour bloquer les accès non autorisés"""
+    """Middleware pour bloquer les accès non autorisés (table POLITIQUES_ACCES)"""
     def __init__(self, get_response):
         self.get_response = get_response
+        # Compilée une seule fois au démarrage
+        self.politiques = PolitiquesAcces(getattr(settings, 'POLITIQUES_ACCES', {}))
 
     def __call__(self, request):
-        if request.path.startswith('/dashboard') or request.path.startswith('/users/dashboard'):
+        role_minimum = self.politiques.politique(request.path_info)
+        if role_minimum == PUBLIC:
+            return self.get_response(request)
+
+        role = role_en_session(request)
+        if role is None or not a_le_role(role, role_minimum):
+            # Session sans rôle ou rôle insuffisant : vérification sur l'utilisateur
             if not request.user.is_authenticated:
-                return redirect('/login')
+                return redirect_to_login(request.get_full_path())
+            memoriser_role(request, request.user)
+            if not a_le_role(request.user.role, role_minimum):
+                return refuser(request)
         return self.get_response(request)
+
+
+from django.http import HttpResponseForbidden
+
+from users.restaurants import activer, resoudre
+
+
+class RestaurantMiddleware:
+    """Restaurant servi par la requête, courant le temps de la vue (users/restaurants.py)"""
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        restaurant = resoudre(request)
+        request.restaurant = restaurant
+        if restaurant is None:
+            return self.get_response(request)
+        # Le personnel d'un restaurant n'accède pas aux autres ; les clients,
+        # communs au réseau, sont toujours servis par un seul restaurant
+        user = request.user
+        if user.is_authenticated and user.restaurant_id not in (None, restaurant.pk) and user.role != 'CLIENT':
+            return HttpResponseForbidden("Ce compte n'est pas rattaché à ce restaurant.")
+        with activer(restaurant):
+            return self.get_response(request)
@@ -41,6 +41,7 @@ INSTALLED_APPS = [
     'stock_app',
     'commandes_app',
     'stats_app',
+    'taches_app',
     # Third party
     'crispy_forms',
     'crispy_bootstrap5',
@@ -52,6 +53,8 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # Restaurant courant (multi-établissement), après l'authentification
+    'restaurant_management.middleware.RestaurantMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     # Middlewares personnalisés
@@ -62,20 +65,51 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'restaurant_management.urls'
 
+# Code du restaurant servant les clients et visiteurs hors de tout nom de
+# domaine connu (users/restaurants.py) ; à défaut, le premier restaurant créé
+RESTAURANT_PAR_DEFAUT = None
+
 LOGIN_URL = 'users:login'
 LOGOUT_REDIRECT_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'users:dashboard'
 
+# Contrôle d'accès : préfixe de chemin -> rôle minimum (PUBLIC, CLIENT pour
+# tout utilisateur connecté, STAFF, MANAGER, ADMIN). Le plus long préfixe
+# s'applique ; les vues précisent leurs exigences avec users.permissions.
+POLITIQUES_ACCES = {
+    '/': 'PUBLIC',
+    '/dashboard/': 'CLIENT',
+    '/list/': 'MANAGER',
+    '/restaurant/': 'ADMIN',
+    '/produits/categories/': 'STAFF',
+    '/produits/produits/': 'CLIENT',
+    '/commandes/': 'CLIENT',
+    '/commandes/clients/': 'STAFF',
+    '/commandes/livraisons/': 'STAFF',
+    '/commandes/api/': 'STAFF',
+    '/stock/': 'STAFF',
+    '/statistiques/': 'MANAGER',
+    '/statistiques/api/': 'STAFF',
+    '/taches/': 'STAFF',
+}
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'restaurant_management.context_processors.navigation',
+            ],
+            # Gabarits compilés une seule fois par processus
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
             ],
         },
     },
@@ -92,9 +126,44 @@ DATABASES = {
     }
 }
 
+# Cache commun à tous les processus (workers gunicorn, run_worker, commandes
+# de gestion) : il porte les numéros de version des instantanés gardés en
+# mémoire (users/restaurants.py), qu'un cache local au processus ne ferait
+# jamais parvenir aux autres. La table se crée avec createcachetable ;
+# Memcached ou Redis conviennent aussi.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'cache_partage',
+        'TIMEOUT': 300,
+    }
+}
+
 # Custom User Model
 AUTH_USER_MODEL = 'users.User'
 
+# Utilisateurs authentifiés gardés en mémoire par processus (users/backends.py)
+AUTHENTICATION_BACKENDS = [
+    'users.backends.UtilisateurEnCacheBackend',
+]
+
+# Sessions lues depuis le cache, écrites en base : une requête authentifiée
+# ne lit plus django_session. Le nettoyage des sessions expirées se fait
+# par lots avec la commande nettoyer_sessions.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# Hachage des mots de passe : coût PBKDF2 calibré sur l'hôte avec
+# « manage.py calibrer_hachage » ; les hachages existants sont mis à jour
+# à la connexion
+PBKDF2_ITERATIONS = config('PBKDF2_ITERATIONS', default=600000, cast=int)
+PASSWORD_HASHERS = [
+    'users.hashers.PBKDF2Configurable',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 AUTH_PASSWORD_VALIDATORS = [
@@ -129,11 +198,31 @@ STATICFILES_DIRS = [
     BASE_DIR / 'static'
 ]
 STATIC_ROOT = BASE_DIR / 'staticfiles'
+STATICFILES_FINDERS = [
+    'django.contrib.staticfiles.finders.FileSystemFinder',
+    'django.contrib.staticfiles.finders.AppDirectoriesFinder',
+    # Paquets css/app.min.css et js/app.min.js (voir restaurant_management/assets.py)
+    'restaurant_management.assets.PaquetsFinder',
+]
 
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Stockage : media adressés par contenu (déduplication, cache permanent)
+STORAGES = {
+    'default': {
+        'BACKEND': 'restaurant_management.storage.StockageParContenu',
+    },
+    # Noms hachés et versions .gz/.br, produits par collectstatic
+    'staticfiles': {
+        'BACKEND': (
+            'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+            else 'restaurant_management.storage.StockageStatique'
+        ),
+    },
+}
+
 # Crispy Forms
 CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
 CRISPY_TEMPLATE_PACK = "bootstrap5"
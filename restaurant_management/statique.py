@@ -0,0 +1,119 @@
+"""
+Serveur WSGI des fichiers statiques collectés.
+
+Placé devant l'application Django (voir wsgi.py), il sert STATIC_ROOT sans
+passer par Django : versions précompressées .br/.gz selon Accept-Encoding,
+cache permanent pour les noms hachés par StockageStatique, ETag et 304.
+Les chemins inconnus sont transmis à l'application.
+"""
+import mimetypes
+import os
+import re
+from wsgiref.util import FileWrapper
+
+from django.conf import settings
+from django.utils.http import http_date
+
+from .media import CACHE_COURT, CACHE_PERMANENT
+
+# Nom haché par ManifestStaticFilesStorage : app.min.3f2a9c1b7d0e.css
+MOTIF_HACHE = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+# Encodage HTTP -> extension du fichier précompressé, par ordre de préférence
+ENCODAGES = (('br', '.br'), ('gzip', '.gz'))
+TAILLE_BLOC = 64 * 1024
+
+
+class FichierStatique:
+    __slots__ = ('type_contenu', 'cache_control', 'derniere_modification', 'versions')
+
+    def __init__(self, type_contenu, cache_control, derniere_modification, versions):
+        self.type_contenu = type_contenu
+        self.cache_control = cache_control
+        self.derniere_modification = derniere_modification
+        # Encodage (None pour l'original) -> (chemin, taille, etag)
+        self.versions = versions
+
+
+def _encodages_acceptes(entete):
+    acceptes = set()
+    for element in entete.split(','):
+        encodage, _, parametres = element.strip().partition(';')
+        qualite = parametres.strip().replace(' ', '')
+        if qualite in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        acceptes.add(encodage.strip().lower())
+    return acceptes
+
+
+class ServeurStatique:
+    """
+    Application WSGI servant STATIC_ROOT devant une autre application
+    """
+
+    def __init__(self, application, racine=None, prefixe=None):
+        self.application = application
+        self.racine = os.path.abspath(racine or settings.STATIC_ROOT)
+        self.prefixe = '/' + (prefixe or settings.STATIC_URL).strip('/') + '/'
+        # Les fichiers collectés ne changent pas pendant la vie du processus
+        self._fichiers = {}
+
+    def _fichier(self, nom):
+        fichier = self._fichiers.get(nom)
+        if fichier is not None:
+            return fichier
+
+        chemin = os.path.abspath(os.path.join(self.racine, nom))
+        if not chemin.startswith(self.racine + os.sep) or not os.path.isfile(chemin):
+            return None
+
+        stat = os.stat(chemin)
+        etag = '%x-%x' % (int(stat.st_mtime), stat.st_size)
+        versions = {None: (chemin, stat.st_size, '"%s"' % etag)}
+        for encodage, extension in ENCODAGES:
+            if os.path.isfile(chemin + extension):
+                taille = os.path.getsize(chemin + extension)
+                versions[encodage] = (chemin + extension, taille, '"%s-%s"' % (etag, encodage))
+
+        fichier = FichierStatique(
+            mimetypes.guess_type(chemin)[0] or 'application/octet-stream',
+            CACHE_PERMANENT if MOTIF_HACHE.search(nom) else CACHE_COURT,
+            http_date(stat.st_mtime),
+            versions,
+        )
+        self._fichiers[nom] = fichier
+        return fichier
+
+    def __call__(self, environ, start_response):
+        chemin = environ.get('PATH_INFO', '')
+        methode = environ.get('REQUEST_METHOD', 'GET')
+        if methode not in ('GET', 'HEAD') or not chemin.startswith(self.prefixe):
+            return self.application(environ, start_response)
+
+        nom = chemin[len(self.prefixe):].encode('latin-1').decode('utf-8', 'replace')
+        fichier = self._fichier(nom)
+        if fichier is None:
+            return self.application(environ, start_response)
+
+        acceptes = _encodages_acceptes(environ.get('HTTP_ACCEPT_ENCODING', ''))
+        encodage = next((e for e, _ in ENCODAGES if e in acceptes and e in fichier.versions), None)
+        chemin_fichier, taille, etag = fichier.versions[encodage]
+
+        entetes = [
+            ('Cache-Control', fichier.cache_control),
+            ('ETag', etag),
+            ('Last-Modified', fichier.derniere_modification),
+            ('Vary', 'Accept-Encoding'),
+        ]
+        if_none_match = environ.get('HTTP_IF_NONE_MATCH')
+        if if_none_match and etag in [e.strip() for e in if_none_match.split(',')]:
+            start_response('304 Not Modified', entetes)
+            return []
+
+        entetes += [('Content-Type', fichier.type_contenu), ('Content-Length', str(taille))]
+        if encodage:
+            entetes.append(('Content-Encoding', encodage))
+        start_response('200 OK', entetes)
+        if methode == 'HEAD':
+            return []
+        enveloppe = environ.get('wsgi.file_wrapper', FileWrapper)
+        return enveloppe(open(chemin_fichier, 'rb'), TAILLE_BLOC)
@@ -0,0 +1,82 @@
+"""
+Stockage des fichiers media adressé par contenu.
+
+Chaque fichier est enregistré sous l'empreinte SHA-256 de son contenu
+(produits/3f2a...c9.png) : deux envois identiques partagent le même
+fichier, et un nom de fichier ne désigne jamais qu'un seul contenu, ce qui
+permet de le servir avec un cache navigateur permanent.
+
+Les fichiers statiques collectés reçoivent de même un nom haché
+(ManifestStaticFilesStorage) et sont précompressés en .gz et .br.
+"""
+import hashlib
+import os
+import re
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+LONGUEUR_EMPREINTE = 20
+MOTIF_EMPREINTE = re.compile(r'^[0-9a-f]{%d}$' % LONGUEUR_EMPREINTE)
+
+
+def empreinte_contenu(contenu):
+    """
+    Empreinte SHA-256 (tronquée) d'un fichier, lu par blocs
+    """
+    sha = hashlib.sha256()
+    contenu.seek(0)
+    for bloc in contenu.chunks():
+        sha.update(bloc)
+    contenu.seek(0)
+    return sha.hexdigest()[:LONGUEUR_EMPREINTE]
+
+
+def est_adresse_par_contenu(nom):
+    """
+    Vrai si le nom de fichier est une empreinte de contenu
+    """
+    base = os.path.splitext(os.path.basename(nom))[0]
+    return bool(MOTIF_EMPREINTE.match(base))
+
+
+@deconstructible
+class StockageParContenu(FileSystemStorage):
+    """
+    FileSystemStorage qui nomme les fichiers d'après leur contenu et
+    déduplique les envois identiques
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+
+        dossier = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        nom = os.path.join(dossier, empreinte_contenu(content) + extension).replace('\\', '/')
+
+        if self.exists(nom):
+            # Contenu déjà stocké : déduplication
+            return nom
+        return super().save(nom, content, max_length=max_length)
+
+
+class StockageStatique(ManifestStaticFilesStorage):
+    """
+    ManifestStaticFilesStorage qui écrit, après collectstatic, les versions
+    compressées (.gz, .br) des fichiers hachés
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        # Import différé : media.py charge ce module à chaque démarrage
+        from .assets import compresser
+
+        yield from super().post_process(paths, dry_run, **options)
+        if not dry_run:
+            for nom_hache in set(self.hashed_files.values()):
+                compresser(self.path(nom_hache))
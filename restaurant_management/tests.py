@@ -0,0 +1,245 @@
+import re
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.template import loader
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from commandes_app.charge import generer
+from commandes_app.models import Commande
+from produits_app.models import Produit
+from users.models import User
+from . import benchmark, demarrage
+from .essais import CachesIsoles
+from .media import CACHE_COURT, CACHE_PERMANENT
+from .statique import ServeurStatique
+from .storage import StockageParContenu
+
+# Budget de poids des ressources bloquantes (CSS et JS) d'une page, compressées
+BUDGET_REQUETES = 2
+BUDGET_OCTETS = 200 * 1024
+# Ressources chargées par les gabarits : <script src>, <link href>, <img src>
+MOTIF_RESSOURCE = re.compile(r'<(?:script|link|img)\b[^>]*?\b(?:src|href)="([^"]*)"')
+MOTIF_STATIC = re.compile(r"\{% static '([^']+)' %\}")
+
+
+class MediaTests(TestCase):
+    """
+    Service des media : cache permanent des fichiers adressés par contenu,
+    ETag et requêtes partielles
+    """
+
+    def setUp(self):
+        self.racine = tempfile.mkdtemp()
+        reglages = override_settings(MEDIA_ROOT=self.racine)
+        reglages.enable()
+        self.addCleanup(reglages.disable)
+        self.addCleanup(shutil.rmtree, self.racine, ignore_errors=True)
+        self.contenu = bytes(range(256)) * 4
+        self.nom = StockageParContenu(location=self.racine).save('produits/fiche.bin', ContentFile(self.contenu))
+
+    def _get(self, nom, **entetes):
+        return self.client.get(reverse('media', kwargs={'chemin': nom}), **entetes)
+
+    def test_cache_permanent_et_etag(self):
+        reponse = self._get(self.nom)
+        self.assertEqual(reponse.status_code, 200)
+        self.assertEqual(b''.join(reponse.streaming_content), self.contenu)
+        self.assertEqual(reponse['Cache-Control'], CACHE_PERMANENT)
+        self.assertEqual(reponse['Accept-Ranges'], 'bytes')
+        etag = reponse['ETag']
+
+        reponse = self._get(self.nom, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(reponse.status_code, 304)
+        self.assertEqual(reponse['ETag'], etag)
+
+        # Fichier au nom libre : cache court
+        with open(f'{self.racine}/notice.txt', 'w') as fichier:
+            fichier.write('notice')
+        self.assertEqual(self._get('notice.txt')['Cache-Control'], CACHE_COURT)
+
+    def test_requetes_partielles(self):
+        reponse = self._get(self.nom, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(reponse.status_code, 206)
+        self.assertEqual(reponse.content, self.contenu[10:20])
+        self.assertEqual(reponse['Content-Range'], f'bytes 10-19/{len(self.contenu)}')
+
+        reponse = self._get(self.nom, HTTP_RANGE='bytes=-6')
+        self.assertEqual(reponse.content, self.contenu[-6:])
+
+        self.assertEqual(self._get(self.nom, HTTP_RANGE='bytes=5000-').status_code, 416)
+        # If-Range périmé : fichier complet
+        self.assertEqual(self._get(self.nom, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"perime"').status_code, 200)
+
+    def test_chemins_refuses(self):
+        self.assertEqual(self._get('../settings.py').status_code, 404)
+        self.assertEqual(self._get('produits/absent.png').status_code, 404)
+        self.assertEqual(self.client.post(reverse('media', kwargs={'chemin': self.nom})).status_code, 405)
+
+
+class PoidsPageTests(CachesIsoles, TestCase):
+    """
+    Poids des ressources chargées par base.html après collectstatic
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.racine = tempfile.mkdtemp()
+        cls.reglages = override_settings(
+            STATIC_ROOT=cls.racine,
+            STORAGES={
+                **settings.STORAGES,
+                'staticfiles': {'BACKEND': 'restaurant_management.storage.StockageStatique'},
+            },
+        )
+        cls.reglages.enable()
+        call_command('collectstatic', interactive=False, verbosity=0, ignore_patterns=['admin'])
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.reglages.disable()
+        shutil.rmtree(cls.racine, ignore_errors=True)
+        super().tearDownClass()
+
+    def _telecharger(self, serveur, url):
+        reponse = {}
+
+        def start_response(statut, entetes):
+            reponse['statut'] = statut
+            reponse['entetes'] = dict(entetes)
+
+        environ = {'PATH_INFO': url, 'REQUEST_METHOD': 'GET', 'HTTP_ACCEPT_ENCODING': 'gzip, br'}
+        corps = b''.join(serveur(environ, start_response))
+        return reponse['statut'], reponse['entetes'], corps
+
+    def test_poids_page(self):
+        utilisateur = User.objects.create_user('gerant', password='motdepasse', role='ADMIN')
+        self.client.force_login(utilisateur)
+        page = self.client.get(reverse('users:detail', args=[utilisateur.pk]))
+        self.assertEqual(page.status_code, 200)
+
+        ressources = re.findall(
+            r'<link[^>]+rel="stylesheet"[^>]+href="([^"]+)"|<script[^>]+src="([^"]+)"',
+            page.content.decode(),
+        )
+        urls = [css or js for css, js in ressources]
+        self.assertFalse([url for url in urls if not url.startswith(settings.STATIC_URL)], urls)
+        self.assertLessEqual(len(urls), BUDGET_REQUETES, urls)
+
+        serveur = ServeurStatique(None, racine=self.racine)
+        total = 0
+        for url in urls:
+            statut, entetes, corps = self._telecharger(serveur, url)
+            self.assertEqual(statut, '200 OK', url)
+            self.assertIn(entetes.get('Content-Encoding'), ('br', 'gzip'), url)
+            self.assertIn('immutable', entetes['Cache-Control'])
+            total += len(corps)
+        self.assertLess(total, BUDGET_OCTETS, f'{len(urls)} ressources, {total / 1024:.0f} Ko transférés')
+
+
+class RessourcesLocalesTests(SimpleTestCase):
+    """
+    Les gabarits ne chargent que des ressources servies par l'application
+    (réseau local sans accès à Internet)
+    """
+
+    def test_aucune_ressource_externe(self):
+        for gabarit in sorted(Path(settings.BASE_DIR, 'templates').rglob('*.html')):
+            source = gabarit.read_text()
+            with self.subTest(gabarit.name):
+                externes = [url for url in MOTIF_RESSOURCE.findall(source) if re.match(r'(https?:)?//', url)]
+                self.assertEqual(externes, [])
+                for chemin in MOTIF_STATIC.findall(source):
+                    self.assertIsNotNone(finders.find(chemin), chemin)
+
+
+class RenduTableauxDeBordTests(CachesIsoles, TestCase):
+    """
+    Temps de rendu des gabarits des tableaux de bord
+    """
+    TABLEAUX_DE_BORD = ['users:dashboard', 'commandes_app:dashboard', 'stats_app:dashboard', 'stock_app:dashboard']
+    REPETITIONS = 50
+    BUDGET_MS = 10
+
+    @classmethod
+    def setUpTestData(cls):
+        generer(graine=1, produits=300, utilisateurs=20, commandes=3000, mouvements=500, jours=30)
+
+    # La vérification de la valorisation en arrière-plan se heurterait au
+    # verrou de la transaction du test sur la base en mémoire
+    @mock.patch('stock_app.views.planifier_verification')
+    def test_benchmark_rendu(self, _planifier):
+        utilisateur = User.objects.create_user('gerant', password='motdepasse', role='ADMIN')
+        self.client.force_login(utilisateur)
+
+        for nom in self.TABLEAUX_DE_BORD:
+            with self.subTest(nom):
+                reponse = self.client.get(reverse(nom))
+                self.assertEqual(reponse.status_code, 200)
+                nom_gabarit = reponse.templates[0].name
+                gabarit = loader.get_template(nom_gabarit)
+                # Chargeur en cache : le gabarit n'est compilé qu'une fois
+                self.assertIs(gabarit.template, loader.get_template(nom_gabarit).template)
+
+                contexte = reponse.context[0].flatten()
+                debut = time.perf_counter()
+                for _ in range(self.REPETITIONS):
+                    gabarit.render(contexte, reponse.wsgi_request)
+                duree_ms = (time.perf_counter() - debut) / self.REPETITIONS * 1000
+                self.assertLess(duree_ms, self.BUDGET_MS, f'{nom_gabarit} rendu en {duree_ms:.1f} ms')
+
+
+class ParcoursBenchmarkTests(CachesIsoles, TestCase):
+    """
+    Le parcours du banc d'essai HTTP reste valide face aux vues
+    """
+
+    def test_parcours_complet(self):
+        generer(graine=2, produits=50, utilisateurs=5, commandes=200, mouvements=50, jours=10)
+        User.objects.create_user('gerant', password='motdepasse', role='MANAGER')
+        produits = list(Produit.objects.filter(is_active=True, stock_actuel__gte=100).values_list('pk', flat=True))
+        mesures = benchmark.Mesures()
+        parcours = benchmark.Parcours(self.client, mesures, produits)
+
+        with mock.patch('stock_app.views.planifier_verification'):
+            abandons = parcours.executer('gerant', 'motdepasse', iterations=2)
+        self.assertEqual(abandons, 0)
+
+        resume = mesures.resume(1.0)
+        self.assertEqual(resume['total']['erreurs'], 0)
+        self.assertEqual(resume['changer_statut']['requetes'], 2 * len(benchmark.ETAPES_STATUT))
+        self.assertEqual(set(resume), {
+            'page_connexion', 'connexion', 'creer_commande', 'ajouter_ligne', 'changer_statut', 'mouvement_stock',
+            'export_csv', 'total', *(f'tableau_de_bord:{nom.split(":")[0]}' for nom in benchmark.TABLEAUX_DE_BORD),
+        })
+        self.assertEqual(Commande.objects.filter(statut='SERVIE', nom_client__startswith='Client ').count(), 2)
+
+
+class DemarrageTests(SimpleTestCase):
+    """
+    Budget du temps de démarrage (python -X importtime)
+    """
+    ESSAIS = 3
+
+    def test_budget_demarrage(self):
+        # Meilleur de quelques essais : une machine chargée ne fait pas échouer le test
+        mesures = []
+        for _ in range(self.ESSAIS):
+            mesures.append(demarrage.mesurer())
+            if mesures[-1].total_ms <= demarrage.BUDGET_MS:
+                break
+        mesure = min(mesures, key=lambda m: m.total_ms)
+
+        for module in demarrage.MODULES_DIFFERES:
+            self.assertFalse(module in mesure.charges, f'{module} ne doit être importé qu\'à l\'usage')
+        detail = ', '.join(f'{module} {cumul / 1000:.1f} ms' for cumul, module in mesure.modules[:5])
+        self.assertLessEqual(mesure.total_ms, demarrage.BUDGET_MS, detail)
@@ -15,9 +15,9 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf import settings
-from django.conf.urls.static import static
+from .media import servir_media
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -26,8 +26,11 @@ urlpatterns = [
     path('commandes/', include('commandes_app.urls')),
     path('stock/', include('stock_app.urls')),
     path('statistiques/', include('stats_app.urls')),
+    path('taches/', include('taches_app.urls')),
 ]
 
-# Servir les fichiers media en développement
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# Servir les fichiers media (cache permanent, ETag et Range) lorsque aucun
+# serveur web frontal ne s'en charge
+urlpatterns += [
+    re_path(r'^%s(?P<chemin>.*)$' % settings.MEDIA_URL.lstrip('/'), servir_media, name='media'),
+]
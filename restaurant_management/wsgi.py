@@ -2,6 +2,7 @@
 WSGI config for restaurant_management project.
 
 It exposes the WSGI callable as a module-level variable named ``application``.
+Collected static files are served ahead of Django by ServeurStatique.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/wsgi/
@@ -11,6 +12,8 @@ import os
 
 from django.core.wsgi import get_wsgi_application
 
+from restaurant_management.statique import ServeurStatique
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'restaurant_management.settings')
 
-application = get_wsgi_application()
+application = ServeurStatique(get_wsgi_application())
@@ -0,0 +1,18 @@
+/*
+ * Chargement asynchrone des widgets des tableaux de bord : chaque widget
+ * interroge l'API JSON et s'affiche dès que sa réponse arrive, sans
+ * attendre les autres.
+ */
+window.chargerWidget = function (url, rendu) {
+    return fetch(url, {credentials: 'same-origin', headers: {'Accept': 'application/json'}})
+        .then(function (reponse) {
+            if (!reponse.ok) {
+                throw new Error('HTTP ' + reponse.status);
+            }
+            return reponse.json();
+        })
+        .then(rendu)
+        .catch(function (erreur) {
+            console.error('Widget ' + url + ' : ' + erreur.message);
+        });
+};
@@ -0,0 +1,180 @@
+"""
+API JSON (lecture seule) des widgets des tableaux de bord.
+
+Chaque point d'entrée porte un ETag et un Last-Modified calculés à partir de
+sondes peu coûteuses (commandes : dernière modification lue sur un index et
+compteur de suppressions, commandes_app/fraicheur.py ; stock : date de
+dernière modification et nombre de lignes) : tant que les données n'ont pas changé, le navigateur
+revalide sa copie et reçoit un 304 sans que les agrégats soient recalculés.
+Les réponses sont compressées en gzip.
+"""
+import hashlib
+from datetime import datetime, time, timedelta
+
+from django.db.models import Count, Max, Sum
+from django.http import JsonResponse
+from django.utils import timezone
+from django.views.decorators.cache import cache_control
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import condition, require_safe
+
+from commandes_app.cloture import ventes_par_jour
+from commandes_app.fraicheur import derniere_modification
+from commandes_app.models import Commande, LigneCommande
+from produits_app.models import Produit
+from stock_app.alertes import compter_alertes
+from stock_app.models import AlerteStock
+from stock_app.valorisation import valeur_totale
+from users.permissions import staff_requis
+from users.restaurants import restaurant_courant_id
+
+VERSION = 'v1'
+JOURS_MAX = 366
+LIMITE_MAX = 50
+
+
+def _sonde_commandes():
+    derniere, suppressions = derniere_modification()
+    return derniere, (derniere, suppressions)
+
+
+def _sonde_stock():
+    produits = Produit.objects.aggregate(derniere=Max('date_updated'), nombre=Count('id'))
+    alertes = AlerteStock.objects.aggregate(derniere=Max('date_declenchement'), nombre=Count('id'))
+    dates = [date for date in (produits['derniere'], alertes['derniere']) if date]
+    signature = (produits['derniere'], produits['nombre'], alertes['derniere'], alertes['nombre'])
+    return max(dates, default=None), signature
+
+
+SONDES = {
+    'commandes': _sonde_commandes,
+    'stock': _sonde_stock,
+}
+
+
+def _etat(request, nom):
+    """
+    Résultat de la sonde pour la requête en cours (évalué une seule fois
+    pour l'ETag et le Last-Modified)
+    """
+    etats = request.__dict__.setdefault('_sondes_api', {})
+    if nom not in etats:
+        derniere, signature = SONDES[nom]()
+        # Les séries glissantes changent à minuit même sans nouvelle donnée
+        debut_jour = timezone.make_aware(datetime.combine(timezone.localdate(), time.min))
+        derniere = max(derniere, debut_jour) if derniere else debut_jour
+        empreinte = hashlib.sha1(
+            repr((VERSION, restaurant_courant_id(), request.get_full_path(), timezone.localdate(), signature)).encode()
+        ).hexdigest()
+        etats[nom] = (derniere, '"%s"' % empreinte)
+    return etats[nom]
+
+
+def point_api(sonde):
+    """
+    Décorateur commun des points d'entrée : rôle employé (le tableau de bord
+    des commandes les utilise aussi), GET/HEAD, gzip, revalidation
+    systématique et requêtes conditionnelles
+    """
+    def decorateur(vue):
+        vue = condition(
+            etag_func=lambda request, *args, **kwargs: _etat(request, sonde)[1],
+            last_modified_func=lambda request, *args, **kwargs: _etat(request, sonde)[0],
+        )(vue)
+        vue = cache_control(private=True, no_cache=True)(vue)
+        vue = gzip_page(vue)
+        vue = require_safe(vue)
+        return staff_requis(vue)
+    return decorateur
+
+
+def _entier(request, nom, defaut, maximum):
+    try:
+        valeur = int(request.GET.get(nom, defaut))
+    except (TypeError, ValueError):
+        valeur = defaut
+    return min(max(valeur, 1), maximum)
+
+
+@point_api('commandes')
+def chiffre_affaires(request):
+    """
+    Chiffre d'affaires et nombre de commandes par jour sur les N derniers
+    jours (?jours=7)
+    """
+    jours = _entier(request, 'jours', 7, JOURS_MAX)
+    aujourd_hui = timezone.localdate()
+    debut = aujourd_hui - timedelta(days=jours - 1)
+
+    # Journées clôturées lues dans leur clôture figée
+    par_jour = ventes_par_jour(debut, aujourd_hui)
+    dates = [debut + timedelta(days=i) for i in range(jours)]
+    return JsonResponse({
+        'labels': [date.strftime('%d/%m') for date in dates],
+        'chiffre_affaires': [float(par_jour.get(date, {}).get('chiffre_affaires') or 0) for date in dates],
+        'commandes': [par_jour.get(date, {}).get('nombre_commandes', 0) for date in dates],
+    })
+
+
+@point_api('commandes')
+def top_produits(request):
+    """
+    Produits les plus vendus (?limite=10)
+    """
+    limite = _entier(request, 'limite', 10, LIMITE_MAX)
+    produits = LigneCommande.objects.values('produit__nom').annotate(
+        quantite=Sum('quantite'),
+        chiffre_affaires=Sum('prix_total'),
+    ).order_by('-quantite')[:limite]
+    return JsonResponse({
+        'produits': [
+            {
+                'nom': produit['produit__nom'],
+                'quantite': produit['quantite'],
+                'chiffre_affaires': float(produit['chiffre_affaires'] or 0),
+            }
+            for produit in produits
+        ],
+    })
+
+
+@point_api('commandes')
+def top_categories(request):
+    """
+    Chiffre d'affaires par catégorie (?limite=10)
+    """
+    limite = _entier(request, 'limite', 10, LIMITE_MAX)
+    categories = LigneCommande.objects.values('produit__categorie__nom').annotate(
+        chiffre_affaires=Sum('prix_total'),
+    ).order_by('-chiffre_affaires')[:limite]
+    return JsonResponse({
+        'labels': [categorie['produit__categorie__nom'] or 'Non catégorisé' for categorie in categories],
+        'donnees': [float(categorie['chiffre_affaires'] or 0) for categorie in categories],
+    })
+
+
+@point_api('commandes')
+def statuts(request):
+    """
+    Répartition des commandes par statut
+    """
+    nombres = dict(Commande.objects.values_list('statut').annotate(nombre=Count('id')).order_by())
+    return JsonResponse({
+        'codes': [code for code, _ in Commande.STATUT_CHOICES],
+        'labels': [libelle for _, libelle in Commande.STATUT_CHOICES],
+        'donnees': [nombres.get(code, 0) for code, _ in Commande.STATUT_CHOICES],
+    })
+
+
+@point_api('stock')
+def indicateurs_stock(request):
+    """
+    Indicateurs du stock : valeur, alertes, produits actifs
+    """
+    alertes = compter_alertes()
+    return JsonResponse({
+        'valeur_totale': float(valeur_totale()),
+        'produits_actifs': Produit.objects.filter(is_active=True).count(),
+        'alertes': alertes['ALERTE'],
+        'ruptures': alertes['RUPTURE'],
+    })
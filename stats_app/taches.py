@@ -0,0 +1,53 @@
+"""
+Tâches différées des statistiques (exécutées par manage.py run_worker)
+"""
+import csv
+import io
+import uuid
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from commandes_app.models import Commande
+from taches_app.file import tache
+
+DOSSIER_EXPORTS = 'exports'
+
+
+@tache(tentatives=2, libelle="Export du chiffre d'affaires")
+def exporter_ca(date_debut=None, date_fin=None):
+    """
+    Écrit en CSV les commandes facturées de la période dans le stockage et
+    retourne le nom du fichier
+    """
+    commandes = Commande.objects.filter(statut__in=['PRETE', 'SERVIE']).select_related('client')
+    if date_debut:
+        commandes = commandes.filter(date_commande__date__gte=date_debut)
+    if date_fin:
+        commandes = commandes.filter(date_commande__date__lte=date_fin)
+
+    tampon = io.StringIO()
+    writer = csv.writer(tampon)
+    writer.writerow(['Date', 'Référence', 'Client', 'Type', 'Statut', 'Montant Total'])
+    lignes = 0
+    for commande in commandes.order_by('date_commande').iterator(chunk_size=2000):
+        writer.writerow([
+            timezone.localtime(commande.date_commande).strftime('%d/%m/%Y'),
+            commande.reference,
+            commande.client.get_full_name() if commande.client else commande.nom_client,
+            commande.get_type_commande_display(),
+            commande.get_statut_display(),
+            commande.montant_total
+        ])
+        lignes += 1
+
+    # Nom imprévisible : le fichier n'est servi que par la vue de la tâche
+    fichier = default_storage.save(
+        f'{DOSSIER_EXPORTS}/{uuid.uuid4().hex}.csv', ContentFile(tampon.getvalue().encode('utf-8')),
+    )
+    return {
+        'fichier': fichier,
+        'nom': f'chiffre_affaires_{timezone.localdate()}.csv',
+        'lignes': lignes,
+    }
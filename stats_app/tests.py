@@ -1,3 +1,86 @@
+from decimal import Decimal
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from commandes_app.fraicheur import derniere_modification
+from commandes_app.models import Commande, LigneCommande
+from produits_app.models import Categorie, Produit
+from restaurant_management.essais import CachesIsoles
+from users.models import User
+
+
+class ApiStatistiquesTests(CachesIsoles, TestCase):
+    """
+    API JSON des widgets : contenu, requêtes conditionnelles et gzip
+    """
+
+    def setUp(self):
+        super().setUp()
+        utilisateur = User.objects.create_user('gerant', password='motdepasse', role='MANAGER')
+        self.client.force_login(utilisateur)
+        categorie = Categorie.objects.create(nom='Plats')
+        self.produit = Produit.objects.create(
+            nom='Thieboudienne', categorie=categorie, prix_vente=Decimal('3000'), stock_actuel=50,
+        )
+        self.commande = Commande.objects.create(nom_client='Awa', statut='SERVIE', montant_total=Decimal('6000'))
+        LigneCommande.objects.create(
+            commande=self.commande, produit=self.produit, quantite=2, prix_unitaire=Decimal('3000'),
+        )
+
+    def test_series_et_repartitions(self):
+        donnees = self.client.get(reverse('stats_app:api_chiffre_affaires'), {'jours': 3}).json()
+        self.assertEqual(len(donnees['labels']), 3)
+        self.assertEqual(donnees['chiffre_affaires'][-1], 6000.0)
+        self.assertEqual(donnees['commandes'][-1], 1)
+
+        donnees = self.client.get(reverse('stats_app:api_top_produits')).json()
+        self.assertEqual(donnees['produits'][0]['nom'], 'Thieboudienne')
+        self.assertEqual(donnees['produits'][0]['quantite'], 2)
+
+        donnees = self.client.get(reverse('stats_app:api_statuts')).json()
+        self.assertEqual(dict(zip(donnees['codes'], donnees['donnees']))['SERVIE'], 1)
+
+    def test_requete_conditionnelle(self):
+        url = reverse('stats_app:api_statuts')
+        reponse = self.client.get(url)
+        self.assertEqual(reponse.status_code, 200)
+        self.assertIn('Last-Modified', reponse)
+        etag = reponse['ETag']
+
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # Une modification des commandes change l'ETag
+        Commande.objects.create(nom_client='Moussa')
+        reponse = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(reponse.status_code, 200)
+        self.assertNotEqual(reponse['ETag'], etag)
+
+        # Une suppression aussi
+        etag = reponse['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Commande.objects.get(nom_client='Moussa').delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_sonde_sur_index(self):
+        derniere_modification()
+        with CaptureQueriesContext(connection) as requetes:
+            derniere_modification()
+        # Restaurants, date de la dernière modification, compteur de suppressions
+        self.assertEqual(len(requetes), 3)
+        if connection.vendor == 'sqlite':
+            sql = next(requete['sql'] for requete in requetes if 'date_mise_a_jour' in requete['sql'])
+            with connection.cursor() as curseur:
+                curseur.execute('EXPLAIN QUERY PLAN ' + sql)
+                plan = ' '.join(str(ligne[-1]) for ligne in curseur.fetchall())
+            self.assertIn('commande_restaurant_maj_idx', plan)
+            self.assertNotIn('SCAN', plan)
 
-# Create your tests here.
+    def test_gzip(self):
+        reponse = self.client.get(
+            reverse('stats_app:api_chiffre_affaires'), {'jours': 30}, HTTP_ACCEPT_ENCODING='gzip',
+        )
+        self.assertEqual(reponse['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', reponse['Vary'])
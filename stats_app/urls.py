@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 app_name = 'stats_app'
 
@@ -12,4 +12,12 @@ urlpatterns = [
     path('export-ca/', views.export_ca, name='export_ca'),
     path('produits/', views.produits_stats, name='produits_stats'),
     path('commandes/', views.commandes_stats, name='commandes_stats'),
+    path('reseau/', views.reseau, name='reseau'),
+    
+    # API JSON des widgets (lecture seule, versionnée)
+    path(f'api/{api.VERSION}/chiffre-affaires/', api.chiffre_affaires, name='api_chiffre_affaires'),
+    path(f'api/{api.VERSION}/top-produits/', api.top_produits, name='api_top_produits'),
+    path(f'api/{api.VERSION}/top-categories/', api.top_categories, name='api_top_categories'),
+    path(f'api/{api.VERSION}/statuts/', api.statuts, name='api_statuts'),
+    path(f'api/{api.VERSION}/stock/', api.indicateurs_stock, name='api_stock'),
 ]
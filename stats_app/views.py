@@ -1,22 +1,28 @@
-from django.shortcuts import render
-from django.contrib.auth.decorators import login_required
-from django.db.models import Sum, Count, Avg, F
+from django.shortcuts import redirect, render
+from django.contrib import messages
+from users.permissions import admin_requis, manager_requis
+from django.db.models import Sum, Count, Avg
 from django.utils import timezone
-from datetime import timedelta
-from django.http import HttpResponse
-import csv
+from datetime import datetime, time, timedelta
+from django.utils.dateparse import parse_date
 from produits_app.models import Produit, Categorie
-from commandes_app.models import Commande, LigneCommande
-from users.models import User
+from commandes_app.cloture import ventes_par_jour, ventes_par_restaurant
+from commandes_app.models import Commande, LigneCommande, ResumeClient
+from users.models import Restaurant, User
+from stock_app.alertes import compter_alertes
+from stock_app.valorisation import valeur_totale
+from taches_app.file import mettre_en_file
+from .taches import exporter_ca
 
-@login_required
+@manager_requis
 def export_ca(request):
     """
-    Exporter les chiffres d'affaires en CSV
+    Exporter les chiffres d'affaires en CSV : l'export est mis en file et
+    la page de la tâche propose le fichier une fois prêt
     """
     # Récupérer les mêmes filtres que la vue chiffre_affaires
-    date_debut = request.GET.get('date_debut')
-    date_fin = request.GET.get('date_fin')
+    date_debut = parse_date(request.GET.get('date_debut') or '')
+    date_fin = parse_date(request.GET.get('date_fin') or '')
     periode = request.GET.get('periode')
     
     today = timezone.now().date()
@@ -35,34 +41,11 @@ def export_ca(request):
         date_debut = today.replace(month=1, day=1)
         date_fin = today
     
-    # Filtrer les commandes
-    commandes = Commande.objects.filter(statut__in=['PRETE', 'SERVIE'])
-    
-    if date_debut:
-        commandes = commandes.filter(date_commande__date__gte=date_debut)
-    if date_fin:
-        commandes = commandes.filter(date_commande__date__lte=date_fin)
-    
-    # Créer la réponse CSV
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="chiffre_affaires_{timezone.now().date()}.csv"'
-    
-    writer = csv.writer(response)
-    writer.writerow(['Date', 'Référence', 'Client', 'Type', 'Statut', 'Montant Total'])
-    
-    for commande in commandes.order_by('date_commande'):
-        writer.writerow([
-            commande.date_commande.strftime('%d/%m/%Y'),
-            commande.reference,
-            commande.client.get_full_name() if commande.client else commande.nom_client,
-            commande.get_type_commande_display(),
-            commande.get_statut_display(),
-            commande.montant_total
-        ])
-    
-    return response
+    tache = mettre_en_file(exporter_ca, date_debut, date_fin, demandeur=request.user)
+    messages.info(request, "Export en préparation : le fichier sera disponible sur cette page.")
+    return redirect('taches_app:detail', pk=tache.pk)
 
-@login_required
+@manager_requis
 def chiffre_affaires(request):
     """
     Page de chiffre d'affaires détaillé
@@ -128,7 +111,7 @@ def chiffre_affaires(request):
     
     # Données pour les graphiques
     dates = [stat['date'].strftime('%d/%m') for stat in statistiques_jour]
-    chiffres_affaires = [stat['chiffre_affaires'] for stat in statistiques_jour]
+    chiffres_affaires = [float(stat['chiffre_affaires']) for stat in statistiques_jour]
     
     # Répartition par type de commande
     types_stats = commandes.values('type_commande').annotate(
@@ -144,15 +127,17 @@ def chiffre_affaires(request):
         'panier_moyen': panier_moyen,
         'nombre_clients': nombre_clients,
         'statistiques_jour': statistiques_jour,
-        'dates': dates,
-        'chiffres_affaires': chiffres_affaires,
-        'types_labels': types_labels,
-        'types_data': types_data,
+        'graphiques': {
+            'dates': dates,
+            'chiffres_affaires': chiffres_affaires,
+            'types_labels': types_labels,
+            'types_data': types_data,
+        },
     }
     
     return render(request, 'stats_app/chiffre_affaires.html', context)
 
-@login_required
+@manager_requis
 def dashboard_stats(request):
     """
     Dashboard des statistiques
@@ -161,22 +146,11 @@ def dashboard_stats(request):
     month_start = today.replace(day=1)
     last_month_start = (month_start - timedelta(days=1)).replace(day=1)
     
-    # Chiffre d'affaires
-    ca_today = Commande.objects.filter(
-        date_commande__date=today,
-        statut__in=['PRETE', 'SERVIE']
-    ).aggregate(total=Sum('montant_total'))['total'] or 0
-    
-    ca_month = Commande.objects.filter(
-        date_commande__date__gte=month_start,
-        statut__in=['PRETE', 'SERVIE']
-    ).aggregate(total=Sum('montant_total'))['total'] or 0
-    
-    ca_last_month = Commande.objects.filter(
-        date_commande__date__gte=last_month_start,
-        date_commande__date__lt=month_start,
-        statut__in=['PRETE', 'SERVIE']
-    ).aggregate(total=Sum('montant_total'))['total'] or 0
+    # Chiffre d'affaires (journées clôturées lues dans leur clôture)
+    ventes = ventes_par_jour(last_month_start, today)
+    ca_today = ventes.get(today, {}).get('chiffre_affaires') or 0
+    ca_month = sum(jour['chiffre_affaires'] for date, jour in ventes.items() if date >= month_start)
+    ca_last_month = sum(jour['chiffre_affaires'] for date, jour in ventes.items() if date < month_start)
     
     # Commandes
     commandes_today = Commande.objects.filter(date_commande__date=today).count()
@@ -185,43 +159,22 @@ def dashboard_stats(request):
     # Produits
     total_produits = Produit.objects.count()
     produits_actifs = Produit.objects.filter(is_active=True).count()
-    produits_en_rupture = Produit.objects.filter(stock_actuel=0).count()
+    produits_en_rupture = compter_alertes()['RUPTURE']
     
     # Catégories
     total_categories = Categorie.objects.count()
     
     # Clients
-    total_clients = User.objects.count()
-    clients_month = User.objects.filter(date_created__date__gte=month_start).count()
+    clients = User.objects.du_restaurant().filter(role='CLIENT')
+    total_clients = clients.count()
+    clients_month = clients.filter(date_created__date__gte=month_start).count()
+    # Clients venus ce mois-ci, d'après leur résumé (index sur la dernière visite)
+    clients_actifs = ResumeClient.objects.filter(
+        derniere_visite__gte=timezone.make_aware(datetime.combine(month_start, time.min))
+    ).count()
     
-    # Top produits vendus
-    top_produits = LigneCommande.objects.values('produit__nom').annotate(
-        total_vendu=Sum('quantite')
-    ).order_by('-total_vendu')[:10]
-    
-    # Top catégories
-    top_categories = LigneCommande.objects.values('produit__categorie__nom').annotate(
-        total_vendu=Sum('quantite'),
-        total_ca=Sum('prix_total')
-    ).order_by('-total_ca')[:10]
-    
-    # Évolution des commandes (7 derniers jours)
-    evolution_data = []
-    for i in range(7):
-        date = today - timedelta(days=i)
-        commandes_jour = Commande.objects.filter(date_commande__date=date).count()
-        ca_jour = Commande.objects.filter(
-            date_commande__date=date,
-            statut__in=['PRETE', 'SERVIE']
-        ).aggregate(total=Sum('montant_total'))['total'] or 0
-        
-        evolution_data.append({
-            'date': date.strftime('%d/%m'),
-            'commandes': commandes_jour,
-            'ca': float(ca_jour)
-        })
-    
-    evolution_data.reverse()
+    # Évolution, top produits et top catégories : widgets chargés
+    # séparément depuis l'API (stats_app/api.py)
     
     context = {
         'ca_today': ca_today,
@@ -236,14 +189,12 @@ def dashboard_stats(request):
         'total_categories': total_categories,
         'total_clients': total_clients,
         'clients_month': clients_month,
-        'top_produits': top_produits,
-        'top_categories': top_categories,
-        'evolution_data': evolution_data,
+        'clients_actifs': clients_actifs,
     }
     
     return render(request, 'stats_app/dashboard.html', context)
 
-@login_required
+@manager_requis
 def chiffre_affaires(request):
     """
     Page détaillée du chiffre d'affaires
@@ -251,24 +202,15 @@ def chiffre_affaires(request):
     today = timezone.now().date()
     month_start = today.replace(day=1)
     
-    # CA par mois (12 derniers mois)
-    ca_mensuel = []
-    for i in range(12):
-        month_date = (month_start - timedelta(days=30*i)).replace(day=1)
-        month_end = (month_date + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-        
-        ca = Commande.objects.filter(
-            date_commande__date__gte=month_date,
-            date_commande__date__lte=month_end,
-            statut__in=['PRETE', 'SERVIE']
-        ).aggregate(total=Sum('montant_total'))['total'] or 0
-        
-        ca_mensuel.append({
-            'month': month_date.strftime('%m/%Y'),
-            'ca': float(ca)
-        })
-    
-    ca_mensuel.reverse()
+    # CA par mois (12 derniers mois), à partir des ventes journalières
+    mois = [month_start]
+    for _ in range(11):
+        mois.append((mois[-1] - timedelta(days=1)).replace(day=1))
+    mois.reverse()
+    ca_par_mois = dict.fromkeys(mois, 0)
+    for date, jour in ventes_par_jour(mois[0], today).items():
+        ca_par_mois[date.replace(day=1)] += jour['chiffre_affaires']
+    ca_mensuel = [{'month': month_date.strftime('%m/%Y'), 'ca': float(ca)} for month_date, ca in ca_par_mois.items()]
     
     # CA par catégorie
     ca_categories = LigneCommande.objects.values('produit__categorie__nom').annotate(
@@ -289,7 +231,7 @@ def chiffre_affaires(request):
     
     return render(request, 'stats_app/chiffre_affaires.html', context)
 
-@login_required
+@manager_requis
 def produits_stats(request):
     """
     Statistiques des produits
@@ -309,13 +251,12 @@ def produits_stats(request):
     ).order_by('-total_ca')[:20]
     
     # État des stocks
-    stock_critique = Produit.objects.filter(stock_actuel__lte=F('seuil_alerte')).count()
-    stock_rupture = Produit.objects.filter(stock_actuel=0).count()
+    alertes = compter_alertes()
+    stock_critique = alertes['ALERTE'] + alertes['RUPTURE']
+    stock_rupture = alertes['RUPTURE']
     
     # Valeur du stock
-    valeur_stock = Produit.objects.aggregate(
-        valeur=Sum(F('stock_actuel') * F('prix_vente'))
-    )['valeur'] or 0
+    valeur_stock = valeur_totale()
     
     context = {
         'total_produits': total_produits,
@@ -328,7 +269,7 @@ def produits_stats(request):
     
     return render(request, 'stats_app/produits.html', context)
 
-@login_required
+@manager_requis
 def commandes_stats(request):
     """
     Statistiques des commandes
@@ -362,11 +303,52 @@ def commandes_stats(request):
     
     commandes_jour.reverse()
     
+    graphiques = {
+        'labels': [jour['date'] for jour in commandes_jour],
+        'donnees': [jour['count'] for jour in commandes_jour],
+    }
+    
     context = {
         'panier_moyen': panier_moyen,
         'statuts': statuts,
         'types': types,
-        'commandes_jour': commandes_jour,
+        'graphiques': graphiques,
     }
     
     return render(request, 'stats_app/commandes.html', context)
+
+@admin_requis
+def reseau(request):
+    """
+    Ventes consolidées de tous les restaurants (comptes du réseau)
+    """
+    if request.user.restaurant_id is not None:
+        messages.error(request, "La vue du réseau est réservée aux comptes du réseau.")
+        return redirect('stats_app:dashboard')
+
+    fin = timezone.localdate()
+    debut = fin.replace(day=1)
+    ventes = ventes_par_restaurant(debut, fin)
+    total = sum(cumul['chiffre_affaires'] for cumul in ventes.values())
+
+    lignes = []
+    for restaurant in Restaurant.objects.filter(is_active=True).order_by('nom'):
+        cumul = ventes.get(restaurant.pk, {})
+        chiffre_affaires = cumul.get('chiffre_affaires', 0)
+        lignes.append({
+            'restaurant': restaurant,
+            'chiffre_affaires': chiffre_affaires,
+            'nombre_commandes': cumul.get('nombre_commandes', 0),
+            'nombre_facturees': cumul.get('nombre_facturees', 0),
+            'part': chiffre_affaires / total * 100 if total else 0,
+        })
+
+    context = {
+        'debut': debut,
+        'fin': fin,
+        'lignes': lignes,
+        'total': total,
+        'total_commandes': sum(cumul['nombre_commandes'] for cumul in ventes.values()),
+        'restaurant_courant': request.restaurant,
+    }
+    return render(request, 'stats_app/reseau.html', context)
@@ -0,0 +1,118 @@
+"""
+Moteur d'alertes de stock.
+
+Maintient la table AlerteStock (produits en alerte ou en rupture) en ne
+réagissant qu'aux franchissements de seuil : un produit n'est réécrit dans
+l'ensemble que lorsque son niveau change. Les pages d'alertes lisent cet
+ensemble au lieu de parcourir tout le catalogue.
+"""
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.signals import post_init, post_save
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from produits_app.catalogue import invalider_catalogue
+from produits_app.models import Produit, niveau_stock
+from .models import AlerteStock
+
+ALERTE = 'ALERTE'
+RUPTURE = 'RUPTURE'
+
+# Émis à chaque franchissement de seuil avec produit, ancien_niveau et
+# nouveau_niveau (None lorsque le produit n'est pas / plus en alerte).
+seuil_franchi = Signal()
+
+
+def _niveau_charge(produit):
+    """
+    Niveau du produit tel que chargé, sans déclencher de requête pour les
+    champs différés
+    """
+    if 'stock_actuel' not in produit.__dict__ or 'seuil_alerte' not in produit.__dict__:
+        return None
+    return niveau_stock(produit.stock_actuel, produit.seuil_alerte)
+
+
+@receiver(post_init, sender=Produit)
+def memoriser_niveau(sender, instance, **kwargs):
+    instance._niveau_stock = _niveau_charge(instance)
+
+
+@receiver(post_save, sender=Produit)
+def detecter_franchissement(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    ancien = None if created else getattr(instance, '_niveau_stock', None)
+    nouveau = _niveau_charge(instance)
+    if ancien == nouveau:
+        return
+    appliquer_niveau(instance, ancien, nouveau)
+
+
+def appliquer_niveau(produit, ancien, nouveau):
+    """
+    Met à jour l'ensemble matérialisé pour un produit et émet l'événement
+    de franchissement
+    """
+    if nouveau is None:
+        AlerteStock.objects.filter(produit_id=produit.pk).delete()
+    else:
+        AlerteStock.objects.update_or_create(
+            produit_id=produit.pk,
+            defaults={'niveau': nouveau, 'date_declenchement': timezone.now()},
+        )
+    produit._niveau_stock = nouveau
+    if ancien != nouveau:
+        # Le niveau de stock fait partie de l'instantané du catalogue
+        invalider_catalogue(produit.restaurant_id)
+        seuil_franchi.send(
+            sender=Produit,
+            produit=produit,
+            ancien_niveau=ancien,
+            nouveau_niveau=nouveau,
+        )
+
+
+def compter_alertes():
+    """
+    Nombre de produits par niveau : {'ALERTE': n, 'RUPTURE': m}
+    """
+    compteurs = {ALERTE: 0, RUPTURE: 0}
+    for ligne in AlerteStock.objects.values('niveau').annotate(total=Count('pk')).order_by():
+        compteurs[ligne['niveau']] = ligne['total']
+    return compteurs
+
+
+def produits_en_alerte():
+    """
+    Produits en stock faible (stock positif sous le seuil)
+    """
+    return Produit.objects.filter(alerte_stock__niveau=ALERTE).select_related('categorie')
+
+
+def produits_en_rupture():
+    """
+    Produits en rupture de stock
+    """
+    return Produit.objects.filter(alerte_stock__niveau=RUPTURE).select_related('categorie')
+
+
+def reconstruire_alertes():
+    """
+    Recalcule entièrement l'ensemble matérialisé à partir du catalogue.
+
+    À utiliser après des mises à jour en masse (QuerySet.update, import)
+    qui ne passent pas par Produit.save().
+    """
+    maintenant = timezone.now()
+    alertes = []
+    for pk, stock_actuel, seuil_alerte in Produit.objects.values_list('pk', 'stock_actuel', 'seuil_alerte'):
+        niveau = niveau_stock(stock_actuel, seuil_alerte)
+        if niveau is not None:
+            alertes.append(AlerteStock(produit_id=pk, niveau=niveau, date_declenchement=maintenant))
+    with transaction.atomic():
+        AlerteStock.objects.all().delete()
+        AlerteStock.objects.bulk_create(alertes, batch_size=500)
+    invalider_catalogue()
+    return len(alertes)
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class StockAppConfig(AppConfig):
     name = 'stock_app'
+
+    def ready(self):
+        # Connexion des récepteurs (alertes et valorisation du stock)
+        from . import alertes, valorisation  # noqa: F401
@@ -0,0 +1,70 @@
+"""
+Variations de stock groupées.
+
+Applique en une seule requête UPDATE les variations de stock de plusieurs
+produits (par exemple tous les ingrédients d'une recette) tout en
+maintenant l'ensemble des alertes et la valorisation du stock.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+
+from produits_app.models import Produit
+from produits_app.recettes import consommation
+from .alertes import appliquer_niveau, niveau_stock
+from .valorisation import ajuster_valeurs
+
+
+def appliquer_variations(variations):
+    """
+    Applique des variations de stock {produit_id: delta} de façon atomique.
+    Le nombre de requêtes ne dépend pas du nombre de produits concernés,
+    hors franchissements de seuil. Retourne les produits mis à jour.
+    """
+    variations = {pk: delta for pk, delta in variations.items() if delta}
+    if not variations:
+        return []
+
+    with transaction.atomic():
+        produits = list(Produit.objects.select_for_update().filter(pk__in=variations))
+        Produit.objects.filter(pk__in=variations).update(
+            stock_actuel=F('stock_actuel') + Case(
+                *[When(pk=pk, then=Value(delta)) for pk, delta in variations.items()],
+                default=Value(0),
+                output_field=IntegerField(),
+            ),
+            date_updated=timezone.now(),
+        )
+
+        deltas_valeur = defaultdict(Decimal)
+        for produit in produits:
+            delta = variations[produit.pk]
+            ancien_niveau = getattr(produit, '_niveau_stock', None)
+            produit.stock_actuel += delta
+            deltas_valeur[produit.categorie_id] += delta * produit.prix_vente
+            produit._valeur_stock = (produit.categorie_id, Decimal(produit.stock_actuel) * produit.prix_vente)
+
+            nouveau_niveau = niveau_stock(produit.stock_actuel, produit.seuil_alerte)
+            if nouveau_niveau != ancien_niveau:
+                appliquer_niveau(produit, ancien_niveau, nouveau_niveau)
+
+        ajuster_valeurs(deltas_valeur)
+    return produits
+
+
+def consommer(lignes):
+    """
+    Décrémente le stock des ingrédients de base pour des lignes
+    [(produit_id, quantite), ...]
+    """
+    return appliquer_variations({pk: -quantite for pk, quantite in consommation(lignes).items()})
+
+
+def restituer(lignes):
+    """
+    Remet en stock les ingrédients de base de lignes annulées
+    """
+    return appliquer_variations(consommation(lignes))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from stock_app import previsions
+
+
+class Command(BaseCommand):
+    help = "Calcule les suggestions de réapprovisionnement à partir de l'historique des consommations"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jours', type=int, default=previsions.JOURS_HISTORIQUE,
+                            help="Nombre de jours d'historique")
+        parser.add_argument('--delai', type=int, default=previsions.DELAI_LIVRAISON,
+                            help='Délai de livraison fournisseur (jours)')
+        parser.add_argument('--horizon', type=int, default=previsions.HORIZON_COMMANDE,
+                            help='Nombre de jours couverts par une commande')
+        parser.add_argument('--limite', type=int, default=20,
+                            help='Nombre de suggestions affichées')
+        parser.add_argument('--appliquer-seuils', action='store_true',
+                            help="Enregistrer les seuils d'alerte suggérés")
+
+    def handle(self, *args, **options):
+        suggestions = previsions.suggestions_reapprovisionnement(
+            jours=options['jours'],
+            delai=options['delai'],
+            horizon=options['horizon'],
+        )
+
+        for s in suggestions[:options['limite']]:
+            if not s.quantite_suggeree:
+                continue
+            couverture = 'inf' if s.couverture_jours == float('inf') else f'{s.couverture_jours:.1f}'
+            self.stdout.write(
+                f'{s.nom:<30} stock={s.stock_actuel:<6} couverture={couverture:<6}j '
+                f'commander={s.quantite_suggeree:<6} seuil={s.seuil_alerte}->{s.seuil_suggere}'
+            )
+
+        if options['appliquer_seuils']:
+            total = previsions.appliquer_seuils(suggestions)
+            self.stdout.write(self.style.SUCCESS(f"{total} seuil(s) d'alerte mis à jour."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from stock_app.alertes import reconstruire_alertes
+
+
+class Command(BaseCommand):
+    help = "Recalcule l'ensemble des alertes de stock à partir du catalogue"
+
+    def handle(self, *args, **options):
+        total = reconstruire_alertes()
+        self.stdout.write(self.style.SUCCESS(f'{total} produit(s) en alerte ou en rupture.'))
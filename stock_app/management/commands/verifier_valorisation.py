@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from stock_app.valorisation import verifier_valorisation
+
+
+class Command(BaseCommand):
+    help = "Compare la valorisation maintenue du stock au recalcul complet et corrige les écarts"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sans-correction',
+            action='store_true',
+            help='Signaler les écarts sans les corriger',
+        )
+
+    def handle(self, *args, **options):
+        ecarts = verifier_valorisation(corriger=not options['sans_correction'])
+        for categorie_id, maintenue, reelle in ecarts:
+            self.stdout.write(self.style.WARNING(
+                f'Catégorie {categorie_id} : {maintenue} maintenu, {reelle} recalculé'
+            ))
+        if not ecarts:
+            self.stdout.write(self.style.SUCCESS('Valorisation du stock cohérente.'))
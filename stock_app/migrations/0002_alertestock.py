@@ -0,0 +1,47 @@
+# Generated by Django 4.2.7 on 2026-10-19 17:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def initialiser_alertes(apps, schema_editor):
+    Produit = apps.get_model('produits_app', 'Produit')
+    AlerteStock = apps.get_model('stock_app', 'AlerteStock')
+    maintenant = django.utils.timezone.now()
+    alertes = []
+    for pk, stock_actuel, seuil_alerte in Produit.objects.values_list('pk', 'stock_actuel', 'seuil_alerte'):
+        if stock_actuel <= 0:
+            niveau = 'RUPTURE'
+        elif stock_actuel <= seuil_alerte:
+            niveau = 'ALERTE'
+        else:
+            continue
+        alertes.append(AlerteStock(produit_id=pk, niveau=niveau, date_declenchement=maintenant))
+    AlerteStock.objects.bulk_create(alertes, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('produits_app', '0001_initial'),
+        ('stock_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlerteStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('niveau', models.CharField(choices=[('ALERTE', 'Stock faible'), ('RUPTURE', 'Rupture')], db_index=True, max_length=10, verbose_name='Niveau')),
+                ('date_declenchement', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Date de déclenchement')),
+                ('produit', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='alerte_stock', to='produits_app.produit', verbose_name='Produit')),
+            ],
+            options={
+                'verbose_name': 'Alerte de stock',
+                'verbose_name_plural': 'Alertes de stock',
+                'ordering': ['-date_declenchement'],
+            },
+        ),
+        migrations.RunPython(initialiser_alertes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.7 on 2026-10-19 17:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def initialiser_valorisation(apps, schema_editor):
+    Produit = apps.get_model('produits_app', 'Produit')
+    ValeurStock = apps.get_model('stock_app', 'ValeurStock')
+    valeurs = Produit.objects.values('categorie_id').annotate(
+        valeur=models.Sum(models.F('stock_actuel') * models.F('prix_vente'))
+    ).order_by()
+    ValeurStock.objects.bulk_create([
+        ValeurStock(categorie_id=ligne['categorie_id'], valeur=ligne['valeur'] or 0)
+        for ligne in valeurs
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('produits_app', '0001_initial'),
+        ('stock_app', '0002_alertestock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ValeurStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('valeur', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Valeur')),
+                ('date_mise_a_jour', models.DateTimeField(auto_now=True, verbose_name='Date de mise à jour')),
+                ('categorie', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='valeur_stock', to='produits_app.categorie', verbose_name='Catégorie')),
+            ],
+            options={
+                'verbose_name': 'Valeur du stock',
+                'verbose_name_plural': 'Valeurs du stock',
+                'ordering': ['categorie__nom'],
+            },
+        ),
+        migrations.RunPython(initialiser_valorisation, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
 from django.utils import timezone
-from produits_app.models import Produit
+from produits_app.models import Categorie, Produit
+from users.models import Restaurant
+from users.restaurants import ParRestaurantManager
 
 class MouvementStock(models.Model):
     """
@@ -14,6 +16,14 @@ class MouvementStock(models.Model):
         ('RETOUR', 'Retour client'),
     )
     
+    restaurant = models.ForeignKey(
+        Restaurant,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='mouvements_stock',
+        verbose_name='Restaurant'
+    )
     produit = models.ForeignKey(
         Produit,
         on_delete=models.CASCADE,
@@ -44,15 +54,22 @@ class MouvementStock(models.Model):
         verbose_name='Utilisateur'
     )
     
+    objects = ParRestaurantManager()
+    
     class Meta:
         verbose_name = 'Mouvement de stock'
         verbose_name_plural = 'Mouvements de stock'
         ordering = ['-date_mouvement']
+        indexes = [
+            models.Index(fields=['restaurant', '-date_mouvement'], name='mouvement_restaurant_date_idx'),
+        ]
     
     def __str__(self):
         return f"{self.get_type_mouvement_display()} - {self.quantite} x {self.produit.nom}"
     
     def save(self, *args, **kwargs):
+        if self.restaurant_id is None:
+            self.restaurant_id = self.produit.restaurant_id
         super().save(*args, **kwargs)
         
         # Mettre à jour le stock du produit
@@ -64,3 +81,79 @@ class MouvementStock(models.Model):
             self.produit.stock_actuel = self.quantite
         
         self.produit.save()
+
+
+class AlerteStock(models.Model):
+    """
+    Ensemble matérialisé des produits en alerte ou en rupture de stock.
+
+    Une ligne n'existe que pour les produits dont le stock a franchi le
+    seuil d'alerte ; elle est maintenue par stock_app.alertes lors des
+    changements de stock_actuel ou de seuil_alerte.
+    """
+    NIVEAU_CHOICES = (
+        ('ALERTE', 'Stock faible'),
+        ('RUPTURE', 'Rupture'),
+    )
+
+    produit = models.OneToOneField(
+        Produit,
+        on_delete=models.CASCADE,
+        related_name='alerte_stock',
+        verbose_name='Produit'
+    )
+    niveau = models.CharField(
+        max_length=10,
+        choices=NIVEAU_CHOICES,
+        db_index=True,
+        verbose_name='Niveau'
+    )
+    date_declenchement = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Date de déclenchement'
+    )
+
+    objects = ParRestaurantManager.par('produit__restaurant')
+
+    class Meta:
+        verbose_name = 'Alerte de stock'
+        verbose_name_plural = 'Alertes de stock'
+        ordering = ['-date_declenchement']
+
+    def __str__(self):
+        return f"{self.get_niveau_display()} - {self.produit.nom}"
+
+
+class ValeurStock(models.Model):
+    """
+    Valeur du stock (stock_actuel x prix_vente) agrégée par catégorie.
+
+    Maintenue par delta par stock_app.valorisation à chaque changement de
+    stock ou de prix ; la valeur totale est la somme des catégories.
+    """
+    categorie = models.OneToOneField(
+        Categorie,
+        on_delete=models.CASCADE,
+        related_name='valeur_stock',
+        verbose_name='Catégorie'
+    )
+    valeur = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        verbose_name='Valeur'
+    )
+    date_mise_a_jour = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Date de mise à jour'
+    )
+
+    objects = ParRestaurantManager.par('categorie__restaurant')
+
+    class Meta:
+        verbose_name = 'Valeur du stock'
+        verbose_name_plural = 'Valeurs du stock'
+        ordering = ['categorie__nom']
+
+    def __str__(self):
+        return f"{self.categorie.nom} : {self.valeur}"
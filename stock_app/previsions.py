@@ -0,0 +1,222 @@
+"""
+Prévision de la demande et suggestions de réapprovisionnement.
+
+Les consommations journalières de tout le catalogue (ventes et sorties de
+stock) sont chargées en une matrice NumPy produits x jours ; une vente est
+imputée aux ingrédients de base de la recette du plat (produits_app/
+recettes.py), qui sont les stocks réellement consommés. Les moyennes
+mobiles, le lissage exponentiel, la couverture en jours et les quantités à
+commander sont ensuite calculés de façon vectorisée.
+
+NumPy (plus de 100 ms d'import) n'est importé qu'au premier calcul : le
+chargement des URL et les commandes qui n'en ont pas besoin restent rapides.
+"""
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from commandes_app.models import LigneCommande
+from produits_app.models import Produit
+from produits_app.recettes import expansion
+from .alertes import reconstruire_alertes
+from .models import MouvementStock
+
+# Paramètres par défaut de la planification
+JOURS_HISTORIQUE = 90
+FENETRE_MOYENNE = 7
+ALPHA_LISSAGE = 0.3
+DELAI_LIVRAISON = 3
+HORIZON_COMMANDE = 7
+# Facteur de service (~95 %) appliqué à l'écart-type de la demande
+FACTEUR_SECURITE = 1.65
+
+
+@dataclass
+class Suggestion:
+    """
+    Suggestion de réapprovisionnement pour un produit
+    """
+    produit_id: int
+    nom: str
+    stock_actuel: int
+    seuil_alerte: int
+    moyenne_mobile: float
+    demande_lissee: float
+    couverture_jours: float
+    seuil_suggere: int
+    quantite_suggeree: int
+
+
+def charger_consommations(jours=JOURS_HISTORIQUE, fin=None):
+    """
+    Charge les consommations journalières par produit.
+
+    Retourne (produits, matrice) où produits est la liste des tuples
+    (id, nom, stock_actuel, seuil_alerte) des produits actifs et matrice un
+    tableau (len(produits), jours) des quantités consommées par jour, le
+    jour le plus récent en dernière colonne.
+    """
+    import numpy as np
+
+    fin = fin or timezone.localdate()
+    debut = fin - timedelta(days=jours - 1)
+
+    produits = list(
+        Produit.objects.filter(is_active=True)
+        .order_by('pk')
+        .values_list('pk', 'nom', 'stock_actuel', 'seuil_alerte')
+    )
+    index = {pk: i for i, (pk, _, _, _) in enumerate(produits)}
+    matrice = np.zeros((len(produits), jours), dtype=np.float64)
+    if not produits:
+        return produits, matrice
+
+    ventes = (
+        LigneCommande.objects
+        .filter(commande__date_commande__date__gte=debut, commande__date_commande__date__lte=fin)
+        .exclude(commande__statut='ANNULEE')
+        .annotate(jour=TruncDate('commande__date_commande'))
+        .values_list('produit_id', 'jour')
+        .annotate(quantite=Sum('quantite'))
+        .order_by()
+    )
+    sorties = (
+        MouvementStock.objects
+        .filter(
+            type_mouvement__in=['SORTIE', 'PERTE'],
+            date_mouvement__date__gte=debut,
+            date_mouvement__date__lte=fin,
+        )
+        .annotate(jour=TruncDate('date_mouvement'))
+        .values_list('produit_id', 'jour')
+        .annotate(quantite=Sum('quantite'))
+        .order_by()
+    )
+
+    # Plat vendu : consommation de ses ingrédients de base
+    ventes = [
+        (ingredient_id, jour, quantite * par_portion)
+        for produit_id, jour, quantite in ventes
+        for ingredient_id, par_portion in expansion(produit_id).items()
+    ]
+    for source in (ventes, sorties):
+        lignes = [
+            (index[produit_id], (jour - debut).days, quantite)
+            for produit_id, jour, quantite in source
+            if produit_id in index
+        ]
+        if lignes:
+            lignes_idx, colonnes, quantites = map(np.asarray, zip(*lignes))
+            np.add.at(matrice, (lignes_idx, colonnes), quantites)
+
+    return produits, matrice
+
+
+def lissage_exponentiel(matrice, alpha=ALPHA_LISSAGE):
+    """
+    Lissage exponentiel simple de chaque ligne, initialisé sur la première
+    colonne ; renvoie le dernier niveau lissé par produit
+    """
+    import numpy as np
+
+    n_jours = matrice.shape[1]
+    if n_jours == 0:
+        return np.zeros(matrice.shape[0])
+    # s_n = (1-a)^(n-1) x_0 + sum_{t>=1} a (1-a)^(n-1-t) x_t
+    exposants = np.arange(n_jours - 1, -1, -1)
+    poids = alpha * (1 - alpha) ** exposants
+    poids[0] = (1 - alpha) ** (n_jours - 1)
+    return matrice @ poids
+
+
+def calculer_previsions(
+    matrice,
+    stocks,
+    fenetre=FENETRE_MOYENNE,
+    alpha=ALPHA_LISSAGE,
+    delai=DELAI_LIVRAISON,
+    horizon=HORIZON_COMMANDE,
+    facteur_securite=FACTEUR_SECURITE,
+):
+    """
+    Calcule, pour chaque ligne de la matrice de consommation :
+    moyenne mobile, demande lissée, couverture en jours, seuil d'alerte
+    suggéré et quantité à commander. Toutes les sorties sont des tableaux
+    NumPy alignés sur les lignes de la matrice.
+    """
+    import numpy as np
+
+    stocks = np.asarray(stocks, dtype=np.float64)
+    fenetre = max(1, min(fenetre, matrice.shape[1]))
+
+    moyenne_mobile = matrice[:, -fenetre:].mean(axis=1) if matrice.shape[1] else np.zeros(len(stocks))
+    demande_lissee = lissage_exponentiel(matrice, alpha)
+    ecart_type = matrice.std(axis=1) if matrice.shape[1] else np.zeros(len(stocks))
+
+    # On retient la demande la plus prudente des deux estimateurs
+    demande = np.maximum(moyenne_mobile, demande_lissee)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        couverture = np.where(demande > 0, np.maximum(stocks, 0) / demande, np.inf)
+
+    stock_securite = facteur_securite * ecart_type * np.sqrt(delai)
+    seuil_suggere = np.ceil(demande * delai + stock_securite).astype(np.int64)
+    besoin = demande * (delai + horizon) + stock_securite - stocks
+    quantite_suggeree = np.ceil(np.clip(besoin, 0, None)).astype(np.int64)
+
+    return {
+        'moyenne_mobile': moyenne_mobile,
+        'demande_lissee': demande_lissee,
+        'couverture_jours': couverture,
+        'seuil_suggere': seuil_suggere,
+        'quantite_suggeree': quantite_suggeree,
+    }
+
+
+def suggestions_reapprovisionnement(jours=JOURS_HISTORIQUE, **parametres):
+    """
+    Suggestions pour tout le catalogue actif, triées par couverture
+    croissante (les produits les plus urgents en premier)
+    """
+    import numpy as np
+
+    produits, matrice = charger_consommations(jours)
+    if not produits:
+        return []
+    resultats = calculer_previsions(matrice, [p[2] for p in produits], **parametres)
+
+    ordre = np.argsort(resultats['couverture_jours'], kind='stable')
+    return [
+        Suggestion(
+            produit_id=produits[i][0],
+            nom=produits[i][1],
+            stock_actuel=produits[i][2],
+            seuil_alerte=produits[i][3],
+            moyenne_mobile=float(resultats['moyenne_mobile'][i]),
+            demande_lissee=float(resultats['demande_lissee'][i]),
+            couverture_jours=float(resultats['couverture_jours'][i]),
+            seuil_suggere=int(resultats['seuil_suggere'][i]),
+            quantite_suggeree=int(resultats['quantite_suggeree'][i]),
+        )
+        for i in ordre
+    ]
+
+
+def appliquer_seuils(suggestions):
+    """
+    Enregistre les seuils d'alerte suggérés et recalcule les alertes.
+    Les produits sans consommation sur la période gardent leur seuil.
+    Retourne le nombre de produits modifiés.
+    """
+    a_modifier = [
+        Produit(pk=s.produit_id, seuil_alerte=s.seuil_suggere)
+        for s in suggestions
+        if s.couverture_jours != float('inf') and s.seuil_suggere != s.seuil_alerte
+    ]
+    if a_modifier:
+        Produit.objects.bulk_update(a_modifier, ['seuil_alerte'], batch_size=500)
+        reconstruire_alertes()
+    return len(a_modifier)
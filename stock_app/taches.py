@@ -0,0 +1,13 @@
+"""
+Tâches différées du stock (exécutées par manage.py run_worker)
+"""
+from taches_app.file import tache
+from .valorisation import verifier_valorisation
+
+
+@tache(libelle='Vérification de la valorisation du stock')
+def verification_valorisation():
+    """
+    Recalcule la valorisation et corrige les écarts
+    """
+    return {'ecarts': len(verifier_valorisation())}
@@ -13,4 +13,8 @@ urlpatterns = [
     
     # Produits en stock faible
     path('alertes/', views.stock_alertes, name='stock_alertes'),
+    
+    # Suggestions de réapprovisionnement
+    path('reapprovisionnement/', views.reapprovisionnement, name='reapprovisionnement'),
+    path('reapprovisionnement/appliquer/', views.reapprovisionnement_appliquer, name='reapprovisionnement_appliquer'),
 ]
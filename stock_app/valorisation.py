@@ -0,0 +1,180 @@
+"""
+Valorisation incrémentale du stock.
+
+La valeur du stock par catégorie est tenue dans ValeurStock et ajustée par
+delta à chaque sauvegarde ou suppression de produit (mouvement de stock,
+vente, changement de prix ou de catégorie). Les lectures ne dépendent plus
+de la taille du catalogue. Une vérification périodique recalcule les
+agrégats et corrige les écarts éventuels.
+"""
+import logging
+import threading
+import time
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from produits_app.models import Produit
+from users.restaurants import activer
+from .models import ValeurStock
+
+logger = logging.getLogger(__name__)
+
+# Intervalle minimal entre deux vérifications mises en file (secondes)
+INTERVALLE_VERIFICATION = 3600
+
+_verrou_verification = threading.Lock()
+_derniere_verification = 0.0
+
+
+def _contribution(produit):
+    """
+    (categorie_id, valeur) du produit tel que chargé, ou None si les champs
+    nécessaires sont différés
+    """
+    champs = produit.__dict__
+    if not all(nom in champs for nom in ('categorie_id', 'stock_actuel', 'prix_vente')):
+        return None
+    if champs['prix_vente'] is None:
+        return None
+    return champs['categorie_id'], Decimal(champs['stock_actuel']) * Decimal(champs['prix_vente'])
+
+
+def _ajuster(categorie_id, delta):
+    if not delta:
+        return
+    ligne = ValeurStock.objects.tous().filter(categorie_id=categorie_id)
+    if ligne.update(valeur=F('valeur') + delta, date_mise_a_jour=timezone.now()):
+        return
+    try:
+        with transaction.atomic():
+            ValeurStock.objects.create(categorie_id=categorie_id, valeur=delta)
+    except IntegrityError:
+        # Ligne créée entre-temps par une transaction concurrente
+        ligne.update(valeur=F('valeur') + delta, date_mise_a_jour=timezone.now())
+
+
+def ajuster_valeurs(deltas):
+    """
+    Applique des variations de valeur par catégorie : {categorie_id: delta}
+    """
+    for categorie_id, delta in deltas.items():
+        _ajuster(categorie_id, delta)
+
+
+@receiver(post_init, sender=Produit)
+def memoriser_contribution(sender, instance, **kwargs):
+    instance._valeur_stock = _contribution(instance)
+
+
+@receiver(post_save, sender=Produit)
+def appliquer_delta(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    ancienne = None if created else getattr(instance, '_valeur_stock', None)
+    nouvelle = _contribution(instance)
+    if nouvelle is None or (not created and ancienne is None):
+        # Instance partiellement chargée : on ne peut pas calculer de delta
+        return
+    if ancienne == nouvelle:
+        return
+    with transaction.atomic():
+        if ancienne is not None and ancienne[0] != nouvelle[0]:
+            _ajuster(ancienne[0], -ancienne[1])
+            _ajuster(nouvelle[0], nouvelle[1])
+        else:
+            _ajuster(nouvelle[0], nouvelle[1] - (ancienne[1] if ancienne else 0))
+    instance._valeur_stock = nouvelle
+
+
+@receiver(post_delete, sender=Produit)
+def retirer_contribution(sender, instance, **kwargs):
+    contribution = getattr(instance, '_valeur_stock', None)
+    if contribution is not None:
+        _ajuster(contribution[0], -contribution[1])
+
+
+def valeur_totale():
+    """
+    Valeur totale du stock
+    """
+    return ValeurStock.objects.aggregate(total=Sum('valeur'))['total'] or Decimal('0')
+
+
+def valeur_par_categorie():
+    """
+    Valeur du stock par catégorie, la plus élevée en premier
+    """
+    return ValeurStock.objects.select_related('categorie').order_by('-valeur')
+
+
+def verifier_valorisation(corriger=True):
+    """
+    Recalcule la valorisation depuis le catalogue et la compare aux agrégats
+    maintenus. Retourne la liste des écarts (categorie_id, maintenue, réelle)
+    et, si corriger est vrai, réaligne les agrégats.
+    """
+    reelles = {
+        ligne['categorie_id']: ligne['valeur'] or Decimal('0')
+        for ligne in Produit.objects.values('categorie_id').annotate(
+            valeur=Sum(F('stock_actuel') * F('prix_vente'))
+        ).order_by()
+    }
+    maintenues = dict(ValeurStock.objects.values_list('categorie_id', 'valeur'))
+
+    ecarts = []
+    for categorie_id in set(reelles) | set(maintenues):
+        reelle = Decimal(reelles.get(categorie_id, 0)).quantize(Decimal('0.01'))
+        maintenue = Decimal(maintenues.get(categorie_id, 0)).quantize(Decimal('0.01'))
+        if reelle != maintenue:
+            ecarts.append((categorie_id, maintenue, reelle))
+
+    for categorie_id, maintenue, reelle in ecarts:
+        logger.warning(
+            "Écart de valorisation pour la catégorie %s : %s maintenu, %s recalculé",
+            categorie_id, maintenue, reelle,
+        )
+        if corriger:
+            _corriger(categorie_id)
+    return ecarts
+
+
+def _corriger(categorie_id):
+    """
+    Réaligne la valeur d'une catégorie, produits verrouillés : un mouvement
+    de stock validé entre le calcul et l'écriture n'est pas écrasé
+    """
+    with transaction.atomic():
+        # Même ordre de verrouillage que appliquer_variations : produits, puis valeur
+        produits = Produit.objects.tous().select_for_update().filter(categorie_id=categorie_id)
+        reelle = sum(
+            (Decimal(stock) * prix for stock, prix in produits.values_list('stock_actuel', 'prix_vente')),
+            Decimal('0'),
+        )
+        ligne = ValeurStock.objects.tous().filter(categorie_id=categorie_id)
+        if not ligne.update(valeur=reelle, date_mise_a_jour=timezone.now()) and reelle:
+            ValeurStock.objects.create(categorie_id=categorie_id, valeur=reelle)
+
+
+def planifier_verification():
+    """
+    Met en file la vérification de tout le réseau, au plus une fois par
+    INTERVALLE_VERIFICATION
+    """
+    from taches_app.file import mettre_en_file
+    from .taches import verification_valorisation
+
+    global _derniere_verification
+    with _verrou_verification:
+        maintenant = time.monotonic()
+        if _derniere_verification and maintenant - _derniere_verification < INTERVALLE_VERIFICATION:
+            return False
+        _derniere_verification = maintenant
+
+    with activer(None):
+        mettre_en_file(verification_valorisation, unique=True)
+    return True
@@ -1,36 +1,36 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.contrib.auth.decorators import login_required
+from django.views.decorators.http import require_POST
+from users.permissions import manager_requis, staff_requis
 from django.contrib import messages
-from django.db.models import Sum, F
 from django.core.paginator import Paginator
 from .models import MouvementStock
 from .forms import MouvementStockForm
+from .alertes import compter_alertes, produits_en_alerte, produits_en_rupture
+from .previsions import appliquer_seuils, suggestions_reapprovisionnement
+from .valorisation import planifier_verification, valeur_par_categorie, valeur_totale
 from produits_app.models import Produit
 
-@login_required
+@staff_requis
 def dashboard_stock(request):
     """
     Dashboard des stocks
     """
     # Statistiques générales
     total_produits = Produit.objects.count()
-    produits_en_stock = Produit.objects.filter(stock_actuel__gt=0).count()
-    produits_en_rupture = Produit.objects.filter(stock_actuel=0).count()
-    stock_critique = Produit.objects.filter(stock_actuel__lte=F('seuil_alerte')).count()
+    alertes = compter_alertes()
+    produits_en_rupture = alertes['RUPTURE']
+    produits_en_stock = total_produits - produits_en_rupture
+    stock_critique = alertes['ALERTE'] + alertes['RUPTURE']
     
     # Valeur du stock
-    valeur_stock = Produit.objects.aggregate(
-        total=Sum(F('stock_actuel') * F('prix_vente'))
-    )['total'] or 0
+    valeur_stock = valeur_totale()
+    planifier_verification()
     
     # Derniers mouvements
     derniers_mouvements = MouvementStock.objects.select_related('produit').order_by('-date_mouvement')[:10]
     
     # Produits en alerte
-    produits_alerte = Produit.objects.filter(
-        stock_actuel__lte=F('seuil_alerte'),
-        stock_actuel__gt=0
-    ).order_by('stock_actuel')[:10]
+    produits_alerte = produits_en_alerte().order_by('stock_actuel')[:10]
     
     context = {
         'total_produits': total_produits,
@@ -38,13 +38,14 @@ def dashboard_stock(request):
         'produits_en_rupture': produits_en_rupture,
         'stock_critique': stock_critique,
         'valeur_stock': valeur_stock,
+        'valeurs_categories': valeur_par_categorie(),
         'derniers_mouvements': derniers_mouvements,
         'produits_alerte': produits_alerte,
     }
     
     return render(request, 'stock_app/dashboard.html', context)
 
-@login_required
+@staff_requis
 def mouvement_list(request):
     """
     Liste des mouvements de stock
@@ -73,7 +74,7 @@ def mouvement_list(request):
         'produit_id': produit_id,
     })
 
-@login_required
+@staff_requis
 def mouvement_create(request):
     """
     Création d'un mouvement de stock
@@ -103,19 +104,16 @@ def mouvement_create(request):
         'title': 'Nouveau mouvement de stock'
     })
 
-@login_required
+@staff_requis
 def stock_alertes(request):
     """
     Page des alertes de stock
     """
     # Produits en rupture
-    produits_rupture = Produit.objects.filter(stock_actuel=0).order_by('nom')
+    produits_rupture = produits_en_rupture().order_by('nom')
     
     # Produits en alerte (stock faible)
-    produits_alerte = Produit.objects.filter(
-        stock_actuel__gt=0,
-        stock_actuel__lte=F('seuil_alerte')
-    ).order_by('stock_actuel')
+    produits_alerte = produits_en_alerte().order_by('stock_actuel')
     
     context = {
         'produits_rupture': produits_rupture,
@@ -123,3 +121,26 @@ def stock_alertes(request):
     }
     
     return render(request, 'stock_app/stock_alertes.html', context)
+
+@staff_requis
+def reapprovisionnement(request):
+    """
+    Suggestions de réapprovisionnement (réservé au staff)
+    """
+    suggestions = suggestions_reapprovisionnement()
+    a_commander = [s for s in suggestions if s.quantite_suggeree > 0]
+    
+    return render(request, 'stock_app/reapprovisionnement.html', {
+        'suggestions': a_commander[:50],
+        'total_a_commander': len(a_commander),
+    })
+
+@manager_requis
+@require_POST
+def reapprovisionnement_appliquer(request):
+    """
+    Enregistrement des seuils d'alerte suggérés (réservé aux managers)
+    """
+    total = appliquer_seuils(suggestions_reapprovisionnement())
+    messages.success(request, f"{total} seuil(s) d'alerte mis à jour.")
+    return redirect('stock_app:reapprovisionnement')
@@ -0,0 +1,20 @@
+from django.contrib import admin
+from .models import Tache
+
+
+@admin.register(Tache)
+class TacheAdmin(admin.ModelAdmin):
+    """
+    Tâches en lecture seule : elles sont inscrites par les vues et exécutées
+    par « manage.py run_worker »
+    """
+    list_display = ('nom', 'statut', 'tentatives', 'restaurant', 'demandeur', 'date_creation', 'date_fin')
+    list_filter = ('statut', 'nom', 'restaurant')
+    search_fields = ('nom',)
+    readonly_fields = ('verrou',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+from django.utils.module_loading import autodiscover_modules
+
+
+class TachesAppConfig(AppConfig):
+    name = 'taches_app'
+
+    def ready(self):
+        # Tâches déclarées dans le module taches.py de chaque app
+        autodiscover_modules('taches')
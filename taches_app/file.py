@@ -0,0 +1,288 @@
+"""
+File de tâches en base de données.
+
+Les traitements lents (exports, recalculs, variantes d'images) ne sont pas
+faits pendant la requête ni dans un thread du serveur web : la vue inscrit
+une ligne Tache et répond aussitôt, un travailleur (manage.py run_worker)
+la réserve et l'exécute dans son pool de threads.
+
+Les fonctions exécutables sont déclarées avec le décorateur @tache dans le
+module taches.py de chaque app, chargé au démarrage ; la ligne garde le nom
+de la fonction et ses arguments (JSON). La tâche s'exécute dans le
+restaurant courant au moment de sa mise en file.
+
+La réservation utilise SELECT ... FOR UPDATE SKIP LOCKED là où la base le
+permet (PostgreSQL) ; sous SQLite, une mise à jour conditionnelle sur le
+statut pose un jeton propre à la réservation, relu ensuite. Deux
+travailleurs ne prennent donc jamais la même tâche. Un échec est retenté
+après un délai exponentiel avec gigue jusqu'à tentatives_max, puis la
+tâche passe ECHOUEE avec la trace de l'erreur. Une tâche dont le verrou a
+expiré (travailleur arrêté en pleine exécution) est remise en attente.
+
+Le résultat est enregistré sur la ligne ; un fichier produit est rangé
+dans le stockage par défaut, son nom sous la clé « fichier » du résultat,
+et supprimé avec la ligne après CONSERVATION.
+"""
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from users.models import Restaurant
+from users.restaurants import activer, annuaire, restaurant_courant_id
+from .models import Tache
+
+logger = logging.getLogger(__name__)
+
+# Tentatives par défaut d'une tâche
+TENTATIVES = 3
+# Délai avant la première reprise (secondes), doublé à chaque échec
+REPRISE_BASE = 10
+REPRISE_MAX = 3600
+# Au-delà, une tâche EN_COURS est considérée comme abandonnée
+DUREE_VERROU = timedelta(minutes=30)
+# Durée de conservation des tâches terminées et de leurs fichiers
+CONSERVATION = timedelta(days=7)
+# Reprise des verrous expirés et purge, au plus une fois par intervalle (secondes)
+INTERVALLE_ENTRETIEN = 300
+TAILLE_ERREUR = 10000
+
+_registre = {}
+
+
+class TacheInconnue(Exception):
+    pass
+
+
+def tache(fonction=None, *, tentatives=TENTATIVES, libelle=None):
+    """
+    Décorateur : déclare une fonction exécutable par le travailleur
+    """
+    def declarer(fonction):
+        fonction.nom_tache = f'{fonction.__module__}.{fonction.__qualname__}'
+        fonction.tentatives = tentatives
+        fonction.libelle = libelle or fonction.__name__.replace('_', ' ').capitalize()
+        _registre[fonction.nom_tache] = fonction
+        return fonction
+
+    return declarer(fonction) if fonction is not None else declarer
+
+
+def libelle(nom):
+    """
+    Libellé affiché d'une tâche
+    """
+    fonction = _registre.get(nom)
+    return fonction.libelle if fonction is not None else nom
+
+
+def mettre_en_file(fonction, *arguments, delai=None, unique=False, demandeur=None):
+    """
+    Inscrit l'exécution de fonction(*arguments) et retourne la Tache ; avec
+    unique, une tâche identique encore en attente est réutilisée
+    """
+    nom = getattr(fonction, 'nom_tache', fonction)
+    if nom not in _registre:
+        raise TacheInconnue(f'Tâche non déclarée : {nom}')
+    arguments = list(arguments)
+    if unique:
+        existante = Tache.objects.filter(
+            nom=nom, arguments=arguments, statut='EN_ATTENTE', restaurant=restaurant_courant_id(),
+        ).first()
+        if existante is not None:
+            return existante
+    return Tache.objects.create(
+        nom=nom,
+        arguments=arguments,
+        tentatives_max=_registre[nom].tentatives,
+        executer_apres=timezone.now() + (delai or timedelta()),
+        demandeur=demandeur if demandeur is not None and demandeur.is_authenticated else None,
+    )
+
+
+def reserver(nombre, travailleur):
+    """
+    Réserve au plus `nombre` tâches dues pour le travailleur et les retourne
+    """
+    maintenant = timezone.now()
+    jeton = f'{travailleur[:48]}:{uuid.uuid4().hex[:12]}'
+    dues = Tache.objects.filter(statut='EN_ATTENTE', executer_apres__lte=maintenant).order_by('executer_apres', 'pk')
+    reservation = {
+        'statut': 'EN_COURS',
+        'verrou': jeton,
+        'date_verrou': maintenant,
+        'tentatives': F('tentatives') + 1,
+    }
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            pks = list(dues.select_for_update(skip_locked=True).values_list('pk', flat=True)[:nombre])
+            Tache.objects.filter(pk__in=pks).update(**reservation)
+    else:
+        # Une tâche prise entre-temps par un autre travailleur n'est plus
+        # EN_ATTENTE : la mise à jour l'ignore
+        pks = list(dues.values_list('pk', flat=True)[:nombre])
+        Tache.objects.filter(pk__in=pks, statut='EN_ATTENTE').update(**reservation)
+    if not pks:
+        return []
+    return list(Tache.objects.filter(verrou=jeton).order_by('executer_apres', 'pk'))
+
+
+def delai_reprise(tentative):
+    """
+    Attente avant la tentative suivante : exponentielle, plafonnée, avec une
+    gigue qui évite de relancer ensemble les tâches tombées ensemble
+    """
+    secondes = min(REPRISE_BASE * 2 ** max(tentative - 1, 0), REPRISE_MAX)
+    return timedelta(seconds=secondes * random.uniform(0.75, 1.25))
+
+
+def _restaurant(restaurant_id):
+    if restaurant_id is None:
+        return None
+    return annuaire().par_id.get(restaurant_id) or Restaurant.objects.filter(pk=restaurant_id).first()
+
+
+def _terminer(tache, **etat):
+    # Sans effet si le verrou a expiré et que la tâche a été reprise ailleurs
+    etat.update(verrou='', date_verrou=None)
+    Tache.objects.filter(pk=tache.pk, verrou=tache.verrou).update(**etat)
+    for champ, valeur in etat.items():
+        setattr(tache, champ, valeur)
+
+
+def executer(tache):
+    """
+    Exécute une tâche réservée et enregistre son issue ; retourne vrai si
+    elle a réussi
+    """
+    fonction = _registre.get(tache.nom)
+    try:
+        if fonction is None:
+            raise TacheInconnue(f'Tâche non déclarée : {tache.nom}')
+        with activer(_restaurant(tache.restaurant_id)):
+            resultat = fonction(*tache.arguments)
+    except Exception:
+        logger.exception("Échec de la tâche %s (tentative %s/%s)", tache, tache.tentatives, tache.tentatives_max)
+        maintenant = timezone.now()
+        if fonction is not None and tache.tentatives < tache.tentatives_max:
+            etat = {'statut': 'EN_ATTENTE', 'executer_apres': maintenant + delai_reprise(tache.tentatives)}
+        else:
+            etat = {'statut': 'ECHOUEE', 'date_fin': maintenant}
+        _terminer(tache, erreur=traceback.format_exc()[-TAILLE_ERREUR:], **etat)
+        return False
+    _terminer(tache, statut='REUSSIE', resultat=resultat, erreur='', date_fin=timezone.now())
+    return True
+
+
+def executer_en_attente(travailleur='local'):
+    """
+    Exécute dans le thread courant les tâches dues jusqu'à épuisement
+    (tests, commandes) ; retourne le nombre de tâches exécutées
+    """
+    executees = 0
+    while True:
+        taches = reserver(20, travailleur)
+        if not taches:
+            return executees
+        for tache in taches:
+            executer(tache)
+            executees += 1
+
+
+def liberer_taches_perdues():
+    """
+    Remet en attente les tâches dont le verrou a expiré, ou les marque
+    échouées si elles ont épuisé leurs tentatives
+    """
+    maintenant = timezone.now()
+    perdues = Tache.objects.filter(statut='EN_COURS', date_verrou__lt=maintenant - DUREE_VERROU)
+    reprises = perdues.filter(tentatives__lt=F('tentatives_max')).update(
+        statut='EN_ATTENTE', verrou='', date_verrou=None, executer_apres=maintenant,
+    )
+    echouees = perdues.update(
+        statut='ECHOUEE', verrou='', date_verrou=None, date_fin=maintenant,
+        erreur='Travailleur interrompu pendant la tâche.',
+    )
+    return reprises + echouees
+
+
+def purger():
+    """
+    Supprime les tâches terminées depuis plus de CONSERVATION et leurs
+    fichiers
+    """
+    anciennes = Tache.objects.filter(
+        statut__in=('REUSSIE', 'ECHOUEE'), date_fin__lt=timezone.now() - CONSERVATION,
+    )
+    for resultat in anciennes.values_list('resultat', flat=True).iterator():
+        if isinstance(resultat, dict) and resultat.get('fichier'):
+            try:
+                default_storage.delete(resultat['fichier'])
+            except OSError:
+                logger.warning("Impossible de supprimer le fichier %s", resultat['fichier'])
+    return anciennes.delete()[0]
+
+
+class Travailleur:
+    """
+    Pool de threads alimenté à mesure que ses threads se libèrent
+    """
+
+    def __init__(self, threads=4, pause=1.0, nom=None):
+        self.threads = max(threads, 1)
+        self.pause = pause
+        self.nom = nom or f'{socket.gethostname()}:{os.getpid()}'
+        self.executees = 0
+        self._arret = threading.Event()
+
+    def arreter(self):
+        self._arret.set()
+
+    def _executer(self, tache):
+        try:
+            return executer(tache)
+        finally:
+            connection.close()
+
+    def tourner(self, une_fois=False):
+        """
+        Réserve et exécute les tâches jusqu'à arreter() ; avec une_fois,
+        s'arrête dès qu'aucune tâche n'est due ni en cours. Retourne le
+        nombre de tâches exécutées.
+        """
+        entretien = None
+        en_cours = set()
+        with ThreadPoolExecutor(self.threads, thread_name_prefix='tache') as pool:
+            while not self._arret.is_set():
+                if entretien is None or time.monotonic() - entretien > INTERVALLE_ENTRETIEN:
+                    liberer_taches_perdues()
+                    purger()
+                    entretien = time.monotonic()
+                libres = self.threads - len(en_cours)
+                taches = reserver(libres, self.nom) if libres else []
+                en_cours.update(pool.submit(self._executer, tache) for tache in taches)
+                if taches and len(en_cours) < self.threads:
+                    # D'autres tâches sont peut-être dues
+                    continue
+                if en_cours:
+                    terminees, en_cours = wait(en_cours, timeout=self.pause, return_when=FIRST_COMPLETED)
+                    self.executees += len(terminees)
+                elif une_fois:
+                    break
+                else:
+                    self._arret.wait(self.pause)
+            terminees, _ = wait(en_cours)
+            self.executees += len(terminees)
+        connection.close()
+        return self.executees
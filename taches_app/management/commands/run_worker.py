@@ -0,0 +1,32 @@
+import signal
+
+from django.core.management.base import BaseCommand
+
+from taches_app.file import Travailleur
+
+
+class Command(BaseCommand):
+    help = ("Exécute les tâches en file (exports, recalculs, images) dans un pool de threads ; "
+            "plusieurs travailleurs peuvent tourner en même temps")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4, help='Tâches exécutées en parallèle (défaut : 4)')
+        parser.add_argument('--pause', type=float, default=1.0,
+                            help="Attente entre deux consultations de la file vide, en secondes (défaut : 1)")
+        parser.add_argument('--une-fois', action='store_true',
+                            help="S'arrêter dès que la file est vide (tâche planifiée, cron)")
+
+    def handle(self, *args, **options):
+        travailleur = Travailleur(threads=options['threads'], pause=options['pause'])
+
+        def arreter(signum, frame):
+            # Les tâches en cours vont à leur terme
+            self.stdout.write('Arrêt demandé, fin des tâches en cours...')
+            travailleur.arreter()
+
+        for signal_arret in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signal_arret, arreter)
+
+        self.stdout.write(f'Travailleur {travailleur.nom} : {travailleur.threads} thread(s)')
+        executees = travailleur.tourner(une_fois=options['une_fois'])
+        self.stdout.write(self.style.SUCCESS(f'{executees} tâche(s) exécutée(s).'))
@@ -0,0 +1,107 @@
+from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.utils import timezone
+
+from users.models import Restaurant
+
+User = get_user_model()
+
+
+class Tache(models.Model):
+    """
+    Traitement différé (export, recalcul, images), exécuté par un
+    travailleur lancé avec « manage.py run_worker »
+    """
+    STATUT_CHOICES = (
+        ('EN_ATTENTE', 'En attente'),
+        ('EN_COURS', 'En cours'),
+        ('REUSSIE', 'Réussie'),
+        ('ECHOUEE', 'Échouée'),
+    )
+
+    restaurant = models.ForeignKey(
+        Restaurant,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='taches',
+        verbose_name='Restaurant'
+    )
+    nom = models.CharField(
+        max_length=200,
+        verbose_name='Tâche'
+    )
+    arguments = models.JSONField(
+        default=list,
+        blank=True,
+        encoder=DjangoJSONEncoder,
+        verbose_name='Arguments'
+    )
+    statut = models.CharField(
+        max_length=20,
+        choices=STATUT_CHOICES,
+        default='EN_ATTENTE',
+        verbose_name='Statut'
+    )
+    tentatives = models.PositiveSmallIntegerField(default=0, verbose_name='Tentatives')
+    tentatives_max = models.PositiveSmallIntegerField(default=3, verbose_name='Tentatives maximum')
+    executer_apres = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Exécuter après'
+    )
+    # Jeton du travailleur qui a réservé la tâche
+    verrou = models.CharField(
+        max_length=64,
+        blank=True,
+        editable=False,
+        verbose_name='Réservée par'
+    )
+    date_verrou = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Réservée le'
+    )
+    resultat = models.JSONField(
+        null=True,
+        blank=True,
+        encoder=DjangoJSONEncoder,
+        verbose_name='Résultat'
+    )
+    erreur = models.TextField(
+        blank=True,
+        verbose_name='Dernière erreur'
+    )
+    demandeur = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='taches',
+        verbose_name='Demandée par'
+    )
+    date_creation = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Date de création'
+    )
+    date_fin = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Date de fin'
+    )
+
+    class Meta:
+        verbose_name = 'Tâche'
+        verbose_name_plural = 'Tâches'
+        ordering = ['-date_creation']
+        indexes = [
+            # Réservation des tâches dues et reprise des verrous expirés
+            models.Index(fields=['statut', 'executer_apres'], name='tache_statut_executer_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.nom} #{self.pk} ({self.get_statut_display()})"
+
+    @property
+    def terminee(self):
+        return self.statut in ('REUSSIE', 'ECHOUEE')
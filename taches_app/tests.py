@@ -0,0 +1,111 @@
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from commandes_app.models import Commande
+from restaurant_management.essais import CachesIsoles
+from users.models import User
+from .file import executer_en_attente, liberer_taches_perdues, mettre_en_file, reserver, tache
+from .models import Tache
+
+_appels = {}
+
+
+@tache(tentatives=2)
+def echoue_une_fois(cle):
+    _appels[cle] = _appels.get(cle, 0) + 1
+    if _appels[cle] == 1:
+        raise ValueError('Première tentative')
+    return {'appels': _appels[cle]}
+
+
+@tache(tentatives=2)
+def echoue_toujours():
+    raise ValueError('Toujours')
+
+
+class FileTachesTests(CachesIsoles, TestCase):
+    """
+    Réservation, reprises avec délai et échec définitif
+    """
+
+    def test_reservation_exclusive(self):
+        taches = [mettre_en_file(echoue_une_fois, f'r{rang}') for rang in range(3)]
+        # Une tâche identique en attente n'est pas dupliquée
+        self.assertEqual(mettre_en_file(echoue_une_fois, 'r0', unique=True), taches[0])
+
+        premiers = reserver(2, 'a')
+        seconds = reserver(2, 'b')
+        self.assertEqual(len(premiers), 2)
+        self.assertEqual([t.pk for t in seconds], [taches[2].pk])
+        self.assertEqual(reserver(2, 'c'), [])
+        self.assertTrue(all(t.statut == 'EN_COURS' and t.tentatives == 1 for t in premiers + seconds))
+
+        # Travailleur arrêté en pleine tâche : verrou expiré, tâche reprise
+        Tache.objects.filter(pk=taches[2].pk).update(date_verrou=timezone.now() - timedelta(hours=1))
+        self.assertEqual(liberer_taches_perdues(), 1)
+        self.assertEqual([t.pk for t in reserver(2, 'd')], [taches[2].pk])
+
+    def test_reprise_puis_echec(self):
+        reussie = mettre_en_file(echoue_une_fois, 'reprise')
+        echouee = mettre_en_file(echoue_toujours)
+        with self.assertLogs('taches_app.file', 'ERROR'):
+            self.assertEqual(executer_en_attente(), 2)
+
+        reussie.refresh_from_db()
+        self.assertEqual(reussie.statut, 'EN_ATTENTE')
+        self.assertGreater(reussie.executer_apres, timezone.now())
+        self.assertIn('Première tentative', reussie.erreur)
+        # Pas avant le délai de reprise
+        self.assertEqual(executer_en_attente(), 0)
+
+        Tache.objects.update(executer_apres=timezone.now())
+        with self.assertLogs('taches_app.file', 'ERROR') as journal:
+            self.assertEqual(executer_en_attente(), 2)
+        self.assertEqual(len(journal.records), 1)
+        reussie.refresh_from_db()
+        echouee.refresh_from_db()
+        self.assertEqual((reussie.statut, reussie.tentatives, reussie.resultat), ('REUSSIE', 2, {'appels': 2}))
+        self.assertEqual((echouee.statut, echouee.tentatives), ('ECHOUEE', 2))
+        self.assertIn('Toujours', echouee.erreur)
+
+
+class ExportTests(CachesIsoles, TestCase):
+    """
+    Export du chiffre d'affaires mis en file puis téléchargé
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.racine = tempfile.mkdtemp()
+        reglages = override_settings(MEDIA_ROOT=self.racine)
+        reglages.enable()
+        self.addCleanup(reglages.disable)
+        self.addCleanup(shutil.rmtree, self.racine, ignore_errors=True)
+        self.gerant = User.objects.create_user('gerant', password='motdepasse', role='MANAGER')
+
+    def test_export_ca(self):
+        commande = Commande.objects.create(nom_client='Awa', statut='SERVIE', montant_total=Decimal('4500'))
+        self.client.force_login(self.gerant)
+        reponse = self.client.get(reverse('stats_app:export_ca'), {'periode': 'mois'})
+        tache_export = Tache.objects.get()
+        self.assertRedirects(reponse, reverse('taches_app:detail', args=[tache_export.pk]))
+        self.assertEqual(tache_export.demandeur, self.gerant)
+        self.assertEqual(self.client.get(reverse('taches_app:etat', args=[tache_export.pk])).json()['statut'],
+                         'EN_ATTENTE')
+
+        self.assertEqual(executer_en_attente(), 1)
+        etat = self.client.get(reverse('taches_app:etat', args=[tache_export.pk])).json()
+        self.assertEqual((etat['statut'], etat['resultat']['lignes']), ('REUSSIE', 1))
+        reponse = self.client.get(etat['fichier'])
+        self.assertEqual(reponse.status_code, 200)
+        self.assertIn(commande.reference, b''.join(reponse.streaming_content).decode())
+
+        # Réservé au demandeur
+        self.client.force_login(User.objects.create_user('autre', password='motdepasse', role='MANAGER'))
+        self.assertEqual(self.client.get(etat['fichier']).status_code, 404)
@@ -0,0 +1,10 @@
+from django.urls import path
+from . import views
+
+app_name = 'taches_app'
+
+urlpatterns = [
+    path('<int:pk>/', views.tache_detail, name='detail'),
+    path('<int:pk>/etat/', views.tache_etat, name='etat'),
+    path('<int:pk>/fichier/', views.tache_fichier, name='fichier'),
+]
@@ -0,0 +1,72 @@
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, JsonResponse
+from django.shortcuts import get_object_or_404, render
+from django.urls import reverse
+from django.views.decorators.cache import cache_control
+
+from users.permissions import staff_requis
+from .file import libelle
+from .models import Tache
+
+
+def _tache_visible(request, pk):
+    """
+    Tâche demandée par l'utilisateur (toutes pour un administrateur)
+    """
+    tache = get_object_or_404(Tache, pk=pk)
+    if tache.demandeur_id != request.user.pk and not request.user.is_admin:
+        raise Http404
+    return tache
+
+
+def _fichier(tache):
+    resultat = tache.resultat if tache.statut == 'REUSSIE' else None
+    return resultat.get('fichier') if isinstance(resultat, dict) else None
+
+
+@staff_requis
+def tache_detail(request, pk):
+    """
+    Suivi d'une tâche : la page se recharge jusqu'à sa fin
+    """
+    tache = _tache_visible(request, pk)
+    context = {
+        'tache': tache,
+        'libelle': libelle(tache.nom),
+        'fichier': _fichier(tache),
+    }
+    return render(request, 'taches_app/detail.html', context)
+
+
+@staff_requis
+@cache_control(private=True, no_store=True)
+def tache_etat(request, pk):
+    """
+    État d'une tâche en JSON, pour le suivi sans recharger la page
+    """
+    tache = _tache_visible(request, pk)
+    etat = {
+        'statut': tache.statut,
+        'terminee': tache.terminee,
+        'tentatives': tache.tentatives,
+        'tentatives_max': tache.tentatives_max,
+    }
+    if tache.statut == 'REUSSIE':
+        etat['resultat'] = tache.resultat
+        if _fichier(tache):
+            etat['fichier'] = reverse('taches_app:fichier', args=[tache.pk])
+    return JsonResponse(etat)
+
+
+@staff_requis
+def tache_fichier(request, pk):
+    """
+    Téléchargement du fichier produit par une tâche
+    """
+    tache = _tache_visible(request, pk)
+    nom = _fichier(tache)
+    if not nom or not default_storage.exists(nom):
+        raise Http404
+    return FileResponse(
+        default_storage.open(nom, 'rb'), as_attachment=True, filename=tache.resultat.get('nom') or None,
+    )
@@ -1,21 +1,30 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import User
+from .models import Restaurant, User
+
+
+@admin.register(Restaurant)
+class RestaurantAdmin(admin.ModelAdmin):
+    list_display = ('nom', 'code', 'domaine', 'is_active', 'date_created')
+    list_filter = ('is_active',)
+    search_fields = ('nom', 'code', 'domaine')
+    prepopulated_fields = {'code': ('nom',)}
+
 
 @admin.register(User)
 class CustomUserAdmin(UserAdmin):
     """
     Configuration de l'admin pour le modèle User personnalisé
     """
-    list_display = ('username', 'email', 'first_name', 'last_name', 'role', 'is_active', 'date_created')
-    list_filter = ('role', 'is_active', 'date_created')
+    list_display = ('username', 'email', 'first_name', 'last_name', 'role', 'restaurant', 'is_active', 'date_created')
+    list_filter = ('role', 'restaurant', 'is_active', 'date_created')
     search_fields = ('username', 'email', 'first_name', 'last_name')
     ordering = ('-date_created',)
     
     fieldsets = (
         (None, {'fields': ('username', 'password')}),
         ('Informations personnelles', {'fields': ('first_name', 'last_name', 'email')}),
-        ('Rôle et contact', {'fields': ('role', 'telephone', 'adresse')}),
+        ('Rôle et contact', {'fields': ('role', 'restaurant', 'telephone', 'adresse')}),
         ('Permissions', {'fields': ('is_active', 'is_staff', 'is_superuser', 'groups', 'user_permissions')}),
         ('Dates importantes', {'fields': ('last_login', 'date_joined')}),
     )
@@ -23,6 +32,6 @@ class CustomUserAdmin(UserAdmin):
     add_fieldsets = (
         (None, {
             'classes': ('wide',),
-            'fields': ('username', 'email', 'first_name', 'last_name', 'role', 'telephone', 'adresse', 'password1', 'password2'),
+            'fields': ('username', 'email', 'first_name', 'last_name', 'role', 'restaurant', 'telephone', 'adresse', 'password1', 'password2'),
         }),
     )
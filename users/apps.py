@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class UsersConfig(AppConfig):
     name = 'users'
+
+    def ready(self):
+        # Rôle mis en cache dans la session, invalidation du cache des utilisateurs
+        from . import backends, permissions  # noqa: F401
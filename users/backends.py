@@ -0,0 +1,82 @@
+"""
+Backend d'authentification avec cache des utilisateurs par processus.
+
+Avec les sessions cached_db, une requête authentifiée ne lit plus la table
+des sessions ; ce backend évite en plus le chargement de la ligne
+users_user. Chaque utilisateur est gardé en mémoire avec un numéro de
+version partagé via le cache Django, incrémenté à chaque enregistrement ou
+suppression de l'utilisateur (mot de passe, rôle, activation, profil) :
+un processus recharge l'utilisateur à la première requête suivante.
+"""
+import copy
+import threading
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.exceptions import ValidationError
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .restaurants import incrementer_apres_validation, version
+
+User = get_user_model()
+
+# Au-delà, le cache est vidé plutôt que de grossir sans limite
+TAILLE_MAX = 1000
+
+_verrou = threading.Lock()
+# pk -> (version, utilisateur)
+_utilisateurs = {}
+
+
+def _cle_version(pk):
+    return f'utilisateur:version:{pk}'
+
+
+def utilisateur_en_cache(pk):
+    """
+    Copie de l'utilisateur gardé en mémoire, rechargé si sa version a
+    changé ; None s'il n'existe pas
+    """
+    courante = version(_cle_version(pk))
+    entree = _utilisateurs.get(pk)
+    if entree is None or entree[0] != courante:
+        try:
+            utilisateur = User._default_manager.get(pk=pk)
+        except User.DoesNotExist:
+            return None
+        with _verrou:
+            if len(_utilisateurs) >= TAILLE_MAX:
+                _utilisateurs.clear()
+            _utilisateurs[pk] = entree = (courante, utilisateur)
+    # Une copie par requête : les modifications d'une vue ne fuient pas
+    return copy.copy(entree[1])
+
+
+def invalider_utilisateur(pk):
+    """
+    Retire l'utilisateur du cache du processus et incrémente sa version
+    après validation de la transaction en cours
+    """
+    _utilisateurs.pop(pk, None)
+    incrementer_apres_validation(_cle_version(pk))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def utilisateur_modifie(sender, instance, **kwargs):
+    invalider_utilisateur(instance.pk)
+
+
+class UtilisateurEnCacheBackend(ModelBackend):
+    """
+    ModelBackend dont get_user passe par le cache des utilisateurs
+    """
+
+    def get_user(self, user_id):
+        try:
+            pk = User._meta.pk.to_python(user_id)
+        except ValidationError:
+            return None
+        utilisateur = utilisateur_en_cache(pk)
+        return utilisateur if utilisateur is not None and self.user_can_authenticate(utilisateur) else None
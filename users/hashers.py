@@ -0,0 +1,53 @@
+"""
+Hachage des mots de passe à coût configurable.
+
+Le nombre d'itérations PBKDF2 vient du réglage PBKDF2_ITERATIONS (fichier
+.env), calibré sur l'hôte au déploiement par la commande calibrer_hachage.
+Django ré-hache un mot de passe à la connexion lorsque son hachage
+enregistré n'a pas le coût ou l'algorithme préféré : changer le réglage
+met donc à jour les comptes au fil des connexions.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, get_hasher
+from django.utils.crypto import get_random_string
+
+# Plancher en dessous duquel la calibration ne descend pas
+ITERATIONS_MIN = 100_000
+
+
+class PBKDF2Configurable(PBKDF2PasswordHasher):
+    """
+    PBKDF2-SHA256 dont le nombre d'itérations suit PBKDF2_ITERATIONS
+    """
+
+    @property
+    def iterations(self):
+        return getattr(settings, 'PBKDF2_ITERATIONS', PBKDF2PasswordHasher.iterations)
+
+
+def mesurer(hasher, repetitions=3, **parametres):
+    """
+    Durée médiane (en secondes) du hachage d'un mot de passe
+    """
+    mot_de_passe = get_random_string(16)
+    durees = []
+    for _ in range(repetitions):
+        sel = hasher.salt()
+        debut = time.perf_counter()
+        hasher.encode(mot_de_passe, sel, **parametres)
+        durees.append(time.perf_counter() - debut)
+    return sorted(durees)[len(durees) // 2]
+
+
+def calibrer_pbkdf2(cible, repetitions=3):
+    """
+    Nombre d'itérations PBKDF2 (arrondi au millier, au moins ITERATIONS_MIN)
+    dont le hachage dure environ `cible` secondes sur cet hôte
+    """
+    hasher = get_hasher('pbkdf2_sha256')
+    echantillon = ITERATIONS_MIN
+    duree = mesurer(hasher, repetitions, iterations=echantillon)
+    iterations = int(echantillon * cible / duree) if duree else echantillon
+    return max(ITERATIONS_MIN, round(iterations, -3))
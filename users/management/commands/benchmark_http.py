@@ -0,0 +1,160 @@
+import json
+import os
+import platform
+import subprocess
+import tempfile
+from contextlib import redirect_stdout
+from datetime import datetime
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from commandes_app.charge import generer
+from produits_app.models import Produit
+from restaurant_management import benchmark
+from users.models import User
+
+MOT_DE_PASSE = 'benchmark'
+
+
+class Command(BaseCommand):
+    help = ("Banc d'essai HTTP des parcours (connexion, commande, statuts, stock, tableaux de bord, "
+            "export CSV) sur des jeux de données générés de taille croissante")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tailles', type=int, nargs='+', default=[1000, 10_000, 100_000],
+                            help='Nombres de commandes des jeux de données (défaut : 1000 10000 100000)')
+        parser.add_argument('--threads', type=int, default=8,
+                            help='Utilisateurs virtuels simultanés (défaut : 8)')
+        parser.add_argument('--iterations', type=int, default=5,
+                            help='Parcours complets par utilisateur virtuel (défaut : 5)')
+        parser.add_argument('--graine', type=int, default=42, help='Graine des jeux de données')
+        parser.add_argument('--sortie', help='Fichier JSON des résultats (défaut : benchmarks/http-<date>.json)')
+        parser.add_argument('--comparer', help='Résultats JSON précédents à comparer (p95 par étape)')
+
+    def handle(self, *args, **options):
+        reference = None
+        if options['comparer']:
+            try:
+                with open(options['comparer'], encoding='utf-8') as fichier:
+                    reference = json.load(fichier)
+            except (OSError, ValueError) as erreur:
+                raise CommandError(f"Résultats de référence illisibles : {erreur}")
+
+        resultats = {
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'commit': self._commit(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'base': connection.vendor,
+            'threads': options['threads'],
+            'iterations': options['iterations'],
+            'graine': options['graine'],
+            'pbkdf2_iterations': settings.PBKDF2_ITERATIONS,
+            'jeux': [],
+        }
+
+        # Base de test jetable, sur fichier pour SQLite : une base en
+        # mémoire partagée verrouille ses tables entre threads
+        fichier_base = None
+        if connection.vendor == 'sqlite':
+            descripteur, fichier_base = tempfile.mkstemp(suffix='.sqlite3')
+            os.close(descripteur)
+            connection.settings_dict['TEST']['NAME'] = fichier_base
+        nom_base = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            # Réglages de production : pas de journal des requêtes SQL
+            with override_settings(DEBUG=False, ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'localhost']):
+                for numero, taille in enumerate(sorted(options['tailles'])):
+                    resultats['jeux'].append(self._mesurer(numero, taille, options))
+        finally:
+            connection.creation.destroy_test_db(nom_base, verbosity=0)
+            if fichier_base and os.path.exists(fichier_base):
+                os.remove(fichier_base)
+
+        sortie = options['sortie'] or os.path.join(
+            settings.BASE_DIR, 'benchmarks', f"http-{datetime.now():%Y%m%d-%H%M%S}.json"
+        )
+        os.makedirs(os.path.dirname(os.path.abspath(sortie)), exist_ok=True)
+        with open(sortie, 'w', encoding='utf-8') as fichier:
+            json.dump(resultats, fichier, indent=2, ensure_ascii=False)
+
+        if reference:
+            self._comparer(reference, resultats)
+        self.stdout.write(self.style.SUCCESS(f'Résultats écrits dans {sortie}.'))
+
+    def _mesurer(self, numero, taille, options):
+        call_command('flush', interactive=False, verbosity=0)
+        cache.clear()
+        self.stdout.write(f'Jeu de {taille} commandes : génération…')
+        totaux = generer(
+            options['graine'], commandes=taille, produits=min(2000, max(100, taille // 50)),
+            mouvements=max(100, taille // 10),
+        )
+
+        mot_de_passe = make_password(MOT_DE_PASSE)
+        comptes = [(f'benchmark{i}', MOT_DE_PASSE) for i in range(max(options['threads'], 1))]
+        User.objects.bulk_create([
+            User(username=nom, password=mot_de_passe, role='MANAGER') for nom, _ in comptes
+        ])
+        # Produits sans recette et bien approvisionnés : les ajouts de lignes
+        # ne butent pas sur le stock
+        produits = list(Produit.objects.filter(
+            is_active=True, stock_actuel__gte=100, composants__isnull=True,
+        ).values_list('pk', flat=True)[:50])
+
+        # Application neuve par jeu : compteurs de RateLimitMiddleware remis à zéro
+        application = WSGIHandler()
+        with open(os.devnull, 'w') as nul, redirect_stdout(nul):
+            # TimingMiddleware écrit une ligne par requête
+            mesures, duree, abandons = benchmark.charger(
+                application, comptes, produits, options['iterations'], prefixe_adresse=f'10.{numero}',
+            )
+        etapes = mesures.resume(duree)
+
+        self.stdout.write(f"{'Étape':<28}{'Requêtes':>9}{'Erreurs':>9}{'Débit/s':>9}"
+                          f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+        for etape, indicateurs in etapes.items():
+            self.stdout.write(
+                f"{etape:<28}{indicateurs['requetes']:>9}{indicateurs['erreurs']:>9}{indicateurs['debit']:>9}"
+                f"{indicateurs['p50_ms']:>9}{indicateurs['p95_ms']:>9}{indicateurs['p99_ms']:>9}"
+            )
+        if abandons:
+            self.stderr.write(f'{abandons} parcours abandonné(s) sur une réponse inattendue.')
+        return {
+            'commandes': taille,
+            'donnees': totaux,
+            'duree_s': round(duree, 2),
+            'parcours_abandonnes': abandons,
+            'etapes': etapes,
+        }
+
+    def _comparer(self, reference, resultats):
+        precedents = {jeu['commandes']: jeu['etapes'] for jeu in reference.get('jeux', [])}
+        for jeu in resultats['jeux']:
+            anciennes = precedents.get(jeu['commandes'])
+            if not anciennes:
+                continue
+            self.stdout.write(f"p95 à {jeu['commandes']} commandes, par rapport au {reference.get('date')} :")
+            for etape, indicateurs in jeu['etapes'].items():
+                ancien = anciennes.get(etape, {}).get('p95_ms')
+                nouveau = indicateurs['p95_ms']
+                if ancien and nouveau is not None:
+                    self.stdout.write(f'  {etape:<28}{ancien:>9} → {nouveau:<9} ({(nouveau - ancien) / ancien:+.0%})')
+
+    def _commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
@@ -0,0 +1,64 @@
+import re
+
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    Argon2PasswordHasher,
+    BCryptSHA256PasswordHasher,
+    PBKDF2PasswordHasher,
+    ScryptPasswordHasher,
+)
+from django.core.management.base import BaseCommand
+
+from users.hashers import ITERATIONS_MIN, calibrer_pbkdf2, mesurer
+
+
+class Command(BaseCommand):
+    help = "Mesure le coût des algorithmes de hachage sur cet hôte et calibre PBKDF2_ITERATIONS"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cible-ms', type=int, default=250,
+                            help='Durée visée pour un hachage, en millisecondes (défaut : 250)')
+        parser.add_argument('--repetitions', type=int, default=3,
+                            help='Mesures par candidat, la médiane est retenue (défaut : 3)')
+        parser.add_argument('--ecrire', action='store_true',
+                            help='Écrire PBKDF2_ITERATIONS dans le fichier .env')
+
+    def handle(self, *args, **options):
+        repetitions = max(options['repetitions'], 1)
+        candidats = [
+            (f'pbkdf2_sha256 ({iterations} itérations)', PBKDF2PasswordHasher(), {'iterations': iterations})
+            for iterations in sorted({ITERATIONS_MIN, settings.PBKDF2_ITERATIONS, PBKDF2PasswordHasher.iterations})
+        ]
+        candidats += [
+            ('scrypt', ScryptPasswordHasher(), {}),
+            ('argon2', Argon2PasswordHasher(), {}),
+            ('bcrypt_sha256', BCryptSHA256PasswordHasher(), {}),
+        ]
+
+        for nom, hasher, parametres in candidats:
+            try:
+                duree = mesurer(hasher, repetitions, **parametres)
+            except ValueError:
+                # Bibliothèque optionnelle absente (argon2-cffi, bcrypt)
+                self.stdout.write(f'{nom:<40} non installé')
+                continue
+            self.stdout.write(f'{nom:<40} {duree * 1000:8.1f} ms')
+
+        iterations = calibrer_pbkdf2(options['cible_ms'] / 1000, repetitions)
+        self.stdout.write(self.style.SUCCESS(
+            f"PBKDF2_ITERATIONS={iterations} (environ {options['cible_ms']} ms, "
+            f"actuellement {settings.PBKDF2_ITERATIONS})"
+        ))
+        if options['ecrire']:
+            self._ecrire_env(iterations)
+
+    def _ecrire_env(self, iterations):
+        chemin = settings.BASE_DIR / '.env'
+        contenu = chemin.read_text(encoding='utf-8') if chemin.exists() else ''
+        ligne = f'PBKDF2_ITERATIONS={iterations}'
+        if re.search(r'^PBKDF2_ITERATIONS=.*$', contenu, re.MULTILINE):
+            contenu = re.sub(r'^PBKDF2_ITERATIONS=.*$', ligne, contenu, flags=re.MULTILINE)
+        else:
+            contenu = contenu.rstrip('\n') + ('\n' if contenu else '') + ligne + '\n'
+        chemin.write_text(contenu, encoding='utf-8')
+        self.stdout.write(f'{chemin} mis à jour ; les mots de passe seront ré-hachés à la connexion.')
@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+
+from commandes_app.models import Cloture, Commande, Table, Tournee
+from commandes_app.tables import invalider_salle
+from produits_app.catalogue import invalider_catalogue
+from produits_app.models import Categorie, Produit, Promotion
+from produits_app.tarifs import invalider_tarifs
+from stock_app.models import MouvementStock
+from users.models import Restaurant, User
+
+# Modèles rattachés directement à leur restaurant ; les lignes, paiements,
+# alertes et valeurs de stock suivent leur commande, produit ou catégorie
+RATTACHES = (Categorie, Produit, Promotion, MouvementStock, Table, Commande, Tournee, Cloture)
+
+
+class Command(BaseCommand):
+    help = "Crée un restaurant du réseau, et lui rattache au besoin les données existantes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('code', help='Code court du restaurant (ex. : plateau)')
+        parser.add_argument('nom', help='Nom affiché du restaurant')
+        parser.add_argument('--domaine', help='Nom de domaine servant ce restaurant')
+        parser.add_argument('--rattacher', action='store_true',
+                            help="Rattache au restaurant les données et le personnel sans restaurant "
+                                 "(passage d'une installation à un seul restaurant au réseau)")
+
+    def handle(self, *args, **options):
+        if Restaurant.objects.filter(code=options['code']).exists():
+            raise CommandError(f"Le restaurant {options['code']} existe déjà.")
+
+        try:
+            with transaction.atomic():
+                restaurant = Restaurant.objects.create(
+                    code=options['code'], nom=options['nom'], domaine=options['domaine'] or None,
+                )
+                rattaches = {}
+                if options['rattacher']:
+                    for modele in RATTACHES:
+                        rattaches[modele._meta.verbose_name_plural] = modele.objects.tous().filter(
+                            restaurant__isnull=True,
+                        ).update(restaurant=restaurant)
+                    # Les clients restent communs au réseau
+                    rattaches['personnel'] = User.objects.filter(
+                        restaurant__isnull=True,
+                    ).exclude(role='CLIENT').update(restaurant=restaurant)
+        except IntegrityError as erreur:
+            raise CommandError(f'Rattachement impossible : {erreur}')
+
+        if options['rattacher']:
+            # update() n'émet pas de signal
+            invalider_catalogue()
+            invalider_catalogue(restaurant.pk)
+            invalider_salle()
+            invalider_salle(restaurant.pk)
+            invalider_tarifs()
+            invalider_tarifs(restaurant.pk)
+            for nom, nombre in rattaches.items():
+                self.stdout.write(f'{nom:<20} {nombre:>10}')
+        self.stdout.write(self.style.SUCCESS(f'Restaurant {restaurant} ({restaurant.code}) créé.'))
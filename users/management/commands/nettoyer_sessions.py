@@ -0,0 +1,33 @@
+import time
+
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = "Supprime les sessions expirées par petits lots, sans bloquer longtemps la base"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lot', type=int, default=500,
+                            help='Nombre de sessions supprimées par transaction (défaut : 500)')
+        parser.add_argument('--pause', type=float, default=0.05,
+                            help='Pause en secondes entre deux lots (défaut : 0.05)')
+
+    def handle(self, *args, **options):
+        lot = max(options['lot'], 1)
+        maintenant = timezone.now()
+        expirees = Session.objects.filter(expire_date__lt=maintenant)
+
+        total = 0
+        while True:
+            cles = list(expirees.values_list('pk', flat=True)[:lot])
+            if not cles:
+                break
+            # Chaque lot est une transaction courte : les écritures de la
+            # caisse ne restent pas bloquées derrière un DELETE massif
+            total += Session.objects.filter(pk__in=cles).delete()[0]
+            if len(cles) < lot:
+                break
+            time.sleep(options['pause'])
+        self.stdout.write(self.style.SUCCESS(f'{total} session(s) expirée(s) supprimée(s).'))
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+import users.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Restaurant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nom', models.CharField(max_length=100, verbose_name='Nom')),
+                ('code', models.SlugField(max_length=30, unique=True, verbose_name='Code')),
+                ('domaine', models.CharField(blank=True, help_text='Hôte servant ce restaurant, par exemple plateau.exemple.sn', max_length=255, null=True, unique=True, verbose_name='Nom de domaine')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Actif')),
+                ('date_created', models.DateTimeField(auto_now_add=True, verbose_name='Date de création')),
+            ],
+            options={
+                'verbose_name': 'Restaurant',
+                'verbose_name_plural': 'Restaurants',
+                'ordering': ['nom'],
+            },
+        ),
+        migrations.AlterModelManagers(
+            name='user',
+            managers=[
+                ('objects', users.models.UtilisateurManager()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='restaurant',
+            field=models.ForeignKey(blank=True, help_text='Vide pour un compte du réseau', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='utilisateurs', to='users.restaurant', verbose_name='Restaurant'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['restaurant', 'role'], name='user_restaurant_role_idx'),
+        ),
+    ]
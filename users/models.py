@@ -1,6 +1,70 @@
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager
 from django.db import models
 
+from .restaurants import restaurant_courant_id
+
+class Restaurant(models.Model):
+    """
+    Établissement du réseau : les catégories, produits, commandes,
+    mouvements de stock et comptes lui sont rattachés (users/restaurants.py)
+    """
+    nom = models.CharField(
+        max_length=100,
+        verbose_name='Nom'
+    )
+    code = models.SlugField(
+        max_length=30,
+        unique=True,
+        verbose_name='Code'
+    )
+    domaine = models.CharField(
+        max_length=255,
+        unique=True,
+        null=True,
+        blank=True,
+        verbose_name='Nom de domaine',
+        help_text='Hôte servant ce restaurant, par exemple plateau.exemple.sn'
+    )
+    latitude = models.FloatField(
+        null=True,
+        blank=True,
+        verbose_name='Latitude',
+        help_text='Position du restaurant, départ des tournées de livraison'
+    )
+    longitude = models.FloatField(
+        null=True,
+        blank=True,
+        verbose_name='Longitude'
+    )
+    is_active = models.BooleanField(
+        default=True,
+        verbose_name='Actif'
+    )
+    date_created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Date de création'
+    )
+    
+    class Meta:
+        verbose_name = 'Restaurant'
+        verbose_name_plural = 'Restaurants'
+        ordering = ['nom']
+    
+    def __str__(self):
+        return self.nom
+
+class UtilisateurManager(UserManager):
+    """
+    Gestionnaire des utilisateurs : l'authentification porte sur tout le
+    réseau, les listes sur le restaurant courant et les comptes du réseau
+    """
+    def du_restaurant(self):
+        utilisateurs = self.get_queryset()
+        restaurant_id = restaurant_courant_id()
+        if restaurant_id is None:
+            return utilisateurs
+        return utilisateurs.filter(models.Q(restaurant_id=restaurant_id) | models.Q(restaurant__isnull=True))
+
 class User(AbstractUser):
     """
     Modèle utilisateur personnalisé étendant AbstractUser
@@ -29,6 +93,15 @@ class User(AbstractUser):
         null=True,
         verbose_name='Adresse'
     )
+    restaurant = models.ForeignKey(
+        Restaurant,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='utilisateurs',
+        verbose_name='Restaurant',
+        help_text='Vide pour un compte du réseau'
+    )
     date_created = models.DateTimeField(
         auto_now_add=True,
         verbose_name='Date de création'
@@ -38,10 +111,15 @@ class User(AbstractUser):
         verbose_name='Date de mise à jour'
     )
     
+    objects = UtilisateurManager()
+    
     class Meta:
         verbose_name = 'Utilisateur'
         verbose_name_plural = 'Utilisateurs'
         ordering = ['-date_created']
+        indexes = [
+            models.Index(fields=['restaurant', 'role'], name='user_restaurant_role_idx'),
+        ]
     
     def __str__(self):
         return f"{self.username} ({self.get_role_display()})"
@@ -0,0 +1,128 @@
+"""
+Contrôle d'accès par rôle.
+
+Les rôles de User.role sont hiérarchiques (CLIENT < STAFF < MANAGER < ADMIN),
+comme les propriétés is_staff_user, is_manager et is_admin du modèle.
+Les vues déclarent le rôle minimum avec role_requis (ou staff_requis,
+manager_requis, admin_requis) ; AuthAccessMiddleware applique en amont la
+table POLITIQUES_ACCES des réglages, compilée en arbre de préfixes.
+
+Le rôle est conservé dans la session à la connexion, ce qui permet au
+middleware de filtrer les requêtes sans recharger l'utilisateur ; les
+décorateurs vérifient le rôle de l'utilisateur chargé et resynchronisent
+la session s'il a changé.
+"""
+from functools import wraps
+
+from django.contrib import messages
+from django.contrib.auth import SESSION_KEY, user_logged_in
+from django.contrib.auth.decorators import login_required
+from django.dispatch import receiver
+from django.shortcuts import redirect
+
+# Politique des pages accessibles sans connexion
+PUBLIC = 'PUBLIC'
+# Tout utilisateur connecté a au moins le rôle CLIENT
+AUTHENTIFIE = 'CLIENT'
+
+NIVEAUX = {
+    'CLIENT': 0,
+    'STAFF': 1,
+    'MANAGER': 2,
+    'ADMIN': 3,
+}
+
+CLE_SESSION_ROLE = '_role_utilisateur'
+
+
+def niveau(role):
+    return NIVEAUX.get(role, -1)
+
+
+def a_le_role(role, role_minimum):
+    """
+    Vrai si le rôle donné atteint le rôle minimum
+    """
+    return role_minimum == PUBLIC or niveau(role) >= niveau(role_minimum)
+
+
+def role_en_session(request):
+    """
+    Rôle mis en cache dans la session, None si la session n'est pas
+    authentifiée ou ne le contient pas encore
+    """
+    session = getattr(request, 'session', None)
+    if session is None or SESSION_KEY not in session:
+        return None
+    return session.get(CLE_SESSION_ROLE)
+
+
+def memoriser_role(request, user):
+    if request.session.get(CLE_SESSION_ROLE) != user.role:
+        request.session[CLE_SESSION_ROLE] = user.role
+
+
+@receiver(user_logged_in)
+def utilisateur_connecte(sender, request, user, **kwargs):
+    if request is not None and hasattr(request, 'session'):
+        memoriser_role(request, user)
+
+
+def refuser(request):
+    messages.error(request, 'Accès non autorisé.')
+    return redirect('users:dashboard')
+
+
+def role_requis(role_minimum):
+    """
+    Décorateur de vue : connexion obligatoire et rôle minimum
+    """
+    def decorateur(vue):
+        @wraps(vue)
+        def enveloppe(request, *args, **kwargs):
+            memoriser_role(request, request.user)
+            if not a_le_role(request.user.role, role_minimum):
+                return refuser(request)
+            return vue(request, *args, **kwargs)
+        return login_required(enveloppe)
+    return decorateur
+
+
+class PolitiquesAcces:
+    """
+    Table chemin -> rôle minimum compilée en arbre de préfixes par segment :
+    la recherche parcourt le chemin une seule fois et retient la politique
+    du plus long préfixe déclaré
+    """
+    __slots__ = ('racine',)
+
+    def __init__(self, politiques):
+        # Noeud : [politique ou None, {segment: noeud}]
+        self.racine = [None, {}]
+        for prefixe, role in politiques.items():
+            if role != PUBLIC and role not in NIVEAUX:
+                raise ValueError(f"Rôle inconnu dans la politique de {prefixe!r} : {role!r}")
+            noeud = self.racine
+            for segment in self._segments(prefixe):
+                noeud = noeud[1].setdefault(segment, [None, {}])
+            noeud[0] = role
+
+    @staticmethod
+    def _segments(chemin):
+        return [segment for segment in chemin.split('/') if segment]
+
+    def politique(self, chemin):
+        noeud = self.racine
+        role = noeud[0] or PUBLIC
+        for segment in self._segments(chemin):
+            noeud = noeud[1].get(segment)
+            if noeud is None:
+                break
+            if noeud[0] is not None:
+                role = noeud[0]
+        return role
+
+
+staff_requis = role_requis('STAFF')
+manager_requis = role_requis('MANAGER')
+admin_requis = role_requis('ADMIN')
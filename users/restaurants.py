@@ -0,0 +1,207 @@
+"""
+Restaurants du réseau (multi-établissement).
+
+Une même installation sert plusieurs restaurants. Le restaurant courant
+est porté par une variable de contexte : RestaurantMiddleware le résout à
+chaque requête (nom de domaine, restaurant choisi en session par un compte
+du réseau, restaurant du compte connecté, ou restaurant par défaut) et
+activer() le positionne ailleurs (commandes de gestion, tests). Seul un
+administrateur du réseau sans restaurant choisi consulte tout le réseau ;
+les clients et visiteurs sont servis par le restaurant par défaut
+(RESTAURANT_PAR_DEFAUT, code d'un restaurant, ou à défaut le premier créé).
+
+Les modèles propres à un restaurant ont pour gestionnaire par défaut
+ParRestaurantManager, qui filtre sur le restaurant courant ; leurs index
+composites commencent par restaurant_id, si bien qu'une requête ne
+parcourt pas les lignes des autres restaurants. Sans restaurant actif
+(installation à un seul restaurant, traitements sur tout le réseau), rien
+n'est filtré. Les nouvelles lignes sont rattachées au restaurant courant.
+
+Les instantanés gardés en mémoire par processus (catalogue, tables,
+tarifs, recettes, utilisateurs, annuaire) sont associés à un numéro de
+version lu avec version() et changé avec incrementer_apres_validation().
+Ces numéros vivent dans le cache Django, qui doit donc être commun à tous
+les processus (CACHES, restaurant_management/settings.py) ; ceux propres à
+un restaurant sont placés dans son espace de noms avec cle().
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+# Restaurant choisi par un compte du réseau
+CLE_SESSION = '_restaurant'
+CLE_VERSION = 'restaurants:version'
+
+_courant = contextvars.ContextVar('restaurant', default=None)
+_verrou = threading.Lock()
+_annuaire = None
+
+
+def restaurant_courant():
+    return _courant.get()
+
+
+def restaurant_courant_id():
+    restaurant = _courant.get()
+    return restaurant.pk if restaurant is not None else None
+
+
+@contextmanager
+def activer(restaurant):
+    """
+    Rend `restaurant` courant le temps du bloc (None : tout le réseau)
+    """
+    jeton = _courant.set(restaurant)
+    try:
+        yield restaurant
+    finally:
+        _courant.reset(jeton)
+
+
+def cle(nom, restaurant_id=None):
+    """
+    Clé de cache `nom` dans l'espace du restaurant `restaurant_id`, du
+    restaurant courant par défaut
+    """
+    if restaurant_id is None:
+        restaurant_id = restaurant_courant_id()
+    return nom if restaurant_id is None else f'{nom}:r{restaurant_id}'
+
+
+def version(cle_version):
+    """
+    Numéro de version partagé `cle_version`, créé au premier accès
+    """
+    valeur = cache.get(cle_version)
+    if valeur is None:
+        cache.add(cle_version, time.time_ns(), timeout=None)
+        valeur = cache.get(cle_version)
+    return valeur
+
+
+def incrementer_apres_validation(cle_version):
+    """
+    Incrémente le numéro de version `cle_version` après validation de la
+    transaction en cours
+    """
+    def incrementer():
+        try:
+            cache.incr(cle_version)
+        except ValueError:
+            cache.set(cle_version, time.time_ns(), timeout=None)
+
+    transaction.on_commit(incrementer)
+
+
+class ParRestaurantManager(models.Manager):
+    """
+    Gestionnaire limité au restaurant courant
+    """
+    # Chemin du restaurant depuis le modèle ; porté par la classe, que
+    # Django dérive pour les relations inverses
+    champ = 'restaurant'
+
+    @classmethod
+    def par(cls, champ):
+        """
+        Gestionnaire d'un modèle rattaché à son restaurant par `champ`
+        (commande__restaurant, produit__restaurant...)
+        """
+        return type(cls.__name__, (cls,), {'champ': champ})()
+
+    def get_queryset(self):
+        lignes = super().get_queryset()
+        restaurant_id = restaurant_courant_id()
+        if restaurant_id is None:
+            return lignes
+        return lignes.filter(**{self.champ: restaurant_id})
+
+    def tous(self):
+        """
+        Lignes de tous les restaurants
+        """
+        return super().get_queryset()
+
+
+class Annuaire:
+    """
+    Instantané des restaurants actifs : par pk, par nom de domaine et
+    restaurant par défaut
+    """
+    __slots__ = ('version', 'par_id', 'par_domaine', 'par_defaut')
+
+    def __init__(self, version, restaurants):
+        self.version = version
+        self.par_id = {restaurant.pk: restaurant for restaurant in restaurants}
+        self.par_domaine = {restaurant.domaine.lower(): restaurant for restaurant in restaurants if restaurant.domaine}
+        code = getattr(settings, 'RESTAURANT_PAR_DEFAUT', None)
+        self.par_defaut = next(
+            (restaurant for restaurant in self.par_id.values() if restaurant.code == code),
+            self.par_id[min(self.par_id)] if self.par_id else None,
+        )
+
+
+def annuaire():
+    """
+    Restaurants actifs, relus si leur version a changé
+    """
+    from .models import Restaurant
+
+    global _annuaire
+    courante = version(CLE_VERSION)
+    instantane = _annuaire
+    if instantane is not None and instantane.version == courante:
+        return instantane
+    with _verrou:
+        instantane = _annuaire
+        if instantane is None or instantane.version != courante:
+            instantane = Annuaire(courante, Restaurant.objects.filter(is_active=True))
+            _annuaire = instantane
+    return instantane
+
+
+def resoudre(request):
+    """
+    Restaurant servi par la requête, None pour tout le réseau (aucun
+    restaurant, ou administrateur du réseau sans restaurant choisi)
+    """
+    restaurants = annuaire()
+    if not restaurants.par_id:
+        return None
+    restaurant = restaurants.par_domaine.get(request.get_host().rsplit(':', 1)[0].lower())
+    if restaurant is not None:
+        return restaurant
+    user = request.user
+    if user.is_authenticated and user.restaurant_id:
+        restaurant = restaurants.par_id.get(user.restaurant_id)
+        if restaurant is not None:
+            return restaurant
+    elif user.is_authenticated and user.role == 'ADMIN':
+        # Compte du réseau : restaurant choisi en session, sinon tout le réseau
+        return restaurants.par_id.get(request.session.get(CLE_SESSION))
+    return restaurants.par_defaut
+
+
+def invalider_annuaire():
+    incrementer_apres_validation(CLE_VERSION)
+
+
+@receiver(pre_save)
+def rattacher_au_restaurant(sender, instance, raw=False, **kwargs):
+    # Modèles portant un champ restaurant, à la création seulement
+    if raw or not instance._state.adding or getattr(instance, 'restaurant_id', 0) is not None:
+        return
+    instance.restaurant_id = restaurant_courant_id()
+
+
+@receiver(post_save, sender='users.Restaurant')
+@receiver(post_delete, sender='users.Restaurant')
+def restaurant_modifie(sender, **kwargs):
+    invalider_annuaire()
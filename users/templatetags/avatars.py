@@ -0,0 +1,30 @@
+from urllib.parse import quote
+
+from django import template
+from django.utils.html import escape
+
+register = template.Library()
+
+COULEUR_FOND = '#007bff'
+COULEUR_TEXTE = '#fff'
+
+
+def initiales(nom):
+    """
+    Initiales des deux premiers mots d'un nom, en majuscules
+    """
+    return ''.join(mot[0] for mot in str(nom).split()[:2]).upper() or '?'
+
+
+@register.simple_tag
+def avatar(nom, taille=34):
+    """
+    URI data: d'un avatar SVG aux initiales du nom, sans service externe
+    """
+    svg = (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{taille}" height="{taille}" viewBox="0 0 100 100">'
+        f'<rect width="100" height="100" fill="{COULEUR_FOND}"/>'
+        f'<text x="50" y="50" dy=".35em" fill="{COULEUR_TEXTE}" font-family="sans-serif" font-size="40" '
+        f'text-anchor="middle">{escape(initiales(nom))}</text></svg>'
+    )
+    return 'data:image/svg+xml,' + quote(svg)
@@ -1,3 +1,304 @@
-from django.test import TestCase
+import io
+import math
+import time
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
+
+from commandes_app.cloture import ventes_par_restaurant
+from commandes_app import livraison
+from commandes_app.models import Cloture, Commande, Table, Tournee
+from produits_app.catalogue import catalogue
+from produits_app.models import Categorie, Produit
+from restaurant_management.essais import CachesIsoles
+from restaurant_management.middleware import AuthAccessMiddleware, RestaurantMiddleware
+
+from .backends import UtilisateurEnCacheBackend, _cle_version, utilisateur_en_cache
+from .hashers import PBKDF2Configurable
+from .models import Restaurant, User
+from .permissions import CLE_SESSION_ROLE, PolitiquesAcces
+from .restaurants import activer, restaurant_courant_id
+
+
+class PermissionsTests(CachesIsoles, TestCase):
+    """
+    Décorateurs de rôle, table des politiques et rôle en session
+    """
+
+    def test_plus_long_prefixe(self):
+        politiques = PolitiquesAcces({
+            '/': 'PUBLIC',
+            '/statistiques/': 'MANAGER',
+            '/statistiques/api/': 'STAFF',
+        })
+        self.assertEqual(politiques.politique('/login/'), 'PUBLIC')
+        self.assertEqual(politiques.politique('/statistiques/produits/'), 'MANAGER')
+        self.assertEqual(politiques.politique('/statistiques/api/v1/statuts/'), 'STAFF')
+        # Préfixe par segment : /statistiquesX/ n'est pas couvert
+        self.assertEqual(politiques.politique('/statistiquesX/'), 'PUBLIC')
+
+    def test_acces_par_role(self):
+        self.assertRedirects(
+            self.client.get('/stock/'), reverse('users:login') + '?next=/stock/', fetch_redirect_response=False,
+        )
+
+        employe = User.objects.create_user('employe', password='motdepasse', role='STAFF')
+        self.client.force_login(employe)
+        self.assertEqual(self.client.get(reverse('stock_app:dashboard')).status_code, 200)
+        self.assertRedirects(
+            self.client.get(reverse('stats_app:dashboard')), reverse('users:dashboard'),
+            fetch_redirect_response=False,
+        )
+        self.assertRedirects(
+            self.client.get(reverse('produits_app:produit_create')), reverse('users:dashboard'),
+            fetch_redirect_response=False,
+        )
+
+    def test_role_en_session(self):
+        User.objects.create_user('gerant', password='motdepasse', role='MANAGER')
+        self.client.post(reverse('users:login'), {'username': 'gerant', 'password': 'motdepasse'})
+        self.assertEqual(self.client.session[CLE_SESSION_ROLE], 'MANAGER')
+
+        # Le middleware décide à partir de la session, sans charger l'utilisateur
+        requete = RequestFactory().get('/statistiques/')
+        requete.session = {SESSION_KEY: '1', CLE_SESSION_ROLE: 'MANAGER'}
+        requete.user = SimpleLazyObject(lambda: self.fail("Utilisateur chargé"))
+        middleware = AuthAccessMiddleware(lambda request: HttpResponse('ok'))
+        with self.assertNumQueries(0):
+            self.assertEqual(middleware(requete).content, b'ok')
+
+
+class SessionsTests(CachesIsoles, TestCase):
+    """
+    Sessions cached_db et cache des utilisateurs : requêtes par requête
+    authentifiée
+    """
+
+    def test_benchmark_requetes_par_requete(self):
+        utilisateur = User.objects.create_user('employe', password='motdepasse', role='STAFF')
+        self.client.force_login(utilisateur)
+        url = reverse('stats_app:api_statuts')
+        self.client.get(url)
+
+        with CaptureQueriesContext(connection) as requetes:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        sql = [requete['sql'] for requete in requetes.captured_queries]
+        session_utilisateur = [s for s in sql if 'django_session' in s or '"users_user"' in s]
+        self.assertEqual(session_utilisateur, [], f'{len(sql)} requête(s) au total')
+
+    def test_invalidation_au_changement_de_role(self):
+        utilisateur = User.objects.create_user('employe', password='motdepasse', role='STAFF')
+        self.client.force_login(utilisateur)
+        url = reverse('stats_app:dashboard')
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        utilisateur.role = 'MANAGER'
+        utilisateur.save()
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+        # Le changement de mot de passe déconnecte les autres sessions
+        utilisateur.set_password('nouveau-motdepasse')
+        utilisateur.save()
+        self.assertRedirects(self.client.get(url), reverse('users:login') + '?next=' + url,
+                             fetch_redirect_response=False)
+
+    def test_modification_par_un_autre_processus(self):
+        # Les versions doivent être visibles de tous les processus
+        self.assertNotIsInstance(cache, LocMemCache)
+        utilisateur = User.objects.create_user('employe', password='motdepasse', role='STAFF')
+        backend = UtilisateurEnCacheBackend()
+        self.assertEqual(backend.get_user(utilisateur.pk).role, 'STAFF')
+
+        # Un autre processus désactive et promeut le compte : sa base et la
+        # version partagée changent, pas la mémoire de ce processus
+        User.objects.filter(pk=utilisateur.pk).update(role='MANAGER', is_active=False)
+        self.assertEqual(backend.get_user(utilisateur.pk).role, 'STAFF')
+        cache.incr(_cle_version(utilisateur.pk))
+        self.assertIsNone(backend.get_user(utilisateur.pk))
+        self.assertEqual(utilisateur_en_cache(utilisateur.pk).role, 'MANAGER')
+
+    def test_nettoyer_sessions(self):
+        maintenant = timezone.now()
+        for i in range(5):
+            Session.objects.create(session_key=f'expiree{i}', session_data='', expire_date=maintenant - timedelta(days=1))
+        Session.objects.create(session_key='active', session_data='', expire_date=maintenant + timedelta(days=1))
+
+        call_command('nettoyer_sessions', lot=2, pause=0, stdout=io.StringIO())
+        self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), ['active'])
+
+
+class ConnexionTests(CachesIsoles, TestCase):
+    """
+    Connexion : un seul hachage par tentative, mise à jour du coût et p95
+    """
+    REPETITIONS = 20
+    BUDGET_P95_MS = 1000
+
+    def _connecter(self, numero=0, mot_de_passe='motdepasse'):
+        # Adresse distincte par tentative pour rester sous RateLimitMiddleware
+        return self.client.post(
+            reverse('users:login'), {'username': 'gerant', 'password': mot_de_passe},
+            REMOTE_ADDR=f'10.0.0.{numero}',
+        )
+
+    def test_un_seul_hachage(self):
+        User.objects.create_user('gerant', password='motdepasse', role='MANAGER')
+        with mock.patch.object(
+            PBKDF2Configurable, 'verify', autospec=True, side_effect=PBKDF2Configurable.verify,
+        ) as verify:
+            reponse = self._connecter()
+        self.assertRedirects(reponse, reverse('users:dashboard'), fetch_redirect_response=False)
+        self.assertEqual(verify.call_count, 1)
+
+    def test_mise_a_jour_du_hachage(self):
+        with override_settings(PBKDF2_ITERATIONS=1000):
+            utilisateur = User.objects.create_user('gerant', password='motdepasse', role='MANAGER')
+        self.assertIn('$1000$', utilisateur.password)
+
+        self._connecter()
+        utilisateur.refresh_from_db()
+        self.assertTrue(utilisateur.password.startswith(f'pbkdf2_sha256${settings.PBKDF2_ITERATIONS}$'))
+        self.assertTrue(utilisateur.check_password('motdepasse'))
+
+    def test_benchmark_p95_connexion(self):
+        User.objects.create_user('gerant', password='motdepasse', role='MANAGER')
+        durees = []
+        for numero in range(self.REPETITIONS):
+            debut = time.perf_counter()
+            reponse = self._connecter(numero)
+            durees.append((time.perf_counter() - debut) * 1000)
+            self.assertEqual(reponse.status_code, 302)
+            self.client.logout()
+
+        p95 = sorted(durees)[math.ceil(0.95 * len(durees)) - 1]
+        print(f'Connexion : p95 {p95:.0f} ms sur {len(durees)} tentatives '
+              f'({settings.PBKDF2_ITERATIONS} itérations PBKDF2)')
+        self.assertLess(p95, self.BUDGET_P95_MS)
+
+
+
+class RestaurantsTests(CachesIsoles, TestCase):
+    """
+    Réseau de restaurants : données, catalogue, middleware et ventes
+    consolidées par restaurant
+    """
+
+    def setUp(self):
+        super().setUp()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.plateau = Restaurant.objects.create(nom='Plateau', code='plateau', domaine='plateau.exemple.sn')
+            self.almadies = Restaurant.objects.create(nom='Almadies', code='almadies')
+        self.produits = {}
+        for restaurant in (self.plateau, self.almadies):
+            with activer(restaurant), self.captureOnCommitCallbacks(execute=True):
+                # Même nom de catégorie dans chaque restaurant
+                categorie = Categorie.objects.create(nom='Plats')
+                self.produits[restaurant.code] = Produit.objects.create(
+                    nom=f'Yassa {restaurant.nom}', categorie=categorie, prix_vente=Decimal('3000'), stock_actuel=50,
+                )
+
+    def test_donnees_par_restaurant(self):
+        self.assertEqual(self.produits['plateau'].restaurant, self.plateau)
+        with activer(self.plateau):
+            self.assertEqual(list(Produit.objects.values_list('nom', flat=True)), ['Yassa Plateau'])
+            self.assertEqual(list(catalogue().par_id), [self.produits['plateau'].pk])
+            commande = Commande.objects.create(nom_client='Awa')
+        with activer(self.almadies):
+            self.assertEqual(list(catalogue().par_id), [self.produits['almadies'].pk])
+            self.assertFalse(Commande.objects.filter(pk=commande.pk).exists())
+        self.assertEqual(commande.restaurant, self.plateau)
+        # Sans restaurant actif : tout le réseau
+        self.assertEqual(Produit.objects.count(), 2)
+
+    def test_middleware(self):
+        def vue(request):
+            return HttpResponse(str(restaurant_courant_id()))
+
+        middleware = RestaurantMiddleware(vue)
+        equipe_almadies = User.objects.create_user('serveur', password='motdepasse', role='STAFF',
+                                                   restaurant=self.almadies)
+        requete = RequestFactory().get('/commandes/')
+        requete.session, requete.user = {}, equipe_almadies
+        self.assertEqual(middleware(requete).content, str(self.almadies.pk).encode())
+
+        # Domaine d'un autre restaurant : refusé au personnel
+        with override_settings(ALLOWED_HOSTS=['.exemple.sn']):
+            requete = RequestFactory().get('/commandes/', HTTP_HOST='plateau.exemple.sn')
+            requete.session, requete.user = {}, equipe_almadies
+            self.assertEqual(middleware(requete).status_code, 403)
+
+        # Client ou visiteur sans restaurant : restaurant par défaut, jamais tout le réseau
+        for utilisateur in (User.objects.create_user('cliente', password='motdepasse'), AnonymousUser()):
+            requete = RequestFactory().get('/commandes/')
+            requete.session, requete.user = {}, utilisateur
+            self.assertEqual(middleware(requete).content, str(self.plateau.pk).encode())
+        with override_settings(RESTAURANT_PAR_DEFAUT='almadies'):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.almadies.save()
+            requete.session = {}
+            self.assertEqual(middleware(requete).content, str(self.almadies.pk).encode())
+
+        # Administrateur du réseau : tout le réseau
+        requete.user = User.objects.create_user('admin', password='motdepasse', role='ADMIN')
+        self.assertEqual(middleware(requete).content, b'None')
+
+    def test_tables_et_tournees_par_restaurant(self):
+        Restaurant.objects.filter(pk=self.almadies.pk).update(latitude=14.7453, longitude=-17.5140)
+        tables = {}
+        for restaurant in (self.plateau, self.almadies):
+            with activer(restaurant):
+                # Chaque restaurant a sa table 1
+                tables[restaurant.code] = Table.objects.create(numero=1)
+                Commande.objects.create(nom_client='Awa', type_commande='LIVRAISON', latitude=14.72, longitude=-17.47)
+        self.assertEqual(tables['almadies'].restaurant, self.almadies)
+
+        tournees = livraison.planifier()
+        self.assertEqual(sorted(tournee.restaurant_id for tournee in tournees),
+                         sorted([self.plateau.pk, self.almadies.pk]))
+        distances = {tournee.restaurant_id: tournee.distance_km for tournee in tournees}
+        # Départ propre à chaque restaurant
+        self.assertNotEqual(distances[self.plateau.pk], distances[self.almadies.pk])
+        with activer(self.plateau):
+            self.assertEqual(list(Table.objects.all()), [tables['plateau']])
+            self.assertEqual([tournee.restaurant_id for tournee in Tournee.objects.all()], [self.plateau.pk])
+
+    def test_ventes_par_restaurant(self):
+        hier = timezone.localdate() - timedelta(days=1)
+        Cloture.objects.create(restaurant=self.plateau, date=hier, nombre_commandes=4, nombre_facturees=3,
+                               chiffre_affaires=Decimal('12000'))
+        for restaurant, montant in ((self.plateau, '5000'), (self.almadies, '7000'), (self.almadies, '1000')):
+            with activer(restaurant):
+                Commande.objects.create(nom_client='Client', statut='SERVIE', montant_total=Decimal(montant))
+
+        ventes = ventes_par_restaurant(hier, timezone.localdate())
+        self.assertEqual(ventes[self.plateau.pk]['chiffre_affaires'], Decimal('17000'))
+        self.assertEqual(ventes[self.plateau.pk]['nombre_commandes'], 5)
+        self.assertEqual(ventes[self.almadies.pk]['chiffre_affaires'], Decimal('8000'))
+
+    def test_creer_restaurant(self):
+        Produit.objects.create(nom='Bissap', categorie=Categorie.objects.create(nom='Boissons'),
+                               prix_vente=Decimal('500'))
+        User.objects.create_user('gerant', password='motdepasse', role='MANAGER')
+        User.objects.create_user('cliente', password='motdepasse', role='CLIENT')
+
+        call_command('creer_restaurant', 'ouakam', 'Ouakam', rattacher=True, stdout=io.StringIO())
+        ouakam = Restaurant.objects.get(code='ouakam')
+        self.assertEqual(Produit.objects.get(nom='Bissap').restaurant, ouakam)
+        self.assertEqual(User.objects.get(username='gerant').restaurant, ouakam)
+        # Les clients restent communs au réseau
+        self.assertIsNone(User.objects.get(username='cliente').restaurant)
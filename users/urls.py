@@ -17,4 +17,7 @@ urlpatterns = [
     path('<int:user_id>/', views.user_detail, name='detail'),
     path('<int:user_id>/update/', views.user_update, name='update'),
     path('<int:user_id>/delete/', views.user_delete, name='delete'),
+
+    # Restaurant consulté par un compte du réseau
+    path('restaurant/', views.choisir_restaurant, name='choisir_restaurant'),
 ]
@@ -1,10 +1,13 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.contrib.auth import login, logout, authenticate
+from django.contrib.auth import login, logout
 from django.contrib.auth.decorators import login_required
+from .permissions import admin_requis, manager_requis
 from django.contrib import messages
 from django.db.models import Q, Sum, Count
 from django.utils import timezone
+from django.views.decorators.http import require_POST
 from .models import User
+from .restaurants import CLE_SESSION, annuaire
 from .forms import CustomUserCreationForm, CustomAuthenticationForm, UserUpdateForm
 from produits_app.models import Produit
 from commandes_app.models import Commande
@@ -25,7 +28,7 @@ def dashboard_view(request):
     
     context = {
         'user': request.user,
-        'user_count': User.objects.count(),
+        'user_count': User.objects.du_restaurant().count(),
         'produit_count': produit_count,
         'commandes_count': commandes_count,
         'chiffre_affaires': chiffre_affaires,
@@ -41,16 +44,14 @@ def login_view(request):
     
     if request.method == 'POST':
         form = CustomAuthenticationForm(request, data=request.POST)
+        # is_valid() authentifie déjà : un seul hachage par tentative
         if form.is_valid():
-            username = form.cleaned_data.get('username')
-            password = form.cleaned_data.get('password')
-            user = authenticate(username=username, password=password)
-            if user is not None:
-                login(request, user)
-                messages.success(request, f'Bienvenue {username} !')
-                return redirect('users:dashboard')
-            else:
-                messages.error(request, 'Nom d\'utilisateur ou mot de passe incorrect.')
+            user = form.get_user()
+            login(request, user)
+            messages.success(request, f'Bienvenue {user.username} !')
+            return redirect('users:dashboard')
+        else:
+            messages.error(request, 'Nom d\'utilisateur ou mot de passe incorrect.')
     else:
         form = CustomAuthenticationForm()
     
@@ -82,17 +83,13 @@ def register_view(request):
     
     return render(request, 'users/register.html', {'form': form})
 
-@login_required
+@manager_requis
 def user_list(request):
     """
     Liste des utilisateurs (réservé aux admins/managers)
     """
-    if not request.user.is_manager:
-        messages.error(request, 'Accès non autorisé.')
-        return redirect('users:dashboard')
-    
     query = request.GET.get('q', '')
-    users = User.objects.all()
+    users = User.objects.du_restaurant()
     
     if query:
         users = users.filter(
@@ -104,28 +101,20 @@ def user_list(request):
     
     return render(request, 'users/list.html', {'users': users, 'query': query})
 
-@login_required
+@manager_requis
 def user_detail(request, user_id):
     """
     Détail d'un utilisateur
     """
-    if not request.user.is_manager:
-        messages.error(request, 'Accès non autorisé.')
-        return redirect('users:dashboard')
-    
-    user = get_object_or_404(User, id=user_id)
+    user = get_object_or_404(User.objects.du_restaurant(), id=user_id)
     return render(request, 'users/detail.html', {'user_obj': user})
 
-@login_required
+@admin_requis
 def user_update(request, user_id):
     """
     Mise à jour d'un utilisateur
     """
-    if not request.user.is_admin:
-        messages.error(request, 'Accès non autorisé.')
-        return redirect('users:dashboard')
-    
-    user = get_object_or_404(User, id=user_id)
+    user = get_object_or_404(User.objects.du_restaurant(), id=user_id)
     
     if request.method == 'POST':
         form = UserUpdateForm(request.POST, instance=user)
@@ -138,16 +127,12 @@ def user_update(request, user_id):
     
     return render(request, 'users/update.html', {'form': form, 'user_obj': user})
 
-@login_required
+@admin_requis
 def user_delete(request, user_id):
     """
     Suppression d'un utilisateur
     """
-    if not request.user.is_admin:
-        messages.error(request, 'Accès non autorisé.')
-        return redirect('users:dashboard')
-    
-    user = get_object_or_404(User, id=user_id)
+    user = get_object_or_404(User.objects.du_restaurant(), id=user_id)
     
     if user == request.user:
         messages.error(request, 'Vous ne pouvez pas supprimer votre propre compte.')
@@ -159,3 +144,25 @@ def user_delete(request, user_id):
         return redirect('users:list')
     
     return render(request, 'users/delete.html', {'user_obj': user})
+
+@admin_requis
+@require_POST
+def choisir_restaurant(request):
+    """
+    Restaurant consulté par un compte du réseau (vide : tout le réseau)
+    """
+    if request.user.restaurant_id is not None:
+        messages.error(request, 'Ce compte est rattaché à un seul restaurant.')
+        return redirect('users:dashboard')
+
+    try:
+        restaurant = annuaire().par_id.get(int(request.POST.get('restaurant', '')))
+    except ValueError:
+        restaurant = None
+    if restaurant is None:
+        request.session.pop(CLE_SESSION, None)
+        messages.info(request, 'Vous consultez tout le réseau.')
+    else:
+        request.session[CLE_SESSION] = restaurant.pk
+        messages.success(request, f'Vous consultez le restaurant {restaurant.nom}.')
+    return redirect('stats_app:reseau')